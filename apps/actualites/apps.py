@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class ActualitesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.actualites'
+
+    def ready(self):
+        from . import services
+        services.connecter_signaux()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.actualites.services import CompteurVuesService
+
+
+class Command(BaseCommand):
+    help = 'Reporte en base les vues d\'actualités accumulées dans le cache (à lancer via cron)'
+
+    def handle(self, *args, **options):
+        total = CompteurVuesService.flush()
+        self.stdout.write(self.style.SUCCESS(f'{total} vue(s) reportée(s) en base'))
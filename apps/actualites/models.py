@@ -5,6 +5,8 @@ from django.core.exceptions import ValidationError
 from django.db.models import F
 from django.conf import settings
 
+from apps.core import slugs
+
 
 class ActualitesActualite(models.Model):
     CATEGORIE_CHOICES = [
@@ -70,19 +72,16 @@ class ActualitesActualite(models.Model):
         if not self.slug:
             self.slug = slugify(self.titre)
 
-        if not self.pk:
-            original_slug = self.slug
-            counter = 1
-            while ActualitesActualite.objects.filter(slug=self.slug).exists():
-                self.slug = f'{original_slug}--{counter}'
-                counter += 1
-            self.created_at = now
-
         if self.publie and not self.date_publication:
             self.date_publication = now
 
         self.updated_at = now
-        super().save(*args, **kwargs)
+        if not self.pk:
+            self.created_at = now
+            # Suffixe libre suivant, sans boucle de sondage (apps/core/slugs.py)
+            slugs.enregistrer(self, super().save, self.slug, *args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
 
     def incrementer_vues(self):
         ActualitesActualite.objects.filter(pk=self.pk).update(vue=F('vue') + 1)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from apps.core.images import ImageDerivesField
 from .models import ActualitesActualite
 
 User = get_user_model()
@@ -25,12 +26,13 @@ class ActualiteSerializer(serializers.ModelSerializer):
     resume_auto = serializers.CharField(read_only=True)
     temps_lecture = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    image_variantes = ImageDerivesField(source='image_principale')
 
     class Meta:
         model = ActualitesActualite
         fields = [
             'id', 'titre', 'slug', 'contenu', 'resume', 'resume_auto',
-            'categorie', 'categorie_display', 'image_url',
+            'categorie', 'categorie_display', 'image_url', 'image_variantes',
             'auteur', 'auteur_detail', 'date_publication',
             'important', 'publie', 'est_publiee',
             'vue', 'featured', 'temps_lecture',
@@ -83,12 +85,13 @@ class ActualiteListSerializer(serializers.ModelSerializer):
     categorie_display = serializers.CharField( read_only=True)
     temps_lecture = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    image_variantes = ImageDerivesField(source='image_principale')
     
     class Meta:
         model = ActualitesActualite
         fields = [
             'id', 'titre', 'slug', 'resume', 'categorie', 'categorie_display',
-             'image_url', 'auteur_nom', 'date_publication',
+             'image_url', 'image_variantes', 'auteur_nom', 'date_publication',
             'important', 'publie', 'vue', 'featured', 'temps_lecture',
             'created_at'
         ]
@@ -0,0 +1,216 @@
+# apps/actualites/services.py
+import contextlib
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, Value, When
+from django.db.models.signals import post_save
+
+from .models import ActualitesActualite
+
+logger = logging.getLogger(__name__)
+
+
+class CompteurVuesService:
+    """
+    Compteur de vues bufferisé pour les actualités.
+
+    Les vues sont accumulées dans le cache (delta partagé entre les workers)
+    et dédupliquées par visiteur sur une courte fenêtre. Les deltas sont
+    reportés dans `ActualitesActualite.vue` par lots, hors requête, par la
+    commande `flush_vues_actualites` (cron, chaque minute) : une vue ne
+    déclenche jamais d'UPDATE.
+
+    L'index partagé des actualités à reporter n'est modifié, et un report
+    n'est fait, que sous un verrou du cache (LOCK_KEY) : deux workers ne
+    s'écrasent pas l'index et un même delta n'est pas reporté deux fois.
+
+    Un identifiant inexistant est mémorisé comme tel (ABSENT, pendant
+    ABSENT_TIMEOUT secondes, oublié à la création d'une actualité) : des
+    vues répétées sur un mauvais id ne lisent pas la base à chaque fois.
+    """
+
+    BASE_KEY = 'actualites:vues:base:{}'
+    DELTA_KEY = 'actualites:vues:delta:{}'
+    VU_KEY = 'actualites:vues:vu:{}:{}'
+    DIRTY_KEY = 'actualites:vues:dirty:{}'
+    INDEX_KEY = 'actualites:vues:index'
+    LOCK_KEY = 'actualites:vues:verrou'
+    ABSENT = -1
+
+    @staticmethod
+    def _config():
+        config = {
+            'DEDUP_SECONDS': 1800, 'BASE_TIMEOUT': 3600, 'ABSENT_TIMEOUT': 300,
+            'LOCK_TIMEOUT': 60, 'LOCK_WAIT': 1.0,
+        }
+        config.update(getattr(settings, 'ACTUALITES_VUES', {}))
+        return config
+
+    @staticmethod
+    def identifiant_visiteur(request):
+        """Empreinte du visiteur : utilisateur connecté, sinon IP + user agent."""
+        if request.user.is_authenticated:
+            brut = f'user:{request.user.pk}'
+        else:
+            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+            ip = x_forwarded_for.split(',')[0].strip() if x_forwarded_for else request.META.get('REMOTE_ADDR', '')
+            brut = f"{ip}|{request.META.get('HTTP_USER_AGENT', '')}"
+        return hashlib.sha1(brut.encode()).hexdigest()
+
+    @classmethod
+    def _base(cls, actualite_id):
+        """
+        Nombre de vues déjà persisté, None si l'actualité n'existe pas ;
+        lu en base uniquement si absent du cache.
+        """
+        cle = cls.BASE_KEY.format(actualite_id)
+        base = cache.get(cle)
+        if base is None:
+            base = ActualitesActualite.objects.filter(pk=actualite_id).values_list('vue', flat=True).first()
+            config = cls._config()
+            if base is None:
+                cache.add(cle, cls.ABSENT, config['ABSENT_TIMEOUT'])
+                return None
+            cache.add(cle, base, config['BASE_TIMEOUT'])
+        return None if base == cls.ABSENT else base
+
+    @classmethod
+    def oublier_absence(cls, actualite_id):
+        """Appelé à la création d'une actualité (signal post_save)."""
+        cle = cls.BASE_KEY.format(actualite_id)
+        if cache.get(cle) == cls.ABSENT:
+            cache.delete(cle)
+
+    @classmethod
+    def _incrementer(cls, cle, delta=1):
+        try:
+            return cache.incr(cle, delta)
+        except ValueError:
+            if cache.add(cle, delta, timeout=None):
+                return delta
+            return cache.incr(cle, delta)
+
+    @classmethod
+    @contextlib.contextmanager
+    def _verrou(cls, attente):
+        """Verrou partagé de l'index ; produit False s'il n'est pas obtenu à temps."""
+        config = cls._config()
+        fin, pause = time.monotonic() + attente, 0.01
+        obtenu = cache.add(cls.LOCK_KEY, 1, config['LOCK_TIMEOUT'])
+        while not obtenu and time.monotonic() < fin:
+            time.sleep(pause)
+            pause = min(pause * 2, 0.1)
+            obtenu = cache.add(cls.LOCK_KEY, 1, config['LOCK_TIMEOUT'])
+        try:
+            yield obtenu
+        finally:
+            if obtenu:
+                cache.delete(cls.LOCK_KEY)
+
+    @classmethod
+    def _marquer(cls, actualite_id):
+        # L'index partagé est la seule liste des deltas à reporter : la
+        # commande de report tourne dans un autre processus.
+        dirty = cls.DIRTY_KEY.format(actualite_id)
+        if cache.add(dirty, 1, timeout=None):
+            with cls._verrou(cls._config()['LOCK_WAIT']) as obtenu:
+                if obtenu:
+                    index = cache.get(cls.INDEX_KEY, set())
+                    index.add(actualite_id)
+                    cache.set(cls.INDEX_KEY, index, timeout=None)
+                else:
+                    # Report en cours trop long : la prochaine vue de cette
+                    # actualité réessaiera, le delta reste dans le cache
+                    cache.delete(dirty)
+
+    @classmethod
+    def enregistrer_vue(cls, actualite_id, visiteur):
+        """
+        Enregistre une vue et retourne le nombre de vues approximatif,
+        ou None si l'actualité n'existe pas.
+        """
+        base = cls._base(actualite_id)
+        if base is None:
+            return None
+
+        config = cls._config()
+        if cache.add(cls.VU_KEY.format(actualite_id, visiteur), 1, config['DEDUP_SECONDS']):
+            delta = cls._incrementer(cls.DELTA_KEY.format(actualite_id))
+            cls._marquer(actualite_id)
+        else:
+            delta = cache.get(cls.DELTA_KEY.format(actualite_id), 0)
+        return base + delta
+
+    @classmethod
+    def nombre_vues(cls, actualite_id):
+        base = cls._base(actualite_id)
+        if base is None:
+            return None
+        return base + cache.get(cls.DELTA_KEY.format(actualite_id), 0)
+
+    @classmethod
+    def flush(cls):
+        """
+        Reporte tous les deltas en attente en une seule requête UPDATE
+        (commande `flush_vues_actualites`). Sans effet (0) si un autre
+        report est en cours.
+        """
+        with cls._verrou(0) as obtenu:
+            if not obtenu:
+                return 0
+            return cls._reporter()
+
+    @classmethod
+    def _reporter(cls):
+        """Report sous verrou : l'index n'est pas modifié pendant ce temps."""
+        index = cache.get(cls.INDEX_KEY, set())
+        ids = set(index)
+        if not ids:
+            return 0
+
+        cles = {cls.DELTA_KEY.format(i): i for i in ids}
+        deltas = {cles[cle]: d for cle, d in cache.get_many(list(cles)).items() if d}
+        if deltas:
+            try:
+                ActualitesActualite.objects.filter(pk__in=deltas).update(
+                    vue=F('vue') + Case(
+                        *[When(pk=pk, then=Value(d)) for pk, d in deltas.items()],
+                        default=Value(0),
+                    )
+                )
+            except Exception as e:
+                # Index inchangé : le prochain report reprend ces deltas
+                logger.error(f"Erreur lors du report des vues: {e}")
+                return 0
+
+        restants = set()
+        for pk, d in deltas.items():
+            # decr plutôt que delete : les vues arrivées entre la lecture
+            # et l'UPDATE restent comptées pour le prochain report.
+            if cache.decr(cls.DELTA_KEY.format(pk), d) > 0:
+                restants.add(pk)
+            try:
+                cache.incr(cls.BASE_KEY.format(pk), d)
+            except ValueError:
+                pass
+
+        # Actualités encore en attente gardées dans l'index (et marquées)
+        reportes = ids - restants
+        cache.delete_many([cls.DIRTY_KEY.format(i) for i in reportes])
+        if reportes:
+            cache.set(cls.INDEX_KEY, index - reportes, timeout=None)
+        return sum(deltas.values())
+
+
+def _actualite_enregistree(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        CompteurVuesService.oublier_absence(instance.pk)
+
+
+def connecter_signaux():
+    """Appelé depuis ActualitesConfig.ready()."""
+    post_save.connect(_actualite_enregistree, sender=ActualitesActualite, dispatch_uid='actualites_vues_creation')
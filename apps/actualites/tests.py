@@ -1,4 +1,9 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
@@ -6,12 +11,14 @@ from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import AccessToken
 from django.contrib.auth import get_user_model
 from .models import ActualitesActualite
+from .services import CompteurVuesService
 
 User = get_user_model()
 
 
 class ActualiteAPITestCase(APITestCase):
     def setUp(self):
+        cache.clear()
         # Créer un utilisateur admin et normal
         self.admin_user = User.objects.create_superuser(
             username='admin',
@@ -131,6 +138,99 @@ class ActualiteAPITestCase(APITestCase):
         self.assertIn('Profession', response.data)
 
 
+class CompteurVuesTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.auteur = User.objects.create_user(username='auteur', password='test')
+        self.lecteur = User.objects.create_user(username='lecteur', password='test')
+        self.client.force_authenticate(user=self.auteur)
+        self.actualite = ActualitesActualite.objects.create(
+            titre='Actualité suivie',
+            contenu='Contenu',
+            categorie='profession',
+            auteur=self.auteur,
+            publie=True,
+            vue=5
+        )
+        self.url = reverse('actualites:actualite-incrementer-vues', args=[self.actualite.id])
+
+    def test_vue_dedupliquee_par_visiteur(self):
+        """Un même visiteur ne compte qu'une fois dans la fenêtre"""
+        self.assertEqual(self.client.post(self.url).data['vues'], 6)
+        self.assertEqual(self.client.post(self.url).data['vues'], 6)
+        self.client.force_authenticate(user=self.lecteur)
+        self.assertEqual(self.client.post(self.url).data['vues'], 7)
+
+    def test_vue_sans_requete_en_base(self):
+        """Une fois la base en cache, le compteur ne touche plus la base"""
+        self.client.post(self.url)
+        self.client.force_authenticate(user=self.lecteur)
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url)
+        self.assertEqual(response.data['vues'], 7)
+
+    def test_flush_reporte_les_vues(self):
+        """Le report écrit les deltas en base sans changer le compte affiché"""
+        self.client.post(self.url)
+        self.client.force_authenticate(user=self.lecteur)
+        self.client.post(self.url)
+        self.assertEqual(CompteurVuesService.flush(), 2)
+
+        self.actualite.refresh_from_db()
+        self.assertEqual(self.actualite.vue, 7)
+        self.assertEqual(CompteurVuesService.nombre_vues(self.actualite.id), 7)
+        self.assertEqual(CompteurVuesService.flush(), 0)
+
+    def test_index_partage_et_report_unique(self):
+        """Marquages de workers différents gardés, un report à la fois"""
+        autre = ActualitesActualite.objects.create(
+            titre='Autre actualité', contenu='Contenu', categorie='profession', auteur=self.auteur, publie=True,
+        )
+        CompteurVuesService.enregistrer_vue(self.actualite.id, 'visiteur-a')
+        CompteurVuesService.enregistrer_vue(autre.id, 'visiteur-b')
+        # L'index partagé connaît les deltas de tous les workers
+        self.assertEqual(cache.get(CompteurVuesService.INDEX_KEY), {self.actualite.id, autre.id})
+
+        cache.add(CompteurVuesService.LOCK_KEY, 1)
+        self.assertEqual(CompteurVuesService.flush(), 0)
+        cache.delete(CompteurVuesService.LOCK_KEY)
+        self.assertEqual(CompteurVuesService.flush(), 2)
+        self.assertEqual(CompteurVuesService.flush(), 0)
+        self.actualite.refresh_from_db()
+        self.assertEqual(self.actualite.vue, 6)
+        self.assertEqual(cache.get(CompteurVuesService.INDEX_KEY), set())
+
+    def test_actualite_inexistante(self):
+        url = reverse('actualites:actualite-incrementer-vues', args=[999999])
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        # Absence mémorisée : pas de lecture en base à chaque vue
+        with self.assertNumQueries(0):
+            self.assertIsNone(CompteurVuesService.enregistrer_vue(999999, 'visiteur-a'))
+
+    def test_absence_oubliee_a_la_creation(self):
+        prochain = self.actualite.id + 1
+        self.assertIsNone(CompteurVuesService.nombre_vues(prochain))
+        ActualitesActualite.objects.create(
+            id=prochain, titre='Nouvelle', contenu='Contenu', categorie='profession', auteur=self.auteur, vue=3,
+            created_at=timezone.now(), updated_at=timezone.now(),
+        )
+        self.assertEqual(CompteurVuesService.nombre_vues(prochain), 3)
+
+    def test_vue_ne_reporte_jamais_en_base(self):
+        """Le report est réservé à la commande flush_vues_actualites"""
+        with mock.patch.object(CompteurVuesService, 'flush') as flush:
+            for visiteur in ('visiteur-a', 'visiteur-b'):
+                CompteurVuesService.enregistrer_vue(self.actualite.id, visiteur)
+        flush.assert_not_called()
+        self.actualite.refresh_from_db()
+        self.assertEqual(self.actualite.vue, 5)
+
+        call_command('flush_vues_actualites', stdout=StringIO())
+        self.actualite.refresh_from_db()
+        self.assertEqual(self.actualite.vue, 7)
+
+
 class ActualiteModelTestCase(TestCase):
     def test_est_publiee_property(self):
         """Test de la propriété est_publiee"""
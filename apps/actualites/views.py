@@ -9,7 +9,10 @@ from django_filters import rest_framework as django_filters
 from django.utils import timezone
 from .models import ActualitesActualite
 from .serializers import ActualiteSerializer, ActualiteListSerializer
+from .services import CompteurVuesService
 from django.db.models import Count, Q, Sum, Avg, F
+from apps.core.budget import budget_requetes, grouper
+from apps.core.cache import cached_public_response
 
 
 class ActualiteFilter(django_filters.FilterSet):
@@ -76,6 +79,7 @@ class ActualiteViewSet(viewsets.ModelViewSet):
         return context
     
     @action(detail=False, methods=['get'])
+    @cached_public_response(ActualitesActualite)
     def publiees(self, request):
         """Liste des actualités publiées (accessible publiquement)"""
         actualites = self.get_queryset().filter(
@@ -109,6 +113,7 @@ class ActualiteViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cached_public_response(ActualitesActualite)
     def featured(self, request):
         """Actualités mises en avant (featured)"""
         actualites = self.get_queryset().filter(
@@ -126,21 +131,26 @@ class ActualiteViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cached_public_response(ActualitesActualite)
+    @budget_requetes(2)
     def par_categorie(self, request):
-        queryset = self.get_queryset().filter(
-            publie = True,
-            date_publication__lte = timezone.now()
+        actualites = grouper(
+            self.get_queryset().filter(
+                publie = True,
+                date_publication__lte = timezone.now()
+            ).select_related('auteur'),
+            'categorie'
         )
         data = {}
         for cat, label in ActualitesActualite.CATEGORIE_CHOICES:
-            items = queryset.filter(categorie=cat)
-            serializer = self.get_serializer(items, many=True)
+            serializer = self.get_serializer(actualites.get(cat, []), many=True)
             data[label] = serializer.data
         return Response(data)
 
 
 
     @action(detail=False, methods=['get'])
+    @cached_public_response(ActualitesActualite)
     def recentes(self, request):
         """Dernières actualités (limitées)"""
         limite = request.query_params.get('limite', 5)
@@ -181,10 +191,18 @@ class ActualiteViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def incrementer_vues(self, request, pk=None):
-        """Incrémenter le compteur de vues"""
-        ActualitesActualite.objects.filter(pk=pk).update(vue=F('vue') +1)
-        actualite = ActualitesActualite.objects.only('vue').get(pk=pk)
-        return Response({'vues': actualite.vue})
+        """Incrémenter le compteur de vues (bufferisé, dédupliqué par visiteur)"""
+        try:
+            actualite_id = int(pk)
+        except (TypeError, ValueError):
+            return Response({"detail": "Actualité introuvable"}, status=status.HTTP_404_NOT_FOUND)
+
+        vues = CompteurVuesService.enregistrer_vue(
+            actualite_id, CompteurVuesService.identifiant_visiteur(request)
+        )
+        if vues is None:
+            return Response({"detail": "Actualité introuvable"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'vues': vues})
         
     @action(detail=False, methods=['get'])
     def recherche_avancee(self, request):
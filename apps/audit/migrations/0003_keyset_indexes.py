@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='securitylog',
+            name='audit_secur_timesta_06e479_idx',
+        ),
+        migrations.AddIndex(
+            model_name='auditadminactionlog',
+            index=models.Index(fields=['created_at', 'id'], name='audit_admin_created_b57228_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loginattemptlog',
+            index=models.Index(fields=['timestamp', 'id'], name='audit_login_timesta_0353b5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='securitylog',
+            index=models.Index(fields=['timestamp', 'id'], name='audit_secur_timesta_70f24f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokenusagelog',
+            index=models.Index(fields=['used_at', 'id'], name='audit_token_used_at_dfe1e4_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Partitionnement mensuel des journaux d'audit (PostgreSQL uniquement)
+
+from django.db import migrations
+
+TABLES = {
+    'audit_securitylog': 'timestamp',
+    'audit_loginattempt': 'timestamp',
+    'audit_tokenusage': 'used_at',
+}
+
+
+def partitionner(apps, schema_editor):
+    from apps.system.partitions import convertir_en_partitions
+
+    for table, colonne in TABLES.items():
+        convertir_en_partitions(schema_editor.connection, table, colonne)
+
+
+class Migration(migrations.Migration):
+    # Une transaction par table, puis une par lot de lignes copiées
+    # (apps/system/partitions.py)
+    atomic = False
+
+    dependencies = [
+        ('audit', '0003_keyset_indexes'),
+    ]
+
+    operations = [
+        # Les modèles sont inchangés ; les tables restent partitionnées en
+        # cas de retour arrière.
+        migrations.RunPython(partitionner, migrations.RunPython.noop),
+    ]
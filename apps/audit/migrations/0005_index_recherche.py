@@ -0,0 +1,44 @@
+# Index de recherche des journaux d'audit (PostgreSQL uniquement, voir apps/audit/recherche.py)
+
+from django.db import migrations
+
+INDEX = {
+    # details @> {...}
+    'audit_secur_details_gin':
+        'ON audit_securitylog USING gin (details jsonb_path_ops)',
+    # texte libre dans details
+    'audit_secur_details_fts':
+        "ON audit_securitylog USING gin (jsonb_to_tsvector('simple'::regconfig, details, '[\"string\"]'::jsonb))",
+    # username / email en icontains (UPPER(...) LIKE UPPER('%...%'))
+    'audit_login_username_trgm':
+        'ON audit_loginattempt USING gin (UPPER(username) gin_trgm_ops)',
+    'audit_user_email_trgm':
+        'ON utilisateurs_user USING gin (UPPER(email) gin_trgm_ops)',
+}
+
+
+def creer_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nom, definition in INDEX.items():
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {nom} {definition}')
+
+
+def supprimer_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nom in INDEX:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nom}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0004_partitions_journaux'),
+        ('utilisateurs', '0003_user_token_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
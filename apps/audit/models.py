@@ -24,6 +24,9 @@ class AuditAdminactionlog(models.Model):
     class Meta:
         managed = True
         db_table = 'audit_adminactionlog'
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
 
 
 class SecurityLog(models.Model):
@@ -69,7 +72,7 @@ class SecurityLog(models.Model):
         managed = True
         db_table = 'audit_securitylog'
         indexes = [
-            models.Index(fields=['timestamp']),
+            models.Index(fields=['timestamp', 'id']),
             models.Index(fields=['user', 'timestamp']),
             models.Index(fields=['action', 'timestamp']),
             models.Index(fields=['ip_address', 'timestamp']),
@@ -112,6 +115,7 @@ class LoginAttemptLog(models.Model):
         managed = True
         db_table = 'audit_loginattempt'
         indexes = [
+            models.Index(fields=['timestamp', 'id']),
             models.Index(fields=['username', 'timestamp']),
             models.Index(fields=['ip_address', 'timestamp']),
             models.Index(fields=['success', 'timestamp']),
@@ -130,4 +134,7 @@ class TokenUsageLog(models.Model):
     
     class Meta:
         managed = True
-        db_table = 'audit_tokenusage'
\ No newline at end of file
+        db_table = 'audit_tokenusage'
+        indexes = [
+            models.Index(fields=['used_at', 'id']),
+        ]
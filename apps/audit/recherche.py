@@ -0,0 +1,161 @@
+# apps/audit/recherche.py
+"""
+Recherche dans les journaux d'audit.
+
+Sur PostgreSQL, chaque critère est servi par un index (migration
+0005_index_recherche) :
+
+    texte libre dans `details`   GIN sur jsonb_to_tsvector('simple', details)
+    `details` cle:valeur / JSON  GIN jsonb_path_ops (opérateur @>)
+    IP, préfixe ou CIDR          colonne inet, opérateur <<=
+    email / nom d'utilisateur    GIN pg_trgm sur UPPER(...) (icontains)
+    action                       btree (action, timestamp), égalité seulement
+
+Sur les autres bases (SQLite en développement), les mêmes filtres sont
+appliqués sans index : icontains sur le texte du JSON, clé JSON exacte, et
+appartenance au réseau calculée en Python sur les adresses distinctes.
+"""
+import ipaddress
+import json
+
+from django.contrib.postgres.search import SearchQuery, SearchVectorExact, SearchVectorField
+from django.db import connections
+from django.db.models import F, Func, GenericIPAddressField, Lookup, Q
+from django.db.utils import NotSupportedError
+
+
+@GenericIPAddressField.register_lookup
+class DansReseau(Lookup):
+    """`ip_address__dans_reseau='10.0.0.0/8'` : adresse contenue dans le réseau (inet <<=)."""
+    lookup_name = 'dans_reseau'
+
+    def as_sql(self, compiler, connection):
+        raise NotSupportedError("dans_reseau n'est disponible que sur PostgreSQL")
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} <<= {rhs}::inet', (*lhs_params, *rhs_params)
+
+
+def _postgresql(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def lire_reseau(valeur):
+    """
+    Adresse, réseau CIDR ou préfixe IPv4 par octets (`192.168.1` ->
+    192.168.1.0/24) ; None si la valeur n'en est pas un.
+    """
+    valeur = valeur.strip()
+    octets = valeur.rstrip('.').split('.')
+    if 1 < len(octets) < 4 and all(o.isdigit() for o in octets):
+        valeur = '.'.join(octets + ['0'] * (4 - len(octets))) + f'/{8 * len(octets)}'
+    try:
+        return ipaddress.ip_network(valeur, strict=False)
+    except ValueError:
+        return None
+
+
+def filtrer_reseau(queryset, champ, reseau):
+    """Lignes dont l'adresse `champ` appartient à `reseau` (ip_network)."""
+    if reseau.num_addresses == 1:
+        return queryset.filter(**{champ: str(reseau.network_address)})
+    if _postgresql(queryset):
+        return queryset.filter(**{f'{champ}__dans_reseau': str(reseau)})
+    adresses = [
+        ip for ip in queryset.exclude(**{f'{champ}__isnull': True})
+        .order_by().values_list(champ, flat=True).distinct()
+        if ipaddress.ip_address(ip) in reseau
+    ]
+    return queryset.filter(**{f'{champ}__in': adresses})
+
+
+class TsvecteurJson(Func):
+    """Expression indexée par audit_secur_details_fts (chaînes du JSON, configuration simple)."""
+    template = "jsonb_to_tsvector('simple'::regconfig, %(expressions)s, '[\"string\"]'::jsonb)"
+    output_field = SearchVectorField()
+
+
+def filtre_texte_details(queryset, terme, champ='details'):
+    """Condition « le texte de `champ` contient `terme` » (plein texte sur PostgreSQL)."""
+    if _postgresql(queryset):
+        # Expression plutôt que SQL brut : la colonne suit l'alias de la
+        # table, y compris dans les sous-requêtes de rechercher()
+        return Q(SearchVectorExact(
+            TsvecteurJson(F(champ)), SearchQuery(terme, config='simple', search_type='plain'),
+        ))
+    return Q(**{f'{champ}__icontains': terme})
+
+
+def filtrer_details(queryset, critere, champ='details'):
+    """
+    Filtre structuré sur un JSON : `cle:valeur` ou objet JSON (`{"cle": ...}`).
+    Sur PostgreSQL, la containment @> est servie par l'index jsonb_path_ops.
+    """
+    try:
+        objet = json.loads(critere)
+    except ValueError:
+        objet = None
+    if not isinstance(objet, dict):
+        cle, separateur, valeur = critere.partition(':')
+        if not separateur:
+            return queryset.filter(filtre_texte_details(queryset, critere, champ))
+        objet = {cle.strip(): valeur.strip()}
+
+    if _postgresql(queryset):
+        return queryset.filter(**{f'{champ}__contains': objet})
+    return queryset.filter(**{f'{champ}__{cle}': valeur for cle, valeur in objet.items()})
+
+
+def _branche_texte(queryset, champ, terme):
+    """
+    Sous-requête des pk dont `champ` contient `terme`. Un champ d'une table
+    liée (`user__email`) est cherché dans sa propre table, où l'index
+    trigramme le sert, puis rattaché par la clé étrangère indexée.
+    """
+    relation, _, sous_champ = champ.rpartition('__')
+    if relation:
+        modele = queryset.model._meta.get_field(relation).related_model
+        cibles = modele._default_manager.filter(**{f'{sous_champ}__icontains': terme})
+        return queryset.filter(**{f'{relation}__in': cibles.values('pk')})
+    return queryset.filter(**{f'{champ}__icontains': terme})
+
+
+def rechercher(queryset, params, champs_texte, champ_ip='ip_address', champ_details=None,
+               champs_exacts=()):
+    """
+    Applique les paramètres de recherche communs aux journaux :
+
+        q        texte libre : champs_texte en icontains, champs_exacts en
+                 égalité (codes sans index texte, comme `action`), details
+                 en plein texte, IP exacte ou réseau si la valeur en est
+                 un ; `search` (paramètre du SearchFilter DRF) en est un alias
+        ip       adresse, préfixe ou réseau CIDR (10.0.0.0/8, 2001:db8::/32)
+        details  critère structuré (cle:valeur ou objet JSON)
+
+    Chaque critère du texte libre est une sous-requête servie par son propre
+    index ; leur UNION remplace un OR qui forcerait un parcours complet.
+    """
+    terme = (params.get('q') or params.get('search') or '').strip()
+    if terme:
+        base = queryset.order_by()
+        branches = [_branche_texte(base, champ, terme) for champ in champs_texte]
+        branches += [base.filter(**{champ: terme}) for champ in champs_exacts]
+        if champ_details:
+            branches.append(base.filter(filtre_texte_details(base, terme, champ_details)))
+        reseau = lire_reseau(terme) if champ_ip else None
+        if reseau is not None:
+            branches.append(filtrer_reseau(base, champ_ip, reseau))
+        premiere, *autres = [branche.values('pk') for branche in branches]
+        queryset = queryset.filter(pk__in=premiere.union(*autres))
+
+    ip = (params.get('ip') or '').strip()
+    if ip and champ_ip:
+        reseau = lire_reseau(ip)
+        queryset = filtrer_reseau(queryset, champ_ip, reseau) if reseau else queryset.none()
+
+    details = (params.get('details') or '').strip()
+    if details and champ_details:
+        queryset = filtrer_details(queryset, details, champ_details)
+    return queryset
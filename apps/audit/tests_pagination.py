@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.pagination import KeysetPagination
+from apps.system.models import SystemLog
+from .models import SecurityLog
+
+User = get_user_model()
+
+
+class KeysetPaginationTestCase(TestCase):
+	"""Pagination par curseur (timestamp, id) des journaux"""
+
+	def setUp(self):
+		cache.clear()
+		self.admin = User.objects.create_user(
+			username='admin', email='admin@test.com', nom='Admin', prenom='Test',
+			password='pass', is_staff=True,
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.admin)
+
+		# 25 logs, dont plusieurs partagent le même horodatage
+		base = timezone.now() - timedelta(days=30)
+		for i in range(25):
+			log = SecurityLog.objects.create(user=self.admin, action='login_success', details={'i': i})
+			SecurityLog.objects.filter(pk=log.pk).update(timestamp=base + timedelta(minutes=i // 3))
+		self.url = reverse('security-list')
+
+	def _parcourir(self, url):
+		ids, pages = [], 0
+		while url:
+			response = self.client.get(url)
+			self.assertEqual(response.status_code, 200)
+			ids += [r['id'] for r in response.data['results']]
+			url = response.data['next']
+			pages += 1
+		return ids, pages
+
+	def test_parcours_complet_sans_doublon_ni_trou(self):
+		ids, pages = self._parcourir(self.url + '?page_size=10')
+		attendu = list(
+			SecurityLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True)
+		)
+		self.assertEqual(ids, attendu)
+		self.assertEqual(pages, 3)
+
+	def test_premiere_page_total_et_liens(self):
+		response = self.client.get(self.url, {'page_size': 10})
+		self.assertEqual(response.data['count'], 25)
+		# COUNT exact sous le seuil (et hors PostgreSQL)
+		self.assertFalse(response.data['count_is_estimate'])
+		self.assertIsNone(response.data['previous'])
+		self.assertIsNotNone(response.data['next'])
+		self.assertIsNotNone(response.data['since'])
+
+	def test_page_precedente(self):
+		page1 = self.client.get(self.url, {'page_size': 10}).data
+		page2 = self.client.get(page1['next']).data
+		retour = self.client.get(page2['previous']).data
+		self.assertEqual(
+			[r['id'] for r in retour['results']],
+			[r['id'] for r in page1['results']],
+		)
+		self.assertIsNone(retour['previous'])
+
+	def test_page_profonde_sans_offset_ni_count(self):
+		page1 = self.client.get(self.url, {'page_size': 10}).data
+		with CaptureQueriesContext(connection) as requetes:
+			self.client.get(page1['next'])
+		sql = ' '.join(q['sql'].upper() for q in requetes.captured_queries)
+		self.assertNotIn('OFFSET', sql)
+
+	def test_since_ne_renvoie_que_les_nouveaux_evenements(self):
+		since = self.client.get(self.url, {'page_size': 5}).data['since']
+		response = self.client.get(self.url, {'since': since})
+		self.assertEqual(response.data['results'], [])
+		self.assertEqual(response.data['since'], since)
+
+		nouveaux = [SecurityLog.objects.create(action='logout').pk for _ in range(3)]
+		response = self.client.get(self.url, {'since': since})
+		self.assertEqual([r['id'] for r in response.data['results']], nouveaux)
+		self.assertIsNone(response.data['next'])
+
+		# Le jeton renvoyé reprend après le dernier événement lu
+		response = self.client.get(self.url, {'since': response.data['since']})
+		self.assertEqual(response.data['results'], [])
+
+	def test_since_accepte_une_date_iso(self):
+		limite = timezone.now() - timedelta(days=1)
+		recent = SecurityLog.objects.create(action='logout')
+		response = self.client.get(self.url, {'since': limite.isoformat()})
+		self.assertEqual([r['id'] for r in response.data['results']], [recent.pk])
+
+	def test_curseur_invalide(self):
+		response = self.client.get(self.url, {'cursor': 'pas-un-curseur'})
+		self.assertEqual(response.status_code, 404)
+		response = self.client.get(self.url, {'since': '2024-13-45T00:00'})
+		self.assertEqual(response.status_code, 404)
+
+	def test_ordre_impose_par_le_curseur(self):
+		# Pas d'OrderingFilter : le tri suit toujours l'index (horodatage, id)
+		premiere = self.client.get(self.url, {'page_size': 5}).data['results']
+		inversee = self.client.get(self.url, {'page_size': 5, 'ordering': 'timestamp'}).data['results']
+		self.assertEqual(inversee, premiere)
+
+	def test_mode_page_conserve(self):
+		response = self.client.get(self.url, {'page': 2, 'page_size': 10})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['count'], 25)
+		self.assertEqual(len(response.data['results']), 10)
+
+	def test_encodage_curseur(self):
+		position = (timezone.now(), 42)
+		self.assertEqual(
+			KeysetPagination.decoder(KeysetPagination.encoder(position, arriere=True)),
+			(position, True),
+		)
+
+	def test_journal_systeme(self):
+		for i in range(3):
+			SystemLog.objects.create(level='error', source='api', action='test', message=f'm{i}')
+		SystemLog.objects.create(level='info', source='api', action='test', message='info')
+		response = self.client.get(reverse('system-log-list'), {'level': 'error', 'page_size': 2})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['count'], 3)
+		self.assertEqual(len(response.data['results']), 2)
+		suite = self.client.get(response.data['next']).data
+		self.assertEqual(len(suite['results']), 1)
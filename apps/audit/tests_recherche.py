@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .models import LoginAttemptLog, SecurityLog
+from .recherche import lire_reseau
+
+User = get_user_model()
+
+
+class RechercheJournauxTestCase(TestCase):
+	"""Recherche structurée et export en flux des journaux d'audit"""
+
+	def setUp(self):
+		cache.clear()
+		self.admin = User.objects.create_user(
+			username='admin', email='admin@test.com', nom='Admin', prenom='Test',
+			password='pass', is_staff=True,
+		)
+		self.alice = User.objects.create_user(
+			username='alice', email='alice@exemple.bf', nom='Alice', prenom='A', password='pass',
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(user=self.admin)
+		self.url = reverse('security-list')
+
+		self.log_lan = SecurityLog.objects.create(
+			user=self.alice, action='login_failed', ip_address='192.168.1.20',
+			details={'motif': 'mot de passe invalide', 'methode': 'password'},
+		)
+		self.log_vpn = SecurityLog.objects.create(
+			user=self.admin, action='login_success', ip_address='10.8.0.5',
+			details={'methode': 'otp'},
+		)
+		self.log_v6 = SecurityLog.objects.create(
+			action='rate_limit_triggered', ip_address='2001:db8::1', details={},
+		)
+
+	def _ids(self, **params):
+		response = self.client.get(self.url, params)
+		self.assertEqual(response.status_code, 200)
+		return {r['id'] for r in response.data['results']}
+
+	def test_lire_reseau(self):
+		self.assertEqual(str(lire_reseau('192.168.1')), '192.168.1.0/24')
+		self.assertEqual(str(lire_reseau('10.0.0.0/8')), '10.0.0.0/8')
+		self.assertEqual(str(lire_reseau('2001:db8::/32')), '2001:db8::/32')
+		self.assertIsNone(lire_reseau('alice'))
+
+	def test_filtre_ip_cidr_et_prefixe(self):
+		self.assertEqual(self._ids(ip='10.0.0.0/8'), {self.log_vpn.pk})
+		self.assertEqual(self._ids(ip='192.168'), {self.log_lan.pk})
+		self.assertEqual(self._ids(ip='2001:db8::/32'), {self.log_v6.pk})
+		self.assertEqual(self._ids(ip='10.8.0.5'), {self.log_vpn.pk})
+		self.assertEqual(self._ids(ip='pas-une-ip'), set())
+
+	def test_q_texte_libre(self):
+		self.assertEqual(self._ids(q='alice@'), {self.log_lan.pk})
+		self.assertEqual(self._ids(q='invalide'), {self.log_lan.pk})
+		self.assertEqual(self._ids(q='192.168.1.0/24'), {self.log_lan.pk})
+
+	def test_search_par_les_recherches_indexees(self):
+		# Plus d'icontains sur le JSON ou l'adresse : même chemin que 'q'
+		self.assertEqual(self._ids(search='invalide'), {self.log_lan.pk})
+		self.assertEqual(self._ids(search='10.0.0.0/8'), {self.log_vpn.pk})
+		with CaptureQueriesContext(connection) as requetes:
+			self._ids(search='10.8')
+		sql = ' '.join(q['sql'] for q in requetes.captured_queries)
+		self.assertNotIn('"ip_address" LIKE', sql)
+
+	def test_q_union_de_criteres_indexes(self):
+		# 'action' n'a qu'un index btree : égalité exacte, pas de sous-chaîne
+		self.assertEqual(self._ids(q='login_failed'), {self.log_lan.pk})
+		self.assertEqual(self._ids(q='login_fail'), set())
+		with CaptureQueriesContext(connection) as requetes:
+			self._ids(q='alice')
+		sql = ' '.join(q['sql'] for q in requetes.captured_queries)
+		self.assertIn('UNION', sql)
+		self.assertNotIn('"action" LIKE', sql)
+
+	def test_details_structure(self):
+		self.assertEqual(self._ids(details='methode:otp'), {self.log_vpn.pk})
+		self.assertEqual(self._ids(details='{"methode": "password"}'), {self.log_lan.pk})
+
+	def test_login_attempts_q(self):
+		LoginAttemptLog.objects.create(username='alice', ip_address='10.1.2.3', success=False)
+		LoginAttemptLog.objects.create(username='bob', ip_address='172.16.0.1', success=True)
+		response = self.client.get(reverse('loginattempt-list'), {'q': 'ALI'})
+		self.assertEqual([r['username'] for r in response.data['results']], ['alice'])
+		response = self.client.get(reverse('loginattempt-list'), {'ip': '172.16.0.0/12'})
+		self.assertEqual([r['username'] for r in response.data['results']], ['bob'])
+
+	def test_export_en_flux_sans_limite(self):
+		for i in range(30):
+			SecurityLog.objects.create(user=self.alice, action='logout', details={'i': i})
+		with CaptureQueriesContext(connection) as requetes:
+			response = self.client.get(reverse('security-export'))
+			contenu = b''.join(response.streaming_content).decode()
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response['Content-Type'], 'text/csv')
+		lignes = contenu.strip().splitlines()
+		self.assertEqual(len(lignes), 1 + 33)
+		self.assertIn('alice@exemple.bf', contenu)
+		# Utilisateurs joints : pas une requête par ligne
+		self.assertLess(len(requetes), 10)
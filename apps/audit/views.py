@@ -2,9 +2,11 @@ from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.db.models import Q
 import csv
+from apps.core.pagination import KeysetPagination
+from .recherche import rechercher
 from .models import SecurityLog, LoginAttemptLog, TokenUsageLog, AuditAdminactionlog
 from .serializers import (
 	SecurityLogSerializer, LoginAttemptLogSerializer,
@@ -18,86 +20,76 @@ class IsAdmin(permissions.BasePermission):
 
 
 class SecurityLogViewSet(viewsets.ReadOnlyModelViewSet):
-	queryset = SecurityLog.objects.all()
+	queryset = SecurityLog.objects.select_related('user')
 	serializer_class = SecurityLogSerializer
 	permission_classes = [permissions.IsAuthenticated, IsAdmin]
-	filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+	lecture_replica = True
+	pagination_class = KeysetPagination
+	keyset_field = 'timestamp'
+	# 'search' passe par rechercher() : un icontains sur details ou ip_address
+	# ne serait servi par aucun index
+	filter_backends = [DjangoFilterBackend]
 	filterset_fields = ['user', 'action', 'ip_address']
-	search_fields = ['user__email', 'ip_address', 'details']
-	ordering_fields = ['timestamp']
 
 	def get_queryset(self):
-		"""Support du paramètre 'q' pour la recherche générale"""
-		queryset = super().get_queryset()
-
-		search_query = self.request.query_params.get('q', None)
-		if search_query:
-			queryset = queryset.filter(
-				Q(user__email__icontains=search_query) |
-				Q(ip_address__icontains=search_query) |
-				Q(action__icontains=search_query) |
-				Q(details__icontains=search_query)
-			)
-
-		return queryset
+		"""Recherche : 'q' ou 'search' (texte libre), 'ip' (adresse, préfixe ou CIDR), 'details' (cle:valeur ou JSON)"""
+		return rechercher(
+			super().get_queryset(), self.request.query_params,
+			champs_texte=['user__email'], champs_exacts=['action'], champ_details='details',
+		)
 
 	@action(detail=False, methods=['get'])
 	def export(self, request):
-		"""Export CSV des logs filtrés (admin only)."""
-		qs = self.filter_queryset(self.get_queryset())[:10000]
-
-		# CSV response
-		response = HttpResponse(content_type='text/csv')
+		"""Export CSV des logs filtrés (admin only), diffusé ligne à ligne sans limite."""
+		qs = self.filter_queryset(self.get_queryset()).order_by('-timestamp', '-id')
+
+		writer = csv.writer(_Tampon())
+
+		def lignes():
+			yield writer.writerow(['timestamp', 'user', 'action', 'ip_address', 'status_code', 'details'])
+			for log in qs.iterator(chunk_size=2000):
+				yield writer.writerow([
+					log.timestamp.isoformat(),
+					log.user.email if log.user else '',
+					log.action,
+					log.ip_address or '',
+					log.status_code or '',
+					json_safe(log.details)
+				])
+
+		response = StreamingHttpResponse(lignes(), content_type='text/csv')
 		response['Content-Disposition'] = 'attachment; filename="security_logs.csv"'
-
-		writer = csv.writer(response)
-		writer.writerow(['timestamp', 'user', 'action', 'ip_address', 'status_code', 'details'])
-
-		for log in qs:
-			writer.writerow([
-				log.timestamp.isoformat(),
-				log.user.email if log.user else '',
-				log.action,
-				log.ip_address or '',
-				log.status_code or '',
-				json_safe(log.details)
-			])
-
 		return response
 
 
 class LoginAttemptLogViewSet(viewsets.ReadOnlyModelViewSet):
-	queryset = LoginAttemptLog.objects.all()
+	queryset = LoginAttemptLog.objects.select_related('user')
 	serializer_class = LoginAttemptLogSerializer
 	permission_classes = [permissions.IsAuthenticated, IsAdmin]
-	filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+	lecture_replica = True
+	pagination_class = KeysetPagination
+	keyset_field = 'timestamp'
+	filter_backends = [DjangoFilterBackend]
 	filterset_fields = ['username', 'ip_address', 'success', 'user']
-	search_fields = ['username', 'user__email', 'ip_address']
-	ordering_fields = ['timestamp']
 
 	def get_queryset(self):
-		"""Support du paramètre 'q' pour la recherche générale"""
-		queryset = super().get_queryset()
-
-		search_query = self.request.query_params.get('q', None)
-		if search_query:
-			queryset = queryset.filter(
-				Q(username__icontains=search_query) |
-				Q(user__email__icontains=search_query) |
-				Q(ip_address__icontains=search_query)
-			)
-
-		return queryset
+		"""Recherche : 'q' ou 'search' (texte libre), 'ip' (adresse, préfixe ou CIDR)"""
+		return rechercher(
+			super().get_queryset(), self.request.query_params,
+			champs_texte=['username', 'user__email'],
+		)
 
 
 class TokenUsageLogViewSet(viewsets.ReadOnlyModelViewSet):
-	queryset = TokenUsageLog.objects.all()
+	queryset = TokenUsageLog.objects.select_related('user')
 	serializer_class = TokenUsageLogSerializer
 	permission_classes = [permissions.IsAuthenticated, IsAdmin]
-	filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+	lecture_replica = True
+	pagination_class = KeysetPagination
+	keyset_field = 'used_at'
+	filter_backends = [DjangoFilterBackend, filters.SearchFilter]
 	filterset_fields = ['user', 'token_type', 'action']
 	search_fields = ['user__email', 'token_type']
-	ordering_fields = ['used_at']
 
 	def get_queryset(self):
 		"""Support du paramètre 'q' pour la recherche générale"""
@@ -115,13 +107,15 @@ class TokenUsageLogViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 class AuditAdminActionViewSet(viewsets.ReadOnlyModelViewSet):
-	queryset = AuditAdminactionlog.objects.all()
+	queryset = AuditAdminactionlog.objects.select_related('utilisateur')
 	serializer_class = AuditAdminActionSerializer
 	permission_classes = [permissions.IsAuthenticated, IsAdmin]
-	filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+	lecture_replica = True
+	pagination_class = KeysetPagination
+	keyset_field = 'created_at'
+	filter_backends = [DjangoFilterBackend, filters.SearchFilter]
 	filterset_fields = ['utilisateur', 'action', 'modele']
 	search_fields = ['utilisateur__email', 'action', 'modele']
-	ordering_fields = ['created_at']
 
 	def get_queryset(self):
 		"""Support du paramètre 'q' pour la recherche générale et filtrage par module"""
@@ -145,6 +139,13 @@ class AuditAdminActionViewSet(viewsets.ReadOnlyModelViewSet):
 		return queryset
 
 
+class _Tampon:
+	"""Pseudo-fichier pour csv.writer : writerow() retourne la ligne formatée."""
+
+	def write(self, value):
+		return value
+
+
 def json_safe(value):
 	try:
 		import json
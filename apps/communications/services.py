@@ -231,7 +231,7 @@ class SMSService:
             if not getattr(settings, 'AQILAS_TOKEN', None):
                 return False, None, "AQILAS_TOKEN manquant dans settings"
 
-            url = "https://www.aqilas.com/api/v1/sms"
+            url = f"{getattr(settings, 'AQILAS_API_URL', 'https://www.aqilas.com/api/v1').rstrip('/')}/sms"
 
             headers = {
                 "X-AUTH-TOKEN": settings.AQILAS_TOKEN,
@@ -7,9 +7,10 @@ from .serializers import ContactInformationSerializer, ContactMessageCreateSeria
 
 # use the EmailService from communications
 from apps.communications.services import EmailService
+from apps.core.cache import PublicResponseCacheMixin
 
 
-class ContactInformationListView(generics.ListAPIView):
+class ContactInformationListView(PublicResponseCacheMixin, generics.ListAPIView):
 	queryset = ContactInformations.objects.filter(actif=True).order_by('ordre')
 	serializer_class = ContactInformationSerializer
 	permission_classes = [permissions.AllowAny]
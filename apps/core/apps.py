@@ -3,3 +3,10 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
+
+    def ready(self):
+        from . import cache, checks, connexions, images, metriques  # noqa: F401 (checks : enregistrement)
+        cache.connecter_signaux()
+        connexions.connecter_signaux()
+        images.connecter_signaux()
+        metriques.installer()
@@ -0,0 +1 @@
+# Banc de mesure des services, sérialiseurs et endpoints chauds (commande benchmarks)
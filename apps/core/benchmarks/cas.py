@@ -0,0 +1,185 @@
+# apps/core/benchmarks/cas.py
+"""
+Cas mesurés. Chaque cas est une fonction `preparer(contexte)` enregistrée
+par `@cas(nom)` qui rend l'opération à répéter (sans argument). La
+préparation et les répétitions tournent dans une transaction annulée en
+fin de cas (executeur.mesurer) : les écritures ne s'accumulent pas d'un
+cas ou d'une campagne à l'autre, et les on_commit (notifications,
+attribution) ne partent pas.
+
+Une opération lève `EchecCas` si le chemin mesuré ne répond pas comme
+prévu : une erreur rapide ne doit pas passer pour un gain.
+"""
+import itertools
+from datetime import timedelta
+
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .donnees import MARQUE, referentiel
+
+CAS = {}
+
+
+class EchecCas(Exception):
+    pass
+
+
+class Cas:
+    def __init__(self, nom, preparer, description):
+        self.nom = nom
+        self.preparer = preparer
+        self.description = description
+
+
+def cas(nom):
+    def enregistrer(preparer):
+        CAS[nom] = Cas(nom, preparer, (preparer.__doc__ or '').strip())
+        return preparer
+    return enregistrer
+
+
+class Contexte:
+    """Référentiel de mesure et clients HTTP (anonyme et administrateur)."""
+
+    def __init__(self):
+        self.ref = referentiel()
+        self.anonyme = APIClient()
+        self.admin = APIClient()
+        self.admin.force_authenticate(user=self.ref['admin'])
+
+
+def verifier(response, attendu=200):
+    if response.status_code != attendu:
+        raise EchecCas(f'{response.status_code} au lieu de {attendu}')
+    if response.streaming:
+        # Le corps diffusé fait partie de la mesure
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+# =====================================================
+# STATISTIQUES
+# =====================================================
+
+@cas('stats.incrementer_visite')
+def incrementer_visite(contexte):
+    """StatsService.incrementer_visite sur la ligne du jour"""
+    from apps.stats.services import StatsService
+
+    def operation():
+        if StatsService.incrementer_visite(pages_vues=3, authentifie=True) is None:
+            raise EchecCas('incrément refusé')
+    return operation
+
+
+@cas('stats.rapport_mensuel')
+def rapport_mensuel(contexte):
+    """StatsService.generer_rapport_mensuel du mois précédent"""
+    from apps.stats.services import StatsService
+
+    mois = timezone.now().date().replace(day=1) - timedelta(days=1)
+    return lambda: StatsService.generer_rapport_mensuel(mois.month, mois.year)
+
+
+@cas('stats.export_csv')
+def export_stats_csv(contexte):
+    """GET stats/export/?format=csv sur un an"""
+    fin = timezone.now().date()
+    params = {'format': 'csv', 'date_debut': fin - timedelta(days=365), 'date_fin': fin}
+    return lambda: verifier(contexte.admin.get(reverse('export-stats'), params))
+
+
+# =====================================================
+# NOTAIRES
+# =====================================================
+
+@cas('notaires.serializer_liste')
+def serializer_notaires(contexte):
+    """NotaireSerializer(many=True) sur une page de 100 notaires"""
+    from apps.notaires.models import NotairesNotaire
+    from apps.notaires.serializers import NotaireSerializer
+
+    queryset = NotairesNotaire.objects.filter(matricule__startswith=MARQUE).order_by('nom', 'prenom')
+    return lambda: NotaireSerializer(queryset[:100], many=True).data
+
+
+@cas('notaires.liste')
+def liste_notaires(contexte):
+    """GET notaires/ (première page)"""
+    return lambda: verifier(contexte.anonyme.get(reverse('notaire-list')))
+
+
+@cas('notaires.recherche')
+def recherche_notaires(contexte):
+    """GET notaires/recherche/?search=... (RechercheNotairesAPIView)"""
+    termes = itertools.cycle(['oued', 'kabore', 'mesure 3', 'awa', 'N0001'])
+    return lambda: verifier(contexte.anonyme.get(reverse('notaires-recherche'), {'search': next(termes)}))
+
+
+# =====================================================
+# PAIEMENTS, COMPTES, VENTES
+# =====================================================
+
+@cas('paiements.webhook')
+def webhook(contexte):
+    """POST paiements/webhook/yengapay/ : une transaction en attente validée par appel"""
+    from apps.paiements.models import PaiementsTransaction
+
+    references = iter(list(
+        PaiementsTransaction.objects.filter(reference__startswith=MARQUE, statut='en_attente')
+        .order_by('reference').values_list('reference', flat=True)[:10000]
+    ))
+    url = reverse('paiements:webhook-yengapay')
+
+    def operation():
+        reference = next(references, None)
+        if reference is None:
+            raise EchecCas('plus de transaction en attente (peupler davantage)')
+        verifier(contexte.anonyme.post(url, {'reference': reference, 'status': 'DONE'}, format='json'))
+    return operation
+
+
+@cas('utilisateurs.verify_token')
+def verify_token(contexte):
+    """VerifyTokenSerializer.is_valid() sur un code SMS valide parmi 5 en cours"""
+    from apps.utilisateurs.models import VerificationVerificationtoken
+    from apps.utilisateurs.serializers import VerificationTokenGenerator, VerifyTokenSerializer
+
+    usager = contexte.ref['usager']
+    expiration = timezone.now() + timedelta(minutes=10)
+    for code in ['111111', '222222', '333333', '444444', '555555']:
+        VerificationVerificationtoken.objects.create(
+            user=usager, token=VerificationTokenGenerator.hash_token(code), type_token='sms', expires_at=expiration,
+        )
+    request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+    donnees = {'token': '555555', 'verification_type': 'sms', 'telephone': usager.telephone}
+
+    def operation():
+        serializer = VerifyTokenSerializer(data=donnees, context={'request': request})
+        if not serializer.is_valid():
+            raise EchecCas(str(serializer.errors))
+    return operation
+
+
+@cas('ventes.numero_recu')
+def numero_recu(contexte):
+    """VenteStickerNotaire._generer_numero_recu (numérotation annuelle des reçus)"""
+    from apps.ventes.models import VenteStickerNotaire
+
+    return VenteStickerNotaire()._generer_numero_recu
+
+
+# =====================================================
+# JOURNAUX
+# =====================================================
+
+@cas('audit.export_csv')
+def export_journaux_csv(contexte):
+    """GET audit/security/export/ filtré sur un utilisateur (diffusion complète)"""
+    url = reverse('security-export')
+    utilisateur = contexte.ref['admin'].pk
+    return lambda: verifier(contexte.admin.get(url, {'user': utilisateur}))
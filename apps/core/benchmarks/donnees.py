@@ -0,0 +1,252 @@
+# apps/core/benchmarks/donnees.py
+"""
+Jeu de données volumineux pour les mesures.
+
+`peupler(echelle)` complète la base jusqu'aux volumes de VOLUMES multipliés
+par `echelle` (1.0 : 5 000 notaires, 1 M de PageVue, 500 000 demandes et
+transactions, 10 M de lignes de journal de sécurité). Les lignes créées
+portent une marque (matricule, référence, URL ou user_agent préfixés) :
+un second passage ne crée que le manquant, `nettoyer()` les retire.
+
+Insertion par bulk_create en lots de LOT lignes ; les signaux et save()
+ne sont pas appelés (numéros de reçu et références sont posés ici). Les
+ventes de mesure sortent leur quantité du registre de stock du sticker de
+mesure en un mouvement par lot, que `nettoyer()` remet en un seul : le
+registre reste réconcilié (apps/ventes/stock.py). Elles occupent des
+numéros de reçu de l'année en cours : à lancer sur une base dédiée.
+"""
+import random
+import secrets
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+MARQUE = 'BENCH'
+LOT = 5000
+
+VOLUMES = {
+    'notaires': 5_000,
+    'pages_vues': 1_000_000,
+    'demandes': 500_000,
+    'transactions': 500_000,
+    'journaux': 10_000_000,
+    'ventes': 20_000,
+    'jours': 365,
+}
+
+REGIONS = 13
+VILLES_PAR_REGION = 4
+URLS = 2_000
+NOMS = ['Ouedraogo', 'Sawadogo', 'Kabore', 'Traore', 'Ouattara', 'Zongo', 'Compaore', 'Kone', 'Sanou', 'Bationo']
+PRENOMS = ['Awa', 'Issa', 'Mariam', 'Boukary', 'Salif', 'Aminata', 'Rasmane', 'Fatimata', 'Adama', 'Clarisse']
+ACTIONS = ['login_success', 'login_failed', 'logout', 'token_refresh', 'profile_update', 'rate_limit_triggered']
+# Un journal sur MILLE est rattaché à l'utilisateur de mesure (export CSV filtré)
+MILLE = 1000
+
+
+def volumes(echelle):
+    # Une année de visites quelle que soit l'échelle (rapport mensuel, export)
+    return {nom: total if nom == 'jours' else max(1, int(total * echelle)) for nom, total in VOLUMES.items()}
+
+
+def _lots(fabrique, debut, fin):
+    """Instances de fabrique(i) pour i dans [debut, fin), par lots de LOT."""
+    for depart in range(debut, fin, LOT):
+        yield [fabrique(i) for i in range(depart, min(depart + LOT, fin))]
+
+
+def _completer(modele, existants, cible, fabrique, rapport, nom, apres=None):
+    """`apres(lot)` est appelé dans la transaction de chaque lot inséré."""
+    crees = 0
+    for lot in _lots(fabrique, existants, cible):
+        with transaction.atomic():
+            modele.objects.bulk_create(lot, batch_size=LOT)
+            if apres:
+                apres(lot)
+        crees += len(lot)
+    rapport[nom] = {'existants': existants, 'crees': crees}
+
+
+def referentiel():
+    """Utilisateurs, document, régions et sticker communs aux mesures."""
+    from apps.documents.models import DocumentsDocument
+    from apps.geographie.models import GeographieRegion, GeographieVille
+    from apps.utilisateurs.models import UtilisateursUser
+    from apps.ventes.models import ReferenceSticker
+
+    admin = UtilisateursUser.objects.filter(username='bench-admin').first()
+    if admin is None:
+        admin = UtilisateursUser.objects.create_superuser(
+            username='bench-admin', email='bench-admin@notaires.bf', nom='Bench', prenom='Admin',
+            password=secrets.token_urlsafe(),
+        )
+    usager = UtilisateursUser.objects.filter(username='bench-usager').first()
+    if usager is None:
+        usager = UtilisateursUser.objects.create_user(
+            username='bench-usager', email='bench-usager@notaires.bf', nom='Bench', prenom='Usager',
+            telephone='+22600000000', password=secrets.token_urlsafe(),
+        )
+    document, _ = DocumentsDocument.objects.get_or_create(
+        reference=f'{MARQUE}-DOC',
+        defaults={'nom': 'Document de mesure', 'description': '-', 'prix': Decimal('5000'), 'delai_heures': 120},
+    )
+    regions = []
+    for r in range(1, REGIONS + 1):
+        region, _ = GeographieRegion.objects.get_or_create(
+            code=f'{MARQUE}{r:02d}', defaults={'nom': f'Région de mesure {r}', 'ordre': 100 + r},
+        )
+        for v in range(1, VILLES_PAR_REGION + 1):
+            GeographieVille.objects.get_or_create(region=region, nom=f'Ville de mesure {r}-{v}')
+        regions.append(region)
+    sticker, _ = ReferenceSticker.objects.get_or_create(
+        nom=f'Sticker {MARQUE}', defaults={'prix_unitaire': Decimal('500'), 'total_stock': 10_000_000},
+    )
+    return {'admin': admin, 'usager': usager, 'document': document, 'sticker': sticker}
+
+
+def peupler(echelle=1.0):
+    """Complète la base jusqu'aux volumes visés ; rend {table: {existants, crees}}."""
+    from apps.audit.models import SecurityLog
+    from apps.demandes.models import DemandesDemande
+    from apps.geographie.models import GeographieVille
+    from apps.notaires.models import NotairesNotaire
+    from apps.paiements.models import PaiementsTransaction
+    from apps.stats.models import PageVue, StatsVisite
+    from apps.ventes import stock
+    from apps.ventes.models import VenteStickerNotaire
+
+    cibles = volumes(echelle)
+    ref = referentiel()
+    alea = random.Random(0)
+    maintenant = timezone.now()
+    aujourdhui = maintenant.date()
+    rapport = {}
+
+    villes = list(GeographieVille.objects.filter(region__code__startswith=MARQUE).values_list('pk', 'region_id'))
+
+    def notaire(i):
+        ville, region = villes[i % len(villes)]
+        return NotairesNotaire(
+            matricule=f'{MARQUE}-N{i:06d}', nom=NOMS[i % len(NOMS)], prenom=PRENOMS[(i // 10) % len(PRENOMS)],
+            email=f'notaire{i}@bench.notaires.bf', telephone=f'+226{70000000 + i}',
+            adresse=f'{i} avenue de la mesure', region_id=region, ville_id=ville, actif=i % 20 != 0,
+        )
+
+    notaires = NotairesNotaire.objects.filter(matricule__startswith=f'{MARQUE}-N')
+    _completer(NotairesNotaire, notaires.count(), cibles['notaires'], notaire, rapport, 'notaires')
+    notaires_pk = list(notaires.values_list('pk', flat=True))
+
+    # Un an de visites quotidiennes (rapport mensuel, export CSV)
+    deja = set(StatsVisite.objects.filter(
+        date__gt=aujourdhui - timedelta(days=cibles['jours'])).values_list('date', flat=True))
+    jours = [aujourdhui - timedelta(days=j) for j in range(cibles['jours'])]
+    manquants = [jour for jour in jours if jour not in deja]
+    StatsVisite.objects.bulk_create([
+        StatsVisite(date=jour, visites=alea.randint(100, 5000), pages_vues=alea.randint(300, 20000),
+                    visites_authentifiees=alea.randint(0, 100), duree_moyenne=alea.uniform(30, 300),
+                    taux_rebond=alea.uniform(10, 80), heure=12)
+        for jour in manquants
+    ], batch_size=LOT)
+    rapport['stats_visites'] = {'existants': len(deja), 'crees': len(manquants)}
+
+    # PageVue : URLS pages par jour, (date, url) unique
+    def page_vue(i):
+        return PageVue(
+            date=aujourdhui - timedelta(days=i // URLS), url=f'/{MARQUE.lower()}/page-{i % URLS}',
+            titre=f'Page {i % URLS}', vues=alea.randint(1, 500), temps_moyen=alea.uniform(5, 200),
+        )
+
+    pages = PageVue.objects.filter(url__startswith=f'/{MARQUE.lower()}/')
+    _completer(PageVue, pages.count(), cibles['pages_vues'], page_vue, rapport, 'pages_vues')
+
+    statuts = [s for s, _ in DemandesDemande.STATUT_CHOICES]
+
+    def demande(i):
+        return DemandesDemande(
+            reference=f'{MARQUE}-D{i:07d}', utilisateur=ref['usager'], document=ref['document'],
+            statut=statuts[i % len(statuts)], donnees_formulaire={'nom': NOMS[i % len(NOMS)]},
+            email_reception=f'client{i}@bench.notaires.bf', montant_total=Decimal('5000'),
+            notaire_id=notaires_pk[i % len(notaires_pk)] if i % 3 == 0 else None,
+        )
+
+    demandes = DemandesDemande.objects.filter(reference__startswith=f'{MARQUE}-D')
+    _completer(DemandesDemande, demandes.count(), cibles['demandes'], demande, rapport, 'demandes')
+
+    # Une transaction par demande (OneToOne), dans l'ordre des références
+    transactions = PaiementsTransaction.objects.filter(reference__startswith=f'{MARQUE}-T')
+    existants = transactions.count()
+    cible = min(cibles['transactions'], cibles['demandes'])
+    demandes_pk = list(demandes.order_by('reference').values_list('pk', flat=True)[existants:cible])
+    etats = ['en_attente', 'validee', 'echouee', 'initiee']
+
+    def paiement(i):
+        return PaiementsTransaction(
+            reference=f'{MARQUE}-T{i:07d}', demande_id=demandes_pk[i - existants], type_paiement='yengapay',
+            montant=Decimal('5000'), statut=etats[i % len(etats)],
+        )
+
+    _completer(PaiementsTransaction, existants, cible, paiement, rapport, 'transactions')
+
+    def journal(i):
+        return SecurityLog(
+            user=ref['admin'] if i % MILLE == 0 else None, action=ACTIONS[i % len(ACTIONS)],
+            ip_address=f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}', user_agent=MARQUE,
+            status_code=200 if i % 7 else 401, details={'n': i},
+        )
+
+    journaux = SecurityLog.objects.filter(user_agent=MARQUE)
+    _completer(SecurityLog, journaux.count(), cibles['journaux'], journal, rapport, 'journaux')
+
+    # Ventes de l'année, reçus numérotés comme VenteStickerNotaire._generer_numero_recu
+    annee = maintenant.year
+
+    def vente(i):
+        return VenteStickerNotaire(
+            reference=f'{MARQUE}-V{i:07d}', notaire_id=notaires_pk[i % len(notaires_pk)],
+            type_sticker=ref['sticker'], quantite=10, quantite_reservee=10, montant_total=Decimal('5000'),
+            plage_debut=f'{MARQUE}{i}', plage_fin=f'{MARQUE}{i}', numero_recu=f'{i + 1:06d}-{annee}/ONBF',
+            date_recu=aujourdhui,
+        )
+
+    def reserver(lot):
+        stock.reserver(ref['sticker'].pk, sum(v.quantite_reservee for v in lot), f'{MARQUE}-V')
+
+    ventes = VenteStickerNotaire.objects.filter(reference__startswith=f'{MARQUE}-V')
+    _completer(VenteStickerNotaire, ventes.count(), cibles['ventes'], vente, rapport, 'ventes', apres=reserver)
+    return rapport
+
+
+def nettoyer():
+    """Supprime les lignes marquées ; rend {table: lignes supprimées}."""
+    from apps.audit.models import SecurityLog
+    from apps.demandes.models import DemandesDemande
+    from apps.notaires.models import NotairesNotaire
+    from apps.stats.models import PageVue
+    from apps.ventes import stock
+    from apps.ventes.models import VenteStickerNotaire
+
+    supprimes = {}
+    ventes = VenteStickerNotaire.objects.filter(reference__startswith=f'{MARQUE}-V')
+    with transaction.atomic():
+        # Stock remis en un mouvement par sticker : le signal post_delete
+        # n'a plus rien à rendre vente par vente
+        reservees = list(
+            ventes.filter(quantite_reservee__gt=0).values('type_sticker_id').annotate(total=Sum('quantite_reservee'))
+        )
+        ventes.update(quantite_reservee=0)
+        for ligne in reservees:
+            stock.liberer(ligne['type_sticker_id'], ligne['total'], f'{MARQUE}-V')
+        supprimes['ventes'] = ventes.delete()[0]
+
+    for nom, queryset in [
+        # Transactions supprimées en cascade
+        ('demandes', DemandesDemande.objects.filter(reference__startswith=f'{MARQUE}-D')),
+        ('notaires', NotairesNotaire.objects.filter(matricule__startswith=f'{MARQUE}-N')),
+        ('pages_vues', PageVue.objects.filter(url__startswith=f'/{MARQUE.lower()}/')),
+        ('journaux', SecurityLog.objects.filter(user_agent=MARQUE)),
+    ]:
+        supprimes[nom] = queryset.delete()[0]
+    return supprimes
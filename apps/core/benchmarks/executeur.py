@@ -0,0 +1,157 @@
+# apps/core/benchmarks/executeur.py
+"""
+Exécution des cas, rapport JSON et comparaison entre campagnes.
+
+`executer()` répète chaque cas (après quelques répétitions d'échauffement)
+et relève débit, latences moyenne/p50/p95/p99/max et nombre moyen de
+requêtes SQL. Le rapport porte aussi les volumes en base et
+l'environnement (moteur, versions) : deux campagnes ne se comparent
+qu'à données et moteur égaux.
+
+`comparer(reference, courant, seuil)` signale les cas dont p50, p95 ou le
+nombre de requêtes SQL dépasse la référence de plus de `seuil` (0.2 :
++20 %). Les latences sous PLANCHER_MS ne sont pas comparées en relatif :
+le bruit y dépasse l'écart mesuré.
+"""
+import contextlib
+import io
+import platform
+import time
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.core.simulation.charge import percentile
+
+from .cas import CAS, Contexte
+
+MESURES_COMPAREES = ('p50_ms', 'p95_ms', 'sql_moyen')
+PLANCHER_MS = 1.0
+
+
+def _config():
+    config = {'ITERATIONS': 30, 'ECHAUFFEMENT': 3, 'SEUIL': 0.2, 'DOSSIER': settings.BASE_DIR / 'benchmarks'}
+    config.update(getattr(settings, 'BENCHMARKS', {}))
+    return config
+
+
+class AnnulerCas(Exception):
+    pass
+
+
+def mesurer(preparation, contexte, iterations, echauffement):
+    """Mesures d'un cas ; ses écritures sont annulées."""
+    latences, requetes = [], []
+
+    def compter(execute, sql, params, many, context):
+        requetes[-1] += 1
+        return execute(sql, params, many, context)
+
+    try:
+        with transaction.atomic(), contextlib.redirect_stdout(io.StringIO()):
+            operation = preparation(contexte)
+            for _ in range(echauffement):
+                operation()
+            debut_total = time.perf_counter()
+            with connection.execute_wrapper(compter):
+                for _ in range(iterations):
+                    requetes.append(0)
+                    debut = time.perf_counter()
+                    operation()
+                    latences.append((time.perf_counter() - debut) * 1000)
+            duree_totale = time.perf_counter() - debut_total
+            raise AnnulerCas
+    except AnnulerCas:
+        pass
+
+    return {
+        'iterations': iterations,
+        'debit': round(iterations / duree_totale, 2) if duree_totale else 0,
+        'moyenne_ms': round(sum(latences) / iterations, 3),
+        'p50_ms': round(percentile(latences, 50), 3),
+        'p95_ms': round(percentile(latences, 95), 3),
+        'p99_ms': round(percentile(latences, 99), 3),
+        'max_ms': round(max(latences), 3),
+        'sql_moyen': round(sum(requetes) / iterations, 2),
+    }
+
+
+def volumes():
+    from apps.audit.models import SecurityLog
+    from apps.demandes.models import DemandesDemande
+    from apps.notaires.models import NotairesNotaire
+    from apps.paiements.models import PaiementsTransaction
+    from apps.stats.models import PageVue
+    from apps.ventes.models import VenteStickerNotaire
+
+    return {
+        nom: modele.objects.count()
+        for nom, modele in [
+            ('notaires', NotairesNotaire), ('pages_vues', PageVue), ('demandes', DemandesDemande),
+            ('transactions', PaiementsTransaction), ('journaux', SecurityLog), ('ventes', VenteStickerNotaire),
+        ]
+    }
+
+
+def executer(noms=None, iterations=None, echauffement=None, sortie=None):
+    """
+    Mesure les cas `noms` (tous par défaut) ; `sortie(nom, mesures_ou_erreur)`
+    est appelé après chaque cas. Un cas en échec est noté `erreur` dans le
+    rapport sans interrompre la campagne.
+    """
+    config = _config()
+    iterations = iterations or config['ITERATIONS']
+    echauffement = config['ECHAUFFEMENT'] if echauffement is None else echauffement
+    inconnus = set(noms or []) - set(CAS)
+    if inconnus:
+        raise KeyError(', '.join(sorted(inconnus)))
+
+    contexte = Contexte()
+    resultats = {}
+    for nom in noms or CAS:
+        try:
+            resultats[nom] = mesurer(CAS[nom].preparer, contexte, iterations, echauffement)
+        except Exception as e:
+            resultats[nom] = {'erreur': f'{type(e).__name__}: {e}'}
+        if sortie:
+            sortie(nom, resultats[nom])
+
+    return {
+        'date': timezone.now().isoformat(),
+        'environnement': {
+            'base': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'hote': platform.node(),
+        },
+        'volumes': volumes(),
+        'cas': resultats,
+    }
+
+
+def comparer(reference, courant, seuil=None):
+    """Régressions de `courant` par rapport à `reference` (rapports JSON)."""
+    seuil = _config()['SEUIL'] if seuil is None else seuil
+    regressions = []
+    for nom, mesures in courant['cas'].items():
+        avant = reference.get('cas', {}).get(nom)
+        if not avant or 'erreur' in avant:
+            continue
+        if 'erreur' in mesures:
+            regressions.append({'cas': nom, 'mesure': 'erreur', 'reference': None, 'courant': mesures['erreur']})
+            continue
+        for mesure in MESURES_COMPAREES:
+            ancien, nouveau = avant.get(mesure), mesures.get(mesure)
+            if ancien is None or nouveau is None:
+                continue
+            if mesure.endswith('_ms') and nouveau < PLANCHER_MS:
+                continue
+            limite = max(ancien, PLANCHER_MS if mesure.endswith('_ms') else 0) * (1 + seuil)
+            if nouveau > limite:
+                regressions.append({
+                    'cas': nom, 'mesure': mesure, 'reference': ancien, 'courant': nouveau,
+                    'ecart': round(nouveau / ancien - 1, 3) if ancien else None,
+                })
+    return regressions
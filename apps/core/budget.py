@@ -0,0 +1,144 @@
+# apps/core/budget.py
+"""
+Budget de requêtes SQL par vue.
+
+Une vue déclare le nombre maximal de requêtes SQL que peut coûter une
+requête HTTP qu'elle sert, pour toutes ses méthodes ou pour une seule :
+
+    class BureauStatsAPIView(APIView):
+        budget_requetes = 5
+
+    @action(detail=False, methods=['get'])
+    @budget_requetes(2)
+    def par_type(self, request): ...
+
+`BudgetRequetesMiddleware` (notaires_bf/middleware.py) compte les requêtes
+de chaque requête HTTP servie par une vue budgétée, à partir de la
+résolution de la vue (y compris celles des permissions, de
+l'authentification et du cache de réponses) ; les autres requêtes HTTP
+ne sont pas suivies. En cas de
+dépassement, les requêtes sont regroupées par empreinte (SQL dont les
+littéraux et les listes IN sont effacés) : une boucle qui interroge la
+base à chaque tour apparaît comme une même empreinte répétée.
+
+Le dépassement est journalisé (logger apps.core.budget) et compté dans
+la métrique http_budget_requetes_depassements ; avec
+BUDGET_REQUETES['STRICT'] (tests), il lève BudgetRequetesDepasse.
+"""
+import hashlib
+import logging
+import re
+from collections import Counter
+
+from django.conf import settings
+from prometheus_client import Counter as CompteurPrometheus
+
+logger = logging.getLogger(__name__)
+
+ATTRIBUT = 'budget_requetes'
+
+DEPASSEMENTS = CompteurPrometheus(
+    'http_budget_requetes_depassements', 'Requêtes HTTP au-delà du budget de requêtes SQL de leur vue', ['vue'],
+)
+
+_LITTERAUX = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTES = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+
+
+def _config():
+    config = {'ACTIF': True, 'STRICT': False, 'EMPREINTES': 5}
+    config.update(getattr(settings, 'BUDGET_REQUETES', {}))
+    return config
+
+
+def actif():
+    return _config()['ACTIF']
+
+
+class BudgetRequetesDepasse(AssertionError):
+    pass
+
+
+def budget_requetes(maximum):
+    """Décorateur d'une méthode ou action de vue : au plus `maximum` requêtes SQL."""
+    def decorer(fonction):
+        setattr(fonction, ATTRIBUT, maximum)
+        return fonction
+    return decorer
+
+
+def attribut_de_vue(view_func, methode, attribut):
+    """
+    Valeur de `attribut` déclarée par la vue résolue pour cette méthode
+    HTTP : sur la méthode ou l'action servie, sinon sur la classe, ou None.
+    """
+    classe = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if classe is None:
+        return getattr(view_func, attribut, None)
+    actions = getattr(view_func, 'actions', None)
+    nom = actions.get(methode.lower()) if actions else methode.lower()
+    valeur = getattr(getattr(classe, nom, None), attribut, None) if nom else None
+    return valeur if valeur is not None else getattr(classe, attribut, None)
+
+
+def budget_de_vue(view_func, methode):
+    """Budget déclaré par la vue résolue pour cette méthode HTTP, ou None."""
+    return attribut_de_vue(view_func, methode, ATTRIBUT)
+
+
+def empreinte(sql):
+    """(empreinte courte, SQL normalisé) : littéraux et listes IN effacés."""
+    normalise = _LISTES.sub('(...)', _LITTERAUX.sub('?', sql))
+    return hashlib.sha1(normalise.encode()).hexdigest()[:12], normalise
+
+
+class Suivi:
+    """Requêtes SQL d'une requête HTTP (execute_wrapper)."""
+
+    def __init__(self):
+        self.requetes = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.requetes.append(sql)
+        return execute(sql, params, many, context)
+
+    def repetees(self, nombre):
+        """Empreintes les plus répétées : [(empreinte, occurrences, sql normalisé)]."""
+        compte, exemples = Counter(), {}
+        for sql in self.requetes:
+            cle, normalise = empreinte(sql)
+            compte[cle] += 1
+            exemples.setdefault(cle, normalise)
+        return [(cle, n, exemples[cle]) for cle, n in compte.most_common(nombre) if n > 1]
+
+
+def verifier(request, suivi, budget):
+    """Journalise (ou lève, en mode strict) un dépassement du budget."""
+    if budget is None or len(suivi.requetes) <= budget:
+        return
+    config = _config()
+    correspondance = getattr(request, 'resolver_match', None)
+    vue = correspondance.view_name if correspondance else request.path
+    repetees = suivi.repetees(config['EMPREINTES'])
+    message = (
+        f"{request.method} {vue} : {len(suivi.requetes)} requêtes SQL pour un budget de {budget}"
+        + ''.join(f"\n  {n} x [{cle}] {sql[:300]}" for cle, n, sql in repetees)
+    )
+    DEPASSEMENTS.labels(vue).inc()
+    if config['STRICT']:
+        raise BudgetRequetesDepasse(message)
+    logger.warning(message, extra={
+        'vue': vue, 'requetes_sql': len(suivi.requetes), 'budget': budget,
+        'empreintes': [{'empreinte': cle, 'occurrences': n} for cle, n, _ in repetees],
+    })
+
+
+def grouper(objets, champ):
+    """
+    {valeur de `champ`: [objets]} en un seul parcours, ordre conservé : à
+    la place d'un filter() par valeur de choix dans une boucle.
+    """
+    groupes = {}
+    for objet in objets:
+        groupes.setdefault(getattr(objet, champ), []).append(objet)
+    return groupes
@@ -0,0 +1,225 @@
+# apps/core/cache.py
+"""
+Cache de réponses versionné pour les endpoints publics en lecture seule.
+
+Chaque modèle suivi possède un compteur de version stocké dans le cache,
+incrémenté par les signaux post_save/post_delete. La clé d'une réponse
+combine l'URL normalisée (chemin + paramètres triés, donc pagination
+comprise) et les versions des modèles dont elle dépend : une modification
+rend automatiquement obsolètes toutes les réponses concernées.
+
+Les réponses servent un ETag fort ; un `If-None-Match` correspondant reçoit
+un 304 sans requête en base ni sérialisation.
+"""
+import hashlib
+import json
+import logging
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import post_save, post_delete
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'rc:version:{}'
+RESPONSE_KEY = 'rc:response:{}'
+
+# Labels ('app_label.modelname') des modèles dont les versions sont suivies
+_modeles_suivis = set()
+
+
+def _config():
+    return getattr(settings, 'RESPONSE_CACHE', {})
+
+
+def _label(modele):
+    """Accepte un label 'app.Modele' ou une classe de modèle."""
+    if isinstance(modele, str):
+        return modele.lower()
+    return modele._meta.concrete_model._meta.label_lower
+
+
+def suivre_modeles(*modeles):
+    """Enregistre des modèles dont les sauvegardes invalident le cache."""
+    labels = tuple(_label(m) for m in modeles)
+    _modeles_suivis.update(labels)
+    return labels
+
+
+def get_versions(labels):
+    """Retourne les versions courantes des modèles, en les initialisant si besoin."""
+    cles = [VERSION_KEY.format(label) for label in labels]
+    versions = cache.get_many(cles)
+    for cle in cles:
+        if cle not in versions:
+            # Point de départ horodaté : une version évincée du cache ne
+            # retombe jamais sur une valeur déjà utilisée.
+            cache.add(cle, time.time_ns() // 1000, timeout=None)
+            versions[cle] = cache.get(cle)
+    return [versions[cle] for cle in cles]
+
+
+def incrementer_version(modele):
+    """Invalide toutes les réponses qui dépendent du modèle."""
+    cle = VERSION_KEY.format(_label(modele))
+    try:
+        cache.incr(cle)
+    except ValueError:
+        cache.set(cle, time.time_ns() // 1000, timeout=None)
+
+
+def _invalider(sender, **kwargs):
+    if _label(sender) in _modeles_suivis:
+        incrementer_version(sender)
+
+
+def connecter_signaux():
+    """Appelé depuis CoreConfig.ready()."""
+    suivre_modeles(*_config().get('MODELS', ()))
+    post_save.connect(_invalider, dispatch_uid='core_response_cache_save')
+    post_delete.connect(_invalider, dispatch_uid='core_response_cache_delete')
+
+
+def _etags_demandes(request):
+    entete = request.META.get('HTTP_IF_NONE_MATCH', '')
+    etags = set()
+    for etag in entete.split(','):
+        etag = etag.strip()
+        if etag.startswith('W/'):
+            etag = etag[2:]
+        if etag:
+            etags.add(etag)
+    return etags
+
+
+def _cle_reponse(view, request, versions):
+    renderer = getattr(request, 'accepted_renderer', None)
+    parametres = urlencode(sorted(request.query_params.lists()), doseq=True)
+    brut = '|'.join([
+        f'{type(view).__module__}.{type(view).__name__}',
+        str(getattr(view, 'action', '') or ''),
+        getattr(renderer, 'format', '') or '',
+        request.path,
+        parametres,
+        ','.join(str(v) for v in versions),
+    ])
+    return RESPONSE_KEY.format(hashlib.sha256(brut.encode()).hexdigest())
+
+
+def _finaliser(response, etag, hit):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    response['Vary'] = 'Accept, Authorization, Cookie'
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
+
+def servir_reponse_cachee(view, request, produire, modeles, timeout=None):
+    """
+    Sert la réponse depuis le cache si elle est à jour, sinon appelle
+    `produire()` et mémorise son contenu.
+
+    Seuls les GET/HEAD des utilisateurs non staff sont mis en cache : le
+    staff voit aussi les contenus non publiés.
+    """
+    config = _config()
+    if (not config.get('ENABLED', True)
+            or request.method not in ('GET', 'HEAD')
+            or request.user.is_staff):
+        return produire()
+
+    try:
+        versions = get_versions([_label(m) for m in modeles])
+        cle = _cle_reponse(view, request, versions)
+        entree = cache.get(cle)
+    except Exception as e:
+        logger.warning(f"Cache de réponses indisponible: {e}")
+        return produire()
+
+    if entree is not None:
+        if entree['etag'] in _etags_demandes(request):
+            return _finaliser(Response(status=status.HTTP_304_NOT_MODIFIED), entree['etag'], True)
+        return _finaliser(Response(entree['data']), entree['etag'], True)
+
+    response = produire()
+    if not isinstance(response, Response) or response.status_code != status.HTTP_200_OK:
+        return response
+
+    contenu = json.dumps(response.data, cls=DjangoJSONEncoder, ensure_ascii=False)
+    etag = '"{}"'.format(hashlib.sha256(contenu.encode()).hexdigest()[:32])
+    try:
+        cache.set(
+            cle,
+            {'etag': etag, 'data': json.loads(contenu)},
+            timeout if timeout is not None else config.get('TIMEOUT', 300),
+        )
+    except Exception as e:
+        logger.warning(f"Impossible de mettre la réponse en cache: {e}")
+
+    if etag in _etags_demandes(request):
+        return _finaliser(Response(status=status.HTTP_304_NOT_MODIFIED), etag, False)
+    return _finaliser(response, etag, False)
+
+
+def cached_public_response(*modeles, timeout=None):
+    """
+    Décorateur pour une méthode de vue (get, action de ViewSet...).
+
+        @action(detail=False, methods=['get'])
+        @cached_public_response('actualites.ActualitesActualite')
+        def publiees(self, request): ...
+    """
+    labels = suivre_modeles(*modeles)
+
+    def decorateur(methode):
+        @wraps(methode)
+        def wrapper(self, request, *args, **kwargs):
+            return servir_reponse_cachee(
+                self, request,
+                lambda: methode(self, request, *args, **kwargs),
+                labels, timeout,
+            )
+        return wrapper
+    return decorateur
+
+
+class PublicResponseCacheMixin:
+    """
+    Met en cache `list` et `retrieve` d'une vue générique.
+
+    `cache_models` liste les modèles dont dépend la réponse ; par défaut le
+    modèle du queryset.
+    """
+    cache_models = ()
+    cache_timeout = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        suivre_modeles(*cls._get_cache_models())
+
+    @classmethod
+    def _get_cache_models(cls):
+        if cls.cache_models:
+            return cls.cache_models
+        queryset = getattr(cls, 'queryset', None)
+        return (queryset.model,) if queryset is not None else ()
+
+    def list(self, request, *args, **kwargs):
+        return servir_reponse_cachee(
+            self, request,
+            lambda: super(PublicResponseCacheMixin, self).list(request, *args, **kwargs),
+            self._get_cache_models(), self.cache_timeout,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return servir_reponse_cachee(
+            self, request,
+            lambda: super(PublicResponseCacheMixin, self).retrieve(request, *args, **kwargs),
+            self._get_cache_models(), self.cache_timeout,
+        )
@@ -0,0 +1,315 @@
+# apps/core/cache_niveaux.py
+"""
+Cache à deux niveaux des valeurs calculées par les services.
+
+    from apps.core.cache_niveaux import cached, invalider
+
+    @cached('notaires:stats', ttl=60, tags=['notaires'])
+    def statistiques(): ...
+
+    invalider('notaires')
+
+La clé et les tags sont des gabarits remplis avec les arguments de
+l'appel ; `obtenir(cle, calculer, ttl, tags)` sert les appels ponctuels.
+
+    - L1 : LRU par processus (CACHE_NIVEAUX['L1_TAILLE'] entrées), sans
+      aller-retour réseau. Une entrée y vit au plus L1_TTL secondes : une
+      invalidation faite par un autre worker y est vue à cette échéance
+      (tout de suite dans le processus qui invalide). La valeur servie est
+      partagée entre appelants : elle ne doit pas être modifiée ;
+    - L2 : cache Django CACHE_NIVEAUX['ALIAS'] (Redis, voir CACHES),
+      partagé entre workers et redémarrages ; sans Redis, propre au
+      processus comme le L1.
+
+Une valeur L2 porte son échéance `ttl`, la durée de son calcul et les
+versions de ses tags ; elle est gardée GRACE secondes de plus pour être
+servie périmée pendant qu'un seul processus la recalcule. Contre les
+ruées sur une clé qui expire :
+
+    - dans un processus, un seul thread calcule une clé, les autres
+      attendent son résultat ;
+    - entre processus, le calcul est réservé par un verrou L2
+      (cache.add) : les autres servent la valeur périmée s'il y en a une,
+      sinon attendent sa publication jusqu'à ATTENTE secondes ;
+    - rafraîchissement anticipé probabiliste : avant l'échéance, une
+      lecture L2 recalcule la valeur avec une probabilité qui croît à
+      l'approche de l'échéance et avec la durée du calcul (facteur BETA),
+      si bien qu'une clé chaude est en général recalculée par un seul
+      lecteur avant d'expirer.
+
+Chaque tag a une version en L2 : `invalider(*tags)` l'incrémente et rend
+obsolètes en une écriture toutes les valeurs qui le portent.
+
+Métriques : cache_niveaux_lectures{niveau, resultat} donne le taux de
+succès de chaque niveau, cache_niveaux_calculs{motif} les recalculs.
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from inspect import signature
+
+from django.conf import settings
+from django.core.cache import caches
+from prometheus_client import Counter
+
+LECTURES = Counter('cache_niveaux_lectures', 'Lectures du cache à deux niveaux', ['niveau', 'resultat'])
+CALCULS = Counter('cache_niveaux_calculs', 'Valeurs calculées par le cache à deux niveaux', ['motif'])
+PERIMEES = Counter('cache_niveaux_perimees_servies', 'Valeurs périmées servies pendant un recalcul')
+
+CLE_VALEUR = 'cn:v:{}'
+CLE_TAG = 'cn:tag:{}'
+CLE_VERROU = 'cn:verrou:{}'
+
+
+def _config():
+    config = {
+        'ACTIF': True, 'ALIAS': 'default', 'L1_TAILLE': 1000, 'L1_TTL': 5,
+        'GRACE': 60, 'VERROU': 30, 'ATTENTE': 5.0, 'BETA': 1.0,
+    }
+    config.update(getattr(settings, 'CACHE_NIVEAUX', {}))
+    return config
+
+
+def _l2():
+    return caches[_config()['ALIAS']]
+
+
+# =====================================================
+# L1 : LRU DU PROCESSUS
+# =====================================================
+
+class LRU:
+    """Entrées {cle: (expiration monotone, entrée L2, tags)} les moins récemment lues évincées."""
+
+    def __init__(self):
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def lire(self, cle):
+        with self._verrou:
+            element = self._entrees.get(cle)
+            if element is None:
+                return None
+            if time.monotonic() >= element[0]:
+                del self._entrees[cle]
+                return None
+            self._entrees.move_to_end(cle)
+            return element[1]
+
+    def ecrire(self, cle, entree, tags, duree, taille):
+        if duree <= 0 or taille <= 0:
+            return
+        with self._verrou:
+            self._entrees[cle] = (time.monotonic() + duree, entree, frozenset(tags))
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > taille:
+                self._entrees.popitem(last=False)
+
+    def oublier(self, cle):
+        with self._verrou:
+            self._entrees.pop(cle, None)
+
+    def oublier_tags(self, tags):
+        tags = set(tags)
+        with self._verrou:
+            for cle in [cle for cle, (_, _, portes) in self._entrees.items() if portes & tags]:
+                del self._entrees[cle]
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+    def __len__(self):
+        return len(self._entrees)
+
+
+_l1 = LRU()
+
+
+def _garder_l1(cle, entree, tags, config):
+    _l1.ecrire(cle, entree, tags, min(config['L1_TTL'], entree['e'] - time.time()), config['L1_TAILLE'])
+
+
+# =====================================================
+# CALCUL UNIQUE
+# =====================================================
+
+class _Calcul:
+    """Calcul en cours d'une clé dans le processus, attendu par les autres threads."""
+
+    __slots__ = ('fini', 'valeur', 'erreur')
+
+    def __init__(self):
+        self.fini = threading.Event()
+        self.valeur = None
+        self.erreur = None
+
+
+_en_cours = {}
+_en_cours_verrou = threading.Lock()
+
+
+def _a_jour(entree, versions):
+    return entree is not None and entree['t'] == versions
+
+
+def _anticiper(entree, maintenant, beta):
+    """Rafraîchissement anticipé : vrai de plus en plus souvent à l'approche de l'échéance."""
+    return maintenant - entree['d'] * beta * math.log(1.0 - random.random()) >= entree['e']
+
+
+def _versions(l2, cles_tags, lues):
+    """Versions des tags, initialisées au besoin (départ horodaté, comme apps/core/cache.py)."""
+    versions = [lues.get(cle) for cle in cles_tags]
+    for i, cle in enumerate(cles_tags):
+        if versions[i] is None:
+            l2.add(cle, time.time_ns() // 1000, timeout=None)
+            versions[i] = l2.get(cle)
+    return versions
+
+
+def _publier(cle, calculer, ttl, tags, versions, motif, config):
+    l2 = _l2()
+    debut = time.perf_counter()
+    valeur = calculer()
+    entree = {'v': valeur, 'e': time.time() + ttl, 'd': time.perf_counter() - debut, 't': versions}
+    CALCULS.labels(motif).inc()
+    l2.set(CLE_VALEUR.format(cle), entree, ttl + config['GRACE'])
+    _garder_l1(cle, entree, tags, config)
+    return valeur
+
+
+def _calculer_partage(cle, calculer, ttl, tags, versions, perimee, motif, config):
+    """Réserve le calcul entre processus ; sinon valeur périmée ou attente de la publication."""
+    l2 = _l2()
+    verrou = CLE_VERROU.format(cle)
+    if l2.add(verrou, 1, config['VERROU']):
+        try:
+            return _publier(cle, calculer, ttl, tags, versions, motif, config)
+        finally:
+            l2.delete(verrou)
+
+    if perimee is not None:
+        PERIMEES.inc()
+        return perimee['v']
+    fin, pause = time.monotonic() + config['ATTENTE'], 0.02
+    while time.monotonic() < fin:
+        time.sleep(pause)
+        pause = min(pause * 2, 0.5)
+        entree = l2.get(CLE_VALEUR.format(cle))
+        if _a_jour(entree, versions) and time.time() < entree['e']:
+            _garder_l1(cle, entree, tags, config)
+            return entree['v']
+    # Détenteur du verrou trop lent ou disparu
+    return _publier(cle, calculer, ttl, tags, versions, 'attente', config)
+
+
+def _calculer(cle, calculer, ttl, tags, versions, perimee, motif, config):
+    """Un seul thread du processus calcule la clé ; les autres attendent ou servent la valeur périmée."""
+    with _en_cours_verrou:
+        calcul = _en_cours.get(cle)
+        meneur = calcul is None
+        if meneur:
+            calcul = _en_cours[cle] = _Calcul()
+
+    if not meneur:
+        if perimee is not None:
+            PERIMEES.inc()
+            return perimee['v']
+        if calcul.fini.wait(config['ATTENTE']) and calcul.erreur is None:
+            return calcul.valeur
+        return _publier(cle, calculer, ttl, tags, versions, 'attente', config)
+
+    try:
+        calcul.valeur = _calculer_partage(cle, calculer, ttl, tags, versions, perimee, motif, config)
+        return calcul.valeur
+    except BaseException as exc:
+        calcul.erreur = exc
+        raise
+    finally:
+        with _en_cours_verrou:
+            _en_cours.pop(cle, None)
+        calcul.fini.set()
+
+
+# =====================================================
+# API
+# =====================================================
+
+def obtenir(cle, calculer, ttl, tags=()):
+    """Valeur de `cle` depuis L1 ou L2, sinon `calculer()` mémorisé `ttl` secondes."""
+    config = _config()
+    if not config['ACTIF']:
+        return calculer()
+
+    entree = _l1.lire(cle)
+    if entree is not None:
+        LECTURES.labels('l1', 'succes').inc()
+        return entree['v']
+    LECTURES.labels('l1', 'echec').inc()
+
+    l2 = _l2()
+    cles_tags = [CLE_TAG.format(tag) for tag in tags]
+    lues = l2.get_many([CLE_VALEUR.format(cle), *cles_tags])
+    versions = _versions(l2, cles_tags, lues)
+    entree = lues.get(CLE_VALEUR.format(cle))
+    if not _a_jour(entree, versions):
+        LECTURES.labels('l2', 'echec').inc()
+        return _calculer(cle, calculer, ttl, tags, versions, None, 'absente', config)
+
+    maintenant = time.time()
+    if maintenant >= entree['e']:
+        LECTURES.labels('l2', 'echec').inc()
+        return _calculer(cle, calculer, ttl, tags, versions, entree, 'expiree', config)
+    LECTURES.labels('l2', 'succes').inc()
+    if _anticiper(entree, maintenant, config['BETA']):
+        return _calculer(cle, calculer, ttl, tags, versions, entree, 'anticipee', config)
+    _garder_l1(cle, entree, tags, config)
+    return entree['v']
+
+
+def cached(cle, ttl, tags=()):
+    """
+    Décorateur : résultat de la fonction mis en cache sous `cle`. La clé
+    et les tags sont des gabarits str.format remplis avec les arguments
+    nommés de l'appel (valeurs par défaut comprises).
+    """
+    def decorer(fonction):
+        parametres = signature(fonction)
+
+        @wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            arguments = parametres.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            valeurs = arguments.arguments
+            return obtenir(
+                cle.format(**valeurs), lambda: fonction(*args, **kwargs), ttl,
+                [tag.format(**valeurs) for tag in tags],
+            )
+        return enveloppe
+    return decorer
+
+
+def invalider(*tags):
+    """Rend obsolètes toutes les valeurs portant l'un des tags."""
+    l2 = _l2()
+    for tag in tags:
+        cle = CLE_TAG.format(tag)
+        try:
+            l2.incr(cle)
+        except ValueError:
+            l2.set(cle, time.time_ns() // 1000, timeout=None)
+    _l1.oublier_tags(tags)
+
+
+def supprimer(cle):
+    _l2().delete(CLE_VALEUR.format(cle))
+    _l1.oublier(cle)
+
+
+def vider_l1():
+    """Vide le niveau L1 du processus (tests)."""
+    _l1.vider()
@@ -0,0 +1,23 @@
+# apps/core/checks.py
+"""Vérifications de déploiement (`manage.py check --deploy`)."""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+CACHES_LOCAUX = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def verifier_cache_partage(app_configs, **kwargs):
+    """Cache mémoire (locmem, dummy) : rien n'est partagé entre les workers."""
+    if settings.CACHES['default']['BACKEND'] not in CACHES_LOCAUX:
+        return []
+    return [Warning(
+        "Le cache par défaut est propre à chaque processus.",
+        hint="Définir REDIS_URL, ou garder le cache fichier par défaut (CACHE_DOSSIER) : compteurs "
+             "de vues, limites de débit, révocations de jetons et invalidations ne sont pas "
+             "partagés entre les workers sans cache commun.",
+        id='core.W001',
+    )]
@@ -0,0 +1,135 @@
+# apps/core/connexions.py
+"""
+Connexions PostgreSQL : persistance, pool et délais.
+
+DB_CONNEXIONS['MODE'] choisit comment un worker obtient ses connexions :
+
+    - 'persistantes' : une connexion par worker (ou par thread), gardée
+      DUREE_MAX secondes (CONN_MAX_AGE) et vérifiée avant réemploi après
+      chaque requête (CONN_HEALTH_CHECKS). Adapté aux workers gunicorn
+      sync, qui ne servent qu'une requête à la fois ;
+    - 'pool' : pool psycopg 3 (OPTIONS['pool'] de Django) de POOL_MIN à
+      POOL_MAX connexions partagées par les threads d'un worker gthread
+      (GUNICORN_THREADS) ; un thread attend au plus POOL_ATTENTE secondes
+      une connexion libre. Exige psycopg[pool] : psycopg2 ne sait pas
+      faire de pool ;
+    - 'requete' : une connexion ouverte puis fermée par requête
+      (comportement par défaut de Django).
+
+Dans tous les modes, `connect_timeout` borne la durée de l'ouverture et,
+si DUREE_REQUETE_MAX_MS est non nul, `statement_timeout` celle d'une
+requête SQL. Les settings ne le fixent que dans les processus web
+(wsgi.py, asgi.py) : une migration ou une commande longue n'est pas coupée.
+
+`reglages()` est appelé par les settings pour compléter
+DATABASES['default']. `publier()` (InstrumentationMiddleware) recopie
+l'état des pools dans les métriques db_pool_* : saturation =
+(db_pool_connexions - db_pool_disponibles) / db_pool_maximum, et
+db_pool_en_attente > 0 signale des threads bloqués faute de connexion.
+"""
+from prometheus_client import Counter, Gauge
+
+MODES = ('persistantes', 'pool', 'requete')
+
+OUVERTURES = Counter('db_connexions_ouvertes', 'Connexions à la base ouvertes', ['alias'])
+POOL_CONNEXIONS = Gauge(
+    'db_pool_connexions', 'Connexions ouvertes par le pool', ['alias'], multiprocess_mode='livesum',
+)
+POOL_DISPONIBLES = Gauge(
+    'db_pool_disponibles', 'Connexions du pool libres', ['alias'], multiprocess_mode='livesum',
+)
+POOL_MAXIMUM = Gauge(
+    'db_pool_maximum', 'Taille maximale du pool', ['alias'], multiprocess_mode='livesum',
+)
+POOL_EN_ATTENTE = Gauge(
+    'db_pool_en_attente', 'Demandes de connexion en attente', ['alias'], multiprocess_mode='livesum',
+)
+POOL_ATTENTES = Counter('db_pool_attentes', 'Demandes de connexion mises en file', ['alias'])
+POOL_ATTENTE_DUREE = Counter('db_pool_attente_secondes', 'Temps d\'attente d\'une connexion du pool', ['alias'])
+POOL_ECHECS = Counter('db_pool_echecs', 'Demandes de connexion en échec (délai dépassé)', ['alias'])
+
+
+def reglages(config, moteur='django.db.backends.postgresql'):
+    """
+    Clés CONN_MAX_AGE, CONN_HEALTH_CHECKS et OPTIONS à fusionner dans une
+    entrée de DATABASES pour le mode `config['MODE']`.
+    """
+    from django.core.exceptions import ImproperlyConfigured
+
+    mode = config['MODE']
+    if mode not in MODES:
+        raise ImproperlyConfigured(f"DB_CONNEXIONS['MODE'] inconnu : {mode!r} (attendu : {', '.join(MODES)})")
+
+    options = {}
+    if moteur.endswith('postgresql'):
+        options['connect_timeout'] = config.get('DELAI_CONNEXION', 5)
+        if config.get('DUREE_REQUETE_MAX_MS'):
+            options['options'] = f"-c statement_timeout={config['DUREE_REQUETE_MAX_MS']}"
+    if mode == 'pool':
+        options['pool'] = {
+            'min_size': config['POOL_MIN'],
+            'max_size': config['POOL_MAX'],
+            'timeout': config['POOL_ATTENTE'],
+        }
+        # Le pool refuse CONN_MAX_AGE ; il vérifie lui-même les connexions prêtées
+        return {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': options}
+    if mode == 'persistantes':
+        return {'CONN_MAX_AGE': config['DUREE_MAX'], 'CONN_HEALTH_CHECKS': True, 'OPTIONS': options}
+    return {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': options}
+
+
+def _pools():
+    """[(alias, pool)] des connexions configurées en pool (ouvert à la première connexion)."""
+    from django.db import connections
+
+    pools = []
+    for alias in connections:
+        if not connections.settings[alias].get('OPTIONS', {}).get('pool'):
+            continue
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is not None:
+            pools.append((alias, pool))
+    return pools
+
+
+def etat():
+    """{alias: statistiques psycopg_pool} sans remise à zéro des compteurs."""
+    return {alias: pool.get_stats() for alias, pool in _pools()}
+
+
+def publier():
+    """Recopie l'état des pools du processus dans les métriques db_pool_*."""
+    for alias, pool in _pools():
+        # pop_stats remet les compteurs à zéro : seuls les écarts sont ajoutés
+        stats = pool.pop_stats()
+        POOL_CONNEXIONS.labels(alias).set(stats.get('pool_size', 0))
+        POOL_DISPONIBLES.labels(alias).set(stats.get('pool_available', 0))
+        POOL_MAXIMUM.labels(alias).set(stats.get('pool_max', 0))
+        POOL_EN_ATTENTE.labels(alias).set(stats.get('requests_waiting', 0))
+        if stats.get('requests_queued'):
+            POOL_ATTENTES.labels(alias).inc(stats['requests_queued'])
+        if stats.get('requests_wait_ms'):
+            POOL_ATTENTE_DUREE.labels(alias).inc(stats['requests_wait_ms'] / 1000)
+        if stats.get('requests_errors'):
+            POOL_ECHECS.labels(alias).inc(stats['requests_errors'])
+
+
+def fermer():
+    """Ferme les connexions et les pools du processus (arrêt d'un worker)."""
+    from django.db import connections
+
+    for connexion in connections.all(initialized_only=True):
+        connexion.close()
+    for alias, _ in _pools():
+        connections[alias].close_pool()
+
+
+def _connexion_creee(sender, connection, **kwargs):
+    OUVERTURES.labels(connection.alias).inc()
+
+
+def connecter_signaux():
+    """Appelé depuis CoreConfig.ready()."""
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(_connexion_creee, dispatch_uid='connexions_ouvertes')
@@ -0,0 +1,90 @@
+# apps/core/idempotence.py
+"""
+Clés d'idempotence (en-tête `Idempotency-Key`) pour les endpoints d'écriture.
+
+La première réponse (hors erreurs 5xx) est conservée dans le cache et
+rejouée telle quelle pour toute requête répétée avec la même clé par le
+même appelant (utilisateur connecté, à défaut adresse IP) : la clé d'un
+autre appelant ne donne jamais accès à sa réponse. Une requête identique
+encore en cours reçoit un 409 ; la même clé réutilisée avec un corps
+différent reçoit un 422.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+RESPONSE_KEY = 'idempotence:{}:{}:{}'
+LOCK_KEY = 'idempotence:{}:{}:{}:en_cours'
+
+
+def _config():
+    config = {'TIMEOUT': 24 * 3600, 'LOCK_TIMEOUT': 60}
+    config.update(getattr(settings, 'IDEMPOTENCY', {}))
+    return config
+
+
+def empreinte_requete(request):
+    """Empreinte du corps (objet, liste ou valeur JSON) et des paramètres de la requête."""
+    if isinstance(request.data, dict):
+        data = sorted((str(k), str(v)) for k, v in request.data.items())
+    else:
+        data = json.dumps(request.data, sort_keys=True, default=str)
+    contenu = {'data': data, 'query': sorted(request.query_params.items())}
+    return hashlib.sha256(json.dumps(contenu).encode()).hexdigest()
+
+
+def appelant(request):
+    """Utilisateur connecté, à défaut adresse IP du client."""
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    ip = x_forwarded_for.split(',')[0].strip() if x_forwarded_for else request.META.get('REMOTE_ADDR', '')
+    return f'ip{ip}'
+
+
+def executer_idempotent(request, portee, produire):
+    """
+    Exécute `produire()` une seule fois par clé d'idempotence et par portée.
+    Sans en-tête `Idempotency-Key`, la requête est traitée normalement.
+    """
+    cle = request.headers.get(HEADER)
+    if not cle:
+        return produire()
+
+    config = _config()
+    condensat = hashlib.sha256(cle.encode()).hexdigest()
+    empreinte = empreinte_requete(request)
+    qui = appelant(request)
+
+    enregistree = cache.get(RESPONSE_KEY.format(portee, qui, condensat))
+    if enregistree is not None:
+        if enregistree['empreinte'] != empreinte:
+            return Response(
+                {'error': f'{HEADER} déjà utilisée pour une requête différente'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(enregistree['data'], status=enregistree['status'], headers={'Idempotent-Replayed': 'true'})
+
+    verrou = LOCK_KEY.format(portee, qui, condensat)
+    if not cache.add(verrou, 1, config['LOCK_TIMEOUT']):
+        return Response(
+            {'error': 'Une requête avec cette clé est déjà en cours de traitement'},
+            status=status.HTTP_409_CONFLICT,
+            headers={'Retry-After': '1'},
+        )
+    try:
+        response = produire()
+        if response.status_code < 500:
+            cache.set(
+                RESPONSE_KEY.format(portee, qui, condensat),
+                {'empreinte': empreinte, 'status': response.status_code, 'data': response.data},
+                config['TIMEOUT'],
+            )
+        return response
+    finally:
+        cache.delete(verrou)
@@ -0,0 +1,314 @@
+# apps/core/images.py
+"""
+Dérivés d'images (miniatures redimensionnées, WebP/AVIF).
+
+Les dérivés sont rangés à côté de l'original, dans un sous-dossier
+`_derives/` :  notaires/photos/_derives/dupont-400w.webp
+
+Ils sont générés dans un pool de threads quand un modèle suivi est
+enregistré avec une nouvelle image (nom de fichier changé), ou
+paresseusement au premier affichage si absents. La liste des dérivés
+disponibles est mémorisée dans le cache pour que les serializers
+construisent les `srcset` sans accès au stockage ; une liste sérialisée
+lit celles de toutes ses images en un seul get_many.
+
+Quand une image est remplacée, vidée ou que sa ligne est supprimée, les
+dérivés de l'ancienne image et leur entrée du cache sont supprimés après le
+commit.
+"""
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_init, post_save
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'images:derives:{}'
+CACHE_PENDING_KEY = 'images:derives:en_cours:{}'
+
+# Champs image dont les dérivés sont générés automatiquement
+CHAMPS_IMAGES = [
+    ('notaires.NotairesNotaire', 'photo'),
+    ('notaires.NotairesStagiaire', 'photo'),
+    ('organisation.OrganisationMembrebureau', 'photo'),
+    ('partenaires.PartenairesPartenaire', 'logo'),
+    ('actualites.ActualitesActualite', 'image_principale'),
+    ('core.CorePage', 'image_principale'),
+]
+
+MIME_TYPES = {'webp': 'image/webp', 'avif': 'image/avif'}
+
+_executor = None
+
+
+def _config():
+    config = {
+        'LARGEURS': [160, 400, 800],
+        'FORMATS': ['webp', 'avif'],
+        'QUALITE': 80,
+        'WORKERS': 2,
+        'ASYNC': True,
+    }
+    config.update(getattr(settings, 'IMAGE_DERIVATIVES', {}))
+    return config
+
+
+def formats_disponibles():
+    from PIL import features
+    return [fmt for fmt in _config()['FORMATS'] if features.check(fmt)]
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=_config()['WORKERS'], thread_name_prefix='derives-images'
+        )
+    return _executor
+
+
+def chemin_derive(nom, largeur, fmt):
+    dossier, fichier = os.path.split(nom)
+    base = os.path.splitext(fichier)[0]
+    return f'{dossier}/_derives/{base}-{largeur}w.{fmt}' if dossier else f'_derives/{base}-{largeur}w.{fmt}'
+
+
+def generer_derives(nom, forcer=False):
+    """
+    Génère les dérivés d'une image stockée et retourne la liste
+    [(largeur, format, chemin)] des dérivés disponibles.
+    """
+    from PIL import Image, ImageOps
+
+    config = _config()
+    formats = formats_disponibles()
+
+    with default_storage.open(nom, 'rb') as fichier:
+        image = Image.open(fichier)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    # Pas d'agrandissement : on s'arrête à la largeur de l'original
+    largeurs = [l for l in config['LARGEURS'] if l < image.width] or [image.width]
+
+    derives = []
+    for largeur in largeurs:
+        copie = image.copy()
+        copie.thumbnail((largeur, largeur * 10), Image.LANCZOS)
+        for fmt in formats:
+            chemin = chemin_derive(nom, largeur, fmt)
+            if forcer or not default_storage.exists(chemin):
+                tampon = BytesIO()
+                copie.save(tampon, format=fmt.upper(), quality=config['QUALITE'])
+                if default_storage.exists(chemin):
+                    default_storage.delete(chemin)
+                default_storage.save(chemin, ContentFile(tampon.getvalue()))
+            derives.append((largeur, fmt, chemin))
+
+    cache.set(CACHE_KEY.format(nom), derives, timeout=None)
+    return derives
+
+
+def _generer_en_tache(nom):
+    try:
+        generer_derives(nom)
+    except Exception as e:
+        logger.warning(f"Impossible de générer les dérivés de {nom}: {e}")
+    finally:
+        cache.delete(CACHE_PENDING_KEY.format(nom))
+
+
+def planifier_derives(nom):
+    """Planifie la génération (une seule fois à la fois par image)."""
+    if not nom or not cache.add(CACHE_PENDING_KEY.format(nom), 1, 600):
+        return
+    if _config()['ASYNC']:
+        _get_executor().submit(_generer_en_tache, nom)
+    else:
+        _generer_en_tache(nom)
+
+
+def supprimer_derives(nom):
+    """Supprime les fichiers dérivés d'une image et leur liste en cache."""
+    cache.delete(CACHE_KEY.format(nom))
+    dossier, fichier = os.path.split(nom)
+    repertoire = f'{dossier}/_derives/' if dossier else '_derives/'
+    motif = re.compile(rf'{re.escape(os.path.splitext(fichier)[0])}-\d+w\.\w+$')
+    try:
+        _, fichiers = default_storage.listdir(repertoire)
+    except FileNotFoundError:
+        return 0
+    supprimes = [repertoire + f for f in fichiers if motif.match(f)]
+    for chemin in supprimes:
+        default_storage.delete(chemin)
+    return len(supprimes)
+
+
+def _image_referencee(nom):
+    """Vrai si une ligne d'un modèle suivi utilise encore l'image `nom`."""
+    return any(
+        apps.get_model(label).objects.filter(**{champ: nom}).exists()
+        for label, champ in CHAMPS_IMAGES
+    )
+
+
+def _supprimer_en_tache(nom):
+    try:
+        # Image partagée par une autre ligne : ses dérivés servent encore
+        if not _image_referencee(nom):
+            supprimer_derives(nom)
+    except Exception as e:
+        logger.warning(f"Impossible de supprimer les dérivés de {nom}: {e}")
+
+
+def planifier_suppression(nom):
+    if _config()['ASYNC']:
+        _get_executor().submit(_supprimer_en_tache, nom)
+    else:
+        _supprimer_en_tache(nom)
+
+
+def derives_par_nom(noms):
+    """{nom: dérivés connus} en un get_many ; planifie la génération des absents."""
+    lus = cache.get_many([CACHE_KEY.format(nom) for nom in noms])
+    resultat = {}
+    for nom in noms:
+        derives = lus.get(CACHE_KEY.format(nom))
+        if derives is None:
+            planifier_derives(nom)
+            derives = []
+        resultat[nom] = derives
+    return resultat
+
+
+def derives_disponibles(nom):
+    """Dérivés connus d'une image ; planifie leur génération s'ils manquent."""
+    return derives_par_nom([nom])[nom]
+
+
+def _noms_images(instance, champs):
+    # Lecture via __dict__ : un champ différé (only/defer) ne déclenche pas de requête
+    noms = {}
+    for champ in champs:
+        valeur = instance.__dict__.get(champ)
+        noms[champ] = getattr(valeur, 'name', valeur) or None
+    return noms
+
+
+def _memoriser_images(sender, instance, **kwargs):
+    instance._images_initiales = _noms_images(instance, _champs_par_modele().get(sender._meta.label_lower, ()))
+
+
+def _apres_sauvegarde(sender, instance, created=False, **kwargs):
+    champs = _champs_par_modele().get(sender._meta.label_lower, ())
+    avant = getattr(instance, '_images_initiales', {})
+    apres = _noms_images(instance, champs)
+    instance._images_initiales = apres
+    for champ in champs:
+        nom, ancien = apres[champ], avant.get(champ)
+        # Image inchangée : ses dérivés sont déjà là
+        if nom and (created or nom != ancien):
+            cache.delete(CACHE_KEY.format(nom))
+            transaction.on_commit(lambda nom=nom: planifier_derives(nom))
+        if ancien and not created and ancien != nom:
+            cache.delete(CACHE_KEY.format(ancien))
+            # Même nom de base : les dérivés seraient ceux de la nouvelle image
+            if _base(ancien) != _base(nom):
+                transaction.on_commit(lambda ancien=ancien: planifier_suppression(ancien))
+
+
+def _apres_suppression(sender, instance, **kwargs):
+    for nom in filter(None, _noms_images(instance, _champs_par_modele().get(sender._meta.label_lower, ())).values()):
+        cache.delete(CACHE_KEY.format(nom))
+        transaction.on_commit(lambda nom=nom: planifier_suppression(nom))
+
+
+def _base(nom):
+    return os.path.splitext(nom)[0] if nom else None
+
+
+def _champs_par_modele():
+    champs = {}
+    for label, champ in CHAMPS_IMAGES:
+        champs.setdefault(label.lower(), []).append(champ)
+    return champs
+
+
+def connecter_signaux():
+    """Appelé depuis CoreConfig.ready()."""
+    for label in _champs_par_modele():
+        modele = apps.get_model(label)
+        post_init.connect(_memoriser_images, sender=modele, dispatch_uid=f'core_images_init_{label}')
+        post_save.connect(_apres_sauvegarde, sender=modele, dispatch_uid=f'core_images_derives_{label}')
+        post_delete.connect(_apres_suppression, sender=modele, dispatch_uid=f'core_images_suppression_{label}')
+
+
+class ImageDerivesField(serializers.Field):
+    """
+    Champ en lecture seule exposant l'original et ses dérivés :
+
+        {"original": "...", "miniature": "...",
+         "srcset": {"webp": "... 160w, ... 400w", "avif": "..."}}
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return super().get_attribute(instance) or None
+
+    def _lus(self):
+        """
+        Dérivés des images de toute la liste sérialisée (many=True), lus une
+        fois par champ et rangés sur le serializer racine.
+        """
+        racine = self.root
+        lus = racine.__dict__.setdefault('_images_derives', {})
+        champs = racine.__dict__.setdefault('_images_champs', set())
+        if self.field_name in champs:
+            return lus
+        champs.add(self.field_name)
+        instances = getattr(racine, 'instance', None)
+        if isinstance(instances, QuerySet):
+            # Requête déjà exécutée par le ListSerializer, sinon rien à lire d'avance
+            instances = instances._result_cache
+        if isinstance(racine, serializers.ListSerializer) and self.parent is racine.child and instances:
+            noms = {fichier.name for fichier in map(self.get_attribute, instances) if fichier}
+            lus.update(derives_par_nom(sorted(noms)))
+        return lus
+
+    def to_representation(self, fichier):
+        if not fichier:
+            return None
+        request = self.context.get('request')
+
+        def url(nom):
+            chemin = default_storage.url(nom)
+            return request.build_absolute_uri(chemin) if request else chemin
+
+        lus = self._lus()
+        derives = lus[fichier.name] if fichier.name in lus else derives_disponibles(fichier.name)
+        srcset = {}
+        for largeur, fmt, chemin in derives:
+            srcset.setdefault(fmt, []).append(f'{url(chemin)} {largeur}w')
+
+        return {
+            'original': url(fichier.name),
+            'miniature': url(derives[0][2]) if derives else url(fichier.name),
+            'srcset': {fmt: ', '.join(valeurs) for fmt, valeurs in srcset.items()},
+        }
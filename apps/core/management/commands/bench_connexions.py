@@ -0,0 +1,122 @@
+import threading
+import time
+from copy import deepcopy
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from apps.core import connexions
+from apps.core.simulation.charge import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit d'un endpoint servi par plusieurs threads selon le mode "
+        "de connexion à la base (DB_CONNEXIONS, apps/core/connexions.py) : une "
+        "connexion par requête, connexions persistantes ou pool psycopg 3"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=connexions.MODES, default=list(connexions.MODES),
+                            help='Modes comparés (tous par défaut)')
+        parser.add_argument('--requetes', type=int, default=400, help='Requêtes HTTP par mode')
+        parser.add_argument('--threads', type=int, default=4, help='Threads concurrents (workers gthread)')
+        parser.add_argument('--url', help='Chemin GET mesuré (défaut : liste des notaires)')
+        parser.add_argument('--alias', default='default', help='Base de données dont le mode varie')
+
+    def _indisponible(self, mode, alias):
+        if mode != 'pool':
+            return None
+        if connections[alias].vendor != 'postgresql':
+            return 'PostgreSQL requis'
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            return 'psycopg[pool] non installé'
+        return None
+
+    def _executer(self, url, requetes, threads, alias):
+        latences, erreurs, ouvertures = [], [], []
+        verrou = threading.Lock()
+
+        def compter(sender, connection, **kwargs):
+            if connection.alias == alias:
+                with verrou:
+                    ouvertures.append(1)
+
+        def travailleur(nombre):
+            client, mesures, echecs = Client(), [], []
+            try:
+                for _ in range(nombre):
+                    debut = time.perf_counter()
+                    try:
+                        response = client.get(url, secure=True)
+                    except Exception as exc:
+                        echecs.append(type(exc).__name__)
+                        continue
+                    mesures.append(time.perf_counter() - debut)
+                    if response.status_code != 200:
+                        echecs.append(str(response.status_code))
+            finally:
+                connections.close_all()
+                with verrou:
+                    latences.extend(mesures)
+                    erreurs.extend(echecs)
+
+        parts = [requetes // threads + (1 if i < requetes % threads else 0) for i in range(threads)]
+        fils = [threading.Thread(target=travailleur, args=(nombre,)) for nombre in parts if nombre]
+        connection_created.connect(compter, weak=False, dispatch_uid='bench_connexions')
+        try:
+            debut = time.perf_counter()
+            for fil in fils:
+                fil.start()
+            for fil in fils:
+                fil.join()
+            duree = time.perf_counter() - debut
+        finally:
+            connection_created.disconnect(dispatch_uid='bench_connexions')
+        return duree, latences, erreurs, len(ouvertures)
+
+    def handle(self, *args, **options):
+        alias, threads = options['alias'], max(options['threads'], 1)
+        url = options['url'] or reverse('notaire-list')
+        reglage = connections.settings[alias]
+        origine = deepcopy(reglage)
+
+        self.stdout.write(f"GET {url} : {options['requetes']} requête(s), {threads} thread(s)")
+        self.stdout.write(f"{'Mode':<14}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'connexions':>12}{'erreurs':>9}")
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']):
+                for mode in options['modes']:
+                    raison = self._indisponible(mode, alias)
+                    if raison:
+                        self.stdout.write(self.style.WARNING(f'{mode:<14}indisponible : {raison}'))
+                        continue
+
+                    connexions.fermer()
+                    nouveau = connexions.reglages({**settings.DB_CONNEXIONS, 'MODE': mode}, reglage['ENGINE'])
+                    options_base = {cle: v for cle, v in origine.get('OPTIONS', {}).items() if cle != 'pool'}
+                    reglage.update(nouveau, OPTIONS={**options_base, **nouveau['OPTIONS']})
+
+                    duree, latences, erreurs, ouvertures = self._executer(url, options['requetes'], threads, alias)
+                    ligne = (
+                        f"{mode:<14}{len(latences) / duree if duree else 0:>9.1f}"
+                        f"{percentile(latences, 50) * 1000:>10.2f}{percentile(latences, 95) * 1000:>10.2f}"
+                        f"{ouvertures:>12}{len(erreurs):>9}"
+                    )
+                    self.stdout.write(self.style.ERROR(ligne) if erreurs else ligne)
+                    stats = connexions.etat().get(alias)
+                    if stats:
+                        self.stdout.write(
+                            f"{'':<14}pool {stats.get('pool_size', 0)}/{stats.get('pool_max', 0)}, "
+                            f"{stats.get('requests_queued', 0)} attente(s), "
+                            f"{stats.get('requests_wait_ms', 0)} ms d'attente cumulée"
+                        )
+        finally:
+            connexions.fermer()
+            reglage.clear()
+            reglage.update(origine)
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from apps.core.models import CorePage
+
+
+class AnnulerImport(Exception):
+    pass
+
+
+def _slug_par_sondage(titre):
+    """Ancienne attribution : une requête exists() par suffixe essayé."""
+    slug = original = slugify(titre)
+    compteur = 1
+    while CorePage.objects.filter(slug=slug).exists():
+        slug = f'{original}--{compteur}'
+        compteur += 1
+    return slug
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure l'import de N pages au titre identique (attribution des slugs, "
+        "apps/core/slugs.py) ; tout est annulé en fin de mesure"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nombre', type=int, default=10000, help='Pages importées')
+        parser.add_argument('--titre', default='Assemblée générale des notaires', help='Titre commun')
+        parser.add_argument('--sondage', action='store_true',
+                            help='Mesurer aussi l\'ancienne attribution par sondage (quadratique)')
+
+    def _mesurer(self, nombre, titre, sondage):
+        requetes = []
+
+        def compter(execute, sql, params, many, context):
+            requetes.append(1)
+            return execute(sql, params, many, context)
+
+        debut = time.perf_counter()
+        try:
+            with connection.execute_wrapper(compter), transaction.atomic():
+                for _ in range(nombre):
+                    page = CorePage(titre=titre, contenu='-')
+                    if sondage:
+                        page.slug = _slug_par_sondage(titre)
+                        super(CorePage, page).save()
+                    else:
+                        page.save()
+                raise AnnulerImport
+        except AnnulerImport:
+            pass
+        return time.perf_counter() - debut, len(requetes)
+
+    def handle(self, *args, **options):
+        modes = [('allocation', False)] + ([('sondage', True)] if options['sondage'] else [])
+        for nom, sondage in modes:
+            duree, requetes = self._mesurer(options['nombre'], options['titre'], sondage)
+            self.stdout.write(self.style.SUCCESS(
+                f"{nom:<10} {options['nombre']} page(s) en {duree:.2f}s, "
+                f"{requetes} requête(s) ({requetes / max(options['nombre'], 1):.1f} par page)"
+            ))
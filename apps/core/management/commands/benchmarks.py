@@ -0,0 +1,84 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.core.benchmarks import donnees
+from apps.core.benchmarks.cas import CAS
+from apps.core.benchmarks.executeur import _config, comparer, executer
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure débit et latences des services, sérialiseurs et endpoints chauds "
+        "(apps/core/benchmarks), écrit le rapport JSON et signale les régressions "
+        "par rapport à une campagne de référence"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peupler', action='store_true', help='Compléter d\'abord le jeu de données')
+        parser.add_argument('--echelle', type=float, default=1.0,
+                            help='Fraction des volumes cibles à peupler (1.0 : 5k notaires, 10M journaux...)')
+        parser.add_argument('--nettoyer', action='store_true', help='Supprimer le jeu de données et quitter')
+        parser.add_argument('--force', action='store_true', help='Peupler ou nettoyer même si DEBUG est faux')
+        parser.add_argument('--cas', nargs='+', choices=sorted(CAS), help='Cas mesurés (tous par défaut)')
+        parser.add_argument('--lister', action='store_true', help='Lister les cas et quitter')
+        parser.add_argument('--iterations', type=int, help='Répétitions mesurées par cas')
+        parser.add_argument('--echauffement', type=int, help='Répétitions non mesurées par cas')
+        parser.add_argument('--sortie', help='Fichier du rapport JSON (défaut : BENCHMARKS[\'DOSSIER\']/<date>.json)')
+        parser.add_argument('--reference', help='Rapport JSON de référence à comparer')
+        parser.add_argument('--seuil', type=float, help='Écart toléré avant régression (0.2 : +20 %%)')
+
+    def handle(self, *args, **options):
+        if options['lister']:
+            for nom, cas in CAS.items():
+                self.stdout.write(f'{nom:<28} {cas.description}')
+            return
+
+        if (options['peupler'] or options['nettoyer']) and not settings.DEBUG and not options['force']:
+            raise CommandError("Jeu de données de mesure : base dédiée attendue (DEBUG=True ou --force)")
+        if options['nettoyer']:
+            for table, nombre in donnees.nettoyer().items():
+                self.stdout.write(f'{table:<14} {nombre} ligne(s) supprimée(s)')
+            return
+        if options['peupler']:
+            for table, etat in donnees.peupler(options['echelle']).items():
+                self.stdout.write(f"{table:<14} {etat['existants']} existante(s), {etat['crees']} créée(s)")
+
+        self.stdout.write(
+            f"{'Cas':<28}{'op/s':>9}{'moy ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'SQL':>8}"
+        )
+
+        def afficher(nom, m):
+            if 'erreur' in m:
+                self.stdout.write(self.style.ERROR(f"{nom:<28}{m['erreur']}"))
+                return
+            self.stdout.write(
+                f"{nom:<28}{m['debit']:>9}{m['moyenne_ms']:>10}{m['p50_ms']:>10}{m['p95_ms']:>10}"
+                f"{m['p99_ms']:>10}{m['sql_moyen']:>8}"
+            )
+
+        rapport = executer(options['cas'], options['iterations'], options['echauffement'], sortie=afficher)
+
+        chemin = Path(options['sortie']) if options['sortie'] else (
+            Path(_config()['DOSSIER']) / f"{timezone.now():%Y%m%d-%H%M%S}.json")
+        chemin.parent.mkdir(parents=True, exist_ok=True)
+        chemin.write_text(json.dumps(rapport, indent=2, ensure_ascii=False))
+        self.stdout.write(f'Rapport : {chemin}')
+
+        if not options['reference']:
+            return
+        reference = json.loads(Path(options['reference']).read_text())
+        if reference.get('volumes') != rapport['volumes']:
+            self.stdout.write(self.style.WARNING("Volumes différents de la référence : comparaison indicative"))
+        regressions = comparer(reference, rapport, options['seuil'])
+        for r in regressions:
+            self.stdout.write(self.style.ERROR(
+                f"{r['cas']:<28}{r['mesure']:<12}{r['reference']} -> {r['courant']}"
+                + (f" (+{r['ecart']:.0%})" if r.get('ecart') else '')
+            ))
+        if regressions:
+            raise CommandError(f"{len(regressions)} régression(s) par rapport à {options['reference']}")
+        self.stdout.write(self.style.SUCCESS('Aucune régression par rapport à la référence'))
@@ -1,12 +1,19 @@
 from django.core.management.base import BaseCommand
 from django.core.files.storage import default_storage
 from django.conf import settings
+from django.apps import apps
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 from pathlib import Path
 
+from apps.core.images import CHAMPS_IMAGES, generer_derives
+
 
 class Command(BaseCommand):
-    help = 'Migre les images du stockage local vers le stockage cloud configuré'
+    help = (
+        'Migre les images du stockage local vers le stockage cloud configuré. '
+        'Avec --derives, génère les miniatures WebP/AVIF des images existantes.'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -19,11 +26,31 @@ class Command(BaseCommand):
             action='store_true',
             help='Supprime les fichiers locaux après migration réussie',
         )
+        parser.add_argument(
+            '--derives',
+            action='store_true',
+            help='Génère les dérivés (miniatures, WebP/AVIF) des images existantes',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Nombre de threads pour la génération des dérivés (défaut: 4)',
+        )
+        parser.add_argument(
+            '--forcer',
+            action='store_true',
+            help='Régénère les dérivés déjà présents',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
         delete_local = options['delete_local']
 
+        if options['derives']:
+            self._generer_derives(options['workers'], options['forcer'], dry_run)
+            return
+
         # Vérifier que nous ne sommes pas en mode DEBUG (développement)
         if settings.DEBUG:
             self.stdout.write(
@@ -131,4 +158,38 @@ class Command(BaseCommand):
                 self.style.WARNING(
                     'Ceci était un dry-run. Utilisez --dry-run=False pour migrer réellement.'
                 )
-            )
\ No newline at end of file
+            )
+
+    def _generer_derives(self, workers, forcer, dry_run):
+        """Génère en parallèle les dérivés de toutes les images référencées en base"""
+        noms = set()
+        for label, champ in CHAMPS_IMAGES:
+            modele = apps.get_model(label)
+            noms.update(
+                modele.objects.exclude(**{champ: ''}).exclude(**{f'{champ}__isnull': True})
+                .values_list(champ, flat=True)
+            )
+
+        self.stdout.write(f'Images à traiter: {len(noms)} ({workers} workers)')
+        if dry_run:
+            for nom in sorted(noms):
+                self.stdout.write(f'[DRY-RUN] Dérivés à générer: {nom}')
+            return
+
+        traites = 0
+        erreurs = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(generer_derives, nom, forcer): nom for nom in noms}
+            for future in as_completed(futures):
+                nom = futures[future]
+                try:
+                    derives = future.result()
+                    traites += 1
+                    self.stdout.write(f'✓ {nom}: {len(derives)} dérivé(s)')
+                except Exception as e:
+                    erreurs += 1
+                    self.stdout.write(self.style.ERROR(f'✗ Erreur pour {nom}: {str(e)}'))
+
+        self.stdout.write(self.style.SUCCESS(f'Dérivés générés pour {traites} image(s)'))
+        if erreurs:
+            self.stdout.write(self.style.WARNING(f'Erreurs: {erreurs}'))
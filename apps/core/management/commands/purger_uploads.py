@@ -0,0 +1,32 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from apps.core.uploads import orphelins
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime les fichiers envoyés en upload direct jamais finalisés : "
+        "aucune ligne ne les référence et leur ticket a expiré (FINALIZE_MAX_AGE). "
+        "À planifier quotidiennement (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Liste les fichiers orphelins sans les supprimer',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        total = 0
+        for cle in orphelins():
+            total += 1
+            if dry_run:
+                self.stdout.write(cle)
+            else:
+                default_storage.delete(cle)
+
+        verbe = 'à supprimer' if dry_run else 'supprimé(s)'
+        self.stdout.write(self.style.SUCCESS(f'{total} fichier(s) orphelin(s) {verbe}'))
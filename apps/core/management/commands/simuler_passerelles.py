@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.simulation.passerelles import creer_serveur
+
+
+class Command(BaseCommand):
+    help = (
+        "Démarre un simulateur local des API Yengapay et Aqilas (SMS). "
+        "Pointer YENGAPAY_API_URL et AQILAS_API_URL vers http://<hote>:<port>/api/v1"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hote', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8090)
+        parser.add_argument('--latence', type=float, default=50, help='Latence moyenne en ms')
+        parser.add_argument('--gigue', type=float, default=20, help='Écart type de la latence en ms')
+        parser.add_argument('--taux-erreur', type=float, default=0.0, help='Part des appels API en 503 (0-1)')
+        parser.add_argument('--taux-refus', type=float, default=0.0, help='Part des paiements refusés (0-1)')
+        parser.add_argument('--taux-doublons', type=float, default=0.0, help='Part des webhooks livrés deux fois (0-1)')
+        parser.add_argument('--delai-webhook', type=float, default=0.5, help='Secondes avant l\'envoi du webhook')
+        parser.add_argument(
+            '--webhook-url', default='http://127.0.0.1:8000/api/paiements/webhook/yengapay/',
+            help='Endpoint de l\'application recevant les webhooks Yengapay'
+        )
+
+    def handle(self, *args, **options):
+        serveur = creer_serveur(options['hote'], options['port'], {
+            'latence_ms': options['latence'],
+            'gigue_ms': options['gigue'],
+            'taux_erreur': options['taux_erreur'],
+            'taux_refus': options['taux_refus'],
+            'taux_doublons': options['taux_doublons'],
+            'delai_webhook': options['delai_webhook'],
+            'webhook_url': options['webhook_url'],
+            'webhook_secret': getattr(settings, 'YENGAPAY_WEBHOOK_SECRET', ''),
+        })
+        self.stdout.write(self.style.SUCCESS(
+            f"Simulateur de passerelles sur http://{options['hote']}:{options['port']}/api/v1 "
+            f"(webhooks -> {options['webhook_url']})"
+        ))
+        try:
+            serveur.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            serveur.server_close()
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.simulation.charge import PiloteCharge
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge du parcours demande -> initier-paiement -> webhook -> traitement "
+        "contre un serveur local (lancer aussi simuler_passerelles, et EXPOSE_QUERY_COUNT=true "
+        "côté serveur pour les nombres de requêtes SQL)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='URL du serveur testé')
+        parser.add_argument('--document', type=int, required=True, help='ID du document demandé')
+        parser.add_argument('--rps', type=float, default=5, help='Scénarios démarrés par seconde')
+        parser.add_argument('--duree', type=float, default=30, help='Durée de l\'injection en secondes')
+        parser.add_argument('--concurrence', type=int, default=64, help='Requêtes HTTP simultanées max')
+        parser.add_argument('--delai-paiement', type=float, default=30,
+                            help='Attente max de la confirmation du paiement (s)')
+        parser.add_argument('--admin', help='username:password d\'un compte staff pour l\'étape de traitement')
+        parser.add_argument('--json', dest='fichier_json', help='Écrire le rapport complet dans ce fichier')
+
+    def _jeton_admin(self, url, identifiants):
+        username, _, password = identifiants.partition(':')
+        reponse = requests.post(f'{url}/api/token/', json={'username': username, 'password': password}, timeout=30)
+        if reponse.status_code != 200:
+            raise CommandError(f"Authentification admin impossible ({reponse.status_code})")
+        return reponse.json()['access']
+
+    def handle(self, *args, **options):
+        url = options['url'].rstrip('/')
+        pilote = PiloteCharge(
+            base_url=url,
+            document_id=options['document'],
+            rps=options['rps'],
+            duree=options['duree'],
+            concurrence=options['concurrence'],
+            jeton_admin=self._jeton_admin(url, options['admin']) if options['admin'] else None,
+            delai_paiement=options['delai_paiement'],
+        )
+        rapport = asyncio.run(pilote.executer())
+
+        self.stdout.write(f"Durée: {rapport['duree']}s  Scénarios: {rapport['scenarios']}")
+        self.stdout.write(
+            f"{'Endpoint':<24}{'req':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'SQL moy':>9}{'SQL max':>9}  codes"
+        )
+        for endpoint, m in rapport['endpoints'].items():
+            self.stdout.write(
+                f"{endpoint:<24}{m['requetes']:>7}{m['debit']:>9}{m['p50_ms']:>9}{m['p95_ms']:>9}{m['p99_ms']:>9}"
+                f"{m['sql_moyen'] if m['sql_moyen'] is not None else '-':>9}"
+                f"{m['sql_max'] if m['sql_max'] is not None else '-':>9}  {m['codes']}"
+            )
+
+        if options['fichier_json']:
+            with open(options['fichier_json'], 'w') as fichier:
+                json.dump(rapport, fichier, indent=2, default=str)
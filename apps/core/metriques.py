@@ -0,0 +1,250 @@
+# apps/core/metriques.py
+"""
+Métriques de performance des requêtes, au format Prometheus.
+
+`InstrumentationMiddleware` (notaires_bf/middleware.py) mesure chaque
+requête et range les mesures par vue résolue et méthode HTTP :
+
+    - durée de la requête ;
+    - nombre et durée des requêtes SQL (`connection.execute_wrapper`) ;
+    - succès et échecs de lecture du cache Django ;
+    - temps passé en appels HTTP sortants (`requests`) ;
+    - taille de la réponse.
+
+Le cache et `requests` n'offrent pas de point d'accroche : `installer()`
+(appelé depuis CoreConfig.ready) enveloppe `get`/`get_many` des backends de
+cache configurés et `requests.Session.send`. Les mesures sont ajoutées à
+la requête en cours via une ContextVar, rien n'est mesuré hors requête
+sauf la durée des appels sortants par hôte.
+
+Sous gunicorn, chaque worker écrit ses valeurs dans des fichiers mappés en
+mémoire sous PROMETHEUS_MULTIPROC_DIR (mode multiprocess de
+prometheus_client, voir notaires_bf/gunicorn.conf.py) : `/metrics` agrège
+tous les workers. Sans cette variable, le registre du processus est servi.
+"""
+import hmac
+import os
+import time
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache.backends.base import BaseCache
+from django.utils import timezone
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+LABELS = ('vue', 'methode')
+VUE_NON_RESOLUE = '<non_resolue>'
+
+REQUETES = Counter('http_requetes', 'Requêtes HTTP traitées', [*LABELS, 'statut'])
+DUREE = Histogram('http_requete_duree_secondes', 'Durée des requêtes HTTP', LABELS)
+SQL_REQUETES = Histogram(
+    'http_requete_sql_requetes', 'Requêtes SQL par requête HTTP', LABELS,
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, float('inf')),
+)
+SQL_DUREE = Histogram('http_requete_sql_duree_secondes', 'Temps SQL par requête HTTP', LABELS)
+CACHE = Counter('http_requete_cache_lectures', 'Lectures du cache Django', [*LABELS, 'resultat'])
+SORTANT_DUREE = Histogram('http_requete_sortant_duree_secondes', 'Temps en appels HTTP sortants par requête', LABELS)
+SORTANT_HOTE = Histogram('http_sortant_duree_secondes', 'Durée des appels HTTP sortants', ['hote'])
+TAILLE = Histogram(
+    'http_reponse_taille_octets', 'Taille des réponses HTTP', LABELS,
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, float('inf')),
+)
+
+_mesure = ContextVar('metriques_mesure', default=None)
+_ABSENT = object()
+
+
+def _config():
+    config = {'ACTIF': True, 'JETON': ''}
+    config.update(getattr(settings, 'METRIQUES', {}))
+    return config
+
+
+def actif():
+    return _config()['ACTIF']
+
+
+class Mesure:
+    """Compteurs d'une requête en cours."""
+
+    __slots__ = ('debut', 'sql_requetes', 'sql_duree', 'cache_succes', 'cache_echecs', 'sortant_duree')
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.sql_requetes = 0
+        self.sql_duree = 0.0
+        self.cache_succes = 0
+        self.cache_echecs = 0
+        self.sortant_duree = 0.0
+
+    def sql(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_requetes += 1
+            self.sql_duree += time.perf_counter() - debut
+
+
+def demarrer():
+    mesure = Mesure()
+    return mesure, _mesure.set(mesure)
+
+
+def annuler(jeton):
+    _mesure.reset(jeton)
+
+
+def terminer(jeton, mesure, request, response):
+    """Enregistre la mesure de la requête terminée."""
+    _mesure.reset(jeton)
+    correspondance = getattr(request, 'resolver_match', None)
+    labels = (correspondance.view_name if correspondance else VUE_NON_RESOLUE) or VUE_NON_RESOLUE, request.method
+
+    REQUETES.labels(*labels, str(response.status_code)).inc()
+    DUREE.labels(*labels).observe(time.perf_counter() - mesure.debut)
+    SQL_REQUETES.labels(*labels).observe(mesure.sql_requetes)
+    SQL_DUREE.labels(*labels).observe(mesure.sql_duree)
+    SORTANT_DUREE.labels(*labels).observe(mesure.sortant_duree)
+    if mesure.cache_succes:
+        CACHE.labels(*labels, 'succes').inc(mesure.cache_succes)
+    if mesure.cache_echecs:
+        CACHE.labels(*labels, 'echec').inc(mesure.cache_echecs)
+
+    if response.has_header('Content-Length'):
+        TAILLE.labels(*labels).observe(int(response['Content-Length']))
+    elif not response.streaming:
+        TAILLE.labels(*labels).observe(len(response.content))
+
+
+# =====================================================
+# INSTRUMENTATION DU CACHE ET DE REQUESTS
+# =====================================================
+
+def _envelopper_cache(classe):
+    if getattr(classe, '_metriques', False):
+        return
+    get, get_many = classe.get, classe.get_many
+
+    def get_mesure(self, key, default=None, version=None):
+        valeur = get(self, key, _ABSENT, version)
+        mesure = _mesure.get()
+        if mesure is not None:
+            if valeur is _ABSENT:
+                mesure.cache_echecs += 1
+            else:
+                mesure.cache_succes += 1
+        return default if valeur is _ABSENT else valeur
+
+    def get_many_mesure(self, keys, version=None):
+        keys = list(keys)
+        valeurs = get_many(self, keys, version)
+        mesure = _mesure.get()
+        if mesure is not None:
+            mesure.cache_succes += len(valeurs)
+            mesure.cache_echecs += len(keys) - len(valeurs)
+        return valeurs
+
+    classe.get, classe._metriques = get_mesure, True
+    # BaseCache.get_many appelle get() pour chaque clé : déjà compté
+    if get_many is not BaseCache.get_many:
+        classe.get_many = get_many_mesure
+
+
+def _envelopper_requests():
+    import requests
+
+    if getattr(requests.Session, '_metriques', False):
+        return
+    send = requests.Session.send
+
+    def send_mesure(self, request, **kwargs):
+        debut = time.perf_counter()
+        try:
+            return send(self, request, **kwargs)
+        finally:
+            duree = time.perf_counter() - debut
+            SORTANT_HOTE.labels(urlsplit(request.url).hostname or '').observe(duree)
+            mesure = _mesure.get()
+            if mesure is not None:
+                mesure.sortant_duree += duree
+
+    requests.Session.send, requests.Session._metriques = send_mesure, True
+
+
+def installer():
+    """Appelé depuis CoreConfig.ready()."""
+    if not actif():
+        return
+    from django.core.cache import caches
+
+    for alias in settings.CACHES:
+        _envelopper_cache(type(caches[alias]))
+    _envelopper_requests()
+
+
+# =====================================================
+# EXPOSITION
+# =====================================================
+
+def registre():
+    """Registre agrégé de tous les workers en mode multiprocess."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registre = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registre)
+        return registre
+    return REGISTRY
+
+
+def jeton_valide(request):
+    """Jeton de collecte (METRIQUES['JETON']) présenté en `Authorization: Bearer`."""
+    jeton = _config()['JETON']
+    entete = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(jeton) and entete.startswith('Bearer ') and hmac.compare_digest(entete[7:].strip(), jeton)
+
+
+def exposition():
+    """(corps, content-type) au format texte Prometheus."""
+    return generate_latest(registre()), CONTENT_TYPE_LATEST
+
+
+def instantane():
+    """
+    Enregistre l'état courant des compteurs dans SystemMetric : par vue et
+    méthode, nombre de requêtes, durée moyenne, requêtes et temps SQL
+    moyens. Valeurs cumulées depuis le démarrage des workers.
+    """
+    from apps.system.models import SystemMetric
+
+    totaux = {}
+    for famille in registre().collect():
+        for echantillon in famille.samples:
+            if not echantillon.name.endswith(('_sum', '_count')) or 'vue' not in echantillon.labels:
+                continue
+            cle = (echantillon.labels['vue'], echantillon.labels['methode'])
+            totaux.setdefault(cle, {})[echantillon.name] = echantillon.value
+
+    maintenant, hote = timezone.now(), os.uname().nodename
+    metriques = []
+    for (vue, methode), valeurs in totaux.items():
+        nombre = valeurs.get('http_requete_duree_secondes_count') or 0
+        if not nombre:
+            continue
+        tags = {'vue': vue, 'methode': methode}
+        for metric_type, name, valeur, unit in [
+            ('request', 'http_requetes', nombre, ''),
+            ('response_time', 'http_requete_duree_moyenne',
+             valeurs.get('http_requete_duree_secondes_sum', 0) / nombre * 1000, 'ms'),
+            ('database', 'sql_requetes_moyenne', valeurs.get('http_requete_sql_requetes_sum', 0) / nombre, ''),
+            ('database', 'sql_duree_moyenne',
+             valeurs.get('http_requete_sql_duree_secondes_sum', 0) / nombre * 1000, 'ms'),
+        ]:
+            metriques.append(SystemMetric(
+                metric_type=metric_type, name=name, value=valeur, unit=unit,
+                tags=tags, hostname=hote, collected_at=maintenant,
+            ))
+    SystemMetric.objects.bulk_create(metriques)
+    return len(metriques)
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoreSlugCompteur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modele', models.CharField(max_length=100)),
+                ('base', models.CharField(max_length=200)),
+                ('dernier', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'core_slug_compteur',
+                'managed': True,
+                'constraints': [models.UniqueConstraint(fields=('modele', 'base'), name='core_slug_compteur_unique')],
+            },
+        ),
+    ]
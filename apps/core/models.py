@@ -145,12 +145,36 @@ class CorePage(models.Model):
     
     def save(self, *args, **kwargs):
         from django.utils import timezone
+        from django.utils.text import slugify
+        from .slugs import enregistrer
         # Auto-définir la date de publication si publié et date non définie
         if self.publie and not self.date_publication:
             self.date_publication = timezone.now()
-        super().save(*args, **kwargs)
+        if not self.pk:
+            # Slug libre dérivé du slug saisi ou du titre (apps/core/slugs.py)
+            enregistrer(self, super().save, self.slug or slugify(self.titre), *args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
     
     @property
     def url(self):
         """Retourne l'URL de la page"""
         return f"/pages/{self.slug}/"
+
+
+class CoreSlugCompteur(models.Model):
+    """Dernier suffixe attribué par slug de base (apps/core/slugs.py)"""
+
+    modele = models.CharField(max_length=100)
+    base = models.CharField(max_length=200)
+    dernier = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        managed = True
+        db_table = 'core_slug_compteur'
+        constraints = [
+            models.UniqueConstraint(fields=['modele', 'base'], name='core_slug_compteur_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.modele} {self.base} ({self.dernier})"
@@ -0,0 +1,227 @@
+# apps/core/pagination.py
+"""
+Pagination par curseur (keyset) pour les journaux (audit, système).
+
+Les pages sont délimitées par la position (horodatage, id) du dernier
+élément lu : `WHERE (ts, id) < (t, n) ORDER BY ts DESC, id DESC LIMIT k`,
+servi par l'index composite (ts, id). Lire une page lointaine coûte donc
+autant que lire la première, là où PageNumberPagination fait un OFFSET
+proportionnel à la profondeur et un COUNT(*) à chaque appel.
+
+Le total renvoyé est une estimation tirée des statistiques du planificateur
+PostgreSQL (exact en dessous d'un seuil, et sur les autres bases) ;
+`count_is_estimate` indique lequel des deux a été renvoyé.
+
+Paramètres :
+    cursor=<jeton>     page suivante / précédente (liens `next` / `previous`)
+    since=<jeton|ISO>  événements plus récents que la position, du plus ancien
+                       au plus récent (suivi en continu ; chaque réponse porte
+                       le jeton `since` à repasser à l'appel suivant)
+    page=<n>           ancien mode PageNumberPagination, conservé pour les
+                       clients existants
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _config():
+    config = {'PAGE_SIZE': 50, 'MAX_PAGE_SIZE': 500, 'SEUIL_COMPTE_EXACT': 10000}
+    config.update(getattr(settings, 'LOG_PAGINATION', {}))
+    return config
+
+
+def estimer_total(queryset):
+    """
+    Nombre (approximatif) de lignes du queryset, sans COUNT(*) sur une
+    grande table : `pg_class.reltuples` sans filtre (somme sur les
+    partitions d'une table partitionnée, dont le parent n'a pas de
+    statistiques propres), estimation de l'EXPLAIN sinon. Un COUNT exact n'est fait que sous le seuil configuré,
+    où il reste bon marché, ou hors PostgreSQL.
+
+    Retourne (total, estime) : `estime` est faux pour un COUNT exact.
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count(), False
+
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            # Une partition jamais analysée (mois à venir, vide) compte pour 0
+            cursor.execute(
+                "SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), -1)::bigint FROM pg_class c "
+                "WHERE (c.oid = %s::regclass AND c.relkind <> 'p') "
+                "OR c.oid IN (SELECT i.inhrelid FROM pg_inherits i WHERE i.inhparent = %s::regclass)",
+                [queryset.model._meta.db_table] * 2,
+            )
+            estimation = cursor.fetchone()[0]
+    else:
+        plan = json.loads(queryset.explain(format='json'))
+        estimation = int(plan[0]['Plan']['Plan Rows'])
+
+    # reltuples vaut -1 (0 ici) tant que la table n'a jamais été analysée
+    if estimation < _config()['SEUIL_COMPTE_EXACT']:
+        return queryset.count(), False
+    return estimation, True
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination keyset sur (champ horodaté, id). Le champ est pris dans
+    l'attribut `keyset_field` de la vue (par défaut 'timestamp'). L'ordre
+    est imposé par le curseur : les vues paginées ainsi n'exposent pas
+    d'OrderingFilter.
+    """
+    cursor_query_param = 'cursor'
+    since_query_param = 'since'
+    page_size_query_param = 'page_size'
+    page_query_param = 'page'
+
+    def _taille_page(self, request):
+        config = _config()
+        try:
+            taille = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return config['PAGE_SIZE']
+        return min(max(taille, 1), config['MAX_PAGE_SIZE'])
+
+    @staticmethod
+    def encoder(position, arriere=False):
+        instant, pk = position
+        brut = json.dumps([instant.isoformat(), pk, int(arriere)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(brut.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decoder(jeton):
+        try:
+            brut = base64.urlsafe_b64decode(jeton + '=' * (-len(jeton) % 4))
+            instant, pk, arriere = json.loads(brut)
+            return (datetime.fromisoformat(instant), int(pk)), bool(arriere)
+        except (binascii.Error, ValueError, TypeError):
+            raise NotFound('Curseur invalide')
+
+    def _decoder_since(self, valeur):
+        try:
+            instant = parse_datetime(valeur)
+        except ValueError:
+            # Date bien formée mais impossible (2024-13-45T00:00)
+            raise NotFound('Curseur invalide')
+        if instant is not None:
+            if settings.USE_TZ and timezone.is_naive(instant):
+                instant = timezone.make_aware(instant)
+            return instant, 0
+        return self.decoder(valeur)[0]
+
+    def _position(self, objet):
+        return getattr(objet, self.champ), objet.pk
+
+    def _avant(self, position):
+        """Lignes strictement antérieures à la position (index range sur le champ)."""
+        instant, pk = position
+        return Q(**{f'{self.champ}__lte': instant}) & (
+            Q(**{f'{self.champ}__lt': instant}) | Q(pk__lt=pk)
+        )
+
+    def _apres(self, position):
+        instant, pk = position
+        return Q(**{f'{self.champ}__gte': instant}) & (
+            Q(**{f'{self.champ}__gt': instant}) | Q(pk__gt=pk)
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_number = None
+        if self.page_query_param in request.query_params:
+            self.page_number = PageNumberPagination()
+            self.page_number.page_size = self._taille_page(request)
+            return self.page_number.paginate_queryset(queryset, request, view)
+
+        self.champ = getattr(view, 'keyset_field', 'timestamp')
+        self.taille = self._taille_page(request)
+        self.base_url = remove_query_param(
+            remove_query_param(request.build_absolute_uri(), self.cursor_query_param),
+            self.since_query_param,
+        )
+        self.count = None
+        self.estime = False
+        self.next = self.previous = None
+        decroissant = (f'-{self.champ}', '-pk')
+        croissant = (self.champ, 'pk')
+
+        # Suivi : pas de total, seulement les nouveautés dans l'ordre d'arrivée
+        if self.since_query_param in request.query_params:
+            depart = self._decoder_since(request.query_params[self.since_query_param])
+            lignes = list(queryset.filter(self._apres(depart)).order_by(*croissant)[:self.taille + 1])
+            plus = len(lignes) > self.taille
+            self.page = lignes[:self.taille]
+            self.since = self.encoder(self._position(self.page[-1]) if self.page else depart)
+            if plus:
+                self.next = replace_query_param(self.base_url, self.since_query_param, self.since)
+            return self.page
+
+        self.count, self.estime = estimer_total(queryset)
+        jeton = request.query_params.get(self.cursor_query_param)
+        position, arriere = self.decoder(jeton) if jeton else (None, False)
+        if position is None:
+            lignes = list(queryset.order_by(*decroissant)[:self.taille + 1])
+        elif arriere:
+            lignes = list(queryset.filter(self._apres(position)).order_by(*croissant)[:self.taille + 1])
+        else:
+            lignes = list(queryset.filter(self._avant(position)).order_by(*decroissant)[:self.taille + 1])
+
+        plus = len(lignes) > self.taille
+        self.page = lignes[:self.taille]
+        if arriere:
+            self.page.reverse()
+
+        if self.page:
+            premier, dernier = self._position(self.page[0]), self._position(self.page[-1])
+            # Lignes plus anciennes : toujours en remontant, selon `plus` sinon
+            if plus or arriere:
+                self.next = replace_query_param(self.base_url, self.cursor_query_param, self.encoder(dernier))
+            # Lignes plus récentes : dès qu'on a quitté la première page
+            if (position is not None and not arriere) or (arriere and plus):
+                self.previous = replace_query_param(
+                    self.base_url, self.cursor_query_param, self.encoder(premier, arriere=True)
+                )
+        # Jeton de suivi : la ligne la plus récente de la première page
+        self.since = self.encoder(self._position(self.page[0])) if self.page and position is None else None
+        return self.page
+
+    def get_paginated_response(self, data):
+        if self.page_number is not None:
+            return self.page_number.get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'count_is_estimate': self.estime,
+            'next': self.next,
+            'previous': self.previous,
+            'since': self.since,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer'},
+                'count_is_estimate': {'type': 'boolean'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'since': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,268 @@
+# apps/core/replicas.py
+"""
+Lecture sur réplique des vues de consultation et de reporting.
+
+Les vues lourdes en lecture (statistiques, tableaux de bord, exports,
+journaux d'audit) le déclarent comme un budget de requêtes :
+
+    class NotaireStatsAPIView(APIView):
+        lecture_replica = True
+
+    @action(detail=False, methods=['get'])
+    @lecture_replica
+    def export(self, request): ...
+
+Pendant une requête GET, HEAD ou OPTIONS servie par une vue déclarée (y
+compris la diffusion d'une réponse en flux), `RouteurReplica`
+(DATABASE_ROUTERS) envoie les lectures sur la base REPLICAS['ALIAS'] ; les
+écritures vont toujours sur `default`. Le primaire reste utilisé :
+
+    - dans une transaction ouverte sur `default`, et pour le reste de la
+      requête dès qu'elle a écrit ;
+    - pendant REPLICAS['COLLANT'] secondes après une requête qui a écrit,
+      pour le même utilisateur (à défaut la même adresse IP) : il relit
+      ses propres écritures même si la réplique ne les a pas reçues ;
+    - quand la réplique est injoignable ou que son retard de réplication
+      dépasse REPLICAS['RETARD_MAX'] secondes. L'état est vérifié au plus
+      toutes les REPLICAS['VERIFICATION'] secondes par processus ;
+    - toujours pour les modèles des applications REPLICAS['APPS_PRIMAIRE']
+      (utilisateurs et rôles, sessions, cache en base) : un jeton révoqué
+      ou un compte désactivé l'est aussitôt, même pendant le retard de
+      réplication.
+
+`lecture()` applique la même règle hors requête HTTP (commandes, tâches).
+Sans base REPLICAS['ALIAS'] dans DATABASES, tout reste sur `default`.
+
+Essai local avec deux bases SQLite : DB_REPLICA_SQLITE=<copie de
+db.sqlite3> ; en PostgreSQL, DB_REPLICA_HOST désigne le serveur réplique.
+Le retard d'un serveur en attente (pg_last_xact_replay_timestamp) croît
+aussi quand le primaire n'écrit rien : RETARD_MAX doit en tenir compte.
+"""
+import contextlib
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.functional import LazyObject, empty
+from prometheus_client import Gauge
+
+from .budget import attribut_de_vue
+
+logger = logging.getLogger(__name__)
+
+ATTRIBUT = 'lecture_replica'
+METHODES_LECTURE = ('GET', 'HEAD', 'OPTIONS')
+PREFIXE_COLLANT = 'replicas:collant:'
+# Authentification (utilisateurs, rôles de core, version de jeton), sessions
+# et cache en base : toujours lus sur le primaire
+APPS_PRIMAIRE = ('auth', 'utilisateurs', 'core', 'sessions', 'contenttypes', 'admin', 'django_cache')
+
+DISPONIBLE = Gauge(
+    'db_replica_disponible', 'Réplique utilisable pour les lectures (1) ou écartée (0)', ['alias'],
+    multiprocess_mode='min',
+)
+RETARD = Gauge(
+    'db_replica_retard_secondes', 'Retard de réplication mesuré', ['alias'], multiprocess_mode='max',
+)
+
+_etat = ContextVar('replicas_etat', default=None)
+_sante = {}
+_verrou = threading.Lock()
+
+
+def _config():
+    config = {
+        'ACTIF': True, 'ALIAS': 'replica', 'COLLANT': 5, 'RETARD_MAX': 10.0, 'VERIFICATION': 15.0,
+        'APPS_PRIMAIRE': APPS_PRIMAIRE,
+    }
+    config.update(getattr(settings, 'REPLICAS', {}))
+    return config
+
+
+def alias():
+    """Alias de la réplique, ou None si elle est absente ou désactivée."""
+    config = _config()
+    if not config['ACTIF'] or config['ALIAS'] not in connections.settings:
+        return None
+    return config['ALIAS']
+
+
+def actif():
+    return alias() is not None
+
+
+def lecture_replica(vue):
+    """Décorateur d'une classe, méthode ou action de vue : lectures sur la réplique."""
+    setattr(vue, ATTRIBUT, True)
+    return vue
+
+
+class Etat:
+    """Routage des lectures d'une requête HTTP (ou d'un bloc `lecture()`)."""
+
+    __slots__ = ('request', 'replica', 'ecrit', 'collant')
+
+    def __init__(self, request=None, replica=False):
+        self.request = request
+        self.replica = replica
+        self.ecrit = False
+        self.collant = None
+
+
+def demarrer(request):
+    etat = Etat(request)
+    return etat, _etat.set(etat)
+
+
+def terminer(jeton):
+    _etat.reset(jeton)
+
+
+def declarer(view_func, methode):
+    """Appelé au moment de résoudre la vue (process_view)."""
+    etat = _etat.get()
+    if etat is not None:
+        etat.replica = methode in METHODES_LECTURE and bool(attribut_de_vue(view_func, methode, ATTRIBUT))
+
+
+@contextlib.contextmanager
+def lecture():
+    """Lectures du bloc sur la réplique, aux mêmes conditions que les vues déclarées."""
+    jeton = _etat.set(Etat(replica=True))
+    try:
+        yield
+    finally:
+        _etat.reset(jeton)
+
+
+def prolonger(contenu, etat):
+    """Itère un contenu diffusé en rétablissant le routage de la requête à chaque morceau."""
+    iterateur = iter(contenu)
+    while True:
+        jeton = _etat.set(etat)
+        try:
+            morceau = next(iterateur)
+        except StopIteration:
+            return
+        finally:
+            _etat.reset(jeton)
+        yield morceau
+
+
+# =====================================================
+# LIRE SES PROPRES ÉCRITURES
+# =====================================================
+
+def _cle(request):
+    utilisateur = getattr(request, 'user', None)
+    if isinstance(utilisateur, LazyObject) and utilisateur._wrapped is empty:
+        # Le résoudre ici interrogerait la base depuis le routeur
+        utilisateur = None
+    if utilisateur is not None and utilisateur.is_authenticated:
+        return f'{PREFIXE_COLLANT}u{utilisateur.pk}'
+    return f"{PREFIXE_COLLANT}ip{request.META.get('REMOTE_ADDR', '')}"
+
+
+def _collant(request):
+    return request is not None and bool(cache.get(_cle(request)))
+
+
+def retenir_ecriture(request, etat):
+    """Fin de requête : après une écriture, relire le primaire pendant COLLANT secondes."""
+    duree = _config()['COLLANT']
+    if etat.ecrit and duree > 0:
+        cache.set(_cle(request), 1, duree)
+
+
+# =====================================================
+# ÉTAT DE LA RÉPLIQUE
+# =====================================================
+
+def retard(replique):
+    """Retard de réplication en secondes (0 hors serveur PostgreSQL en attente)."""
+    connexion = connections[replique]
+    if connexion.vendor != 'postgresql':
+        connexion.ensure_connection()
+        return 0.0
+    with connexion.cursor() as curseur:
+        curseur.execute(
+            "SELECT CASE WHEN pg_is_in_recovery() THEN "
+            "COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) ELSE 0 END"
+        )
+        return float(curseur.fetchone()[0])
+
+
+def _verifier(replique, retard_max):
+    try:
+        valeur = retard(replique)
+    except DatabaseError as exc:
+        logger.warning('Réplique %s injoignable, lectures sur le primaire : %s', replique, exc)
+        DISPONIBLE.labels(replique).set(0)
+        return False
+    RETARD.labels(replique).set(valeur)
+    if valeur > retard_max:
+        logger.warning('Réplique %s en retard de %.1f s, lectures sur le primaire', replique, valeur)
+    DISPONIBLE.labels(replique).set(int(valeur <= retard_max))
+    return valeur <= retard_max
+
+
+def disponible(replique):
+    """Réplique joignable et à jour, vérifié au plus toutes les VERIFICATION secondes."""
+    config = _config()
+    verifie, etat = _sante.get(replique, (None, False))
+    if verifie is not None and time.monotonic() - verifie < config['VERIFICATION']:
+        return etat
+    with _verrou:
+        verifie, etat = _sante.get(replique, (None, False))
+        if verifie is None or time.monotonic() - verifie >= config['VERIFICATION']:
+            etat = _verifier(replique, config['RETARD_MAX'])
+            _sante[replique] = (time.monotonic(), etat)
+    return etat
+
+
+def oublier():
+    """Force une nouvelle vérification de la réplique (tests, bascule)."""
+    _sante.clear()
+
+
+class RouteurReplica:
+    """DATABASE_ROUTERS : lectures des requêtes déclarées sur la réplique."""
+
+    def db_for_read(self, model, **hints):
+        etat = _etat.get()
+        if etat is None or not etat.replica or etat.ecrit:
+            return None
+        if model._meta.app_label in _config()['APPS_PRIMAIRE']:
+            return None
+        replique = alias()
+        if replique is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        if etat.collant is None:
+            # Primaire pendant la lecture du cache, qui peut interroger la base
+            etat.collant = True
+            etat.collant = _collant(etat.request)
+        if etat.collant or not disponible(replique):
+            return None
+        return replique
+
+    def db_for_write(self, model, **hints):
+        etat = _etat.get()
+        if etat is not None:
+            etat.ecrit = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {DEFAULT_DB_ALIAS, _config()['ALIAS']}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplique reçoit son schéma du primaire
+        if db == _config()['ALIAS']:
+            return False
+        return None
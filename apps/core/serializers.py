@@ -1,5 +1,6 @@
 # apps/core/serializers.py
 from rest_framework import serializers
+from .images import ImageDerivesField
 from .models import CoreConfiguration, CorePage
 
 
@@ -15,14 +16,15 @@ class CoreConfigurationSerializer(serializers.ModelSerializer):
 class CorePageSerializer(serializers.ModelSerializer):
     """Serializer pour les pages CMS"""
     image_url = serializers.SerializerMethodField()
-    url = serializers.CharField(source='url', read_only=True)
+    image_variantes = ImageDerivesField(source='image_principale')
+    url = serializers.CharField(read_only=True)
     
     class Meta:
         model = CorePage
         fields = [
             'id', 'titre', 'slug', 'contenu', 'resume',
             'template', 'meta_title', 'meta_description',
-            'image_principale', 'image_url', 'url',
+            'image_principale', 'image_url', 'image_variantes', 'url',
             'ordre', 'publie', 'date_publication',
             'auteur', 'created_at', 'updated_at'
         ]
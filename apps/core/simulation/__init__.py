@@ -0,0 +1 @@
+# Outils de simulation locale : passerelles externes et tests de charge
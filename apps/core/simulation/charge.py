@@ -0,0 +1,167 @@
+# apps/core/simulation/charge.py
+"""
+Pilote de test de charge (asyncio, boucle ouverte à débit cible).
+
+Chaque scénario rejoue le parcours complet d'un usager :
+
+    1. POST demandes/demandes/                  création (anonyme)
+    2. POST paiements/initier-paiement/         avec Idempotency-Key
+    3. (webhook signé envoyé par le simulateur de passerelles)
+    4. GET  demandes/demandes/suivi/            jusqu'à en_attente_traitement
+    5. POST demandes/demandes/<id>/completer/   traitement (si jeton admin)
+
+Les requêtes HTTP (requests, bloquant) tournent dans un pool de threads ;
+asyncio ne sert qu'à lancer les scénarios au débit voulu. Le rapport donne,
+par endpoint, le débit, les latences p50/p95/p99 et le nombre moyen de
+requêtes SQL (en-tête X-Query-Count, voir QueryCountHeaderMiddleware).
+"""
+import asyncio
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(valeurs, p):
+    if not valeurs:
+        return 0.0
+    valeurs = sorted(valeurs)
+    rang = max(0, math.ceil(p / 100 * len(valeurs)) - 1)
+    return valeurs[rang]
+
+
+class Mesures:
+    """Latences, codes et nombre de requêtes SQL par endpoint."""
+
+    def __init__(self):
+        self.latences = defaultdict(list)
+        self.requetes_sql = defaultdict(list)
+        self.codes = defaultdict(lambda: defaultdict(int))
+        self.scenarios = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def enregistrer(self, endpoint, duree, code, requetes_sql):
+        with self.lock:
+            self.latences[endpoint].append(duree)
+            self.codes[endpoint][code] += 1
+            if requetes_sql is not None:
+                self.requetes_sql[endpoint].append(requetes_sql)
+
+    def rapport(self, duree_totale):
+        endpoints = {}
+        for endpoint, latences in self.latences.items():
+            sql = self.requetes_sql.get(endpoint) or []
+            endpoints[endpoint] = {
+                'requetes': len(latences),
+                'debit': round(len(latences) / duree_totale, 2) if duree_totale else 0,
+                'p50_ms': round(percentile(latences, 50) * 1000, 1),
+                'p95_ms': round(percentile(latences, 95) * 1000, 1),
+                'p99_ms': round(percentile(latences, 99) * 1000, 1),
+                'sql_moyen': round(sum(sql) / len(sql), 1) if sql else None,
+                'sql_max': max(sql) if sql else None,
+                'codes': dict(self.codes[endpoint]),
+            }
+        return {
+            'duree': round(duree_totale, 2),
+            'scenarios': dict(self.scenarios),
+            'endpoints': endpoints,
+        }
+
+
+class PiloteCharge:
+    def __init__(self, base_url, document_id, rps, duree, concurrence=64,
+                 jeton_admin=None, delai_paiement=30, intervalle_suivi=0.5):
+        self.base_url = base_url.rstrip('/')
+        self.document_id = document_id
+        self.rps = rps
+        self.duree = duree
+        self.jeton_admin = jeton_admin
+        self.delai_paiement = delai_paiement
+        self.intervalle_suivi = intervalle_suivi
+        self.mesures = Mesures()
+        self.executor = ThreadPoolExecutor(max_workers=concurrence, thread_name_prefix='charge')
+        self.session = requests.Session()
+        adaptateur = requests.adapters.HTTPAdapter(pool_connections=concurrence, pool_maxsize=concurrence)
+        self.session.mount('http://', adaptateur)
+        self.session.mount('https://', adaptateur)
+
+    def _requete(self, endpoint, methode, chemin, **kwargs):
+        debut = time.perf_counter()
+        try:
+            reponse = self.session.request(methode, f'{self.base_url}{chemin}', timeout=60, **kwargs)
+        except requests.RequestException:
+            self.mesures.enregistrer(endpoint, time.perf_counter() - debut, 'erreur_reseau', None)
+            return None
+        sql = reponse.headers.get('X-Query-Count')
+        self.mesures.enregistrer(
+            endpoint, time.perf_counter() - debut, reponse.status_code, int(sql) if sql else None
+        )
+        return reponse
+
+    async def _appel(self, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: self._requete(*args, **kwargs))
+
+    async def scenario(self):
+        reponse = await self._appel('POST demandes', 'POST', '/api/demandes/demandes/', json={
+            'document': self.document_id,
+            'email_reception': f'charge-{uuid.uuid4().hex[:10]}@example.com',
+            'donnees_formulaire': {'source': 'test_charge'},
+        })
+        if reponse is None or reponse.status_code != 201:
+            self.mesures.scenarios['echec_creation'] += 1
+            return
+        demande = reponse.json()
+
+        reponse = await self._appel(
+            'POST initier-paiement', 'POST', '/api/paiements/initier-paiement/',
+            json={'demande_id': demande['id']},
+            headers={'Idempotency-Key': uuid.uuid4().hex},
+        )
+        if reponse is None or reponse.status_code != 200:
+            self.mesures.scenarios['echec_initiation'] += 1
+            return
+
+        limite = time.monotonic() + self.delai_paiement
+        statut = None
+        while time.monotonic() < limite:
+            await asyncio.sleep(self.intervalle_suivi)
+            reponse = await self._appel(
+                'GET suivi', 'GET', '/api/demandes/demandes/suivi/', params={'reference': demande['reference']}
+            )
+            statut = reponse.json().get('statut') if reponse is not None and reponse.ok else None
+            if statut == 'en_attente_traitement':
+                break
+        if statut != 'en_attente_traitement':
+            self.mesures.scenarios['paiement_non_confirme'] += 1
+            return
+
+        if self.jeton_admin:
+            reponse = await self._appel(
+                'POST completer', 'POST', f"/api/demandes/demandes/{demande['id']}/completer/",
+                headers={'Authorization': f'Bearer {self.jeton_admin}'},
+                files={'document_genere': ('document.pdf', b'%PDF-1.4 test de charge', 'application/pdf')},
+            )
+            if reponse is None or reponse.status_code not in (200, 202):
+                self.mesures.scenarios['echec_traitement'] += 1
+                return
+
+        self.mesures.scenarios['reussis'] += 1
+
+    async def executer(self):
+        """Lance rps scénarios par seconde pendant `duree` secondes (boucle ouverte)."""
+        debut = time.monotonic()
+        taches = []
+        for i in range(int(self.rps * self.duree)):
+            attente = debut + i / self.rps - time.monotonic()
+            if attente > 0:
+                await asyncio.sleep(attente)
+            taches.append(asyncio.create_task(self.scenario()))
+        await asyncio.gather(*taches)
+        duree_totale = time.monotonic() - debut
+        self.executor.shutdown()
+        return self.mesures.rapport(duree_totale)
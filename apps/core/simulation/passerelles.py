@@ -0,0 +1,198 @@
+# apps/core/simulation/passerelles.py
+"""
+Simulateur local des API Yengapay et Aqilas (SMS), pour les tests de
+charge hors ligne.
+
+Routes imitées (mêmes chemins que les services de l'application) :
+
+    POST /api/v1/groups/<org>/payment-intent/<projet>            initiation
+    GET  /api/v1/groups/<org>/payment-intent/project/<projet>/intent/<id>
+    POST /api/v1/sms                                             Aqilas
+    GET  /__stats                                                compteurs
+
+Après une initiation, un webhook signé (HMAC SHA256 du JSON compact, en-tête
+`x-webhook-hash`) est envoyé à `webhook_url`, éventuellement en double.
+Latence, taux d'erreur, taux de paiements refusés et taux de doublons sont
+configurables.
+
+Pour viser le simulateur :  YENGAPAY_API_URL=http://127.0.0.1:8090/api/v1
+                            AQILAS_API_URL=http://127.0.0.1:8090/api/v1
+"""
+import hashlib
+import hmac
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+ROUTE_INITIATION = re.compile(r'^/api/v1/groups/[^/]+/payment-intent/(?P<projet>[^/]+)/?$')
+ROUTE_VERIFICATION = re.compile(r'^/api/v1/groups/[^/]+/payment-intent/project/[^/]+/intent/(?P<id>[^/]+)/?$')
+ROUTE_SMS = re.compile(r'^/api/v1/sms/?$')
+
+
+CONFIG_DEFAUT = {
+    'latence_ms': 50,
+    'gigue_ms': 20,
+    'taux_erreur': 0.0,       # réponses 503 sur les appels API
+    'taux_refus': 0.0,        # paiements terminés en FAILED
+    'taux_doublons': 0.0,     # webhooks livrés deux fois
+    'delai_webhook': 0.5,     # secondes entre initiation et webhook
+    'webhook_url': '',
+    'webhook_secret': '',
+}
+
+
+def signer(payload, secret):
+    """Signature attendue par YengapayService.verify_webhook_signature."""
+    corps = json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+    signature = hmac.new(secret.encode('utf-8'), corps.encode('utf-8'), hashlib.sha256).hexdigest()
+    return corps, signature
+
+
+class EtatSimulateur:
+    """Intents de paiement et compteurs, partagés entre les threads du serveur."""
+
+    def __init__(self, config):
+        self.config = {**CONFIG_DEFAUT, **config}
+        self.intents = {}
+        self.compteurs = Counter()
+        self.lock = threading.Lock()
+
+    def compter(self, cle, n=1):
+        with self.lock:
+            self.compteurs[cle] += n
+
+    def creer_intent(self, donnees):
+        intent_id = uuid.uuid4().hex
+        statut_final = 'FAILED' if random.random() < self.config['taux_refus'] else 'DONE'
+        with self.lock:
+            self.intents[intent_id] = {
+                'id': intent_id,
+                'reference': donnees.get('reference'),
+                'paymentAmount': donnees.get('paymentAmount'),
+                'transactionStatus': 'PENDING',
+                'statut_final': statut_final,
+            }
+        return self.intents[intent_id]
+
+    def terminer_intent(self, intent_id):
+        with self.lock:
+            intent = self.intents[intent_id]
+            intent['transactionStatus'] = intent['statut_final']
+            return dict(intent)
+
+    def envoyer_webhook(self, intent_id):
+        intent = self.terminer_intent(intent_id)
+        if not self.config['webhook_url']:
+            return
+        payload = {
+            'id': intent['id'],
+            'reference': intent['reference'],
+            'paymentAmount': intent['paymentAmount'],
+            'paymentStatus': intent['transactionStatus'],
+        }
+        corps, signature = signer(payload, self.config['webhook_secret'])
+        envois = 2 if random.random() < self.config['taux_doublons'] else 1
+        for _ in range(envois):
+            try:
+                requests.post(
+                    self.config['webhook_url'], data=corps.encode('utf-8'), timeout=30,
+                    headers={'Content-Type': 'application/json', 'x-webhook-hash': signature},
+                )
+                self.compter('webhooks_envoyes')
+            except requests.RequestException as e:
+                self.compter('webhooks_en_erreur')
+                logger.warning(f"Webhook {intent['reference']} non délivré: {e}")
+
+
+class GestionnaireSimulateur(BaseHTTPRequestHandler):
+    etat = None  # EtatSimulateur, fixé par creer_serveur()
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _repondre(self, code, donnees):
+        corps = json.dumps(donnees).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def _simuler_reseau(self, route):
+        """Latence puis, selon le taux d'erreur, une 503. Retourne True si en erreur."""
+        config = self.etat.config
+        time.sleep(max(0.0, random.gauss(config['latence_ms'], config['gigue_ms'])) / 1000)
+        self.etat.compter(route)
+        if random.random() < config['taux_erreur']:
+            self.etat.compter(f'{route}_503')
+            self._repondre(503, {'message': 'Service temporairement indisponible (simulé)'})
+            return True
+        return False
+
+    def _lire_json(self):
+        longueur = int(self.headers.get('Content-Length') or 0)
+        try:
+            return json.loads(self.rfile.read(longueur) or b'{}')
+        except ValueError:
+            return {}
+
+    def do_GET(self):
+        if self.path.startswith('/__stats'):
+            with self.etat.lock:
+                return self._repondre(200, dict(self.etat.compteurs))
+
+        correspondance = ROUTE_VERIFICATION.match(self.path)
+        if not correspondance:
+            return self._repondre(404, {'message': 'Route inconnue'})
+        if self._simuler_reseau('verification'):
+            return
+        intent = self.etat.intents.get(correspondance['id'])
+        if intent is None:
+            return self._repondre(404, {'message': 'Intent introuvable'})
+        self._repondre(200, {k: v for k, v in intent.items() if k != 'statut_final'})
+
+    def do_POST(self):
+        donnees = self._lire_json()
+
+        if ROUTE_INITIATION.match(self.path):
+            if self._simuler_reseau('initiation'):
+                return
+            intent = self.etat.creer_intent(donnees)
+            timer = threading.Timer(self.etat.config['delai_webhook'], self.etat.envoyer_webhook, [intent['id']])
+            timer.daemon = True
+            timer.start()
+            hote = self.headers.get('Host', 'localhost')
+            return self._repondre(200, {
+                'id': intent['id'],
+                'reference': intent['reference'],
+                'transactionStatus': 'PENDING',
+                'checkoutPageUrlWithPaymentToken': f"http://{hote}/checkout/{intent['id']}",
+            })
+
+        if ROUTE_SMS.match(self.path):
+            if self._simuler_reseau('sms'):
+                return
+            destinataires = donnees.get('to') or []
+            self.etat.compter('sms_destinataires', len(destinataires))
+            return self._repondre(200, {'success': True, 'bulk_id': uuid.uuid4().hex})
+
+        self._repondre(404, {'message': 'Route inconnue'})
+
+
+def creer_serveur(hote, port, config):
+    """Crée (sans le démarrer) le serveur HTTP du simulateur."""
+    etat = EtatSimulateur(config)
+    gestionnaire = type('Gestionnaire', (GestionnaireSimulateur,), {'etat': etat})
+    serveur = ThreadingHTTPServer((hote, port), gestionnaire)
+    serveur.daemon_threads = True
+    return serveur
@@ -0,0 +1,128 @@
+# apps/core/slugs.py
+"""
+Attribution de slugs uniques (ActualitesActualite, CorePage, ...).
+
+Un slug libre est gardé tel quel, saisi à la main ou non (casse comprise).
+Un slug déjà pris reçoit le suffixe libre suivant : `titre--1`,
+`titre--2`, ... Le dernier suffixe attribué est tenu par slug de base dans
+`CoreSlugCompteur` : une attribution incrémente ce compteur sous verrou de
+ligne, quel que soit le nombre de slugs voisins déjà pris (l'ancienne boucle
+faisait une requête exists() par suffixe essayé, soit un import quadratique
+pour des titres identiques).
+
+Le compteur est initialisé, à la première rencontre d'une base, par un
+parcours de préfixe sur les slugs existants (LIKE 'titre--%', servi sous
+PostgreSQL par l'index varchar_pattern_ops que Django crée pour les
+SlugField uniques). Un slug saisi à la main peut dépasser le compteur :
+la contrainte d'unicité tranche, le compteur est recalé par un nouveau
+parcours et l'enregistrement réessayé (SLUGS['TENTATIVES'] fois).
+"""
+import re
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Length
+from django.utils.text import slugify
+
+from .models import CoreSlugCompteur
+
+# Comme django.core.validators.validate_slug
+SLUG = re.compile(r'^[-a-zA-Z0-9_]+$')
+SEPARATEUR = '--'
+# Place réservée au suffixe dans max_length ('--' + 8 chiffres)
+RESERVE_SUFFIXE = 10
+
+
+def _config():
+    config = {'TENTATIVES': 5}
+    config.update(getattr(settings, 'SLUGS', {}))
+    return config
+
+
+def demande(valeur, max_length):
+    """Slug de `valeur`, gardé tel quel si c'est déjà un slug saisi."""
+    slug = valeur if SLUG.match(valeur or '') else slugify(valeur)
+    return slug[:max_length].strip('-')
+
+
+def base_slug(valeur, max_length):
+    """Slug de `valeur` tronqué pour laisser la place d'un suffixe."""
+    return demande(valeur, max_length)[:max_length - RESERVE_SUFFIXE].strip('-')
+
+
+def avec_suffixe(base, numero):
+    return base if numero == 0 else f'{base}{SEPARATEUR}{numero}'
+
+
+def dernier_suffixe(modele, base, champ='slug'):
+    """
+    Plus grand suffixe pris pour `base` (0 pour la base seule, -1 si rien
+    n'est pris), en une requête sur le préfixe.
+    """
+    prefixe = f'{base}{SEPARATEUR}'
+    # Un slug ne contient que [-a-zA-Z0-9_] : le préfixe s'insère tel quel dans la regex
+    dernier = (
+        modele._default_manager
+        .filter(Q(**{champ: base}) | Q(**{f'{champ}__startswith': prefixe, f'{champ}__regex': rf'^{prefixe}[0-9]+$'}))
+        .annotate(_longueur=Length(champ))
+        # Suffixe le plus long puis le plus grand : le plus grand numériquement
+        .order_by('-_longueur', f'-{champ}')
+        .values_list(champ, flat=True)
+        .first()
+    )
+    if dernier is None:
+        return -1
+    return 0 if dernier == base else int(dernier[len(prefixe):])
+
+
+def allouer(instance, valeur, champ='slug', recaler=False):
+    """
+    Slug dérivé de `valeur` s'il est libre, sinon le prochain suffixe libre
+    pour une instance de ce modèle (le compteur ne sert qu'en cas de collision).
+    """
+    modele = type(instance)
+    max_length = modele._meta.get_field(champ).max_length
+    voulu = demande(valeur, max_length) or modele._meta.model_name
+    if not modele._default_manager.filter(**{champ: voulu}).exists():
+        # Pris entre-temps : la contrainte d'unicité tranche (enregistrer)
+        return voulu
+
+    base = base_slug(voulu, max_length)
+    cle = {'modele': f'{modele._meta.label_lower}.{champ}', 'base': base}
+    with transaction.atomic():
+        compteur = CoreSlugCompteur.objects.select_for_update().filter(**cle).first()
+        if compteur is None:
+            numero = dernier_suffixe(modele, base, champ) + 1
+            try:
+                with transaction.atomic():
+                    CoreSlugCompteur.objects.create(dernier=numero, **cle)
+            except IntegrityError:
+                # Compteur créé entre-temps par un enregistrement concurrent
+                return allouer(instance, valeur, champ, recaler)
+            return avec_suffixe(base, numero)
+
+        numero = compteur.dernier + 1
+        if recaler:
+            numero = max(numero, dernier_suffixe(modele, base, champ) + 1)
+        compteur.dernier = numero
+        compteur.save(update_fields=['dernier'])
+    return avec_suffixe(base, numero)
+
+
+def enregistrer(instance, sauver, valeur, *args, champ='slug', **kwargs):
+    """
+    Attribue un slug libre à une instance nouvelle et l'enregistre avec
+    `sauver` (le `save` parent). Une collision avec un slug posé hors
+    compteur est rattrapée en recalant le compteur.
+    """
+    tentatives = _config()['TENTATIVES']
+    for tentative in range(tentatives):
+        setattr(instance, champ, allouer(instance, valeur, champ, recaler=tentative > 0))
+        try:
+            with transaction.atomic():
+                return sauver(*args, **kwargs)
+        except IntegrityError:
+            pris = type(instance)._default_manager.filter(**{champ: getattr(instance, champ)})
+            if tentative == tentatives - 1 or not pris.exists():
+                raise
@@ -0,0 +1,139 @@
+# apps/core/telechargements.py
+"""
+Liens de téléchargement signés pour les fichiers du stockage.
+
+Un lien porte un jeton signé (clé de stockage, nom, type, échéance) : aucun
+état n'est stocké côté serveur, et renvoyer un lien ne coûte rien. Un lien
+vit TELECHARGEMENTS['DUREE'] secondes au plus, moins si l'appelant le
+demande (`duree`) : transmis par email ou copié, il ne doit pas rester
+utilisable longtemps. Un lien `staff` (pièces internes) n'est servi qu'à un
+administrateur authentifié, même porteur du lien. À l'ouverture
+(`TelechargementView`) :
+
+    - stockage S3 : redirection vers une URL pré-signée de courte durée ;
+      le fichier ne transite pas par les workers ;
+    - stockage local : réponse en flux, avec prise en charge des requêtes
+      partielles (Range / If-Range), ETag et Cache-Control.
+"""
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import content_disposition_header
+
+
+SIGNING_SALT = 'core.telechargements'
+PLAGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+TAILLE_BLOC = 64 * 1024
+
+
+def _config():
+    config = {'DUREE': 24 * 3600, 'DUREE_REDIRECTION': 300, 'CACHE_MAX_AGE': 3600}
+    config.update(getattr(settings, 'TELECHARGEMENTS', {}))
+    return config
+
+
+def duree_lien(duree=None):
+    """Validité effective d'un lien, bornée par TELECHARGEMENTS['DUREE']."""
+    maximum = _config()['DUREE']
+    return min(duree, maximum) if duree else maximum
+
+
+def creer_lien(cle, nom, content_type='application/octet-stream', request=None, duree=None, staff=False):
+    """URL absolue de téléchargement signée, valable `duree` secondes (TELECHARGEMENTS['DUREE'] au plus)."""
+    donnees = {'cle': cle, 'nom': nom, 'type': content_type, 'exp': int(time.time()) + duree_lien(duree)}
+    if staff:
+        donnees['staff'] = True
+    jeton = signing.dumps(donnees, salt=SIGNING_SALT, compress=True)
+    chemin = reverse('core-telechargement', kwargs={'jeton': jeton})
+    if request is not None:
+        return request.build_absolute_uri(chemin)
+    return settings.BASE_URL.rstrip('/') + chemin
+
+
+def lire_jeton(jeton):
+    """Décode un jeton ; lève signing.SignatureExpired / signing.BadSignature."""
+    donnees = signing.loads(jeton, salt=SIGNING_SALT, max_age=_config()['DUREE'])
+    if time.time() > donnees.get('exp', float('inf')):
+        raise signing.SignatureExpired('Lien expiré')
+    return donnees
+
+
+def url_redirection(cle, nom):
+    """URL S3 pré-signée de courte durée, qui force le nom du fichier téléchargé."""
+    return default_storage.url(
+        cle,
+        parameters={'ResponseContentDisposition': content_disposition_header(True, nom)},
+        expire=_config()['DUREE_REDIRECTION'],
+    )
+
+
+def _plage(entete, taille):
+    """(debut, fin) inclusifs, None sans plage exploitable, False si non satisfiable."""
+    correspondance = PLAGE.match(entete or '')
+    if not correspondance or not any(correspondance.groups()):
+        return None
+    debut, fin = correspondance.groups()
+    if not debut:
+        # bytes=-N : les N derniers octets
+        debut, fin = max(0, taille - int(fin)), taille - 1
+    else:
+        debut, fin = int(debut), min(int(fin), taille - 1) if fin else taille - 1
+    if debut >= taille or debut > fin:
+        return False
+    return debut, fin
+
+
+def _lire(fichier, debut, longueur):
+    try:
+        fichier.seek(debut)
+        while longueur > 0:
+            bloc = fichier.read(min(TAILLE_BLOC, longueur))
+            if not bloc:
+                break
+            longueur -= len(bloc)
+            yield bloc
+    finally:
+        fichier.close()
+
+
+def reponse_fichier(request, cle, nom, content_type):
+    """Réponse de téléchargement en flux, partielle si le client le demande."""
+    taille = default_storage.size(cle)
+    etag = '"{}"'.format(hashlib.sha256(f'{cle}:{taille}'.encode()).hexdigest()[:32])
+    entetes = {
+        'ETag': etag,
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': f"private, max-age={_config()['CACHE_MAX_AGE']}",
+    }
+
+    if etag in request.headers.get('If-None-Match', ''):
+        return HttpResponse(status=304, headers=entetes)
+
+    plage = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range == etag:
+        plage = _plage(request.headers.get('Range'), taille)
+
+    if plage is False:
+        return HttpResponse(status=416, headers={**entetes, 'Content-Range': f'bytes */{taille}'})
+
+    fichier = default_storage.open(cle, 'rb')
+    if plage is None:
+        reponse = FileResponse(fichier, as_attachment=True, filename=nom, content_type=content_type)
+    else:
+        debut, fin = plage
+        reponse = StreamingHttpResponse(
+            _lire(fichier, debut, fin - debut + 1), status=206, content_type=content_type
+        )
+        reponse['Content-Length'] = str(fin - debut + 1)
+        reponse['Content-Range'] = f'bytes {debut}-{fin}/{taille}'
+        reponse['Content-Disposition'] = content_disposition_header(True, nom)
+    for nom_entete, valeur in entetes.items():
+        reponse[nom_entete] = valeur
+    return reponse
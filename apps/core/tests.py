@@ -0,0 +1,231 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.partenaires.models import PartenairesPartenaire
+from apps.partenaires.serializers import PartenaireSerializer
+from .images import CACHE_KEY, ImageDerivesField, generer_derives
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': True, 'TIMEOUT': 300, 'MODELS': []})
+class PublicResponseCacheTestCase(APITestCase):
+    """Tests du cache de réponses publiques versionné"""
+
+    def setUp(self):
+        cache.clear()
+        PartenairesPartenaire.objects.create(nom='Partenaire 1', type_partenaire='sponsor', ordre=1)
+        self.url = reverse('partenaire-list')
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_hit_serves_same_content(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.json(), second.json())
+
+    def test_save_invalidates_cached_responses(self):
+        etag = self.client.get(self.url)['ETag']
+        PartenairesPartenaire.objects.create(nom='Partenaire 2', type_partenaire='sponsor', ordre=2)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url, {'page': 1})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        response = self.client.get(self.url, {'page': 1})
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+
+@override_settings(IMAGE_DERIVATIVES={'LARGEURS': [40, 100, 800], 'FORMATS': ['webp'], 'ASYNC': False})
+class ImageDerivesTestCase(TestCase):
+    """Tests de la génération des dérivés d'images"""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        from PIL import Image
+        tampon = BytesIO()
+        Image.new('RGB', (200, 100), 'red').save(tampon, format='PNG')
+        self.nom = default_storage.save('notaires/photos/dupont.png', ContentFile(tampon.getvalue()))
+
+    def test_generer_derives(self):
+        derives = generer_derives(self.nom)
+        # Pas d'agrandissement au-delà de la largeur d'origine (200px)
+        self.assertEqual([largeur for largeur, _, _ in derives], [40, 100])
+        self.assertEqual(derives[0][2], 'notaires/photos/_derives/dupont-40w.webp')
+
+        from PIL import Image
+        with default_storage.open(derives[0][2], 'rb') as fichier:
+            image = Image.open(fichier)
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (40, 20))
+
+    def test_champ_srcset_genere_paresseusement(self):
+        partenaire = PartenairesPartenaire(nom='P', type_partenaire='sponsor', logo=self.nom)
+        champ = ImageDerivesField(source='logo')
+        champ.bind('logo_variantes', None)
+
+        # Premier appel : génération planifiée (synchrone ici), l'original est servi
+        representation = champ.to_representation(partenaire.logo)
+        self.assertTrue(representation['original'].endswith('dupont.png'))
+
+        representation = champ.to_representation(partenaire.logo)
+        self.assertIn('dupont-40w.webp 40w', representation['srcset']['webp'])
+        self.assertTrue(representation['miniature'].endswith('dupont-40w.webp'))
+
+    def test_regeneration_seulement_si_image_changee(self):
+        with mock.patch('apps.core.images.planifier_derives') as planifier:
+            with self.captureOnCommitCallbacks(execute=True):
+                partenaire = PartenairesPartenaire.objects.create(nom='P', type_partenaire='sponsor', logo=self.nom)
+            planifier.assert_called_once_with(self.nom)
+
+            # Image inchangée, ou champ image différé : rien à régénérer
+            with self.captureOnCommitCallbacks(execute=True):
+                partenaire = PartenairesPartenaire.objects.get(pk=partenaire.pk)
+                partenaire.nom = 'Q'
+                partenaire.save()
+                PartenairesPartenaire.objects.only('nom').get(pk=partenaire.pk).save(update_fields=['nom'])
+            planifier.assert_called_once()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                partenaire.logo = 'partenaires/logos/autre.png'
+                partenaire.save()
+            planifier.assert_called_with('partenaires/logos/autre.png')
+
+    def test_derives_supprimes_au_remplacement_et_a_la_suppression(self):
+        autre = default_storage.save('partenaires/logos/autre.png', default_storage.open(self.nom))
+        partenaire = PartenairesPartenaire.objects.create(nom='P', type_partenaire='sponsor', logo=self.nom)
+        generer_derives(self.nom)
+        generer_derives(autre)
+        partage = PartenairesPartenaire.objects.create(nom='Q', type_partenaire='sponsor', logo=autre)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            partenaire.logo = autre
+            partenaire.save()
+        self.assertFalse(default_storage.exists('notaires/photos/_derives/dupont-40w.webp'))
+        self.assertIsNone(cache.get(CACHE_KEY.format(self.nom)))
+
+        # Image encore utilisée par une autre ligne : dérivés conservés
+        with self.captureOnCommitCallbacks(execute=True):
+            partenaire.delete()
+        self.assertTrue(default_storage.exists('partenaires/logos/_derives/autre-40w.webp'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            partage.delete()
+        self.assertFalse(default_storage.exists('partenaires/logos/_derives/autre-40w.webp'))
+        self.assertIsNone(cache.get(CACHE_KEY.format(autre)))
+
+    def test_liste_lue_en_un_get_many(self):
+        for i in range(3):
+            PartenairesPartenaire.objects.create(nom=f'P{i}', type_partenaire='sponsor', logo=self.nom)
+        PartenairesPartenaire.objects.create(nom='Sans logo', type_partenaire='sponsor')
+        generer_derives(self.nom)
+
+        with mock.patch('apps.core.images.derives_disponibles') as unitaires, \
+                mock.patch.object(cache, 'get_many', wraps=cache.get_many) as lots:
+            donnees = PartenaireSerializer(PartenairesPartenaire.objects.all(), many=True).data
+        lots.assert_called_once()
+        unitaires.assert_not_called()
+        variantes = [ligne['logo_variantes'] for ligne in donnees]
+        self.assertIsNone(variantes[-1])
+        self.assertTrue(all('dupont-40w.webp 40w' in v['srcset']['webp'] for v in variantes[:3]))
+
+
+class SimulateurPasserellesTestCase(TestCase):
+    def setUp(self):
+        import threading
+        from .simulation.passerelles import creer_serveur
+
+        self.recus = []
+        self.serveur = creer_serveur('127.0.0.1', 0, {
+            'latence_ms': 0, 'gigue_ms': 0, 'delai_webhook': 0, 'webhook_secret': 'secret',
+        })
+        # Webhooks capturés au lieu d'être envoyés en HTTP
+        etat = self.serveur.RequestHandlerClass.etat
+        etat.envoyer_webhook = lambda intent_id: self.recus.append(etat.terminer_intent(intent_id))
+        threading.Thread(target=self.serveur.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.serveur.server_address[1]}/api/v1'
+
+    def tearDown(self):
+        self.serveur.shutdown()
+        self.serveur.server_close()
+
+    def test_initiation_verification_et_signature(self):
+        from unittest.mock import MagicMock
+        from apps.paiements.services.yengapay import YengapayService
+        from .simulation.passerelles import signer
+
+        transaction = MagicMock(reference='TX-SIM', montant=5000, demande=MagicMock(id=1))
+        with override_settings(YENGAPAY_API_URL=self.url, YENGAPAY_ORGANIZATION_ID='org', YENGAPAY_WEBHOOK_SECRET='secret'):
+            service = YengapayService(transaction)
+            resultat = service.initiate_payment()
+            self.assertTrue(resultat['success'])
+
+            import time
+            for _ in range(50):
+                if self.recus:
+                    break
+                time.sleep(0.01)
+            verification = service.verify_payment(resultat['transaction_id'])
+            self.assertEqual(verification['status'], 'reussi')
+
+            payload = {'reference': 'TX-SIM', 'paymentStatus': 'DONE'}
+            _, signature = signer(payload, 'secret')
+            self.assertTrue(service.verify_webhook_signature(payload, signature))
+
+
+class QueryCountHeaderTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(EXPOSE_QUERY_COUNT=True)
+    def test_entete_nombre_de_requetes(self):
+        response = self.client.get(reverse('partenaire-list'))
+        self.assertIn('X-Query-Count', response)
+        self.assertGreaterEqual(int(response['X-Query-Count']), 1)
+
+    def test_desactive_par_defaut(self):
+        response = self.client.get(reverse('partenaire-list'))
+        self.assertNotIn('X-Query-Count', response)
+
+
+class CachePartageCheckTestCase(TestCase):
+    """core.W001 : seulement pour un cache propre au processus"""
+
+    def test_avertissement(self):
+        from .checks import verifier_cache_partage
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([w.id for w in verifier_cache_partage(None)], ['core.W001'])
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.gettempdir(),
+        }}):
+            self.assertEqual(verifier_cache_partage(None), [])
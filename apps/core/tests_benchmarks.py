@@ -0,0 +1,114 @@
+# tests_benchmarks.py - Tests du banc de mesure (apps/core/benchmarks)
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from .benchmarks import donnees
+from .benchmarks.cas import CAS
+from .benchmarks.executeur import comparer, executer
+from apps.audit.models import SecurityLog
+from apps.notaires.models import NotairesNotaire
+from apps.paiements.models import PaiementsTransaction
+from apps.stats.models import StatsVisite
+from apps.ventes import stock
+from apps.ventes.models import ReferenceSticker
+
+ECHELLE = 0.0004
+
+
+class BenchmarksTestCase(TestCase):
+    """Jeu de données marqué, mesures annulées, rapport JSON et régressions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.peuplement = donnees.peupler(ECHELLE)
+
+    def test_peuplement_idempotent(self):
+        cibles = donnees.volumes(ECHELLE)
+        self.assertEqual(self.peuplement['notaires'], {'existants': 0, 'crees': cibles['notaires']})
+        self.assertEqual(SecurityLog.objects.filter(user_agent=donnees.MARQUE).count(), cibles['journaux'])
+        self.assertEqual(PaiementsTransaction.objects.count(), cibles['transactions'])
+
+        second = donnees.peupler(ECHELLE)
+        self.assertTrue(all(etat['crees'] == 0 for etat in second.values()))
+
+        sticker = ReferenceSticker.objects.get(nom=f'Sticker {donnees.MARQUE}')
+        vendus = 10 * cibles['ventes']
+        self.assertEqual(stock.disponible(sticker.pk), sticker.total_stock - vendus)
+        self.assertEqual(stock.reconcilier()['ecarts'], [])
+
+        donnees.nettoyer()
+        self.assertFalse(NotairesNotaire.objects.filter(matricule__startswith=donnees.MARQUE).exists())
+        self.assertFalse(PaiementsTransaction.objects.exists())
+        # Stock des ventes de mesure rendu une seule fois
+        self.assertEqual(stock.disponible(sticker.pk), sticker.total_stock)
+        self.assertEqual(stock.reconcilier()['ecarts'], [])
+
+    def test_tous_les_cas_mesures_et_annules(self):
+        visites = StatsVisite.objects.order_by('date').values_list('date', 'visites')
+        avant = list(visites)
+        en_attente = PaiementsTransaction.objects.filter(statut='en_attente').count()
+
+        rapport = executer(iterations=3, echauffement=1)
+
+        self.assertEqual(set(rapport['cas']), set(CAS))
+        for nom, mesures in rapport['cas'].items():
+            self.assertNotIn('erreur', mesures, nom)
+            self.assertGreater(mesures['debit'], 0)
+            self.assertLessEqual(mesures['p50_ms'], mesures['max_ms'])
+        self.assertGreater(rapport['cas']['notaires.serializer_liste']['sql_moyen'], 0)
+        self.assertEqual(rapport['volumes']['notaires'], donnees.volumes(ECHELLE)['notaires'])
+
+        self.assertEqual(list(visites), avant)
+        self.assertEqual(PaiementsTransaction.objects.filter(statut='en_attente').count(), en_attente)
+
+    def test_cas_en_echec_note(self):
+        PaiementsTransaction.objects.update(statut='validee')
+        rapport = executer(['paiements.webhook'], iterations=2, echauffement=0)
+        self.assertIn('EchecCas', rapport['cas']['paiements.webhook']['erreur'])
+
+    def test_comparaison(self):
+        reference = {'cas': {
+            'a': {'p50_ms': 10.0, 'p95_ms': 20.0, 'sql_moyen': 3},
+            'b': {'p50_ms': 0.1, 'p95_ms': 0.2, 'sql_moyen': 0},
+            'c': {'p50_ms': 5.0, 'p95_ms': 5.0, 'sql_moyen': 1},
+        }}
+        courant = {'cas': {
+            'a': {'p50_ms': 11.0, 'p95_ms': 30.0, 'sql_moyen': 3},
+            # Sous le plancher : bruit, mais une requête SQL de plus compte
+            'b': {'p50_ms': 0.5, 'p95_ms': 0.9, 'sql_moyen': 1},
+            'c': {'erreur': 'EchecCas: 500 au lieu de 200'},
+            'nouveau': {'p50_ms': 100.0, 'p95_ms': 100.0, 'sql_moyen': 50},
+        }}
+        self.assertEqual(
+            sorted((r['cas'], r['mesure']) for r in comparer(reference, courant, seuil=0.2)),
+            [('a', 'p95_ms'), ('b', 'sql_moyen'), ('c', 'erreur')],
+        )
+        self.assertEqual(comparer(reference, reference), [])
+
+    def test_commande_rapport_et_regression(self):
+        dossier = tempfile.mkdtemp()
+        sortie = os.path.join(dossier, 'courant.json')
+        call_command('benchmarks', '--cas', 'ventes.numero_recu', 'stats.rapport_mensuel',
+                     '--iterations', '2', '--sortie', sortie, stdout=StringIO())
+        with open(sortie) as fichier:
+            rapport = json.load(fichier)
+        self.assertEqual(set(rapport['cas']), {'ventes.numero_recu', 'stats.rapport_mensuel'})
+
+        # Référence impossible à tenir : une requête SQL de moins
+        rapport['cas']['ventes.numero_recu']['sql_moyen'] -= 1
+        reference = os.path.join(dossier, 'reference.json')
+        with open(reference, 'w') as fichier:
+            json.dump(rapport, fichier)
+        with self.assertRaisesMessage(CommandError, '1 régression'):
+            call_command('benchmarks', '--cas', 'ventes.numero_recu', '--iterations', '2',
+                         '--sortie', sortie, '--reference', reference, stdout=StringIO())
+
+    @override_settings(DEBUG=False)
+    def test_peuplement_refuse_hors_debug(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmarks', '--peupler', '--echelle', ECHELLE, stdout=StringIO())
@@ -0,0 +1,139 @@
+# tests_budget.py - Tests du budget de requêtes SQL par vue
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import budget
+from apps.actualites.models import ActualitesActualite
+from apps.documents.models import DocumentsTextelegal
+from apps.documents.views import TexteLegalViewSet
+from apps.organisation.models import OrganisationMembrebureau
+from apps.organisation.views import BureauPublicAPIView, BureauStatsAPIView
+from apps.utilisateurs.models import UtilisateursUser
+
+
+class BudgetRequetesTestCase(TestCase):
+    """Déclaration, empreintes et signalement des dépassements"""
+
+    def test_empreinte(self):
+        a, normalise = budget.empreinte("SELECT * FROM t WHERE id IN (%s, %s, %s) AND nom = 'x' LIMIT 21")
+        b, _ = budget.empreinte("SELECT * FROM t WHERE id IN (%s) AND nom = 'y' LIMIT 3")
+        self.assertEqual(a, b)
+        self.assertEqual(normalise, 'SELECT * FROM t WHERE id IN (...) AND nom = ? LIMIT ?')
+        self.assertNotEqual(a, budget.empreinte('SELECT * FROM t2 WHERE id IN (%s)')[0])
+
+    def test_declaration(self):
+        vue = TexteLegalViewSet.as_view({'get': 'par_type'})
+        self.assertEqual(budget.budget_de_vue(vue, 'GET'), 2)
+        self.assertIsNone(budget.budget_de_vue(TexteLegalViewSet.as_view({'get': 'list'}), 'GET'))
+        self.assertEqual(budget.budget_de_vue(BureauStatsAPIView.as_view(), 'GET'), BureauStatsAPIView.budget_requetes)
+
+    def test_depassement_journalise_avec_empreintes(self):
+        suivi = budget.Suivi()
+        suivi.requetes = ['SELECT 1'] + [f'SELECT * FROM poste WHERE poste = {i}' for i in range(6)]
+        request = mock.Mock(method='GET', path='/x/', resolver_match=None)
+        with self.assertLogs('apps.core.budget', 'WARNING') as journaux:
+            budget.verifier(request, suivi, 3)
+        self.assertIn('7 requêtes SQL pour un budget de 3', journaux.output[0])
+        self.assertIn('6 x [', journaux.output[0])
+        self.assertIn('SELECT * FROM poste WHERE poste = ?', journaux.output[0])
+
+        with override_settings(BUDGET_REQUETES={'STRICT': True}):
+            with self.assertRaises(budget.BudgetRequetesDepasse):
+                budget.verifier(request, suivi, 3)
+            budget.verifier(request, suivi, 7)
+
+    @override_settings(BUDGET_REQUETES={'STRICT': True})
+    def test_depassement_leve_par_le_middleware(self):
+        DocumentsTextelegal.objects.create(type_texte='loi', titre='Loi 1')
+        with mock.patch.object(TexteLegalViewSet.par_type, 'budget_requetes', 0):
+            with self.assertRaises(budget.BudgetRequetesDepasse):
+                APIClient().get(reverse('documents:textelegal-par-type'))
+
+    def test_suivi_reserve_aux_vues_budgetees(self):
+        with mock.patch.object(budget, 'Suivi', wraps=budget.Suivi) as suivi:
+            self.assertEqual(APIClient().get(reverse('documents:textelegal-list')).status_code, 200)
+            suivi.assert_not_called()
+            APIClient().get(reverse('documents:textelegal-par-type'))
+            suivi.assert_called_once()
+
+
+@override_settings(BUDGET_REQUETES={'STRICT': True})
+class VuesGroupeesTestCase(TestCase):
+    """Les vues groupées tiennent un budget constant quel que soit le volume"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = UtilisateursUser.objects.create_user(
+            username='admin', email='admin@notaires.bf', nom='Admin', prenom='Test',
+            password='pass', is_staff=True,
+        )
+        self.client = APIClient()
+
+    def _peupler(self, nombre):
+        auteur = self.admin
+        for i in range(nombre):
+            for poste, _ in OrganisationMembrebureau.POSTE_CHOICES:
+                OrganisationMembrebureau.objects.create(
+                    nom=f'Nom {i}', prenom=poste, poste=poste, ordre=i,
+                    date_entree=date.today() - timedelta(days=365 * (i + 1)),
+                )
+            for type_texte, _ in DocumentsTextelegal.TYPE_CHOICES:
+                DocumentsTextelegal.objects.create(type_texte=type_texte, titre=f'{type_texte} {i}', ordre=i)
+            for categorie, _ in ActualitesActualite.CATEGORIE_CHOICES:
+                ActualitesActualite.objects.create(
+                    titre=f'{categorie} {i}', contenu='-', categorie=categorie, auteur=auteur,
+                    publie=True, date_publication=timezone.now() - timedelta(days=1),
+                )
+
+    def _requetes(self, url, admin=False):
+        cache.clear()
+        self.client.force_authenticate(user=self.admin if admin else None)
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(requetes), response.data
+
+    def test_budget_constant(self):
+        urls = [
+            (reverse('bureau-stats'), True),
+            (reverse('bureau-public'), False),
+            (reverse('membres-par-poste'), False),
+            (reverse('documents:textelegal-par-type'), False),
+            (reverse('actualites:actualite-par-categorie'), False),
+        ]
+        self._peupler(1)
+        peu = [self._requetes(url, admin)[0] for url, admin in urls]
+        self._peupler(4)
+        self.assertEqual([self._requetes(url, admin)[0] for url, admin in urls], peu)
+        # Le budget déclaré par la vue publique est tenu, pas seulement constant
+        self.assertLessEqual(peu[1], BureauPublicAPIView.budget_requetes)
+
+    def test_contenu_des_groupes(self):
+        self._peupler(2)
+        _, stats = self._requetes(reverse('bureau-stats'), admin=True)
+        self.assertEqual(stats['total_membres'], 16)
+        self.assertEqual(stats['repartition_par_poste']['Président'], 2)
+        self.assertEqual(stats['anciennete_moyenne'], 1.5)
+
+        _, bureau = self._requetes(reverse('bureau-public'))
+        self.assertEqual(
+            list(bureau),
+            ['Président', 'Vice-Président', 'Secrétaire', 'Secrétaire Adjoint', 'Trésorier',
+             'Trésorier Adjoint', 'conseillers'],
+        )
+        self.assertEqual([m['ordre'] for m in bureau['conseillers']], [0, 1])
+
+        _, textes = self._requetes(reverse('documents:textelegal-par-type'))
+        self.assertEqual([t['titre'] for t in textes['Loi']], ['loi 0', 'loi 1'])
+
+        _, actualites = self._requetes(reverse('actualites:actualite-par-categorie'))
+        self.assertEqual(len(actualites['Profession']), 2)
+        self.assertEqual(actualites['Profession'][0]['auteur_detail']['id'], self.admin.pk)
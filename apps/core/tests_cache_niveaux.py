@@ -0,0 +1,129 @@
+# tests_cache_niveaux.py - Tests du cache à deux niveaux (apps/core/cache_niveaux.py)
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from . import cache_niveaux
+from .cache_niveaux import CLE_VALEUR, CLE_VERROU, cached, invalider, obtenir
+
+
+def _compte(niveau, resultat):
+    return cache_niveaux.LECTURES.labels(niveau, resultat)._value.get()
+
+
+class CacheNiveauxTestCase(SimpleTestCase):
+    """L1 devant L2, tags, calcul unique et rafraîchissement anticipé"""
+
+    def setUp(self):
+        cache.clear()
+        cache_niveaux.vider_l1()
+        self.appels = []
+
+    def _calcul(self, valeur='v', pause=0):
+        def calculer():
+            self.appels.append(valeur)
+            time.sleep(pause)
+            return valeur
+        return calculer
+
+    def test_l1_puis_l2(self):
+        l1, l2 = _compte('l1', 'succes'), _compte('l2', 'succes')
+        self.assertEqual(obtenir('cle', self._calcul(), 60), 'v')
+        self.assertEqual(obtenir('cle', self._calcul(), 60), 'v')
+        self.assertEqual(_compte('l1', 'succes') - l1, 1)
+
+        # Autre worker : L1 vide, L2 partagé
+        cache_niveaux.vider_l1()
+        self.assertEqual(obtenir('cle', self._calcul(), 60), 'v')
+        self.assertEqual(_compte('l2', 'succes') - l2, 1)
+        self.assertEqual(self.appels, ['v'])
+
+    def test_valeur_none_mise_en_cache(self):
+        obtenir('vide', self._calcul(None), 60)
+        cache_niveaux.vider_l1()
+        self.assertIsNone(obtenir('vide', self._calcul(None), 60))
+        self.assertEqual(self.appels, [None])
+
+    @override_settings(CACHE_NIVEAUX={'L1_TAILLE': 2})
+    def test_lru_borne(self):
+        for cle in ('a', 'b', 'c'):
+            obtenir(cle, self._calcul(cle), 60)
+        self.assertEqual(len(cache_niveaux._l1), 2)
+        self.assertIsNone(cache_niveaux._l1.lire('a'))
+
+    def test_decorateur_et_tags(self):
+        @cached('notaire:{notaire_id}:{format}', ttl=60, tags=['notaire:{notaire_id}'])
+        def fiche(notaire_id, format='court'):
+            self.appels.append((notaire_id, format))
+            return f'{notaire_id}-{format}'
+
+        self.assertEqual(fiche(1), '1-court')
+        self.assertEqual(fiche(notaire_id=1), '1-court')
+        self.assertEqual(fiche(2, format='long'), '2-long')
+        self.assertEqual(self.appels, [(1, 'court'), (2, 'long')])
+
+        invalider('notaire:1')
+        fiche(1)
+        fiche(2, 'long')
+        self.assertEqual(self.appels, [(1, 'court'), (2, 'long'), (1, 'court')])
+
+        # Invalidation faite par un autre worker : vue au L2, une fois le L1 échu
+        cache.incr(cache_niveaux.CLE_TAG.format('notaire:2'))
+        fiche(2, 'long')
+        self.assertEqual(len(self.appels), 3)
+        cache_niveaux.vider_l1()
+        fiche(2, 'long')
+        self.assertEqual(self.appels[-1], (2, 'long'))
+
+    def test_un_seul_calcul_par_processus(self):
+        resultats = []
+        fils = [
+            threading.Thread(target=lambda: resultats.append(obtenir('lent', self._calcul(pause=0.2), 60)))
+            for _ in range(8)
+        ]
+        for fil in fils:
+            fil.start()
+        for fil in fils:
+            fil.join()
+        self.assertEqual(resultats, ['v'] * 8)
+        self.assertEqual(self.appels, ['v'])
+
+    def test_verrou_tenu_par_un_autre_processus(self):
+        # Valeur expirée mais dans la grâce : servie périmée sans calcul
+        obtenir('cle', self._calcul('ancienne'), 60)
+        entree = cache.get(CLE_VALEUR.format('cle'))
+        cache.set(CLE_VALEUR.format('cle'), {**entree, 'e': time.time() - 1}, 60)
+        cache_niveaux.vider_l1()
+        cache.add(CLE_VERROU.format('cle'), 1, 30)
+        self.assertEqual(obtenir('cle', self._calcul('nouvelle'), 60), 'ancienne')
+        self.assertEqual(self.appels, ['ancienne'])
+
+        # Sans valeur : attente de la publication, puis calcul à l'échéance
+        with override_settings(CACHE_NIVEAUX={'ATTENTE': 0.1}):
+            cache.add(CLE_VERROU.format('absente'), 1, 30)
+            self.assertEqual(obtenir('absente', self._calcul('calculee'), 60), 'calculee')
+
+            cache.add(CLE_VERROU.format('publiee'), 1, 30)
+            threading.Timer(0.03, lambda: cache.set(CLE_VALEUR.format('publiee'), {
+                'v': 'publiee', 'e': time.time() + 60, 'd': 0.0, 't': [],
+            }, 60)).start()
+            self.assertEqual(obtenir('publiee', self._calcul('inutile'), 60), 'publiee')
+        self.assertNotIn('inutile', self.appels)
+
+    def test_rafraichissement_anticipe(self):
+        cache.set(CLE_VALEUR.format('chaude'), {'v': 'ancienne', 'e': time.time() + 1, 'd': 10.0, 't': []}, 60)
+        cache.set(CLE_VALEUR.format('rapide'), {'v': 'ancienne', 'e': time.time() + 1, 'd': 0.0, 't': []}, 60)
+        with mock.patch.object(cache_niveaux.random, 'random', return_value=0.5):
+            # Calcul de 10 s, échéance dans 1 s : recalcul avant l'expiration
+            self.assertEqual(obtenir('chaude', self._calcul('nouvelle'), 60), 'nouvelle')
+            self.assertEqual(obtenir('rapide', self._calcul('nouvelle'), 60), 'ancienne')
+        self.assertEqual(self.appels, ['nouvelle'])
+
+    @override_settings(CACHE_NIVEAUX={'ACTIF': False})
+    def test_inactif(self):
+        obtenir('cle', self._calcul(), 60)
+        obtenir('cle', self._calcul(), 60)
+        self.assertEqual(self.appels, ['v', 'v'])
@@ -0,0 +1,70 @@
+# tests_connexions.py - Tests des modes de connexion à la base (apps/core/connexions.py)
+from io import StringIO
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TransactionTestCase
+
+from . import connexions
+
+CONFIG = {
+    'MODE': 'persistantes', 'DUREE_MAX': 600, 'POOL_MIN': 2, 'POOL_MAX': 10, 'POOL_ATTENTE': 10.0,
+    'DELAI_CONNEXION': 5, 'DUREE_REQUETE_MAX_MS': 30000,
+}
+
+
+class ReglagesTestCase(SimpleTestCase):
+    """Clés DATABASES produites par mode"""
+
+    def test_persistantes(self):
+        reglages = connexions.reglages(CONFIG)
+        self.assertEqual(reglages['CONN_MAX_AGE'], 600)
+        self.assertTrue(reglages['CONN_HEALTH_CHECKS'])
+        self.assertEqual(reglages['OPTIONS'], {'connect_timeout': 5, 'options': '-c statement_timeout=30000'})
+
+    def test_pool(self):
+        reglages = connexions.reglages({**CONFIG, 'MODE': 'pool'})
+        # Django refuse un pool avec CONN_MAX_AGE
+        self.assertEqual(reglages['CONN_MAX_AGE'], 0)
+        self.assertEqual(reglages['OPTIONS']['pool'], {'min_size': 2, 'max_size': 10, 'timeout': 10.0})
+
+    def test_requete_et_sqlite(self):
+        reglages = connexions.reglages({**CONFIG, 'MODE': 'requete', 'DUREE_REQUETE_MAX_MS': 0})
+        self.assertEqual(reglages['CONN_MAX_AGE'], 0)
+        self.assertNotIn('options', reglages['OPTIONS'])
+        self.assertEqual(connexions.reglages(CONFIG, 'django.db.backends.sqlite3')['OPTIONS'], {})
+
+    def test_mode_inconnu(self):
+        with self.assertRaises(ImproperlyConfigured):
+            connexions.reglages({**CONFIG, 'MODE': 'illimite'})
+
+    def test_publication_des_statistiques_du_pool(self):
+        pool = mock.Mock()
+        pool.pop_stats.return_value = {
+            'pool_size': 8, 'pool_available': 1, 'pool_max': 10, 'requests_waiting': 3,
+            'requests_queued': 4, 'requests_wait_ms': 1500, 'requests_errors': 1,
+        }
+        attentes = connexions.POOL_ATTENTE_DUREE.labels('test')._value.get()
+        with mock.patch.object(connexions, '_pools', return_value=[('test', pool)]):
+            connexions.publier()
+        self.assertEqual(connexions.POOL_CONNEXIONS.labels('test')._value.get(), 8)
+        self.assertEqual(connexions.POOL_EN_ATTENTE.labels('test')._value.get(), 3)
+        self.assertEqual(connexions.POOL_ATTENTE_DUREE.labels('test')._value.get() - attentes, 1.5)
+
+
+class BenchConnexionsTestCase(TransactionTestCase):
+    """Commande bench_connexions : modes mesurés puis réglages restaurés"""
+
+    def test_comparaison_des_modes(self):
+        avant = dict(connections.settings['default'])
+        sortie = StringIO()
+        call_command('bench_connexions', '--requetes', '6', '--threads', '2', stdout=sortie)
+        lignes = sortie.getvalue().splitlines()
+
+        for mode in ('persistantes', 'requete'):
+            ligne = next(ligne for ligne in lignes if ligne.startswith(mode))
+            self.assertEqual(ligne.split()[-1], '0', ligne)
+        self.assertIn('pool          indisponible : PostgreSQL requis', sortie.getvalue())
+        self.assertEqual(dict(connections.settings['default']), avant)
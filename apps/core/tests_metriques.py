@@ -0,0 +1,97 @@
+# tests_metriques.py - Tests de l'instrumentation des requêtes et de /metrics
+import io
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APITestCase
+
+from . import metriques
+from apps.system.models import SystemMetric
+from apps.utilisateurs.models import UtilisateursUser
+
+VUE = 'partenaire-list'
+
+
+def valeur(nom, **labels):
+    return REGISTRY.get_sample_value(nom, labels) or 0
+
+
+class InstrumentationTestCase(APITestCase):
+    """Mesures par vue et méthode, exposition Prometheus et instantané"""
+
+    def setUp(self):
+        cache.clear()
+        self.labels = {'vue': VUE, 'methode': 'GET'}
+
+    def test_requete_mesuree(self):
+        avant = {
+            nom: valeur(nom, **self.labels)
+            for nom in ('http_requete_duree_secondes_count', 'http_requete_sql_requetes_sum',
+                        'http_reponse_taille_octets_sum')
+        }
+        requetes = valeur('http_requetes_total', statut='200', **self.labels)
+        response = self.client.get(reverse(VUE))
+
+        self.assertEqual(valeur('http_requetes_total', statut='200', **self.labels), requetes + 1)
+        self.assertEqual(valeur('http_requete_duree_secondes_count', **self.labels),
+                         avant['http_requete_duree_secondes_count'] + 1)
+        self.assertGreaterEqual(valeur('http_requete_sql_requetes_sum', **self.labels),
+                                avant['http_requete_sql_requetes_sum'] + 1)
+        self.assertEqual(valeur('http_reponse_taille_octets_sum', **self.labels),
+                         avant['http_reponse_taille_octets_sum'] + len(response.content))
+
+    def test_lectures_du_cache(self):
+        echecs = valeur('http_requete_cache_lectures_total', resultat='echec', **self.labels)
+        succes = valeur('http_requete_cache_lectures_total', resultat='succes', **self.labels)
+        self.client.get(reverse(VUE))
+        self.client.get(reverse(VUE))
+        self.assertGreater(valeur('http_requete_cache_lectures_total', resultat='echec', **self.labels), echecs)
+        self.assertGreater(valeur('http_requete_cache_lectures_total', resultat='succes', **self.labels), succes)
+        # Hors requête, rien n'est compté et la valeur par défaut est respectée
+        self.assertEqual(cache.get('absente', 'defaut'), 'defaut')
+
+    def test_appels_sortants(self):
+        import requests
+
+        reponse = requests.Response()
+        reponse.status_code, reponse._content, reponse.raw = 200, b'{}', io.BytesIO()
+        mesure, jeton = metriques.demarrer()
+        try:
+            with mock.patch('requests.adapters.HTTPAdapter.send', return_value=reponse):
+                requests.get('https://passerelle.example.com/statut')
+        finally:
+            metriques.annuler(jeton)
+        self.assertGreater(mesure.sortant_duree, 0)
+        self.assertGreater(valeur('http_sortant_duree_secondes_count', hote='passerelle.example.com'), 0)
+
+    def test_metrics_protege(self):
+        self.assertIn(self.client.get(reverse('metriques')).status_code, (401, 403))
+
+        admin = UtilisateursUser.objects.create_user(
+            username='admin', email='admin@notaires.bf', nom='Admin', prenom='Test',
+            password='pass', is_staff=True,
+        )
+        self.client.force_authenticate(user=admin)
+        self.client.get(reverse(VUE))
+        response = self.client.get(reverse('metriques'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(f'http_requete_duree_secondes_count{{methode="GET",vue="{VUE}"}}', response.content.decode())
+
+    @override_settings(METRIQUES={'ACTIF': True, 'JETON': 'jeton-collecte'})
+    def test_metrics_jeton_de_collecte(self):
+        response = self.client.get(reverse('metriques'), HTTP_AUTHORIZATION='Bearer jeton-collecte')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('metriques'), HTTP_AUTHORIZATION='Bearer mauvais')
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_instantane(self):
+        self.client.get(reverse(VUE))
+        self.assertGreater(metriques.instantane(), 0)
+        metrique = SystemMetric.objects.get(name='http_requetes', tags__vue=VUE, tags__methode='GET')
+        self.assertEqual(metrique.metric_type, 'request')
+        self.assertGreaterEqual(metrique.value, 1)
+        self.assertTrue(SystemMetric.objects.filter(name='sql_requetes_moyenne', tags__vue=VUE).exists())
@@ -0,0 +1,155 @@
+# tests_replicas.py - Tests du routage des lectures vers la réplique (apps/core/replicas.py)
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import OperationalError, connections, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from . import replicas
+from apps.audit.models import SecurityLog
+from apps.notaires.models import NotairesNotaire
+from apps.utilisateurs.authentication import ClaimsRefreshToken, revoquer_tokens
+from apps.utilisateurs.models import UtilisateursUser
+from notaires_bf.middleware import ReplicaLectureMiddleware
+
+REPLIQUE = 'replica'
+
+
+# Statistiques recalculées à chaque appel : le test compte les lectures
+@override_settings(CACHE_NIVEAUX={'ACTIF': False})
+class ReplicaTestCase(TransactionTestCase):
+    """
+    Un second alias sur la base de test (TEST MIRROR), comme une réplique
+    sans retard : le test observe sur quelle connexion partent les
+    lectures. Il est déclaré après la préparation de la classe et retiré
+    avant son démontage, le lanceur de tests ne connaissant que `default`.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        defaut = connections.settings['default']
+        connections.settings[REPLIQUE] = {**defaut, 'TEST': {**defaut['TEST'], 'MIRROR': 'default'}}
+        cls.databases = {*cls.databases, REPLIQUE}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLIQUE].close()
+        del connections[REPLIQUE]
+        del connections.settings[REPLIQUE]
+        del cls.databases
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        replicas.oublier()
+        self.admin = UtilisateursUser.objects.create_user(
+            username='admin', email='admin@notaires.bf', nom='Admin', prenom='Test',
+            password='pass', is_staff=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def _get(self, url, **params):
+        with CaptureQueriesContext(connections[REPLIQUE]) as replique, \
+                CaptureQueriesContext(connections['default']) as primaire:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            if response.streaming:
+                contenu = b''.join(response.streaming_content)
+            else:
+                contenu = response.content
+        return len(replique), len(primaire), contenu
+
+    def _ecrire(self):
+        """Requête d'écriture de l'administrateur, servie par le middleware."""
+        def vue(request):
+            UtilisateursUser.objects.filter(pk=self.admin.pk).update(prenom='Modifié')
+            return HttpResponse()
+
+        request = RequestFactory().post('/')
+        request.user = self.admin
+        ReplicaLectureMiddleware(vue)(request)
+
+    def test_vue_declaree_lue_sur_la_replique(self):
+        NotairesNotaire.objects.create(matricule='N1', nom='Ouedraogo', prenom='Awa', actif=True)
+        replique, primaire, contenu = self._get(reverse('notaires-stats'))
+        self.assertGreaterEqual(replique, 4)
+        self.assertEqual(primaire, 0)
+        self.assertIn(b'"total_notaires":1', contenu)
+
+        replique, primaire, _ = self._get(reverse('notaire-list'))
+        self.assertEqual(replique, 0)
+        self.assertGreater(primaire, 0)
+
+    def test_export_diffuse_lu_sur_la_replique(self):
+        SecurityLog.objects.create(user=self.admin, action='login', ip_address='10.0.0.1')
+        replique, primaire, contenu = self._get(reverse('security-export'))
+        self.assertGreater(replique, 0)
+        self.assertEqual(primaire, 0)
+        self.assertIn(b'admin@notaires.bf', contenu)
+
+    def test_lire_ses_propres_ecritures(self):
+        self._ecrire()
+        replique, primaire, _ = self._get(reverse('notaires-stats'))
+        self.assertEqual(replique, 0)
+        self.assertGreater(primaire, 0)
+
+        # Fenêtre COLLANT écoulée
+        cache.clear()
+        replique, _, _ = self._get(reverse('notaires-stats'))
+        self.assertGreater(replique, 0)
+
+    def test_repli_sur_le_primaire(self):
+        with mock.patch.object(replicas, 'retard', side_effect=OperationalError('injoignable')), \
+                self.assertLogs('apps.core.replicas', 'WARNING'):
+            replique, primaire, _ = self._get(reverse('notaires-stats'))
+        self.assertEqual(replique, 0)
+        self.assertGreater(primaire, 0)
+
+        # Vérification suivante : réplique trop en retard
+        replicas.oublier()
+        with mock.patch.object(replicas, 'retard', return_value=60.0), \
+                self.assertLogs('apps.core.replicas', 'WARNING') as journaux:
+            replique, _, _ = self._get(reverse('notaires-stats'))
+        self.assertIn('en retard de 60.0 s', journaux.output[0])
+        self.assertEqual(replique, 0)
+        self.assertEqual(replicas.DISPONIBLE.labels(REPLIQUE)._value.get(), 0)
+
+        # Le résultat est gardé VERIFICATION secondes
+        with mock.patch.object(replicas, 'retard', return_value=0.0) as verification:
+            self._get(reverse('notaires-stats'))
+        verification.assert_not_called()
+        replicas.oublier()
+        replique, _, _ = self._get(reverse('notaires-stats'))
+        self.assertGreater(replique, 0)
+
+    def test_authentification_sur_le_primaire(self):
+        # Jeton révoqué sur le primaire, profil à recharger : la réplique
+        # en retard ne doit pas le valider
+        jeton = str(ClaimsRefreshToken.for_user(self.admin).access_token)
+        revoquer_tokens(self.admin)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {jeton}')
+        with CaptureQueriesContext(connections[REPLIQUE]) as replique:
+            response = client.get(reverse('notaires-stats'))
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse([q for q in replique.captured_queries if 'utilisateurs' in q['sql']])
+
+    def test_bloc_lecture_transaction_et_ecriture(self):
+        self.assertEqual(router.db_for_read(NotairesNotaire), 'default')
+        with replicas.lecture():
+            self.assertEqual(router.db_for_read(NotairesNotaire), REPLIQUE)
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(NotairesNotaire), 'default')
+            self.assertEqual(router.db_for_write(NotairesNotaire), 'default')
+            # La suite du bloc relit ce qu'il vient d'écrire
+            self.assertEqual(router.db_for_read(NotairesNotaire), 'default')
+            # Authentification : toujours le primaire (révocation immédiate)
+            self.assertEqual(router.db_for_read(UtilisateursUser), 'default')
+        self.assertFalse(router.allow_migrate(REPLIQUE, 'notaires'))
+        self.assertTrue(router.allow_migrate('default', 'notaires'))
@@ -0,0 +1,111 @@
+# tests_slugs.py - Tests de l'attribution des slugs uniques
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from . import slugs
+from .models import CorePage
+from apps.actualites.models import ActualitesActualite
+from apps.utilisateurs.models import UtilisateursUser
+
+
+class SlugsTestCase(TestCase):
+    """Suffixe libre suivant en une requête, collisions concurrentes rattrapées"""
+
+    def _page(self, titre='Assemblée générale', **champs):
+        return CorePage.objects.create(titre=titre, contenu='-', **champs)
+
+    def test_suffixes_successifs(self):
+        self.assertEqual(
+            [self._page().slug for _ in range(4)],
+            ['assemblee-generale', 'assemblee-generale--1', 'assemblee-generale--2', 'assemblee-generale--3'],
+        )
+
+    def test_requetes_constantes(self):
+        def requetes_attribution():
+            with CaptureQueriesContext(connection) as requetes:
+                slugs.allouer(CorePage(), 'Assemblée générale')
+            return len(requetes.captured_queries)
+
+        # Base prise et compteur créé
+        self._page()
+        self._page()
+        peu = requetes_attribution()
+        for _ in range(20):
+            self._page()
+        self.assertEqual(requetes_attribution(), peu)
+        self.assertEqual(self._page().slug, 'assemblee-generale--24')
+
+    def test_compteur_initialise_sur_l_existant(self):
+        # Slugs posés avant le compteur (données importées)
+        CorePage.objects.bulk_create([
+            CorePage(titre='Assemblée générale', contenu='-', slug=slug)
+            for slug in ['assemblee-generale', 'assemblee-generale--2', 'assemblee-generale--10']
+        ])
+        self.assertEqual(self._page().slug, 'assemblee-generale--11')
+
+    def test_slug_saisi_au_dela_du_compteur(self):
+        self._page()
+        self._page()
+        self._page(slug='assemblee-generale--2')
+        # --2 est pris : le compteur est recalé
+        self.assertEqual(self._page().slug, 'assemblee-generale--3')
+
+    def test_slugs_voisins_ignores(self):
+        self._page(slug='assemblee-generale-2026')
+        self._page(slug='assemblee-generale--annexe')
+        self.assertEqual(self._page().slug, 'assemblee-generale')
+        self.assertEqual(self._page().slug, 'assemblee-generale--1')
+
+    def test_slug_saisi_conserve_si_libre(self):
+        self.assertEqual(self._page(titre='Présentation', slug='a-propos').slug, 'a-propos')
+        page = self._page(titre='Autre', slug='a-propos')
+        self.assertEqual(page.slug, 'a-propos--1')
+        page.titre = 'Autre titre'
+        page.save()
+        page.refresh_from_db()
+        self.assertEqual(page.slug, 'a-propos--1')
+
+        # Redevenu libre : gardé malgré le compteur
+        CorePage.objects.filter(slug__startswith='a-propos').delete()
+        self.assertEqual(self._page(titre='Présentation', slug='a-propos').slug, 'a-propos')
+        self.assertEqual(self._page(titre='Contact', slug='Contact').slug, 'Contact')
+        self.assertEqual(self._page(titre='Contact').slug, 'contact')
+
+    def test_collision_rattrapee(self):
+        self._page()
+        self._page()
+        # Slug posé hors compteur : la première attribution entre en collision
+        CorePage.objects.bulk_create([CorePage(titre='x', contenu='-', slug='assemblee-generale--2')])
+        self.assertEqual(self._page().slug, 'assemblee-generale--3')
+
+    def test_collision_persistante_remontee(self):
+        self._page()
+        with mock.patch.object(slugs, 'allouer', return_value='assemblee-generale'):
+            with self.assertRaises(IntegrityError):
+                self._page()
+
+    def test_actualites(self):
+        auteur = UtilisateursUser.objects.create_user(
+            username='auteur', email='auteur@notaires.bf', nom='A', prenom='B', password='pass',
+        )
+        actualites = [
+            ActualitesActualite.objects.create(titre='Rentrée solennelle', contenu='-', categorie='evenement',
+                                               auteur=auteur)
+            for _ in range(3)
+        ]
+        self.assertEqual(
+            [a.slug for a in actualites],
+            ['rentree-solennelle', 'rentree-solennelle--1', 'rentree-solennelle--2'],
+        )
+
+    def test_benchmark(self):
+        sortie = StringIO()
+        call_command('bench_slugs', nombre=50, sondage=True, stdout=sortie)
+        self.assertIn('allocation 50 page(s)', sortie.getvalue())
+        self.assertIn('sondage', sortie.getvalue())
+        self.assertFalse(CorePage.objects.exists())
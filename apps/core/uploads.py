@@ -0,0 +1,247 @@
+# apps/core/uploads.py
+"""
+Uploads directs vers le stockage (URLs pré-signées).
+
+1. Le client demande des URLs d'upload (`PresignUploadView`) en précisant
+   l'usage, le nom, la taille et le type de chaque fichier.
+2. Il envoie chaque fichier directement au stockage (S3, ou la vue locale
+   `LocalUploadView` qui sert de remplaçant hors ligne).
+3. Il transmet les `upload_id` reçus à l'endpoint métier (finalisation),
+   qui vérifie les objets avec `verifier_uploads` puis crée les lignes en lot.
+
+Les `upload_id` sont des jetons signés : aucun état n'est stocké côté
+serveur entre la demande d'URL et la finalisation. Les deux vues anonymes
+sont limitées en débit (portée `uploads` de DEFAULT_THROTTLE_RATES), et
+`manage.py purger_uploads` supprime les objets envoyés mais jamais
+finalisés : plus vieux que FINALIZE_MAX_AGE et référencés par aucune ligne
+du modèle cible de leur usage.
+"""
+import logging
+import os
+import uuid
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+SIGNING_SALT = 'core.uploads'
+
+# Limites par usage : préfixe de stockage (aligné sur le upload_to du
+# modèle cible), taille max et types MIME autorisés ; `reference` est le
+# champ fichier qui retient un objet finalisé (voir `orphelins`).
+USAGES = {
+    'demande_piece_jointe': {
+        'prefixe': 'demandes/pieces_jointes/%Y/%m/',
+        'reference': ('demandes.DemandesPieceJointe', 'fichier'),
+        'taille_max': 10 * 1024 * 1024,
+        'types': {
+            'application/pdf': ['.pdf'],
+            'image/jpeg': ['.jpg', '.jpeg'],
+            'image/png': ['.png'],
+        },
+    },
+    'evenement_reponse': {
+        'prefixe': 'evenements/reponses/',
+        'reference': ('evenements.InscriptionReponse', 'valeur_fichier'),
+        'taille_max': 10 * 1024 * 1024,
+        'types': {
+            'application/pdf': ['.pdf'],
+            'image/jpeg': ['.jpg', '.jpeg'],
+            'image/png': ['.png'],
+            'application/msword': ['.doc'],
+            'application/vnd.openxmlformats-officedocument.wordprocessingml.document': ['.docx'],
+        },
+    },
+}
+
+
+def _config():
+    config = {'BACKEND': None, 'EXPIRES': 900, 'FINALIZE_MAX_AGE': 24 * 3600}
+    config.update(getattr(settings, 'DIRECT_UPLOADS', {}))
+    return config
+
+
+class LocalUploadBackend:
+    """
+    Remplaçant local de S3 : l'URL pointe vers `LocalUploadView`, qui écrit
+    le corps de la requête dans `default_storage`.
+    """
+
+    def generer_url(self, request, cle, ticket, content_type, taille_max):
+        url = reverse('core-upload-local', kwargs={'ticket': ticket})
+        return {
+            'url': request.build_absolute_uri(url),
+            'method': 'PUT',
+            'fields': {},
+            'headers': {'Content-Type': content_type},
+        }
+
+    def decrire(self, cle):
+        """Retourne (taille, content_type) de l'objet, ou None s'il n'existe pas."""
+        if not default_storage.exists(cle):
+            return None
+        return default_storage.size(cle), None
+
+
+class S3UploadBackend:
+    """URLs de type POST pré-signées, avec conditions de taille et de type côté S3."""
+
+    def __init__(self):
+        self.storage = default_storage
+        self.client = self.storage.connection.meta.client
+
+    def _cle_objet(self, cle):
+        return self.storage._normalize_name(cle)
+
+    def generer_url(self, request, cle, ticket, content_type, taille_max):
+        presigne = self.client.generate_presigned_post(
+            Bucket=self.storage.bucket_name,
+            Key=self._cle_objet(cle),
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, taille_max],
+            ],
+            ExpiresIn=_config()['EXPIRES'],
+        )
+        return {
+            'url': presigne['url'],
+            'method': 'POST',
+            'fields': presigne['fields'],
+            'headers': {},
+        }
+
+    def decrire(self, cle):
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.storage.bucket_name, Key=self._cle_objet(cle))
+        except ClientError:
+            return None
+        return head['ContentLength'], head.get('ContentType')
+
+
+def stockage_s3():
+    """Vrai si le stockage par défaut est S3 (ou forcé via DIRECT_UPLOADS['BACKEND'])."""
+    nom = _config()['BACKEND']
+    if nom is None:
+        backend = getattr(settings, 'STORAGES', {}).get('default', {}).get('BACKEND', '')
+        nom = 's3' if 's3' in backend.lower() else 'local'
+    return nom == 's3'
+
+
+def get_backend():
+    return S3UploadBackend() if stockage_s3() else LocalUploadBackend()
+
+
+def creer_ticket(request, usage, nom, taille, content_type):
+    """Valide la demande et retourne les informations d'upload d'un fichier."""
+    regles = USAGES[usage]
+    extension = os.path.splitext(nom or '')[1].lower()
+
+    if content_type not in regles['types'] or extension not in regles['types'][content_type]:
+        raise serializers.ValidationError(f"{nom} : type de fichier non autorisé")
+    if not taille or taille > regles['taille_max']:
+        raise serializers.ValidationError(
+            f"{nom} : fichier trop volumineux (max {regles['taille_max'] // (1024 * 1024)}MB)"
+        )
+
+    cle = timezone.now().strftime(regles['prefixe']) + f'{uuid.uuid4().hex}{extension}'
+    ticket = signing.dumps({
+        'cle': cle,
+        'usage': usage,
+        'nom': nom,
+        'taille_max': regles['taille_max'],
+        'content_type': content_type,
+    }, salt=SIGNING_SALT)
+
+    config = _config()
+    informations = get_backend().generer_url(request, cle, ticket, content_type, regles['taille_max'])
+    informations.update({
+        'upload_id': ticket,
+        'cle': cle,
+        'expires_in': config['EXPIRES'],
+    })
+    return informations
+
+
+def lire_ticket(ticket, max_age=None):
+    """Décode un ticket signé ; lève ValidationError s'il est invalide ou expiré."""
+    try:
+        return signing.loads(ticket, salt=SIGNING_SALT, max_age=max_age or _config()['FINALIZE_MAX_AGE'])
+    except signing.SignatureExpired:
+        raise serializers.ValidationError("Ticket d'upload expiré")
+    except signing.BadSignature:
+        raise serializers.ValidationError("Ticket d'upload invalide")
+
+
+def verifier_uploads(tickets, usage):
+    """
+    Vérifie que les objets des tickets existent dans le stockage et
+    respectent les limites. Retourne la liste des tickets décodés enrichis
+    de la taille réelle (`taille`).
+    """
+    backend = get_backend()
+    verifies = []
+    for ticket in tickets:
+        donnees = lire_ticket(ticket)
+        if donnees['usage'] != usage:
+            raise serializers.ValidationError("Ticket d'upload non valable pour cet usage")
+
+        description = backend.decrire(donnees['cle'])
+        if description is None:
+            raise serializers.ValidationError(f"{donnees['nom']} : fichier non reçu par le stockage")
+        taille, content_type = description
+        if taille > donnees['taille_max']:
+            raise serializers.ValidationError(f"{donnees['nom']} : fichier trop volumineux")
+        if content_type and content_type != donnees['content_type']:
+            raise serializers.ValidationError(f"{donnees['nom']} : type de fichier inattendu")
+
+        donnees['taille'] = taille
+        verifies.append(donnees)
+    return verifies
+
+
+# =====================================================
+# PURGE DES UPLOADS NON FINALISÉS
+# =====================================================
+
+def _parcourir(dossier):
+    try:
+        dossiers, fichiers = default_storage.listdir(dossier)
+    except FileNotFoundError:
+        return
+    for fichier in fichiers:
+        yield dossier + fichier
+    for sous_dossier in dossiers:
+        yield from _parcourir(f'{dossier}{sous_dossier}/')
+
+
+def orphelins(lot=500):
+    """
+    Clés du stockage sous les préfixes d'upload qu'aucune ligne ne
+    référence, envoyées depuis plus de FINALIZE_MAX_AGE (leur ticket ne
+    peut plus être finalisé).
+    """
+    limite = timezone.now() - timedelta(seconds=_config()['FINALIZE_MAX_AGE'])
+    for regles in USAGES.values():
+        modele, champ = regles['reference']
+        modele = apps.get_model(modele)
+        racine = regles['prefixe'].split('%', 1)[0]
+        cles = _parcourir(racine)
+        while True:
+            paquet = [cle for cle, _ in zip(cles, range(lot))]
+            if not paquet:
+                break
+            references = set(
+                modele.objects.filter(**{f'{champ}__in': paquet}).values_list(champ, flat=True)
+            )
+            for cle in paquet:
+                if cle not in references and default_storage.get_modified_time(cle) < limite:
+                    yield cle
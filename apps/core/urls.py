@@ -1,7 +1,7 @@
 # apps/core/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CoreConfigurationViewSet, CorePageViewSet
+from .views import CoreConfigurationViewSet, CorePageViewSet, PresignUploadView, LocalUploadView, TelechargementView
 
 router = DefaultRouter()
 router.register(r'configurations', CoreConfigurationViewSet, basename='configuration')
@@ -9,5 +9,8 @@ router.register(r'pages', CorePageViewSet, basename='page')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('uploads/presign/', PresignUploadView.as_view(), name='core-upload-presign'),
+    path('uploads/local/<str:ticket>/', LocalUploadView.as_view(), name='core-upload-local'),
+    path('telechargements/<str:jeton>/', TelechargementView.as_view(), name='core-telechargement'),
 ]
 
@@ -1,8 +1,16 @@
 # apps/core/views.py
-from rest_framework import viewsets, permissions, filters
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, HttpResponseRedirect
+from rest_framework import viewsets, permissions, filters, serializers, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from . import metriques, telechargements, uploads
+from .cache import cached_public_response
 from .models import CoreConfiguration, CorePage
 from .serializers import (
     CoreConfigurationSerializer,
@@ -50,6 +58,7 @@ class CorePageViewSet(viewsets.ModelViewSet):
         return [permissions.AllowAny()]
     
     @action(detail=True, methods=['get'], url_path='par-slug')
+    @cached_public_response(CorePage)
     def par_slug(self, request, slug=None):
         """Récupérer une page par son slug"""
         try:
@@ -62,3 +71,126 @@ class CorePageViewSet(viewsets.ModelViewSet):
                 status=404
             )
 
+
+
+class PresignUploadSerializer(serializers.Serializer):
+    """Demande d'URLs d'upload direct"""
+    usage = serializers.ChoiceField(choices=list(uploads.USAGES))
+    fichiers = serializers.ListField(
+        child=serializers.DictField(), min_length=1, max_length=10
+    )
+
+
+class PresignUploadView(APIView):
+    """
+    Délivre des URLs d'upload direct vers le stockage.
+
+    POST /api/core/uploads/presign/
+    {"usage": "demande_piece_jointe",
+     "fichiers": [{"nom": "cnib.pdf", "taille": 123456, "content_type": "application/pdf"}]}
+    """
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'uploads'
+
+    def post(self, request):
+        serializer = PresignUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        usage = serializer.validated_data['usage']
+
+        resultats = []
+        for fichier in serializer.validated_data['fichiers']:
+            try:
+                taille = int(fichier.get('taille') or 0)
+            except (TypeError, ValueError):
+                taille = 0
+            resultats.append(uploads.creer_ticket(
+                request, usage, fichier.get('nom'), taille, fichier.get('content_type')
+            ))
+        return Response({'uploads': resultats}, status=status.HTTP_201_CREATED)
+
+
+class LocalUploadView(APIView):
+    """
+    Réception des fichiers pour le backend d'upload local (développement,
+    tests). Le corps brut de la requête PUT est écrit dans le stockage.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'uploads'
+
+    def put(self, request, ticket):
+        donnees = uploads.lire_ticket(ticket, max_age=uploads._config()['EXPIRES'])
+
+        if request.content_type.split(';')[0].strip() != donnees['content_type']:
+            return Response({'error': 'Content-Type inattendu'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            taille = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            taille = 0
+        if not taille or taille > donnees['taille_max']:
+            return Response({'error': 'Fichier trop volumineux ou vide'}, status=status.HTTP_400_BAD_REQUEST)
+        if default_storage.exists(donnees['cle']):
+            return Response({'error': 'Fichier déjà reçu'}, status=status.HTTP_409_CONFLICT)
+
+        # Écriture en flux depuis la requête, sans tout charger en mémoire
+        default_storage.save(donnees['cle'], File(request._request, name=donnees['nom']))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TelechargementView(APIView):
+    """
+    Téléchargement d'un fichier du stockage via un lien signé
+    (`telechargements.creer_lien`). Sur S3, redirige vers une URL
+    pré-signée ; sinon sert le fichier en flux (Range, ETag). Un lien
+    `staff` exige en plus un administrateur authentifié.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def perform_authentication(self, request):
+        # Authentification à la demande : seuls les liens `staff` la lisent
+        pass
+
+    def get(self, request, jeton):
+        try:
+            donnees = telechargements.lire_jeton(jeton)
+        except signing.SignatureExpired:
+            return Response({'error': 'Lien expiré'}, status=status.HTTP_410_GONE)
+        except signing.BadSignature:
+            return Response({'error': 'Lien invalide'}, status=status.HTTP_404_NOT_FOUND)
+        if donnees.get('staff') and not request.user.is_staff:
+            self.permission_denied(request, message='Lien réservé aux administrateurs')
+
+        if uploads.stockage_s3():
+            return HttpResponseRedirect(telechargements.url_redirection(donnees['cle'], donnees['nom']))
+        if not default_storage.exists(donnees['cle']):
+            return Response({'error': 'Fichier introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        return telechargements.reponse_fichier(request, donnees['cle'], donnees['nom'], donnees['type'])
+
+
+class AccesMetriques(permissions.BasePermission):
+    """Jeton de collecte Prometheus, ou compte administrateur."""
+
+    def has_permission(self, request, view):
+        if metriques.jeton_valide(request):
+            return True
+        return bool(request.user and request.user.is_staff)
+
+
+class MetriquesView(APIView):
+    """
+    Métriques des requêtes au format texte Prometheus, agrégées sur tous
+    les workers (apps/core/metriques.py).
+    """
+    permission_classes = [AccesMetriques]
+
+    def perform_authentication(self, request):
+        # Authentification paresseuse : le jeton de collecte n'est pas un JWT
+        pass
+
+    def get(self, request):
+        if not metriques.actif():
+            raise Http404
+        corps, content_type = metriques.exposition()
+        return HttpResponse(corps, content_type=content_type)
@@ -1,15 +1,26 @@
 from django.contrib import admin
-from django.core.mail import EmailMessage
-from django.conf import settings
-from django.utils import timezone
-from .models import DemandesDemande, DemandesPieceJointe
+from .livraison import planifier_envoi
+from .models import DemandesDemande, DemandesPieceJointe, DemandesTransition
+
+
+class TransitionInline(admin.TabularInline):
+    model = DemandesTransition
+    fields = ('created_at', 'de', 'vers', 'source', 'utilisateur')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(DemandesDemande)
 class DemandeAdmin(admin.ModelAdmin):
-    list_display = ('reference', 'statut', 'created_at')
+    list_display = ('reference', 'statut', 'erreur_envoi_email', 'created_at')
     list_filter = ('statut', 'created_at')
     search_fields = ('reference', 'email_reception')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'erreur_envoi_email', 'date_erreur_envoi_email')
+    inlines = [TransitionInline]
 
     actions = ['envoyer_document_email']
 
@@ -24,31 +35,11 @@ class DemandeAdmin(admin.ModelAdmin):
                 self.message_user(request, f"Demande {demande.reference} : aucun document généré", level='error')
                 continue
 
-            try:
-                # Ouvrir le fichier généré
-                with open(demande.document_genere.path, 'rb') as f:
-                    contenu = f.read()
-                
-                email = EmailMessage(
-                    subject=f"Votre document - Demande {demande.reference}",
-                    body=f"Bonjour,\n\nVotre demande {demande.reference} a été traitée.\n\nCordialement,\nL'Ordre des Notaires",
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    to=[demande.email_reception]
-                )
-                email.attach(demande.document_genere.name, contenu, 'application/pdf')
-                email.send()
-
-                # Mettre à jour la demande
-                demande.statut = 'document_envoye_email'
-                demande.date_envoi_email = timezone.now()
-                demande.save()
-
-                self.message_user(request, f"Document envoyé pour la demande {demande.reference}")
-
-            except Exception as e:
-                self.message_user(request, f"Erreur pour la demande {demande.reference} : {str(e)}", level='error')
-
-    envoyer_document_email.short_description = "Envoyer le document par email"
+            # Lien signé envoyé après le commit, hors de la requête d'administration
+            planifier_envoi(demande.pk)
+            self.message_user(request, f"Envoi du lien de téléchargement planifié pour la demande {demande.reference}")
+
+    envoyer_document_email.short_description = "Envoyer le lien de téléchargement par email"
 
 
 @admin.register(DemandesPieceJointe)
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 class DemandesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.demandes'
+
+    def ready(self):
+        from . import attribution, suivi
+        attribution.connecter_signaux()
+        suivi.connecter_signaux()
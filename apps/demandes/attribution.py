@@ -0,0 +1,299 @@
+# apps/demandes/attribution.py
+"""
+Attribution automatique des demandes aux notaires selon leur charge.
+
+L'index `NotairesCharge` garde pour chaque notaire le nombre de demandes
+actives (statut `en_traitement`), sa capacité, sa région et le délai moyen
+de traitement (moyenne mobile exponentielle attribution -> envoi du
+document). Il est tenu à jour par les signaux de `DemandesDemande`
+(enregistrement et suppression) et de `NotairesNotaire`, et peut être
+reconstruit (`attribuer_demandes --reconstruire`).
+
+Le meilleur notaire est la première ligne de l'index composite
+(disponible, région, demandes_actives, duree_moyenne) : O(log n), sans
+COUNT. La ligne est verrouillée (SELECT ... FOR UPDATE SKIP LOCKED) pendant
+l'attribution, si bien que deux paiements simultanés ne peuvent pas
+dépasser la capacité d'un même notaire.
+"""
+import heapq
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from apps.notaires.models import NotairesCharge, NotairesNotaire
+
+from . import etats
+from .models import DemandesDemande
+
+logger = logging.getLogger(__name__)
+
+STATUT_EN_ATTENTE = etats.EN_ATTENTE_TRAITEMENT
+STATUT_ACTIF = etats.EN_TRAITEMENT
+STATUT_TRAITE = etats.DOCUMENT_ENVOYE
+
+
+class AttributionImpossible(Exception):
+    pass
+
+
+def _config():
+    config = {'CAPACITE': 5, 'LISSAGE': 0.2, 'AUTOMATIQUE': False, 'LOT': 500}
+    config.update(getattr(settings, 'DEMANDES_ATTRIBUTION', {}))
+    return config
+
+
+def region_demande(demande):
+    """Région souhaitée, d'après le formulaire (`region_id` ou `region`)."""
+    donnees = demande.donnees_formulaire if isinstance(demande.donnees_formulaire, dict) else {}
+    valeur = donnees.get('region_id', donnees.get('region'))
+    try:
+        return int(valeur)
+    except (TypeError, ValueError):
+        return None
+
+
+def synchroniser_notaires():
+    """Crée les lignes d'index manquantes (nouveaux notaires)."""
+    capacite = _config()['CAPACITE']
+    manquants = NotairesNotaire.objects.filter(charge__isnull=True).values_list('pk', 'region_id', 'actif')
+    NotairesCharge.objects.bulk_create(
+        [
+            NotairesCharge(notaire_id=pk, region_id=region_id, disponible=actif, capacite=capacite)
+            for pk, region_id, actif in manquants
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def reconstruire_index():
+    """Recalcule l'index depuis les demandes (après des mises à jour en masse)."""
+    synchroniser_notaires()
+    actives = dict(
+        DemandesDemande.objects.filter(statut=STATUT_ACTIF, notaire__isnull=False)
+        .values('notaire').annotate(n=Count('id')).values_list('notaire', 'n')
+    )
+    charges = list(NotairesCharge.objects.select_related('notaire'))
+    for charge in charges:
+        charge.demandes_actives = actives.get(charge.notaire_id, 0)
+        charge.region_id = charge.notaire.region_id
+        charge.disponible = charge.notaire.actif and charge.demandes_actives < charge.capacite
+    NotairesCharge.objects.bulk_update(charges, ['demandes_actives', 'region', 'disponible'])
+    return len(charges)
+
+
+def _candidats(region_id=None):
+    return (
+        NotairesCharge.objects
+        .filter(disponible=True, **({'region_id': region_id} if region_id else {}))
+        .order_by('demandes_actives', 'duree_moyenne', 'notaire_id')
+    )
+
+
+def _verrouiller_meilleur(region_id=None):
+    """Ligne d'index du meilleur notaire disponible, verrouillée ; None si aucun."""
+    for region in ([region_id, None] if region_id else [None]):
+        charge = _candidats(region).select_for_update(skip_locked=True).first()
+        if charge is None and _candidats(region).exists():
+            # Tous les candidats sont en cours d'attribution : on attend le premier
+            charge = _candidats(region).select_for_update().first()
+        if charge is not None:
+            return charge
+    return None
+
+
+def _affecter(demande, notaire_id):
+    demande.notaire_id = notaire_id
+    demande.date_attribution = timezone.now()
+    demande.statut = STATUT_ACTIF
+
+
+def attribuer(demande_id, notaire_id=None, forcer=False, utilisateur=None):
+    """
+    Attribue une demande `en_attente_traitement` : au notaire indiqué, ou au
+    meilleur notaire disponible. Une demande déjà `en_traitement` peut être
+    réattribuée à un notaire indiqué ; la charge passe de l'ancien au nouveau.
+    Retourne la demande ; lève AttributionImpossible si aucun notaire ne
+    peut la prendre.
+    """
+    with transaction.atomic():
+        demande = DemandesDemande.objects.select_for_update().get(pk=demande_id)
+        reattribution = demande.statut == STATUT_ACTIF and notaire_id is not None
+        if demande.statut != STATUT_EN_ATTENTE and not reattribution:
+            raise AttributionImpossible(
+                f"La demande doit être en attente de traitement (statut actuel : {demande.statut})"
+            )
+        if reattribution and str(demande.notaire_id) == str(notaire_id):
+            return demande
+
+        if notaire_id is not None:
+            synchroniser_notaires()
+            charge = NotairesCharge.objects.select_for_update().filter(
+                notaire_id=notaire_id, notaire__actif=True
+            ).first()
+            if charge is None:
+                raise AttributionImpossible('Notaire non trouvé ou inactif')
+            if not forcer and charge.demandes_actives >= charge.capacite:
+                raise AttributionImpossible('Ce notaire a atteint sa capacité de demandes actives')
+        else:
+            charge = _verrouiller_meilleur(region_demande(demande))
+            if charge is None:
+                raise AttributionImpossible('Aucun notaire disponible')
+
+        # L'index est mis à jour par le signal post_save, sous le même verrou
+        etats.appliquer(
+            demande, STATUT_ACTIF, 'attribution', utilisateur,
+            notaire_id=charge.notaire_id, date_attribution=timezone.now(),
+        )
+    logger.info(f"Demande {demande.reference} attribuée au notaire {demande.notaire_id}")
+    return demande
+
+
+def attribuer_en_attente(limite=None):
+    """
+    Attribue en une passe le stock de demandes en attente de traitement.
+
+    Les notaires disponibles sont verrouillés et placés dans des tas (un
+    global, un par région) ; chaque attribution coûte O(log n). Demandes et
+    index sont ensuite écrits en deux bulk_update.
+    Retourne {'attribuees': n, 'restantes': m, 'par_notaire': {...}}.
+    """
+    limite = limite or _config()['LOT']
+    synchroniser_notaires()
+    with transaction.atomic():
+        demandes = list(etats.file_statut(STATUT_EN_ATTENTE).select_for_update(skip_locked=True)[:limite])
+        charges = {
+            charge.notaire_id: charge
+            for charge in NotairesCharge.objects.select_for_update().filter(disponible=True)
+        }
+
+        # Entrées (actives, durée, id, version) ; une entrée dont la version
+        # n'est plus celle de la charge est périmée et ignorée.
+        versions = dict.fromkeys(charges, 0)
+        tas_global, tas_regions = [], {}
+
+        def pousser(charge):
+            entree = (charge.demandes_actives, charge.duree_moyenne, charge.notaire_id, versions[charge.notaire_id])
+            heapq.heappush(tas_global, entree)
+            if charge.region_id:
+                heapq.heappush(tas_regions.setdefault(charge.region_id, []), entree)
+
+        def extraire(tas):
+            while tas:
+                _, _, notaire_id, version = heapq.heappop(tas)
+                if version == versions[notaire_id]:
+                    return charges[notaire_id]
+            return None
+
+        for charge in charges.values():
+            if charge.demandes_actives < charge.capacite:
+                pousser(charge)
+
+        attribuees, modifiees = [], {}
+        for demande in demandes:
+            region_id = region_demande(demande)
+            charge = extraire(tas_regions.get(region_id, [])) if region_id else None
+            charge = charge or extraire(tas_global)
+            if charge is None:
+                break
+            _affecter(demande, charge.notaire_id)
+            charge.demandes_actives += 1
+            charge.disponible = charge.demandes_actives < charge.capacite
+            versions[charge.notaire_id] += 1
+            if charge.disponible:
+                pousser(charge)
+            attribuees.append(demande)
+            modifiees[charge.notaire_id] = charge
+
+        maintenant = timezone.now()
+        for demande in attribuees:
+            demande.updated_at = maintenant
+        DemandesDemande.objects.bulk_update(attribuees, ['notaire', 'date_attribution', 'statut', 'updated_at'])
+        etats.historiser(attribuees, STATUT_EN_ATTENTE, STATUT_ACTIF, 'attribution')
+        NotairesCharge.objects.bulk_update(modifiees.values(), ['demandes_actives', 'disponible'])
+
+    return {
+        'attribuees': len(attribuees),
+        'restantes': len(demandes) - len(attribuees),
+        'par_notaire': {notaire_id: charge.demandes_actives for notaire_id, charge in modifiees.items()},
+    }
+
+
+def _ajuster_charge(notaire_id, delta, duree=None):
+    charge = NotairesCharge.objects.select_for_update().select_related('notaire').filter(notaire_id=notaire_id).first()
+    if charge is None:
+        synchroniser_notaires()
+        charge = NotairesCharge.objects.select_for_update().select_related('notaire').get(notaire_id=notaire_id)
+    charge.demandes_actives = max(0, charge.demandes_actives + delta)
+    if duree is not None:
+        lissage = _config()['LISSAGE']
+        charge.duree_moyenne = duree if not charge.demandes_traitees else (
+            lissage * duree + (1 - lissage) * charge.duree_moyenne
+        )
+        charge.demandes_traitees += 1
+    charge.disponible = charge.notaire.actif and charge.demandes_actives < charge.capacite
+    charge.save()
+
+
+def _memoriser_etat(sender, instance, **kwargs):
+    # Lecture via __dict__ : un champ différé (only/defer) ne déclenche pas de requête
+    instance._attribution_initiale = (
+        instance.__dict__.get('notaire_id'), instance.__dict__.get('statut') == STATUT_ACTIF
+    )
+
+
+def _demande_enregistree(sender, instance, created, **kwargs):
+    avant = getattr(instance, '_attribution_initiale', (None, False))
+    apres = (instance.notaire_id, instance.statut == STATUT_ACTIF)
+    instance._attribution_initiale = apres
+    if avant == apres:
+        return
+
+    with transaction.atomic():
+        ancien_notaire, etait_active = avant
+        if etait_active and ancien_notaire:
+            duree = None
+            if instance.statut == STATUT_TRAITE and instance.date_attribution:
+                duree = ((instance.date_envoi_email or timezone.now()) - instance.date_attribution).total_seconds()
+            _ajuster_charge(ancien_notaire, -1, duree)
+        nouveau_notaire, est_active = apres
+        if est_active and nouveau_notaire:
+            _ajuster_charge(nouveau_notaire, +1)
+
+
+def _demande_supprimee(sender, instance, **kwargs):
+    notaire_id, etait_active = getattr(instance, '_attribution_initiale', (None, False))
+    if etait_active and notaire_id:
+        with transaction.atomic():
+            _ajuster_charge(notaire_id, -1)
+
+
+def _notaire_enregistre(sender, instance, **kwargs):
+    charge, _ = NotairesCharge.objects.get_or_create(
+        notaire=instance, defaults={'capacite': _config()['CAPACITE']}
+    )
+    disponible = instance.actif and charge.demandes_actives < charge.capacite
+    if (charge.region_id, charge.disponible) != (instance.region_id, disponible):
+        charge.region_id, charge.disponible = instance.region_id, disponible
+        charge.save(update_fields=['region', 'disponible', 'updated_at'])
+
+
+def attribuer_apres_paiement(demande_id):
+    """Attribution automatique à la validation du paiement (si activée)."""
+    if not _config()['AUTOMATIQUE']:
+        return
+    try:
+        attribuer(demande_id)
+    except AttributionImpossible as e:
+        logger.warning(f"Demande {demande_id} non attribuée automatiquement: {e}")
+
+
+def connecter_signaux():
+    """Appelé depuis DemandesConfig.ready()."""
+    post_init.connect(_memoriser_etat, sender=DemandesDemande, dispatch_uid='attribution_demande_init')
+    post_save.connect(_demande_enregistree, sender=DemandesDemande, dispatch_uid='attribution_demande_save')
+    post_delete.connect(_demande_supprimee, sender=DemandesDemande, dispatch_uid='attribution_demande_delete')
+    post_save.connect(_notaire_enregistre, sender=NotairesNotaire, dispatch_uid='attribution_notaire_save')
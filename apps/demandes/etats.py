@@ -0,0 +1,125 @@
+# apps/demandes/etats.py
+"""
+Machine à états des demandes.
+
+Tout changement de `DemandesDemande.statut` passe par `transition()` (ou
+`appliquer()` sur une ligne déjà verrouillée) : la transition est validée
+contre TRANSITIONS, appliquée sous SELECT ... FOR UPDATE et historisée
+dans `DemandesTransition`. Un webhook et une vérification qui valident le
+même paiement en même temps sont donc sérialisés : le second voit le
+statut déjà appliqué et ne fait rien.
+
+Rester dans le même statut est toujours permis (rejeu idempotent) et n'est
+pas historisé.
+
+Les files de travail (`file_statut`, `file_notaire`) s'appuient sur les
+index partiels de DemandesDemande, limités aux statuts actifs.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DemandesDemande, DemandesTransition
+
+BROUILLON = 'brouillon'
+ATTENTE_FORMULAIRE = 'attente_formulaire'
+ATTENTE_PAIEMENT = 'attente_paiement'
+EN_ATTENTE_TRAITEMENT = 'en_attente_traitement'
+EN_TRAITEMENT = 'en_traitement'
+DOCUMENT_ENVOYE = 'document_envoye_email'
+ANNULE = 'annule'
+
+# Statut -> statuts atteignables par tout appelant
+TRANSITIONS = {
+    BROUILLON: {ATTENTE_FORMULAIRE, ATTENTE_PAIEMENT, ANNULE},
+    ATTENTE_FORMULAIRE: {ATTENTE_PAIEMENT, ANNULE},
+    ATTENTE_PAIEMENT: {ATTENTE_FORMULAIRE, ANNULE},
+    EN_ATTENTE_TRAITEMENT: {EN_TRAITEMENT, ANNULE},
+    EN_TRAITEMENT: {EN_ATTENTE_TRAITEMENT, DOCUMENT_ENVOYE, ANNULE},
+    DOCUMENT_ENVOYE: set(),
+    ANNULE: set(),
+}
+
+# Réservées à un paiement validé (`paiement=True` : webhook, vérification,
+# réconciliation, validation admin d'une transaction), qui fait foi : il
+# fait passer en attente de traitement depuis tout statut antérieur.
+TRANSITIONS_PAIEMENT = {
+    BROUILLON: {EN_ATTENTE_TRAITEMENT},
+    ATTENTE_FORMULAIRE: {EN_ATTENTE_TRAITEMENT},
+    ATTENTE_PAIEMENT: {EN_ATTENTE_TRAITEMENT},
+}
+
+# Statuts couverts par les index partiels demande_file_*_idx
+STATUTS_ACTIFS = (ATTENTE_FORMULAIRE, ATTENTE_PAIEMENT, EN_ATTENTE_TRAITEMENT, EN_TRAITEMENT)
+
+
+class TransitionInvalide(Exception):
+    pass
+
+
+def peut_passer(de, vers, paiement=False):
+    return (
+        de == vers or vers in TRANSITIONS.get(de, ())
+        or (paiement and vers in TRANSITIONS_PAIEMENT.get(de, ()))
+    )
+
+
+def verifier(demande, vers, paiement=False):
+    if not peut_passer(demande.statut, vers, paiement):
+        raise TransitionInvalide(
+            f"Demande {demande.reference or demande.pk} : transition {demande.statut} -> {vers} interdite"
+        )
+
+
+def appliquer(demande, vers, source, utilisateur=None, paiement=False, **champs):
+    """
+    Applique la transition sur une demande verrouillée (select_for_update,
+    dans une transaction). `champs` sont enregistrés avec le statut ;
+    `paiement` autorise TRANSITIONS_PAIEMENT. Retourne True si le statut a
+    changé.
+    """
+    verifier(demande, vers, paiement)
+    de = demande.statut
+    if de == vers and not champs:
+        return False
+
+    for nom, valeur in champs.items():
+        setattr(demande, nom, valeur)
+    demande.statut = vers
+    demande.save(update_fields=['statut', 'updated_at', *champs])
+    if de == vers:
+        return False
+
+    DemandesTransition.objects.create(
+        demande=demande, de=de, vers=vers, source=source,
+        utilisateur=utilisateur if getattr(utilisateur, 'is_authenticated', False) else None,
+    )
+    return True
+
+
+def transition(demande_id, vers, source, utilisateur=None, paiement=False, **champs):
+    """Verrouille la demande, applique la transition et retourne la demande."""
+    with transaction.atomic():
+        demande = DemandesDemande.objects.select_for_update().get(pk=demande_id)
+        appliquer(demande, vers, source, utilisateur, paiement, **champs)
+    return demande
+
+
+def historiser(demandes, de, vers, source):
+    """Historique d'une transition appliquée en masse (bulk_update)."""
+    maintenant = timezone.now()
+    DemandesTransition.objects.bulk_create([
+        DemandesTransition(demande=demande, de=de, vers=vers, source=source, created_at=maintenant)
+        for demande in demandes
+    ])
+
+
+def file_statut(statut):
+    """Demandes d'un statut actif, plus anciennes d'abord (index partiel)."""
+    if statut not in STATUTS_ACTIFS:
+        raise ValueError(f"{statut} n'est pas un statut actif")
+    return DemandesDemande.objects.filter(statut=statut).order_by('created_at', 'id')
+
+
+def file_notaire(notaire_id):
+    """Demandes en traitement chez un notaire, plus anciennes d'abord (index partiel)."""
+    return DemandesDemande.objects.filter(notaire_id=notaire_id, statut=EN_TRAITEMENT).order_by('created_at', 'id')
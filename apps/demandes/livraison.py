@@ -0,0 +1,143 @@
+# apps/demandes/livraison.py
+"""
+Livraison des documents générés.
+
+Le document est écrit en flux dans le stockage (`demandes/documents/...`),
+sa clé est conservée dans `document_genere`, et le client reçoit par email
+un lien de téléchargement signé (`apps.core.telechargements`, valable
+TELECHARGEMENTS['DUREE']) au lieu d'une pièce jointe. L'envoi se fait hors
+de la requête, après le commit ; un renvoi ne fait que signer un nouveau
+lien. Un envoi en échec est consigné sur la demande (`erreur_envoi_email`,
+visible dans l'API et l'administration) jusqu'au prochain envoi réussi.
+"""
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.mail import EmailMultiAlternatives
+from django.db import connections, transaction
+from django.utils import timezone
+
+from apps.core import telechargements
+
+from . import etats
+from .models import DemandesDemande
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _config():
+    config = {'ASYNC': True, 'WORKERS': 2}
+    config.update(getattr(settings, 'DEMANDES_LIVRAISON', {}))
+    return config
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=_config()['WORKERS'], thread_name_prefix='livraison-documents'
+        )
+    return _executor
+
+
+def enregistrer_document(demande, fichier):
+    """Écrit le fichier envoyé dans le stockage et retourne sa clé."""
+    extension = os.path.splitext(fichier.name)[1].lower()[:10]
+    cle = default_storage.save(
+        f"demandes/documents/{timezone.now():%Y/%m}/{uuid.uuid4().hex}{extension}", fichier
+    )
+    demande.document_genere = cle
+    return cle
+
+
+def nom_telechargement(demande):
+    return f"{demande.reference}{os.path.splitext(demande.document_genere or '')[1]}"
+
+
+def lien_document(demande, request=None):
+    """Lien signé vers le document généré de la demande."""
+    type_mime = 'application/pdf' if demande.document_genere.lower().endswith('.pdf') else 'application/octet-stream'
+    return telechargements.creer_lien(demande.document_genere, nom_telechargement(demande), type_mime, request)
+
+
+def envoyer_lien(demande_id):
+    """Envoie au client l'email contenant le lien de téléchargement."""
+    demande = DemandesDemande.objects.select_related('document').get(pk=demande_id)
+    if not demande.document_genere or not demande.email_reception:
+        raise ValueError(f"Demande {demande.reference} : document ou email manquant")
+    etats.verifier(demande, etats.DOCUMENT_ENVOYE)
+
+    lien = lien_document(demande)
+    heures = max(1, telechargements.duree_lien() // 3600)
+    titre = getattr(demande.document, 'titre', None) or 'Document'
+    sujet = f"Votre document - Demande {demande.reference}"
+    message = f"""
+Bonjour,
+
+Votre demande de document (Référence: {demande.reference}) a été traitée avec succès.
+
+Détails de la commande :
+- Référence : {demande.reference}
+- Document : {titre}
+- Montant payé : {demande.montant_total} FCFA
+
+Téléchargez votre document ici (lien valable {heures} heures) :
+{lien}
+
+Passé ce délai, contactez-nous pour recevoir un nouveau lien.
+
+Cordialement,
+L'Ordre des Notaires du Burkina Faso
+"""
+    email = EmailMultiAlternatives(sujet, message, settings.DEFAULT_FROM_EMAIL, [demande.email_reception])
+    email.attach_alternative(
+        f'<p>Bonjour,</p><p>Votre demande <strong>{demande.reference}</strong> a été traitée.</p>'
+        f'<p><a href="{lien}">Télécharger votre document</a> (lien valable {heures} heures).</p>'
+        f"<p>Cordialement,<br>L'Ordre des Notaires du Burkina Faso</p>",
+        'text/html',
+    )
+    email.send()
+
+    etats.transition(
+        demande.pk, etats.DOCUMENT_ENVOYE, 'livraison',
+        date_envoi_email=timezone.now(), erreur_envoi_email=None, date_erreur_envoi_email=None,
+    )
+    logger.info(f"Lien de téléchargement envoyé pour la demande {demande.reference}")
+    return lien
+
+
+def _envoyer(demande_id):
+    try:
+        envoyer_lien(demande_id)
+    except Exception as e:
+        logger.exception(f"Erreur lors de l'envoi du lien pour la demande {demande_id}: {e}")
+        # Hors de la requête : l'échec n'a pas d'autre trace visible pour l'agent
+        DemandesDemande.objects.filter(pk=demande_id).update(
+            erreur_envoi_email=f"{type(e).__name__}: {e}"[:500],
+            date_erreur_envoi_email=timezone.now(),
+            updated_at=timezone.now(),
+        )
+
+
+def _envoyer_en_tache(demande_id):
+    try:
+        _envoyer(demande_id)
+    finally:
+        # Le thread du pool ne doit pas garder de connexion ouverte
+        connections.close_all()
+
+
+def planifier_envoi(demande_id):
+    """Envoie le lien après le commit, dans un thread si DEMANDES_LIVRAISON['ASYNC']."""
+    def lancer():
+        if _config()['ASYNC']:
+            _get_executor().submit(_envoyer_en_tache, demande_id)
+        else:
+            _envoyer(demande_id)
+    transaction.on_commit(lancer)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from apps.demandes.attribution import attribuer_en_attente, reconstruire_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Attribue aux notaires les demandes en attente de traitement, selon leur charge '
+        '(à lancer via cron, ou ponctuellement pour résorber le stock)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limite', type=int, default=None,
+            help='Nombre maximum de demandes à attribuer'
+        )
+        parser.add_argument(
+            '--reconstruire', action='store_true',
+            help="Recalculer l'index de charge des notaires avant l'attribution"
+        )
+
+    def handle(self, *args, **options):
+        if options['reconstruire']:
+            n = reconstruire_index()
+            self.stdout.write(f'Index de charge reconstruit ({n} notaire(s))')
+
+        rapport = attribuer_en_attente(options['limite'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{rapport['attribuees']} demande(s) attribuée(s), "
+            f"{rapport['restantes']} sans notaire disponible"
+        ))
+        for notaire_id, actives in rapport['par_notaire'].items():
+            self.stdout.write(f'  notaire {notaire_id}: {actives} demande(s) active(s)')
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demandes', '0004_alter_demandesdemande_utilisateur'),
+        ('documents', '0004_fix_delai_heures_72h_to_5days'),
+        ('notaires', '0009_initialiser_charges'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandesTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('de', models.CharField(max_length=50)),
+                ('vers', models.CharField(max_length=50)),
+                ('source', models.CharField(max_length=30)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Transition de demande',
+                'verbose_name_plural': 'Transitions de demandes',
+                'db_table': 'demandes_transition',
+                'managed': True,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='demandesdemande',
+            index=models.Index(condition=models.Q(('statut', 'attente_formulaire')), fields=['created_at', 'id'], name='demande_file_formulaire_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandesdemande',
+            index=models.Index(condition=models.Q(('statut', 'attente_paiement')), fields=['created_at', 'id'], name='demande_file_paiement_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandesdemande',
+            index=models.Index(condition=models.Q(('statut', 'en_attente_traitement')), fields=['created_at', 'id'], name='demande_file_attente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandesdemande',
+            index=models.Index(condition=models.Q(('statut', 'en_traitement')), fields=['created_at', 'id'], name='demande_file_traitement_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandesdemande',
+            index=models.Index(condition=models.Q(('statut', 'en_traitement')), fields=['notaire', 'created_at', 'id'], name='demande_file_notaire_idx'),
+        ),
+        migrations.AddField(
+            model_name='demandestransition',
+            name='demande',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='demandes.demandesdemande'),
+        ),
+        migrations.AddField(
+            model_name='demandestransition',
+            name='utilisateur',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='demandestransition',
+            index=models.Index(fields=['demande', 'created_at'], name='demande_transition_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:41
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demandes', '0005_etats_transitions'),
+        ('documents', '0004_fix_delai_heures_72h_to_5days'),
+        ('notaires', '0009_initialiser_charges'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='demandesdemande',
+            index=models.Index(django.db.models.functions.text.Upper('reference'), name='demande_reference_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandesdemande',
+            index=models.Index(django.db.models.functions.text.Upper('email_reception'), name='demande_email_upper_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('demandes', '0006_index_suivi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='demandesdemande',
+            name='date_erreur_envoi_email',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='demandesdemande',
+            name='erreur_envoi_email',
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+    ]
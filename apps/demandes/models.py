@@ -6,6 +6,7 @@
 #   * Remove `managed = False` lines if you wish to allow Django to create, modify, and delete the table
 # Feel free to rename the models, but don't rename db_table values or field names.
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 from django.conf import settings
 
@@ -41,6 +42,9 @@ class DemandesDemande(models.Model):
     date_attribution = models.DateTimeField(blank=True, null=True)
     document_genere = models.CharField(max_length=200, blank=True, null=True)
     date_envoi_email = models.DateTimeField(blank=True, null=True)
+    # Dernier échec de l'envoi du lien (apps/demandes/livraison.py), effacé au succès suivant
+    erreur_envoi_email = models.CharField(max_length=500, blank=True, null=True)
+    date_erreur_envoi_email = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -49,6 +53,27 @@ class DemandesDemande(models.Model):
         db_table = 'demandes_demande'
         verbose_name = 'Demande'
         verbose_name_plural = 'Demandes'
+        indexes = [
+            # Files de travail (apps/demandes/etats.py) : un index partiel par
+            # statut actif ; les demandes closes n'y figurent pas
+            *[
+                models.Index(fields=['created_at', 'id'], name=f'demande_file_{nom}_idx',
+                             condition=models.Q(statut=statut))
+                for nom, statut in [
+                    ('formulaire', 'attente_formulaire'),
+                    ('paiement', 'attente_paiement'),
+                    ('attente', 'en_attente_traitement'),
+                    ('traitement', 'en_traitement'),
+                ]
+            ],
+            models.Index(
+                fields=['notaire', 'created_at', 'id'], name='demande_file_notaire_idx',
+                condition=models.Q(statut='en_traitement'),
+            ),
+            # Suivi sans compte, insensible à la casse (apps/demandes/suivi.py)
+            models.Index(Upper('reference'), name='demande_reference_upper_idx'),
+            models.Index(Upper('email_reception'), name='demande_email_upper_idx'),
+        ]
 
     def __str__(self):
         return f"{self.reference or '-'} ({self.statut})"
@@ -131,4 +156,26 @@ class DemandesPieceJointe(models.Model):
             if taille < 1024.0:
                 return f"{taille:.2f} {unit}"
             taille /= 1024.0
-        return f"{taille:.2f} TB"
\ No newline at end of file
+        return f"{taille:.2f} TB"
+
+
+class DemandesTransition(models.Model):
+    """Historique des changements de statut d'une demande (apps/demandes/etats.py)"""
+    demande = models.ForeignKey(DemandesDemande, on_delete=models.CASCADE, related_name='transitions')
+    de = models.CharField(max_length=50)
+    vers = models.CharField(max_length=50)
+    source = models.CharField(max_length=30)
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        managed = True
+        db_table = 'demandes_transition'
+        verbose_name = 'Transition de demande'
+        verbose_name_plural = 'Transitions de demandes'
+        indexes = [models.Index(fields=['demande', 'created_at'], name='demande_transition_idx')]
+
+    def __str__(self):
+        return f"{self.demande_id}: {self.de} -> {self.vers} ({self.source})"
@@ -1,4 +1,6 @@
+from django.db import transaction
 from rest_framework import serializers
+from . import etats
 from .models import DemandesDemande, DemandesPieceJointe
 from apps.documents.serializers import DocumentSerializer
 from apps.utilisateurs.serializers import UserProfileSerializer
@@ -15,7 +17,8 @@ class DemandeSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = [
             'reference', 'created_at', 'updated_at',
-            'date_attribution', 'date_envoi_email'
+            'date_attribution', 'date_envoi_email',
+            'erreur_envoi_email', 'date_erreur_envoi_email'
         ]
     
     def validate(self, data):
@@ -35,6 +38,32 @@ class DemandeSerializer(serializers.ModelSerializer):
             
         return data
 
+    def validate_statut(self, value):
+        if self.instance is not None and not etats.peut_passer(self.instance.statut, value):
+            raise serializers.ValidationError(
+                f"Transition {self.instance.statut} -> {value} interdite"
+            )
+        return value
+
+    def update(self, instance, validated_data):
+        # Le statut passe par la machine à états (verrou + historique), vérifié
+        # sous verrou avant d'enregistrer les autres champs
+        statut = validated_data.pop('statut', None)
+        request = self.context.get('request')
+        with transaction.atomic():
+            if statut is not None:
+                verrouillee = DemandesDemande.objects.select_for_update().get(pk=instance.pk)
+                try:
+                    etats.verifier(verrouillee, statut)
+                except etats.TransitionInvalide as e:
+                    raise serializers.ValidationError({'statut': str(e)})
+                # Statut courant, pas celui lu avant le verrou
+                instance.statut = verrouillee.statut
+            instance = super().update(instance, validated_data)
+            if statut is not None:
+                etats.appliquer(instance, statut, 'api', getattr(request, 'user', None))
+        return instance
+
 class DemandeCreateSerializer(serializers.ModelSerializer):
     """Serializer pour créer une demande - permet les utilisateurs anonymes"""
     
@@ -90,7 +119,7 @@ class DemandeCreateSerializer(serializers.ModelSerializer):
 class PieceJointeSerializer(serializers.ModelSerializer):
     """Serializer pour les pièces jointes"""
     fichier_url = serializers.SerializerMethodField()
-    taille_formatee = serializers.CharField(source='taille_formatee', read_only=True)
+    taille_formatee = serializers.CharField(read_only=True)
     type_piece_display = serializers.CharField(source='get_type_piece_display', read_only=True)
     
     class Meta:
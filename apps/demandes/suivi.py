@@ -0,0 +1,134 @@
+# apps/demandes/suivi.py
+"""
+Suivi des demandes par référence et/ou email, sans compte.
+
+Les comparaisons se font sur UPPER(reference) et UPPER(email_reception),
+servies par les index fonctionnels de DemandesDemande (une recherche est un
+parcours d'index, quelle que soit la taille de la table). Une recherche sans
+résultat est mémorisée quelques secondes (DEMANDES_SUIVI['TTL_ABSENT']) :
+les essais de références au hasard et les rafraîchissements répétés d'un
+suivi inexistant ne touchent plus la base.
+
+Chaque valeur recherchée (référence, email ou terme `q`, normalisés) a une
+version en cache ; une absence est mémorisée avec les versions de ses
+valeurs. Enregistrer une demande avance les versions de sa référence et de
+son email : toutes les combinaisons qui pourraient désormais la trouver
+(référence + email + q, email + q...) sont oubliées d'un coup, sans avoir à
+énumérer leurs clés.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Upper
+from django.db.models.signals import post_save
+
+from .models import DemandesDemande
+
+CLE_ABSENT = 'demandes:suivi:absent:{}'
+CLE_VERSION = 'demandes:suivi:version:{}'
+
+
+def _config():
+    config = {'TTL_ABSENT': 60}
+    config.update(getattr(settings, 'DEMANDES_SUIVI', {}))
+    return config
+
+
+def normaliser(valeur):
+    return (valeur or '').strip().upper()
+
+
+def avec_cles(queryset):
+    """Ajoute les expressions indexées `reference_norm` et `email_norm`."""
+    return queryset.alias(reference_norm=Upper('reference'), email_norm=Upper('email_reception'))
+
+
+def filtre(reference='', email=''):
+    """Correspondance exacte, insensible à la casse (à appliquer après `avec_cles`)."""
+    condition = Q()
+    if reference:
+        condition &= Q(reference_norm=normaliser(reference))
+    if email:
+        condition &= Q(email_norm=normaliser(email))
+    return condition
+
+
+def filtre_terme(terme):
+    """Référence ou email exact (paramètre `q` du suivi)."""
+    terme = normaliser(terme)
+    return Q(reference_norm=terme) | Q(email_norm=terme)
+
+
+def _empreinte(*valeurs):
+    return hashlib.sha256('|'.join(normaliser(v) for v in valeurs).encode()).hexdigest()[:32]
+
+
+def _cle(reference='', email='', terme=''):
+    return CLE_ABSENT.format(_empreinte(reference, email, terme))
+
+
+def _cles_versions(*valeurs):
+    # Même empreinte pour une valeur, qu'elle soit cherchée comme référence, email ou terme
+    return [CLE_VERSION.format(_empreinte(valeur)) for valeur in valeurs if normaliser(valeur)]
+
+
+def _lire(reference, email, terme):
+    """(absence mémorisée, versions courantes de ses valeurs) en un get_many."""
+    cle = _cle(reference, email, terme)
+    cles_versions = _cles_versions(reference, email, terme)
+    lues = cache.get_many([cle, *cles_versions])
+    return lues.get(cle), [lues.get(cle_version, 0) for cle_version in cles_versions]
+
+
+def est_absent(reference='', email='', terme=''):
+    memorisee, versions = _lire(reference, email, terme)
+    return memorisee == versions
+
+
+def marquer_absent(reference='', email='', terme='', versions=None):
+    """Mémorise l'absence ; `versions` lues avant la recherche si l'appelant les a."""
+    if versions is None:
+        versions = _lire(reference, email, terme)[1]
+    cache.set(_cle(reference, email, terme), versions, _config()['TTL_ABSENT'])
+
+
+def trouver(reference, email=''):
+    """Demande suivie par référence (et email), ou None ; une seule requête."""
+    memorisee, versions = _lire(reference, email, '')
+    if memorisee == versions:
+        return None
+    demande = (
+        avec_cles(DemandesDemande.objects.select_related('document', 'notaire', 'utilisateur'))
+        .filter(filtre(reference, email))
+        .first()
+    )
+    if demande is None:
+        marquer_absent(reference, email, versions=versions)
+    return demande
+
+
+def _avancer(cles_versions):
+    # Départ horodaté, sans retour possible à une version déjà servie. Une
+    # version n'a pas à survivre aux absences qu'elle invalide : après
+    # TTL_ABSENT, celles marquées avant l'avancée ont expiré
+    version = time.time_ns() // 1000
+    cache.set_many({cle: version for cle in cles_versions}, _config()['TTL_ABSENT'])
+
+
+def _oublier_absences(sender, instance, **kwargs):
+    cles_versions = _cles_versions(instance.reference, instance.email_reception)
+    if not cles_versions:
+        return
+    # Maintenant, puis au commit : une absence marquée entre les deux (ligne
+    # pas encore visible) est aussi oubliée
+    _avancer(cles_versions)
+    transaction.on_commit(lambda: _avancer(cles_versions))
+
+
+def connecter_signaux():
+    """Appelé depuis DemandesConfig.ready()."""
+    post_save.connect(_oublier_absences, sender=DemandesDemande, dispatch_uid='suivi_demande_save')
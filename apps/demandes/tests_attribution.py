@@ -0,0 +1,153 @@
+# tests_attribution.py - Tests du moteur d'attribution des demandes
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .attribution import (
+    AttributionImpossible, attribuer, attribuer_en_attente, reconstruire_index,
+)
+from .models import DemandesDemande
+from apps.documents.models import DocumentsDocument
+from apps.geographie.models import GeographieRegion
+from apps.notaires.models import NotairesCharge, NotairesNotaire
+from apps.utilisateurs.models import UtilisateursUser
+
+
+@override_settings(DEMANDES_ATTRIBUTION={'CAPACITE': 2})
+class AttributionDemandesTestCase(TestCase):
+    """Attribution des demandes selon la charge des notaires"""
+
+    def setUp(self):
+        self.centre = GeographieRegion.objects.create(nom='Centre', code='CEN', ordre=1)
+        self.hauts_bassins = GeographieRegion.objects.create(nom='Hauts-Bassins', code='HBS', ordre=2)
+        self.document = DocumentsDocument.objects.create(
+            reference='DOC-ATTR', nom='Document', description='Test',
+            prix=10000, delai_heures=48, actif=True,
+        )
+        self.notaire_a = self._notaire('N-A', self.centre)
+        self.notaire_b = self._notaire('N-B', self.hauts_bassins)
+
+    def _notaire(self, matricule, region, actif=True):
+        return NotairesNotaire.objects.create(
+            matricule=matricule, nom=matricule, prenom='Maître', email=f'{matricule}@notaires.bf',
+            telephone='+22670000000', adresse='Ouagadougou', region=region, actif=actif,
+        )
+
+    def _demande(self, n, statut='en_attente_traitement', region=None):
+        return DemandesDemande.objects.create(
+            reference=f'DEM-ATTR-{n}', document=self.document, statut=statut, montant_total=10000,
+            donnees_formulaire={'region_id': region.pk} if region else {},
+        )
+
+    def _charge(self, notaire):
+        return NotairesCharge.objects.get(notaire=notaire)
+
+    def test_index_cree_avec_les_notaires(self):
+        charge = self._charge(self.notaire_a)
+        self.assertEqual((charge.demandes_actives, charge.capacite, charge.region_id), (0, 2, self.centre.pk))
+        self.assertTrue(charge.disponible)
+
+    def test_attribution_au_moins_charge(self):
+        premiere = attribuer(self._demande(1).pk)
+        seconde = attribuer(self._demande(2).pk)
+        self.assertEqual(premiere.statut, 'en_traitement')
+        self.assertIsNotNone(premiere.date_attribution)
+        self.assertNotEqual(premiere.notaire_id, seconde.notaire_id)
+        self.assertEqual(self._charge(self.notaire_a).demandes_actives, 1)
+        self.assertEqual(self._charge(self.notaire_b).demandes_actives, 1)
+
+    def test_region_preferee(self):
+        demande = attribuer(self._demande(1, region=self.hauts_bassins).pk)
+        self.assertEqual(demande.notaire_id, self.notaire_b.pk)
+
+    def test_capacite_respectee(self):
+        for n in range(4):
+            attribuer(self._demande(n).pk)
+        self.assertFalse(self._charge(self.notaire_a).disponible)
+        self.assertFalse(self._charge(self.notaire_b).disponible)
+        with self.assertRaises(AttributionImpossible):
+            attribuer(self._demande(5).pk)
+        with self.assertRaises(AttributionImpossible):
+            attribuer(self._demande(6).pk, notaire_id=self.notaire_a.pk)
+        attribuer(self._demande(7).pk, notaire_id=self.notaire_a.pk, forcer=True)
+        self.assertEqual(self._charge(self.notaire_a).demandes_actives, 3)
+
+    def test_notaire_inactif_ignore(self):
+        self.notaire_b.actif = False
+        self.notaire_b.save()
+        for n in range(2):
+            self.assertEqual(attribuer(self._demande(n).pk).notaire_id, self.notaire_a.pk)
+
+    def test_traitement_libere_la_charge_et_met_a_jour_le_delai(self):
+        demande = attribuer(self._demande(1).pk)
+        demande.date_attribution = timezone.now() - timedelta(hours=2)
+        demande.statut = 'document_envoye_email'
+        demande.date_envoi_email = timezone.now()
+        demande.save()
+        charge = NotairesCharge.objects.get(notaire_id=demande.notaire_id)
+        self.assertEqual(charge.demandes_actives, 0)
+        self.assertEqual(charge.demandes_traitees, 1)
+        self.assertAlmostEqual(charge.duree_moyenne, 7200, delta=5)
+
+    def test_attribution_du_stock_en_une_passe(self):
+        for n in range(5):
+            self._demande(n)
+        self._demande(9, region=self.centre)
+        rapport = attribuer_en_attente()
+        self.assertEqual(rapport['attribuees'], 4)
+        self.assertEqual(rapport['restantes'], 2)
+        self.assertEqual(DemandesDemande.objects.filter(statut='en_traitement').count(), 4)
+        for notaire in (self.notaire_a, self.notaire_b):
+            charge = self._charge(notaire)
+            self.assertEqual(charge.demandes_actives, 2)
+            self.assertFalse(charge.disponible)
+
+    def test_reattribution_d_une_demande_en_traitement(self):
+        demande = attribuer(self._demande(1).pk, notaire_id=self.notaire_a.pk)
+        demande = attribuer(demande.pk, notaire_id=self.notaire_b.pk)
+        self.assertEqual((demande.statut, demande.notaire_id), ('en_traitement', self.notaire_b.pk))
+        self.assertEqual(self._charge(self.notaire_a).demandes_actives, 0)
+        self.assertEqual(self._charge(self.notaire_b).demandes_actives, 1)
+
+        # Sans notaire indiqué, une demande en traitement n'est pas déplacée
+        with self.assertRaises(AttributionImpossible):
+            attribuer(demande.pk)
+
+    def test_suppression_libere_la_charge(self):
+        demande = attribuer(self._demande(1).pk, notaire_id=self.notaire_a.pk)
+        DemandesDemande.objects.get(pk=demande.pk).delete()
+        charge = self._charge(self.notaire_a)
+        self.assertEqual((charge.demandes_actives, charge.disponible), (0, True))
+
+    def test_reconstruire_index(self):
+        attribuer(self._demande(1).pk)
+        DemandesDemande.objects.update(statut='annule')
+        reconstruire_index()
+        self.assertEqual(NotairesCharge.objects.filter(demandes_actives__gt=0).count(), 0)
+
+    def test_api(self):
+        admin = UtilisateursUser.objects.create_user(
+            username='admin', email='admin@test.com', password='pass', nom='Admin', prenom='T', is_staff=True,
+        )
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        demande = self._demande(1)
+        response = client.post(reverse('demande-assigner-notaire', args=[demande.pk]), {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['demande']['statut'], 'en_traitement')
+
+        self._demande(2)
+        response = client.post(reverse('demande-attribuer-en-attente'), {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['attribuees'], 1)
+
+    def test_commande(self):
+        self._demande(1)
+        sortie = StringIO()
+        call_command('attribuer_demandes', '--reconstruire', stdout=sortie)
+        self.assertIn('1 demande(s) attribuée(s)', sortie.getvalue())
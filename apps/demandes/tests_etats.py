@@ -0,0 +1,137 @@
+# tests_etats.py - Tests de la machine à états des demandes
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from . import etats
+from .models import DemandesDemande, DemandesTransition
+from apps.documents.models import DocumentsDocument
+from apps.notaires.models import NotairesNotaire
+from apps.paiements.models import PaiementsTransaction
+from apps.paiements.services.reconciliation import appliquer_statut
+from apps.utilisateurs.models import UtilisateursUser
+
+
+class EtatsDemandeTestCase(TestCase):
+    """Transitions de statut validées, verrouillées et historisées"""
+
+    def setUp(self):
+        self.document = DocumentsDocument.objects.create(
+            reference='DOC-ETATS', nom='Document', description='Test', prix=10000, delai_heures=48, actif=True,
+        )
+        self.admin = UtilisateursUser.objects.create_user(
+            username='admin', email='admin@notaires.bf', nom='Admin', prenom='Test',
+            password='pass', is_staff=True,
+        )
+
+    def _demande(self, n, statut='attente_paiement', **kwargs):
+        return DemandesDemande.objects.create(
+            reference=f'DEM-ETATS-{n}', document=self.document, statut=statut, montant_total=10000, **kwargs
+        )
+
+    def test_transition_valide_historisee(self):
+        # Réservée à un paiement validé
+        with self.assertRaises(etats.TransitionInvalide):
+            etats.transition(self._demande(1).pk, etats.EN_ATTENTE_TRAITEMENT, 'test', self.admin)
+        demande = etats.transition(
+            DemandesDemande.objects.get().pk, etats.EN_ATTENTE_TRAITEMENT, 'test', self.admin, paiement=True,
+        )
+        self.assertEqual(demande.statut, etats.EN_ATTENTE_TRAITEMENT)
+        historique = list(demande.transitions.values_list('de', 'vers', 'source', 'utilisateur'))
+        self.assertEqual(historique, [('attente_paiement', 'en_attente_traitement', 'test', self.admin.pk)])
+
+    def test_transition_interdite(self):
+        demande = self._demande(1, statut=etats.ANNULE)
+        with self.assertRaises(etats.TransitionInvalide):
+            etats.transition(demande.pk, etats.EN_TRAITEMENT, 'test')
+        demande.refresh_from_db()
+        self.assertEqual(demande.statut, etats.ANNULE)
+        self.assertFalse(DemandesTransition.objects.exists())
+
+    def test_meme_statut_idempotent(self):
+        demande = self._demande(1, statut=etats.EN_ATTENTE_TRAITEMENT)
+        etats.transition(demande.pk, etats.EN_ATTENTE_TRAITEMENT, 'test')
+        self.assertFalse(DemandesTransition.objects.exists())
+
+    def test_paiement_valide_une_seule_fois(self):
+        demande = self._demande(1)
+        tx = PaiementsTransaction.objects.create(
+            reference='TXN-ETATS', demande=demande, type_paiement='yengapay', montant=10000,
+            commission=0, statut='en_attente', donnees_api={},
+        )
+        appliquer_statut(tx.pk, 'validee', 'webhook')
+        appliquer_statut(tx.pk, 'validee', 'verification')
+        demande.refresh_from_db()
+        self.assertEqual(demande.statut, etats.EN_ATTENTE_TRAITEMENT)
+        self.assertEqual(list(demande.transitions.values_list('source', flat=True)), ['webhook'])
+
+    def test_paiement_sur_demande_annulee(self):
+        demande = self._demande(1, statut=etats.ANNULE)
+        tx = PaiementsTransaction.objects.create(
+            reference='TXN-ETATS', demande=demande, type_paiement='yengapay', montant=10000,
+            commission=0, statut='en_attente', donnees_api={},
+        )
+        tx, _, modifie = appliquer_statut(tx.pk, 'validee', 'webhook')
+        self.assertTrue(modifie)
+        self.assertEqual(tx.statut, 'validee')
+        demande.refresh_from_db()
+        self.assertEqual(demande.statut, etats.ANNULE)
+
+    def test_api_refuse_transition_interdite(self):
+        demande = self._demande(1, statut=etats.DOCUMENT_ENVOYE)
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        url = reverse('demande-detail', args=[demande.pk])
+        response = client.patch(url, {'statut': etats.ANNULE}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        demande = self._demande(2, statut=etats.ATTENTE_PAIEMENT)
+        response = client.patch(reverse('demande-detail', args=[demande.pk]), {'statut': etats.ANNULE}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(demande.transitions.get().source, 'api')
+
+        response = client.get(reverse('demande-historique', args=[demande.pk]))
+        self.assertEqual([t['vers'] for t in response.data], [etats.ANNULE])
+
+        # Passage réservé aux paiements : refusé, aucun autre champ enregistré
+        demande = self._demande(3, statut=etats.ATTENTE_PAIEMENT, email_reception='avant@example.com')
+        response = client.patch(
+            reverse('demande-detail', args=[demande.pk]),
+            {'statut': etats.EN_ATTENTE_TRAITEMENT, 'email_reception': 'apres@example.com'}, format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        demande.refresh_from_db()
+        self.assertEqual((demande.statut, demande.email_reception), (etats.ATTENTE_PAIEMENT, 'avant@example.com'))
+
+    def test_files_de_travail(self):
+        notaire = NotairesNotaire.objects.create(
+            matricule='N-ETATS', nom='Notaire', prenom='Maître', email='n@notaires.bf',
+            telephone='+22670000000', adresse='Ouagadougou',
+        )
+        attente = [self._demande(n, statut=etats.EN_ATTENTE_TRAITEMENT).pk for n in range(3)]
+        self._demande(10, statut=etats.DOCUMENT_ENVOYE)
+        en_cours = self._demande(11, statut=etats.EN_TRAITEMENT, notaire=notaire)
+
+        self.assertEqual(list(etats.file_statut(etats.EN_ATTENTE_TRAITEMENT).values_list('pk', flat=True)), attente)
+        self.assertEqual(list(etats.file_notaire(notaire.pk).values_list('pk', flat=True)), [en_cours.pk])
+        with self.assertRaises(ValueError):
+            etats.file_statut(etats.DOCUMENT_ENVOYE)
+
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        response = client.get(reverse('demande-file-de-travail'), {'statut': etats.EN_ATTENTE_TRAITEMENT})
+        self.assertEqual(response.status_code, 200)
+        resultats = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([d['id'] for d in resultats], attente)
+        response = client.get(reverse('demande-file-de-travail'), {'statut': etats.ANNULE})
+        self.assertEqual(response.status_code, 400)
+
+    def test_file_utilise_index_partiel(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan vérifié sur SQLite')
+        sql, params = etats.file_statut(etats.EN_ATTENTE_TRAITEMENT).values_list('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(ligne[-1]) for ligne in cursor.fetchall())
+        self.assertIn('demande_file_attente_idx', plan)
@@ -0,0 +1,177 @@
+# tests_livraison.py - Tests de la livraison des documents par lien signé
+import re
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core import mail, signing
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .models import DemandesDemande
+from apps.core import telechargements
+from apps.documents.models import DocumentsDocument
+from apps.utilisateurs.models import UtilisateursUser
+
+CONTENU = b'%PDF-1.4 ' + bytes(range(256)) * 40
+
+
+@override_settings(
+    DEMANDES_LIVRAISON={'ASYNC': False},
+    DIRECT_UPLOADS={'BACKEND': 'local', 'EXPIRES': 900},
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    BASE_URL='http://testserver',
+)
+class LivraisonDocumentTestCase(TestCase):
+    """Document généré stocké, client notifié par un lien signé"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.admin = UtilisateursUser.objects.create_user(
+            username='admin', email='admin@notaires.bf', nom='Admin', prenom='Test',
+            password='pass', is_staff=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        document = DocumentsDocument.objects.create(
+            reference='DOC-LIV', nom='Acte', description='Test', prix=10000, delai_heures=48, actif=True,
+        )
+        self.demande = DemandesDemande.objects.create(
+            reference='DEM-LIV-1', document=document, statut='en_traitement', montant_total=10000,
+            email_reception='client@example.com',
+        )
+
+    def _completer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('demande-completer-traitement', args=[self.demande.pk]),
+                {'document_genere': SimpleUploadedFile('acte final.pdf', CONTENU, 'application/pdf')},
+                format='multipart',
+            )
+
+    def _lien(self):
+        return re.search(r'http://testserver(\S+)', mail.outbox[-1].body).group(1)
+
+    def test_completer_stocke_et_envoie_un_lien(self):
+        response = self._completer()
+        self.assertEqual(response.status_code, 202)
+
+        self.demande.refresh_from_db()
+        self.assertEqual(self.demande.statut, 'document_envoye_email')
+        self.assertIsNotNone(self.demande.date_envoi_email)
+        self.assertTrue(self.demande.document_genere.startswith('demandes/documents/'))
+        with default_storage.open(self.demande.document_genere, 'rb') as f:
+            self.assertEqual(f.read(), CONTENU)
+
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEqual(message.to, ['client@example.com'])
+        self.assertEqual(message.attachments, [])
+        self.assertIn('/api/core/telechargements/', message.body)
+
+    def test_telechargement_complet(self):
+        self._completer()
+        client = APIClient()
+        response = client.get(self._lien())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENU)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('DEM-LIV-1.pdf', response['Content-Disposition'])
+        self.assertIn('private', response['Cache-Control'])
+
+        # Revalidation : même ETag, pas de corps
+        response = client.get(self._lien(), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_telechargement_partiel(self):
+        self._completer()
+        client = APIClient()
+        response = client.get(self._lien(), HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), CONTENU[100:200])
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(CONTENU)}')
+
+        response = client.get(self._lien(), HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), CONTENU[-10:])
+
+        response = client.get(self._lien(), HTTP_RANGE=f'bytes={len(CONTENU)}-')
+        self.assertEqual(response.status_code, 416)
+
+        # If-Range périmé : fichier complet
+        response = client.get(self._lien(), HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"autre"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_lien_invalide_ou_expire(self):
+        self._completer()
+        client = APIClient()
+        lien = self._lien()
+        self.assertEqual(client.get(lien[:-3] + 'xyz/').status_code, 404)
+        with mock.patch.object(telechargements.signing, 'loads', side_effect=signing.SignatureExpired):
+            self.assertEqual(client.get(lien).status_code, 410)
+
+    def test_lien_de_courte_duree(self):
+        self._completer()
+        self.assertIn('lien valable 24 heures', mail.outbox[-1].body)
+        client = APIClient()
+        lien = self._lien()
+        maintenant = time.time()
+        with mock.patch.object(telechargements.time, 'time', return_value=maintenant + 23 * 3600):
+            self.assertEqual(client.get(lien).status_code, 200)
+        with mock.patch.object(telechargements.time, 'time', return_value=maintenant + 25 * 3600):
+            self.assertEqual(client.get(lien).status_code, 410)
+
+        # Durée demandée plus courte, jamais plus longue que DUREE
+        self.demande.refresh_from_db()
+        court = telechargements.creer_lien(self.demande.document_genere, 'a.pdf', duree=60)
+        long = telechargements.creer_lien(self.demande.document_genere, 'a.pdf', duree=30 * 86400)
+        with mock.patch.object(telechargements.time, 'time', return_value=maintenant + 120):
+            self.assertEqual(client.get(court).status_code, 410)
+            self.assertEqual(client.get(long).status_code, 200)
+        self.assertEqual(telechargements.lire_jeton(long.rsplit('/', 2)[-2])['exp'] - int(maintenant), 86400)
+
+    def test_echec_d_envoi_consigne(self):
+        with mock.patch('apps.demandes.livraison.EmailMultiAlternatives.send', side_effect=OSError('SMTP injoignable')), \
+                self.assertLogs('apps.demandes.livraison', 'ERROR'):
+            self.assertEqual(self._completer().status_code, 202)
+        response = self.client.get(reverse('demande-detail', args=[self.demande.pk]))
+        self.assertEqual(response.data['statut'], 'en_traitement')
+        self.assertEqual(response.data['erreur_envoi_email'], 'OSError: SMTP injoignable')
+        self.assertIsNotNone(response.data['date_erreur_envoi_email'])
+
+        # Le renvoi réussi efface l'échec
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('demande-renvoyer-lien', args=[self.demande.pk]))
+        self.demande.refresh_from_db()
+        self.assertEqual(self.demande.statut, 'document_envoye_email')
+        self.assertIsNone(self.demande.erreur_envoi_email)
+        self.assertIsNone(self.demande.date_erreur_envoi_email)
+
+    def test_stockage_s3_redirige(self):
+        self._completer()
+        with mock.patch('apps.core.uploads.stockage_s3', return_value=True), \
+                mock.patch.object(telechargements, 'url_redirection', return_value='https://s3.example/doc'):
+            response = APIClient().get(self._lien())
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://s3.example/doc')
+
+    def test_renvoyer_lien(self):
+        self._completer()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('demande-renvoyer-lien', args=[self.demande.pk]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(mail.outbox), 2)
+
+        self.client.force_authenticate(user=UtilisateursUser.objects.create_user(
+            username='client', email='client@example.com', nom='C', prenom='C', password='pass',
+        ))
+        response = self.client.post(reverse('demande-renvoyer-lien', args=[self.demande.pk]))
+        self.assertEqual(response.status_code, 403)
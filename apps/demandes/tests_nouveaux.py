@@ -1,8 +1,19 @@
 # tests_nouveaux.py - Tests pour DemandesPieceJointe
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework_simplejwt.tokens import AccessToken
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -119,3 +130,133 @@ class DemandesPieceJointeAPITestCase(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+
+@override_settings(DIRECT_UPLOADS={'BACKEND': 'local', 'EXPIRES': 900})
+class DemandesUploadDirectTestCase(APITestCase):
+    """Tests du flux d'upload direct (backend local)"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        cache.clear()
+
+        self.document = DocumentsDocument.objects.create(
+            reference='DOC-UPLOAD',
+            nom='Document upload',
+            description='Test',
+            prix=10000,
+            delai_heures=48,
+            actif=True
+        )
+        self.demande = DemandesDemande.objects.create(
+            reference='DEM-UPLOAD-001',
+            document=self.document,
+            statut='attente_formulaire',
+            montant_total=10000
+        )
+
+    def _presign(self, nom='cnib.pdf', taille=12, content_type='application/pdf'):
+        response = self.client.post(reverse('core-upload-presign'), {
+            'usage': 'demande_piece_jointe',
+            'fichiers': [{'nom': nom, 'taille': taille, 'content_type': content_type}],
+        }, format='json')
+        return response
+
+    def _upload(self, ticket, contenu=b'%PDF-1.4 test'):
+        return self.client.generic('PUT', ticket['url'], contenu, content_type=ticket['headers']['Content-Type'])
+
+    def test_presign_rejette_type_non_autorise(self):
+        response = self._presign(nom='script.exe', content_type='application/octet-stream')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_presign_rejette_fichier_trop_volumineux(self):
+        response = self._presign(taille=50 * 1024 * 1024)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_puis_finalisation(self):
+        ticket = self._presign().data['uploads'][0]
+        self.assertEqual(self._upload(ticket).status_code, status.HTTP_204_NO_CONTENT)
+
+        url = reverse('demande-finaliser-pieces-jointes', args=[self.demande.id])
+        payload = {
+            'reference': 'dem-upload-001',
+            'pieces_jointes': [{'upload_id': ticket['upload_id'], 'type_piece': 'cnib'}],
+        }
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        piece = DemandesPieceJointe.objects.get(demande=self.demande)
+        self.assertEqual(piece.fichier.name, ticket['cle'])
+        self.assertEqual(piece.taille_fichier, len(b'%PDF-1.4 test'))
+
+        # Rejouer la finalisation ne crée pas de doublon
+        self.client.post(url, payload, format='json')
+        self.assertEqual(DemandesPieceJointe.objects.filter(demande=self.demande).count(), 1)
+
+    def test_creation_annulee_si_attachement_echoue(self):
+        ticket = self._presign().data['uploads'][0]
+        self._upload(ticket)
+        payload = {
+            'document': self.document.id, 'email_reception': 'client@example.com',
+            'pieces_jointes': [{'upload_id': ticket['upload_id'], 'type_piece': 'cnib'}],
+        }
+        with mock.patch.object(DemandesPieceJointe.objects, 'bulk_create', side_effect=DatabaseError('panne')), \
+                self.assertRaises(DatabaseError):
+            self.client.post(reverse('demande-list'), payload, format='json')
+        self.assertFalse(DemandesDemande.objects.filter(email_reception='client@example.com').exists())
+
+        response = self.client.post(reverse('demande-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(DemandesPieceJointe.objects.get(fichier=ticket['cle']).demande_id, response.data['id'])
+
+    def test_finalisation_sans_upload(self):
+        ticket = self._presign().data['uploads'][0]
+        url = reverse('demande-finaliser-pieces-jointes', args=[self.demande.id])
+        response = self.client.post(url, {
+            'reference': 'DEM-UPLOAD-001',
+            'pieces_jointes': [{'upload_id': ticket['upload_id'], 'type_piece': 'cnib'}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_finalisation_mauvaise_reference(self):
+        ticket = self._presign().data['uploads'][0]
+        self._upload(ticket)
+        url = reverse('demande-finaliser-pieces-jointes', args=[self.demande.id])
+        response = self.client.post(url, {
+            'reference': 'DEM-AUTRE',
+            'pieces_jointes': [{'upload_id': ticket['upload_id'], 'type_piece': 'cnib'}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_upload_refuse_content_type_different(self):
+        ticket = self._presign().data['uploads'][0]
+        response = self.client.generic('PUT', ticket['url'], b'data', content_type='image/png')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_presign_limite_en_debit(self):
+        with mock.patch.dict(ScopedRateThrottle.THROTTLE_RATES, {'uploads': '2/hour'}):
+            self.assertEqual(self._presign().status_code, status.HTTP_201_CREATED)
+            self.assertEqual(self._presign().status_code, status.HTTP_201_CREATED)
+            self.assertEqual(self._presign().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_purge_des_uploads_non_finalises(self):
+        orphelin, recent, finalise = (self._presign().data['uploads'][0] for _ in range(3))
+        for ticket in (orphelin, recent, finalise):
+            self._upload(ticket)
+        DemandesPieceJointe.objects.create(
+            demande=self.demande, type_piece='cnib', fichier=finalise['cle'],
+            nom_original='cnib.pdf', taille_fichier=13,
+        )
+
+        def date_envoi(cle):
+            return timezone.now() - (timedelta(minutes=5) if cle == recent['cle'] else timedelta(days=2))
+
+        with mock.patch.object(default_storage, 'get_modified_time', side_effect=date_envoi):
+            call_command('purger_uploads', stdout=mock.Mock())
+
+        self.assertFalse(default_storage.exists(orphelin['cle']))
+        self.assertTrue(default_storage.exists(recent['cle']))
+        self.assertTrue(default_storage.exists(finalise['cle']))
@@ -0,0 +1,113 @@
+# tests_suivi.py - Tests du suivi des demandes sans compte
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from . import suivi
+from .models import DemandesDemande
+from apps.documents.models import DocumentsDocument
+from apps.utilisateurs.models import UtilisateursUser
+
+
+class SuiviDemandeTestCase(TestCase):
+    """Recherche indexée, insensible à la casse, avec cache des absences"""
+
+    def setUp(self):
+        cache.clear()
+        self.document = DocumentsDocument.objects.create(
+            reference='DOC-SUIVI', nom='Document', description='Test', prix=10000, delai_heures=48, actif=True,
+        )
+        self.demande = DemandesDemande.objects.create(
+            reference='DEM-20260101-1234', document=self.document, statut='attente_paiement',
+            montant_total=10000, email_reception='Client@Example.com',
+        )
+        self.client = APIClient()
+        self.url_suivi = reverse('demande-suivi-demande')
+        self.url_liste = reverse('demande-list')
+
+    def test_suivi_insensible_a_la_casse(self):
+        response = self.client.get(self.url_suivi, {'reference': 'dem-20260101-1234', 'email': 'client@example.COM'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.demande.pk)
+
+    def test_suivi_inconnu_mis_en_cache(self):
+        self.assertEqual(self.client.get(self.url_suivi, {'reference': 'DEM-INCONNUE'}).status_code, 404)
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(self.url_suivi, {'reference': 'dem-inconnue'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(requetes.captured_queries), 0)
+
+    def test_absence_oubliee_a_la_creation(self):
+        self.assertIsNone(suivi.trouver('DEM-NOUVELLE'))
+        DemandesDemande.objects.create(
+            reference='DEM-NOUVELLE', document=self.document, montant_total=10000,
+        )
+        self.assertIsNotNone(suivi.trouver('dem-nouvelle'))
+
+    def test_absences_combinees_oubliees_a_la_creation(self):
+        recherches = [
+            {'email': 'nouveau@example.com', 'q': 'DEM-COMBINE'},
+            {'reference': 'DEM-COMBINE-1', 'email': 'nouveau@example.com', 'q': 'combine'},
+            {'q': 'dem-combine-1'},
+        ]
+        for params in recherches:
+            self.assertEqual(self.client.get(self.url_liste, params).data['results'], [])
+            self.assertTrue(suivi.est_absent(params.get('reference'), params.get('email'), params['q']))
+
+        demande = DemandesDemande.objects.create(
+            reference='DEM-COMBINE-1', document=self.document, montant_total=10000,
+            email_reception='Nouveau@Example.com',
+        )
+        for params in recherches:
+            response = self.client.get(self.url_liste, params)
+            self.assertEqual([d['id'] for d in response.data['results']], [demande.pk], params)
+
+    def test_absence_marquee_avant_le_commit_oubliee(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            DemandesDemande.objects.create(
+                reference='DEM-COMMIT-1', document=self.document, montant_total=10000,
+            )
+            # Lecture concurrente qui ne voit pas encore la ligne
+            suivi.marquer_absent('DEM-COMMIT-1')
+        self.assertFalse(suivi.est_absent('dem-commit-1'))
+
+    def test_liste_anonyme_par_terme_en_une_requete(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(self.url_liste, {'q': 'dem-20260101-1234'})
+        self.assertEqual([d['id'] for d in response.data['results']], [self.demande.pk])
+        sql = ' '.join(q['sql'].upper() for q in requetes.captured_queries)
+        self.assertIn('UPPER', sql)
+        self.assertNotIn('LIKE', sql)
+
+        # Un terme partiel ne révèle rien à un anonyme
+        response = self.client.get(self.url_liste, {'q': '1234'})
+        self.assertEqual(response.data['results'], [])
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get(self.url_liste, {'q': '1234'})
+        self.assertEqual(len(requetes.captured_queries), 0)
+
+    def test_liste_utilisateur_recherche_et_suivi(self):
+        user = UtilisateursUser.objects.create_user(
+            username='u', email='u@example.com', nom='U', prenom='U', password='pass',
+        )
+        propre = DemandesDemande.objects.create(
+            reference='DEM-PROPRE-1', document=self.document, montant_total=10000, utilisateur=user,
+        )
+        self.client.force_authenticate(user=user)
+        response = self.client.get(self.url_liste, {'q': 'propre'})
+        self.assertEqual([d['id'] for d in response.data['results']], [propre.pk])
+        response = self.client.get(self.url_liste, {'q': 'DEM-20260101-1234'})
+        self.assertEqual([d['id'] for d in response.data['results']], [self.demande.pk])
+
+    def test_index_fonctionnel_utilise(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan vérifié sur SQLite')
+        qs = suivi.avec_cles(DemandesDemande.objects.all()).filter(suivi.filtre(email='client@example.com'))
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(ligne[-1]) for ligne in cursor.fetchall())
+        self.assertIn('demande_email_upper_idx', plan)
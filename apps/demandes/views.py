@@ -3,6 +3,7 @@ from rest_framework import serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 from .models import DemandesDemande, DemandesPieceJointe
@@ -11,6 +12,9 @@ from .serializers import (
     PieceJointeSerializer, PieceJointeCreateSerializer
 )
 from apps.utilisateurs.permissions import IsOwnerOrReadOnly
+from apps.core import uploads
+from . import etats, suivi
+from .livraison import enregistrer_document, planifier_envoi
 
 class DemandeViewSet(viewsets.ModelViewSet):
     queryset = DemandesDemande.objects.all()
@@ -22,7 +26,7 @@ class DemandeViewSet(viewsets.ModelViewSet):
     
     def get_permissions(self):
         """Gestion granulaire des permissions"""
-        if self.action in ['create', 'list', 'suivi_demande']:
+        if self.action in ['create', 'list', 'suivi_demande', 'finaliser_pieces_jointes']:
             return [permissions.AllowAny()]
         return [permissions.IsAuthenticated()]
     
@@ -32,57 +36,57 @@ class DemandeViewSet(viewsets.ModelViewSet):
         - Admin/Superuser : voit toutes les demandes
         - Utilisateur authentifié : voit ses propres demandes OU celles correspondant à la référence fournie
         - Utilisateur anonyme : doit fournir email ET/OU référence pour voir des données
+
+        Référence et email sont comparés sur UPPER(...) (index fonctionnels,
+        voir apps/demandes/suivi.py) ; tout se fait en une seule requête.
         """
         user = self.request.user
         email = self.request.query_params.get('email', '').strip()
         reference = self.request.query_params.get('reference', '').strip()
+        search_query = self.request.query_params.get('q', '').strip()
+        staff = user.is_superuser or user.is_staff
+        queryset = suivi.avec_cles(DemandesDemande.objects.all())
 
-        if user.is_superuser or user.is_staff:
-            queryset = DemandesDemande.objects.all()
+        if staff:
+            perimetre = Q()
         elif user.is_authenticated:
-            # Base : ses propres demandes
-            base_filter = Q(utilisateur=user)
-            
-            # Extension : si recherche par référence/email, autoriser même si utilisateur est None
+            # Ses propres demandes, plus celles désignées par référence/email
+            perimetre = Q(utilisateur=user)
             if email or reference:
-                tracking_filters = Q()
-                if email:
-                    tracking_filters &= Q(email_reception__iexact=email)
-                if reference:
-                    tracking_filters &= Q(reference__iexact=reference)
-                base_filter |= tracking_filters
-                
-            queryset = DemandesDemande.objects.filter(base_filter)
+                perimetre |= suivi.filtre(reference, email)
+        elif self.action == 'list' and suivi.est_absent(reference, email, search_query):
+            # Suivi déjà recherché sans résultat il y a peu
+            return queryset.none()
         else:
             # Anonyme : nécessite au moins un critère de suivi
-            if email or reference:
-                filters = Q()
-                if email:
-                    filters &= Q(email_reception__iexact=email)
-                if reference:
-                    filters &= Q(reference__iexact=reference)
-                queryset = DemandesDemande.objects.filter(filters)
-            else:
-                queryset = DemandesDemande.objects.none()
+            perimetre = suivi.filtre(reference, email) if (email or reference) else None
 
         # Support du paramètre search 'q'
-        search_query = self.request.query_params.get('q', '').strip()
         if search_query:
-            # Si on n'a rien (cas anonyme sans email/ref), on tente une recherche exacte sur q
-            if queryset.count() == 0 and not (user.is_superuser or user.is_staff):
-                # On autorise la recherche par référence exacte via 'q' pour les anonymes
-                queryset = DemandesDemande.objects.filter(
-                    Q(reference__iexact=search_query) | 
-                    Q(email_reception__iexact=search_query)
-                )
+            recherche = Q(reference__icontains=search_query) | Q(email_reception__icontains=search_query)
+            if staff:
+                condition = recherche
             else:
-                # Sinon on affine le queryset existant
-                queryset = queryset.filter(
-                    Q(reference__icontains=search_query) |
-                    Q(email_reception__icontains=search_query)
-                )
+                # Référence ou email exact pour le suivi, et recherche libre
+                # limitée au périmètre de l'utilisateur
+                condition = suivi.filtre_terme(search_query)
+                if perimetre is not None:
+                    condition |= perimetre & recherche
+        elif perimetre is None:
+            return queryset.none()
+        else:
+            condition = perimetre
 
-        return queryset
+        return queryset.filter(condition)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if not request.user.is_authenticated:
+            params = [request.query_params.get(nom, '').strip() for nom in ('reference', 'email', 'q')]
+            resultats = response.data.get('results') if isinstance(response.data, dict) else response.data
+            if any(params) and not resultats:
+                suivi.marquer_absent(*params)
+        return response
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -96,7 +100,7 @@ class DemandeViewSet(viewsets.ModelViewSet):
         """
         import json
         # Utiliser un dictionnaire simple pour les données modifiables
-        mutable_data = request.data.dict()
+        mutable_data = request.data.dict() if hasattr(request.data, 'dict') else dict(request.data)
         
         # Gérer donnees_formulaire si c'est une chaîne JSON (cas du multipart/form-data)
         donnees_formulaire = mutable_data.get('donnees_formulaire')
@@ -107,15 +111,30 @@ class DemandeViewSet(viewsets.ModelViewSet):
             except json.JSONDecodeError:
                 pass
 
+        # Pièces jointes déjà envoyées directement au stockage (upload pré-signé)
+        pieces_uploadees = mutable_data.pop('pieces_jointes', None) or []
+        if isinstance(pieces_uploadees, str):
+            try:
+                pieces_uploadees = json.loads(pieces_uploadees)
+            except json.JSONDecodeError:
+                return Response({'pieces_jointes': 'JSON invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
         # Utiliser les données préparées
         serializer = self.get_serializer(data=mutable_data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Vérifier les uploads avant de créer quoi que ce soit
+        pieces_verifiees = self._verifier_pieces_uploadees(pieces_uploadees)
         
-        # Créer la demande
-        demande = serializer.save()
+        # Créer la demande et ses pièces uploadées ensemble : pas de demande
+        # orpheline si l'attachement échoue
+        with transaction.atomic():
+            demande = serializer.save()
+            self._attacher_pieces_uploadees(demande, pieces_verifiees)
         
         # Traiter les fichiers envoyés comme pièces jointes (Optionnel / Automatique)
+        erreurs_pieces = []
         if request.FILES:
             for key, file_obj in request.FILES.items():
                 try:
@@ -144,10 +163,87 @@ class DemandeViewSet(viewsets.ModelViewSet):
                     import logging
                     logger = logging.getLogger(__name__)
                     logger.error(f"Erreur S3 lors de l'upload auto de {key}: {str(e)} - Type: {type(e)}")
+                    erreurs_pieces.append(key)
 
         # Retourner la réponse complète avec tous les détails
         full_serializer = DemandeSerializer(demande, context=self.get_serializer_context())
-        return Response(full_serializer.data, status=status.HTTP_201_CREATED)
+        data = full_serializer.data
+        if erreurs_pieces:
+            data['erreurs_pieces_jointes'] = erreurs_pieces
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def _verifier_pieces_uploadees(self, pieces):
+        """
+        Vérifie une liste de pièces uploadées directement au stockage :
+        [{"upload_id": "...", "type_piece": "cnib", "description": "..."}]
+        """
+        if not isinstance(pieces, list):
+            raise serializers.ValidationError({'pieces_jointes': 'Une liste est attendue'})
+
+        types_valides = {choice[0] for choice in DemandesPieceJointe.TYPE_PIECE_CHOICES}
+        for piece in pieces:
+            if not isinstance(piece, dict) or not piece.get('upload_id'):
+                raise serializers.ValidationError({'pieces_jointes': 'upload_id requis pour chaque pièce'})
+            if piece.get('type_piece', 'autre') not in types_valides:
+                raise serializers.ValidationError({'pieces_jointes': f"Type de pièce invalide: {piece.get('type_piece')}"})
+
+        verifies = uploads.verifier_uploads(
+            [piece['upload_id'] for piece in pieces], 'demande_piece_jointe'
+        )
+        return list(zip(pieces, verifies))
+
+    def _attacher_pieces_uploadees(self, demande, pieces_verifiees):
+        """Crée les pièces jointes en une seule requête (les doublons sont ignorés)"""
+        if not pieces_verifiees:
+            return []
+
+        cles = [fichier['cle'] for _, fichier in pieces_verifiees]
+        deja_attachees = set(
+            DemandesPieceJointe.objects.filter(fichier__in=cles).values_list('fichier', flat=True)
+        )
+        nouvelles = {}
+        for piece, fichier in pieces_verifiees:
+            if fichier['cle'] in deja_attachees or fichier['cle'] in nouvelles:
+                continue
+            nouvelles[fichier['cle']] = DemandesPieceJointe(
+                demande=demande,
+                type_piece=piece.get('type_piece', 'autre'),
+                fichier=fichier['cle'],
+                nom_original=fichier['nom'],
+                taille_fichier=fichier['taille'],
+                description=piece.get('description'),
+            )
+        return DemandesPieceJointe.objects.bulk_create(nouvelles.values())
+
+    @action(detail=True, methods=['post'], url_path='pieces-jointes/finaliser')
+    def finaliser_pieces_jointes(self, request, pk=None):
+        """
+        Attache à la demande des fichiers envoyés directement au stockage.
+        Les visiteurs anonymes doivent fournir la référence de la demande.
+        """
+        try:
+            demande = DemandesDemande.objects.get(pk=pk)
+        except DemandesDemande.DoesNotExist:
+            from rest_framework.exceptions import NotFound
+            raise NotFound("Demande introuvable.")
+
+        user = request.user
+        if not user.is_staff:
+            if demande.utilisateur is not None:
+                autorise = user.is_authenticated and demande.utilisateur_id == user.id
+            else:
+                reference = str(request.data.get('reference', '')).strip()
+                autorise = bool(reference) and reference.upper() == (demande.reference or '').upper()
+            if not autorise:
+                from rest_framework.exceptions import PermissionDenied
+                raise PermissionDenied("Vous ne pouvez pas ajouter de pièce jointe à cette demande")
+
+        pieces_verifiees = self._verifier_pieces_uploadees(request.data.get('pieces_jointes') or [])
+        creees = self._attacher_pieces_uploadees(demande, pieces_verifiees)
+        return Response({
+            'status': 'success',
+            'pieces_jointes': PieceJointeSerializer(creees, many=True, context={'request': request}).data
+        }, status=status.HTTP_201_CREATED)
 
     def retrieve(self, request, *args, **kwargs):
         """Interdire l'accès direct par ID pour les utilisateurs anonymes"""
@@ -168,13 +264,8 @@ class DemandeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        filters = Q(reference__iexact=reference)
-        if email:
-            filters &= Q(email_reception__iexact=email)
-
-        try:
-            demande = DemandesDemande.objects.get(filters)
-        except DemandesDemande.DoesNotExist:
+        demande = suivi.trouver(reference, email)
+        if demande is None:
             from rest_framework.exceptions import NotFound
             raise NotFound("Aucune demande trouvée avec cette référence.")
 
@@ -183,32 +274,86 @@ class DemandeViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def assigner_notaire(self, request, pk=None):
+        """
+        Attribue la demande au notaire `notaire_id`, ou sans notaire_id au
+        notaire disponible le moins chargé (voir apps/demandes/attribution.py).
+        """
+        from .attribution import AttributionImpossible, attribuer
+
         demande = self.get_object()
-        notaire_id = request.data.get('notaire_id')
-        
-        # Logique d'assignation
-        from apps.notaires.models import NotairesNotaire
+        notaire_id = request.data.get('notaire_id') or None
+        forcer = str(request.data.get('forcer', '')).lower() in ('1', 'true')
         try:
-            notaire = NotairesNotaire.objects.get(id=notaire_id, actif=True)
-            demande.notaire = notaire
-            demande.date_attribution = timezone.now()
-            demande.statut = 'en_traitement'
-            demande.save()
-            
-            return Response({
-                'status': 'success',
-                'message': f'Notaire {notaire.nom} assigné à la demande',
-                'demande': DemandeSerializer(demande).data
-            })
-        except NotairesNotaire.DoesNotExist:
+            demande = attribuer(demande.pk, notaire_id=notaire_id, forcer=forcer, utilisateur=request.user)
+        except AttributionImpossible as e:
             return Response({
                 'status': 'error',
-                'message': 'Notaire non trouvé ou inactif'
+                'message': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
-    
+
+        return Response({
+            'status': 'success',
+            'message': f'Notaire {demande.notaire.nom} assigné à la demande',
+            'demande': DemandeSerializer(demande, context={'request': request}).data
+        })
+
+    @action(detail=False, methods=['post'], url_path='attribuer-en-attente')
+    def attribuer_en_attente(self, request):
+        """Attribue en une passe les demandes en attente de traitement (admin)."""
+        from .attribution import attribuer_en_attente
+
+        if not request.user.is_staff:
+            from rest_framework.exceptions import PermissionDenied
+            raise PermissionDenied("Action réservée aux administrateurs")
+        try:
+            limite = int(request.data.get('limite') or 0) or None
+        except (TypeError, ValueError):
+            return Response({'limite': 'Entier attendu'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(attribuer_en_attente(limite))
+
+    @action(detail=False, methods=['get'], url_path='file')
+    def file_de_travail(self, request):
+        """
+        File de travail (admin) : demandes d'un statut actif (`statut`) ou en
+        traitement chez un notaire (`notaire`), plus anciennes d'abord.
+        """
+        if not request.user.is_staff:
+            from rest_framework.exceptions import PermissionDenied
+            raise PermissionDenied("Action réservée aux administrateurs")
+
+        notaire_id = request.query_params.get('notaire')
+        statut = request.query_params.get('statut', etats.EN_ATTENTE_TRAITEMENT)
+        if notaire_id:
+            queryset = etats.file_notaire(notaire_id)
+        elif statut in etats.STATUTS_ACTIFS:
+            queryset = etats.file_statut(statut)
+        else:
+            return Response({
+                'statut': f"Statut actif attendu parmi : {', '.join(etats.STATUTS_ACTIFS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = queryset.select_related('document', 'notaire')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(DemandeSerializer(page, many=True, context={'request': request}).data)
+        return Response(DemandeSerializer(queryset, many=True, context={'request': request}).data)
+
+    @action(detail=True, methods=['get'])
+    def historique(self, request, pk=None):
+        """Historique des changements de statut de la demande"""
+        demande = self.get_object()
+        return Response(list(
+            demande.transitions.order_by('created_at', 'id')
+            .values('de', 'vers', 'source', 'utilisateur', 'created_at')
+        ))
+
     @action(detail=True, methods=['post'])
     def completer_traitement(self, request, pk=None):
-        """Compléter le traitement d'une demande et envoyer le document par email"""
+        """
+        Compléter le traitement d'une demande : le document généré est écrit
+        dans le stockage et le client reçoit un lien de téléchargement signé
+        (envoi asynchrone, voir apps/demandes/livraison.py).
+        """
         demande = self.get_object()
         document_genere = request.FILES.get('document_genere')
 
@@ -223,76 +368,38 @@ class DemandeViewSet(viewsets.ModelViewSet):
                 'error': 'Aucun email de réception spécifié pour cette demande'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Sauvegarder le document généré
-        # Le document_genere est un CharField qui stocke le chemin/nom du fichier
-        document_genere.name  # S'assurer que le fichier a un nom
-        
-        # Envoyer l'email avec le document en pièce jointe
-        try:
-            from django.core.mail import EmailMessage
-            from django.conf import settings
-            
-            # Lire le contenu du fichier avant de l'envoyer
-            document_genere.seek(0)  # Se repositionner au début du fichier
-            document_content = document_genere.read()
-            document_genere.seek(0)  # Se repositionner à nouveau pour sauvegarde
-            
-            sujet = f"Votre document - Demande {demande.reference}"
-            message = f"""
-Bonjour,
-
-Votre demande de document (Référence: {demande.reference}) a été traitée avec succès.
-
-Détails de la commande :
-- Référence : {demande.reference}
-- Document : {demande.document.titre if hasattr(demande.document, 'titre') else 'Document'}
-- Montant payé : {demande.montant_total} FCFA
-
-Le document demandé est joint à cet email.
-
-Cordialement,
-L'Ordre des Notaires du Burkina Faso
-"""
-            
-            email = EmailMessage(
-                sujet,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [demande.email_reception],
-            )
-            
-            # Attacher le document généré
-            email.attach(
-                document_genere.name,
-                document_content,
-                document_genere.content_type
-            )
-            
-            email.send()
-            
-            # Sauvegarder le nom du fichier dans le modèle
-            demande.document_genere = document_genere.name
-            demande.statut = 'document_envoye_email'
-            demande.date_envoi_email = timezone.now()
-            demande.save()
-            
+        if not etats.peut_passer(demande.statut, etats.DOCUMENT_ENVOYE):
             return Response({
-                'status': 'success',
-                'message': f'Document envoyé par email à {demande.email_reception}',
-                'demande': DemandeSerializer(demande, context={'request': request}).data
-            })
-            
-        except Exception as e:
-            # En cas d'erreur d'envoi, retourner une erreur
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Erreur lors de l'envoi de l'email pour la demande {demande.id}: {str(e)}")
-            
+                'error': f'La demande ne peut pas être complétée (statut actuel : {demande.statut})'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        enregistrer_document(demande, document_genere)
+        demande.save(update_fields=['document_genere', 'updated_at'])
+        planifier_envoi(demande.pk)
+
+        return Response({
+            'status': 'accepted',
+            'message': f'Le lien de téléchargement va être envoyé à {demande.email_reception}',
+            'demande': DemandeSerializer(demande, context={'request': request}).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'], url_path='renvoyer-lien')
+    def renvoyer_lien(self, request, pk=None):
+        """Renvoyer au client un nouveau lien de téléchargement (admin)."""
+        if not request.user.is_staff:
+            from rest_framework.exceptions import PermissionDenied
+            raise PermissionDenied("Action réservée aux administrateurs")
+        demande = self.get_object()
+        if not demande.document_genere or not demande.email_reception:
             return Response({
-                'status': 'error',
-                'message': f'Erreur lors de l\'envoi de l\'email : {str(e)}',
-                'demande': DemandeSerializer(demande, context={'request': request}).data
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                'error': 'Aucun document généré ou email de réception pour cette demande'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        planifier_envoi(demande.pk)
+        return Response({
+            'status': 'accepted',
+            'message': f'Le lien de téléchargement va être renvoyé à {demande.email_reception}'
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 class PieceJointeViewSet(viewsets.ModelViewSet):
@@ -6,6 +6,8 @@ from django_filters import rest_framework as django_filters
 from django.db.models import Avg, Count, Q
 from .models import DocumentsDocument, DocumentsTextelegal
 from .serializers import DocumentSerializer, TexteLegalSerializer
+from apps.core.budget import budget_requetes, grouper
+from apps.core.cache import cached_public_response
 
 
 class DocumentFilter(django_filters.FilterSet):
@@ -161,17 +163,16 @@ class TexteLegalViewSet(viewsets.ModelViewSet):
         return Response(types_display)
     
     @action(detail=False, methods=['get'])
+    @cached_public_response(DocumentsTextelegal)
+    @budget_requetes(2)
     def par_type(self, request):
         """Groupement des textes légaux par type"""
         result = {}
-        queryset = self.get_queryset()
+        textes = grouper(self.get_queryset(), 'type_texte')
         
-        for choix in DocumentsTextelegal.TYPE_CHOICES:
-            type_value, type_display = choix
-            textes = queryset.filter(type_texte=type_value)
-            
-            if textes.exists():
-                serializer = self.get_serializer(textes, many=True)
+        for type_value, type_display in DocumentsTextelegal.TYPE_CHOICES:
+            if type_value in textes:
+                serializer = self.get_serializer(textes[type_value], many=True)
                 result[type_display] = serializer.data
         
         return Response(result)
@@ -1,6 +1,8 @@
 import json
 from rest_framework import serializers
 from django.db import transaction
+
+from apps.core import uploads
  
 from .models import (
     Evenement,
@@ -104,6 +106,8 @@ class ReponseChampSerializer(serializers.Serializer):
     """Serializer pour une réponse individuelle à un champ"""
     champ = serializers.IntegerField()
     valeur = serializers.JSONField(required=False, allow_null=True)
+    # Fichier envoyé directement au stockage (voir apps/core/uploads.py)
+    upload_id = serializers.CharField(required=False)
 
 
 class ReponsesJSONField(serializers.Field):
@@ -219,6 +223,12 @@ class InscriptionCreateSerializer(serializers.Serializer):
             champ = champs_map[champ_id]
 
             if champ.type == 'file':
+                if r.get('upload_id'):
+                    fichier_uploade = uploads.verifier_uploads(
+                        [r['upload_id']], 'evenement_reponse'
+                    )[0]
+                    r['fichier_uploade'] = fichier_uploade['cle']
+                    continue
                 fichier = self._get_file(champ_id)
                 self._validate_file(champ, fichier)
                 continue
@@ -287,6 +297,7 @@ class InscriptionCreateSerializer(serializers.Serializer):
                 )
             }
 
+            nouvelles_reponses = []
             for r in reponses:
                 champ = champs_map[r['champ']]
                 valeur = r.get('valeur')
@@ -305,9 +316,11 @@ class InscriptionCreateSerializer(serializers.Serializer):
                 elif champ.type == 'checkbox':
                     reponse.valeur_bool = valeur
                 elif champ.type == 'file':
-                    reponse.valeur_fichier = self._get_file(champ.id)
+                    reponse.valeur_fichier = r.get('fichier_uploade') or self._get_file(champ.id)
+
+                nouvelles_reponses.append(reponse)
 
-                reponse.save()
+            InscriptionReponse.objects.bulk_create(nouvelles_reponses)
 
             evenement.nombre_places -= 1
             evenement.save(update_fields=['nombre_places'])
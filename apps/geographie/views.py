@@ -7,8 +7,11 @@ from .models import GeographieRegion, GeographieVille
 from .serializers import RegionSerializer, VilleSerializer
 from rest_framework.decorators import action
 from .filters import VilleFilter
-class RegionViewSet(viewsets.ModelViewSet):
+from apps.core.cache import cached_public_response, PublicResponseCacheMixin
+class RegionViewSet(PublicResponseCacheMixin, viewsets.ModelViewSet):
     queryset = GeographieRegion.objects.all().order_by('ordre', 'nom')
+    # RegionSerializer expose le nombre de villes de chaque région
+    cache_models = (GeographieRegion, GeographieVille)
     serializer_class = RegionSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -23,14 +26,17 @@ class RegionViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
     @action(detail=True, methods=['get'])
+    @cached_public_response(GeographieRegion, GeographieVille)
     def villes(self, request, pk=None):
         region = self.get_object()
         villes = GeographieVille.objects.filter(region=region)
         serializer = VilleSerializer(villes, many=True)
         return Response(serializer.data) 
          
-class VilleViewSet(viewsets.ModelViewSet):
+class VilleViewSet(PublicResponseCacheMixin, viewsets.ModelViewSet):
     queryset = GeographieVille.objects.all().order_by('nom')
+    # VilleSerializer expose aussi le nom et le code de la région
+    cache_models = (GeographieVille, GeographieRegion)
     serializer_class = VilleSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
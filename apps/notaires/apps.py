@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class NotairesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.notaires'
+
+    def ready(self):
+        from . import services
+        services.connecter_signaux()
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geographie', '0001_initial'),
+        ('notaires', '0007_notairesnotaire_ifu_notairesnotaire_rscpm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotairesCharge',
+            fields=[
+                ('notaire', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='charge', serialize=False, to='notaires.notairesnotaire')),
+                ('disponible', models.BooleanField(default=True)),
+                ('demandes_actives', models.PositiveIntegerField(default=0)),
+                ('capacite', models.PositiveIntegerField(default=5)),
+                ('duree_moyenne', models.FloatField(default=0, help_text='Délai moyen attribution -> envoi (secondes)')),
+                ('demandes_traitees', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('region', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='geographie.geographieregion')),
+            ],
+            options={
+                'db_table': 'notaires_charge',
+                'managed': True,
+                'indexes': [models.Index(fields=['disponible', 'region', 'demandes_actives', 'duree_moyenne'], name='notaires_ch_disponi_e69483_idx'), models.Index(fields=['disponible', 'demandes_actives', 'duree_moyenne'], name='notaires_ch_disponi_e9479b_idx')],
+            },
+        ),
+    ]
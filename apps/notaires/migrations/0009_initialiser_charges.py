@@ -0,0 +1,35 @@
+# Index de charge initial : une ligne par notaire, demandes en_traitement comptées
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def initialiser(apps, schema_editor):
+    NotairesNotaire = apps.get_model('notaires', 'NotairesNotaire')
+    NotairesCharge = apps.get_model('notaires', 'NotairesCharge')
+    DemandesDemande = apps.get_model('demandes', 'DemandesDemande')
+
+    actives = dict(
+        DemandesDemande.objects.filter(statut='en_traitement', notaire__isnull=False)
+        .values('notaire').annotate(n=Count('id')).values_list('notaire', 'n')
+    )
+    charges = []
+    for pk, region_id, actif in NotairesNotaire.objects.values_list('pk', 'region_id', 'actif'):
+        n = actives.get(pk, 0)
+        charges.append(NotairesCharge(
+            notaire_id=pk, region_id=region_id, demandes_actives=n,
+            disponible=actif and n < 5,
+        ))
+    NotairesCharge.objects.bulk_create(charges, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notaires', '0008_notairescharge'),
+        ('demandes', '0004_alter_demandesdemande_utilisateur'),
+    ]
+
+    operations = [
+        migrations.RunPython(initialiser, migrations.RunPython.noop),
+    ]
@@ -56,6 +56,39 @@ class NotairesNotaire(models.Model):
         return self.assurance_rc_date_echeance >= timezone.now().date()
 
 
+class NotairesCharge(models.Model):
+    """
+    Index de charge de travail d'un notaire, tenu à jour par le moteur
+    d'attribution des demandes (apps/demandes/attribution.py).
+    """
+    notaire = models.OneToOneField(
+        NotairesNotaire, on_delete=models.CASCADE, primary_key=True, related_name='charge'
+    )
+    region = models.ForeignKey(
+        'geographie.GeographieRegion',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True
+    )
+    disponible = models.BooleanField(default=True)
+    demandes_actives = models.PositiveIntegerField(default=0)
+    capacite = models.PositiveIntegerField(default=5)
+    duree_moyenne = models.FloatField(default=0, help_text="Délai moyen attribution -> envoi (secondes)")
+    demandes_traitees = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'notaires_charge'
+        indexes = [
+            models.Index(fields=['disponible', 'region', 'demandes_actives', 'duree_moyenne']),
+            models.Index(fields=['disponible', 'demandes_actives', 'duree_moyenne']),
+        ]
+
+    def __str__(self):
+        return f'{self.notaire} - {self.demandes_actives}/{self.capacite}'
+
+
 class NotairesCotisation(models.Model):
     notaire = models.ForeignKey(NotairesNotaire, on_delete=models.CASCADE, related_name='cotisations')
     annee = models.PositiveIntegerField()
@@ -1,11 +1,13 @@
 # apps/notaires/serializers.py 
 from rest_framework import serializers
+from apps.core.images import ImageDerivesField
 from .models import NotairesNotaire, NotairesCotisation, NotairesStagiaire
 
 class NotaireMinimalSerializer(serializers.ModelSerializer):
     region_nom = serializers.CharField(source='region.nom', read_only=True, allow_null=True)
     ville_nom = serializers.CharField(source='ville.nom', read_only=True, allow_null=True)
     nom_complet = serializers.SerializerMethodField()
+    photo_variantes = ImageDerivesField(source='photo')
 
     class Meta:
         model = NotairesNotaire
@@ -15,6 +17,7 @@ class NotaireMinimalSerializer(serializers.ModelSerializer):
             'prenom',
             'nom_complet',
             'photo',
+            'photo_variantes',
             'telephone',
             'email',
             'region_nom',
@@ -35,11 +38,12 @@ class NotaireSerializer(serializers.ModelSerializer):
     nombre_demandes = serializers.SerializerMethodField()
     demandes_en_cours = serializers.SerializerMethodField()
     assurance_rc_valide = serializers.BooleanField(read_only=True)
+    photo_variantes = ImageDerivesField(source='photo')
 
     class Meta:
         model = NotairesNotaire
         fields = [
-            'id', 'matricule', 'nom', 'prenom', 'nom_complet', 'photo',
+            'id', 'matricule', 'nom', 'prenom', 'nom_complet', 'photo', 'photo_variantes',
             'telephone', 'email', 'adresse',
             'region', 'region_nom',
             'ville', 'ville_nom',
@@ -154,6 +158,7 @@ class StagiaireSerializer(serializers.ModelSerializer):
         read_only=True
     )
     notaire_nom_complet = serializers.SerializerMethodField()
+    photo_variantes = ImageDerivesField(source='photo')
 
     class Meta:
         model = NotairesStagiaire
@@ -166,6 +171,7 @@ class StagiaireSerializer(serializers.ModelSerializer):
             'nom',
             'prenom',
             'photo',
+            'photo_variantes',
             'email',
             'telephone',
             'statut',
@@ -0,0 +1,72 @@
+# apps/notaires/services.py
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_save
+
+from apps.core.cache_niveaux import cached, invalider
+from .models import NotairesNotaire
+
+TAG_NOTAIRES = 'notaires'
+
+
+@cached('notaires:stats', ttl=60, tags=[TAG_NOTAIRES])
+def statistiques():
+    """
+    Statistiques globales des notaires (tableau de bord admin), mises en
+    cache et invalidées à chaque notaire enregistré ou supprimé. Un
+    renommage de région n'est vu qu'à l'échéance (60 s).
+    """
+    stats_globales = NotairesNotaire.objects.aggregate(
+        total=Count('id'),
+        actifs=Count('id', filter=Q(actif=True)),
+        inactifs=Count('id', filter=Q(actif=False)),
+        total_ventes=Sum('total_ventes'),
+        total_cotisations=Sum('total_cotisations')
+    )
+
+    # Distribution par région
+    distribution_region = NotairesNotaire.objects.values(
+        'region__nom'
+    ).annotate(
+        count=Count('id'),
+        ventes=Sum('total_ventes')
+    ).order_by('-count')
+
+    # Top 10 notaires par ventes
+    top_ventes = NotairesNotaire.objects.filter(
+        total_ventes__gt=0
+    ).order_by('-total_ventes')[:10].values(
+        'id', 'nom', 'prenom', 'region__nom', 'total_ventes'
+    )
+
+    # Derniers inscrits
+    derniers_notaires = NotairesNotaire.objects.order_by(
+        '-created_at'
+    )[:5].values(
+        'id', 'nom', 'prenom', 'created_at'
+    )
+
+    return {
+        'globales': {
+            'total_notaires': stats_globales['total'] or 0,
+            'notaires_actifs': stats_globales['actifs'] or 0,
+            'notaires_inactifs': stats_globales['inactifs'] or 0,
+            'chiffre_affaires_total': float(stats_globales['total_ventes'] or 0),
+            'cotisations_total': float(stats_globales['total_cotisations'] or 0),
+        },
+        'distribution_par_region': list(distribution_region),
+        'top_ventes': list(top_ventes),
+        'derniers_inscrits': list(derniers_notaires),
+    }
+
+
+def _notaire_modifie(sender, **kwargs):
+    # Tout de suite et au commit : des statistiques relues avant le commit ne survivent pas
+    invalider(TAG_NOTAIRES)
+    transaction.on_commit(lambda: invalider(TAG_NOTAIRES))
+
+
+def connecter_signaux():
+    """Appelé depuis NotairesConfig.ready()."""
+    post_save.connect(_notaire_modifie, sender=NotairesNotaire, dispatch_uid='notaires_stats_save')
+    post_delete.connect(_notaire_modifie, sender=NotairesNotaire, dispatch_uid='notaires_stats_delete')
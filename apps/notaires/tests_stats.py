@@ -0,0 +1,37 @@
+# tests_stats.py - Statistiques des notaires mises en cache (apps/notaires/services.py)
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from apps.core import cache_niveaux
+from apps.utilisateurs.models import UtilisateursUser
+from .models import NotairesNotaire
+
+
+class NotaireStatsCacheTestCase(APITestCase):
+    """Statistiques servies depuis le cache, invalidées à l'enregistrement d'un notaire"""
+
+    def setUp(self):
+        cache.clear()
+        cache_niveaux.vider_l1()
+        self.notaire = NotairesNotaire.objects.create(matricule='N1', nom='Ouedraogo', prenom='Awa', actif=True)
+        admin = UtilisateursUser.objects.create_user(
+            username='admin', email='admin@notaires.bf', nom='Admin', prenom='Test',
+            password='pass', is_staff=True,
+        )
+        self.client.force_authenticate(user=admin)
+
+    def test_cache_puis_invalidation(self):
+        url = reverse('notaires-stats')
+        self.assertEqual(self.client.get(url).data['globales']['total_notaires'], 1)
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get(url)
+        self.assertFalse([q for q in requetes if 'notaires_notaire' in q['sql']])
+
+        self.notaire.actif = False
+        self.notaire.save()
+        self.assertEqual(self.client.get(url).data['globales']['notaires_inactifs'], 1)
+        NotairesNotaire.objects.create(matricule='N2', nom='Kabore', prenom='Issa', actif=True)
+        self.assertEqual(self.client.get(url).data['globales']['total_notaires'], 2)
@@ -18,9 +18,6 @@ router.register(r'cotisations', CotisationViewSet, basename='cotisation')
 router.register(r'stagiaires', StagiaireViewSet, basename='stagiaire')
 
 urlpatterns = [
-    # Routes REST standards (ViewSets)
-    path('', include(router.urls)),
-
     #  Statistiques globales (admin)
     path(
         'notaires/stats/',
@@ -34,4 +31,8 @@ urlpatterns = [
         RechercheNotairesAPIView.as_view(),
         name='notaires-recherche'
     ),
+
+    # Routes REST standards (ViewSets), après les chemins fixes que la route
+    # de détail notaires/<pk>/ capturerait sinon
+    path('', include(router.urls)),
 ]
@@ -10,6 +10,7 @@ from django.utils import timezone
 from datetime import timedelta
 from django.shortcuts import get_object_or_404
 
+from . import services
 from .models import NotairesNotaire, NotairesCotisation, NotairesStagiaire
 from .serializers import (
     NotaireSerializer, NotaireMinimalSerializer,
@@ -224,6 +225,7 @@ class NotaireViewSet(viewsets.ModelViewSet):
 class NotaireStatsAPIView(APIView):
     """API pour les statistiques globales des notaires"""
     permission_classes = [permissions.IsAuthenticated]
+    lecture_replica = True
     
     def get(self, request):
         # Vérifier les permissions (admin seulement)
@@ -233,51 +235,7 @@ class NotaireStatsAPIView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Statistiques globales
-        stats_globales = NotairesNotaire.objects.aggregate(
-            total=Count('id'),
-            actifs=Count('id', filter=Q(actif=True)),
-            inactifs=Count('id', filter=Q(actif=False)),
-            total_ventes=Sum('total_ventes'),
-            total_cotisations=Sum('total_cotisations')
-        )
-        
-        # Distribution par région
-        distribution_region = NotairesNotaire.objects.values(
-            'region__nom'
-        ).annotate(
-            count=Count('id'),
-            ventes=Sum('total_ventes')
-        ).order_by('-count')
-        
-        # Top 10 notaires par ventes
-        top_ventes = NotairesNotaire.objects.filter(
-            total_ventes__gt=0
-        ).order_by('-total_ventes')[:10].values(
-            'id', 'nom', 'prenom', 'region__nom', 'total_ventes'
-        )
-        
-        # Derniers inscrits
-        derniers_notaires = NotairesNotaire.objects.order_by(
-            '-created_at'
-        )[:5].values(
-            'id', 'nom', 'prenom', 'created_at'
-        )
-        
-        data = {
-            'globales': {
-                'total_notaires': stats_globales['total'] or 0,
-                'notaires_actifs': stats_globales['actifs'] or 0,
-                'notaires_inactifs': stats_globales['inactifs'] or 0,
-                'chiffre_affaires_total': float(stats_globales['total_ventes'] or 0),
-                'cotisations_total': float(stats_globales['total_cotisations'] or 0),
-            },
-            'distribution_par_region': list(distribution_region),
-            'top_ventes': list(top_ventes),
-            'derniers_inscrits': list(derniers_notaires),
-        }
-        
-        return Response(data)
+        return Response(services.statistiques())
 
 
 class CotisationViewSet(viewsets.ModelViewSet):
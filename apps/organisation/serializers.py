@@ -1,5 +1,6 @@
 # apps/organisation/serializers.py
 from rest_framework import serializers
+from apps.core.images import ImageDerivesField
 from .models import (
     OrganisationMembrebureau,
     OrganisationHistorique,
@@ -11,12 +12,13 @@ class MembreBureauMinimalSerializer(serializers.ModelSerializer):
     nom_complet = serializers.SerializerMethodField()
     poste_display = serializers.CharField(source='get_poste_display', read_only=True)
     photo_url = serializers.SerializerMethodField()
+    photo_variantes = ImageDerivesField(source='photo')
     
     class Meta:
         model = OrganisationMembrebureau
         fields = [
             'id', 'nom', 'prenom', 'nom_complet',
-            'poste', 'poste_display', 'photo_url',
+            'poste', 'poste_display', 'photo_url', 'photo_variantes',
             'ordre', 'actif'
         ]
     
@@ -37,13 +39,14 @@ class MembreBureauSerializer(serializers.ModelSerializer):
     poste_display = serializers.CharField(source='get_poste_display', read_only=True)
     photo_url = serializers.SerializerMethodField()
     est_en_mandat = serializers.BooleanField(read_only=True)
+    photo_variantes = ImageDerivesField(source='photo')
     
     class Meta:
         model = OrganisationMembrebureau
         fields = [
             'id', 'nom', 'prenom', 'nom_complet',
             'poste', 'poste_display',
-            'photo', 'photo_url',
+            'photo', 'photo_url', 'photo_variantes',
             'ordre', 'actif',
             'telephone', 'email', 'biographie',
             'mot_du_president',
@@ -12,9 +12,6 @@ router.register(r'historique', HistoriqueViewSet, basename='historique')
 router.register(r'missions', MissionViewSet, basename='mission')
 
 urlpatterns = [
-    # API REST standard via router
-    path('', include(router.urls)),
-    
     # Statistiques (admin)
     path('stats/', 
          BureauStatsAPIView.as_view(), 
@@ -45,4 +42,8 @@ urlpatterns = [
     path('membres-bureau/<int:pk>/desactiver/', 
          MembreBureauViewSet.as_view({'post': 'desactiver'}), 
          name='membre-desactiver'),
-]
\ No newline at end of file
+    
+    # API REST standard via router, après les chemins fixes que la route
+    # de détail membres-bureau/<pk>/ capturerait sinon
+    path('', include(router.urls)),
+]
@@ -7,6 +7,9 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Count, Q, Avg
 from datetime import date, timedelta
 
+from apps.core.budget import budget_requetes, grouper
+from apps.core.cache import cached_public_response, PublicResponseCacheMixin
+
 from .models import (
     OrganisationMembrebureau,
     OrganisationHistorique,
@@ -87,17 +90,17 @@ class MembreBureauViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @budget_requetes(2)
     def par_poste(self, request):
         """Grouper les membres par poste"""
-        queryset = self.get_queryset().filter(actif=True)
+        membres = grouper(self.get_queryset().filter(actif=True).order_by('ordre'), 'poste')
         
-        # Grouper par poste
+        # Grouper par poste, dans l'ordre des choix
         postes = {}
-        for poste_display, poste_value in OrganisationMembrebureau.POSTE_CHOICES:
-            membres = queryset.filter(poste=poste_value).order_by('ordre')
-            if membres.exists():
+        for poste_value, poste_display in OrganisationMembrebureau.POSTE_CHOICES:
+            if poste_value in membres:
                 postes[poste_display] = MembreBureauMinimalSerializer(
-                    membres, many=True, context={'request': request}
+                    membres[poste_value], many=True, context={'request': request}
                 ).data
         
         return Response(postes)
@@ -148,6 +151,7 @@ class MembreBureauViewSet(viewsets.ModelViewSet):
 class BureauStatsAPIView(APIView):
     """API pour les statistiques du bureau"""
     permission_classes = [permissions.IsAuthenticated]
+    budget_requetes = 4
     
     def get(self, request):
         # Vérifier les permissions (admin seulement)
@@ -157,46 +161,41 @@ class BureauStatsAPIView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Statistiques globales
-        total_membres = OrganisationMembrebureau.objects.count()
-        membres_actifs = OrganisationMembrebureau.objects.filter(actif=True).count()
-        
-        # Membres en mandat actuellement
         today = date.today()
-        membres_en_mandat = OrganisationMembrebureau.objects.filter(
-            actif=True,
-            mandat_debut__lte=today,
-            mandat_fin__gte=today
-        ).count()
+        membres = OrganisationMembrebureau.objects.order_by()
         
-        # Répartition par poste
-        repartition_par_poste = {}
-        for poste_display, poste_value in OrganisationMembrebureau.POSTE_CHOICES:
-            count = OrganisationMembrebureau.objects.filter(
-                poste=poste_value, actif=True
-            ).count()
-            if count > 0:
-                repartition_par_poste[poste_display] = count
+        # Statistiques globales et membres en mandat actuellement
+        totaux = membres.aggregate(
+            total_membres=Count('id'),
+            membres_actifs=Count('id', filter=Q(actif=True)),
+            membres_en_mandat=Count('id', filter=Q(
+                actif=True, mandat_debut__lte=today, mandat_fin__gte=today
+            )),
+        )
+        
+        # Répartition par poste : une requête groupée
+        comptes = dict(
+            membres.filter(actif=True).values_list('poste').annotate(nombre=Count('id'))
+        )
+        repartition_par_poste = {
+            poste_display: comptes[poste_value]
+            for poste_value, poste_display in OrganisationMembrebureau.POSTE_CHOICES
+            if comptes.get(poste_value)
+        }
         
-        # Ancienneté moyenne
-        membres_avec_date = OrganisationMembrebureau.objects.filter(
-            date_entree__isnull=False
+        # Ancienneté moyenne en années
+        dates_entree = list(
+            membres.filter(date_entree__isnull=False).values_list('date_entree', flat=True)
         )
-        if membres_avec_date.exists():
-            # Calcul de l'ancienneté en années
-            total_anciennete = 0
-            for membre in membres_avec_date:
-                anciennete = (date.today() - membre.date_entree).days / 365.25
-                total_anciennete += anciennete
-            
-            anciennete_moyenne = total_anciennete / membres_avec_date.count()
+        if dates_entree:
+            anciennete_moyenne = sum(
+                (today - date_entree).days / 365.25 for date_entree in dates_entree
+            ) / len(dates_entree)
         else:
             anciennete_moyenne = 0
         
         data = {
-            'total_membres': total_membres,
-            'membres_actifs': membres_actifs,
-            'membres_en_mandat': membres_en_mandat,
+            **totaux,
             'repartition_par_poste': repartition_par_poste,
             'anciennete_moyenne': round(anciennete_moyenne, 1)
         }
@@ -207,44 +206,43 @@ class BureauStatsAPIView(APIView):
 class BureauPublicAPIView(APIView):
     """API publique pour le bureau exécutif"""
     permission_classes = [permissions.AllowAny]
+    budget_requetes = 2
     
+    @cached_public_response(OrganisationMembrebureau)
     def get(self, request):
-        # Récupérer les membres du bureau exécutif actifs
+        # Membres actifs du bureau exécutif et conseillers, en une requête
         postes_executifs = [
             'president', 'vice_president', 
             'secretaire', 'secretaire_adjoint',
             'tresorier', 'tresorier_adjoint'
         ]
         
-        membres = OrganisationMembrebureau.objects.filter(
-            actif=True,
-            poste__in=postes_executifs
-        ).order_by('ordre')
+        membres = grouper(
+            OrganisationMembrebureau.objects.filter(
+                actif=True,
+                poste__in=[*postes_executifs, 'conseiller']
+            ).order_by('ordre'),
+            'poste'
+        )
         
         # Organiser par poste
         bureau_organise = {}
-        for poste_display, poste_value in OrganisationMembrebureau.POSTE_CHOICES:
-            if poste_value in postes_executifs:
-                membres_poste = membres.filter(poste=poste_value)
-                if membres_poste.exists():
-                    bureau_organise[poste_display] = MembreBureauMinimalSerializer(
-                        membres_poste, many=True, context={'request': request}
-                    ).data
+        for poste_value, poste_display in OrganisationMembrebureau.POSTE_CHOICES:
+            if poste_value in postes_executifs and poste_value in membres:
+                bureau_organise[poste_display] = MembreBureauMinimalSerializer(
+                    membres[poste_value], many=True, context={'request': request}
+                ).data
         
         # Ajouter les conseillers séparément
-        conseillers = OrganisationMembrebureau.objects.filter(
-            actif=True, poste='conseiller'
-        ).order_by('ordre')
-        
-        if conseillers.exists():
-                    bureau_organise['conseillers'] = MembreBureauMinimalSerializer(
-                conseillers, many=True, context={'request': request}
+        if 'conseiller' in membres:
+            bureau_organise['conseillers'] = MembreBureauMinimalSerializer(
+                membres['conseiller'], many=True, context={'request': request}
             ).data
         
         return Response(bureau_organise)
 
 
-class HistoriqueViewSet(viewsets.ModelViewSet):
+class HistoriqueViewSet(PublicResponseCacheMixin, viewsets.ModelViewSet):
     """API pour l'historique de l'Ordre"""
     queryset = OrganisationHistorique.objects.all()
     serializer_class = OrganisationHistoriqueSerializer
@@ -262,7 +260,7 @@ class HistoriqueViewSet(viewsets.ModelViewSet):
         return queryset.order_by('ordre', 'date_evenement')
 
 
-class MissionViewSet(viewsets.ModelViewSet):
+class MissionViewSet(PublicResponseCacheMixin, viewsets.ModelViewSet):
     """API pour les missions de l'Ordre"""
     queryset = OrganisationMission.objects.all()
     serializer_class = OrganisationMissionSerializer
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.paiements.services.reconciliation import ReconciliationService
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-vérifie auprès du fournisseur les paiements bloqués en initiee/en_attente '
+        '(à lancer via cron, ou en continu avec --boucle)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--boucle', type=int, metavar='SECONDES', default=0,
+            help='Relancer la réconciliation toutes les SECONDES secondes'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            rapport = ReconciliationService.executer()
+            self.stdout.write(self.style.SUCCESS(
+                f"{rapport['examinees']} transaction(s) examinée(s) : "
+                f"{rapport['validees']} validée(s), {rapport['echouees']} échouée(s), "
+                f"{rapport['inchangees']} inchangée(s), {len(rapport['erreurs'])} erreur(s), "
+                f"{len(rapport['sans_identifiant'])} sans identifiant fournisseur "
+                f"({rapport['duree']}s)"
+            ))
+            for reference, erreur in rapport['erreurs'].items():
+                self.stdout.write(self.style.WARNING(f'  {reference}: {erreur}'))
+
+            if not options['boucle']:
+                break
+            time.sleep(options['boucle'])
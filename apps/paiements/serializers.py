@@ -2,9 +2,11 @@ from rest_framework import serializers
 from decimal import Decimal, ROUND_HALF_UP
 import uuid
 from datetime import datetime
+from django.db import transaction as db_transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from .models import PaiementsTransaction
+from apps.demandes import etats
 from apps.demandes.models import DemandesDemande
 
 
@@ -128,30 +130,33 @@ class PaiementCreateSerializer(serializers.Serializer):
         unique_id = str(uuid.uuid4().hex[:8].upper())
         reference = f"TXN-{timestamp}-{unique_id}"
     
-        # Créer la transaction
-        transaction = PaiementsTransaction.objects.create(
-            reference=reference,
-            demande=demande,
-            type_paiement=type_paiement,
-            montant=montant,
-            commission=commission,
-            statut='initiee',
-            donnees_api={
-                'initiated_at': timezone.now().isoformat(),
-                'provider': type_paiement,
-                'montant': float(montant),
-                'commission': 0.0,
-                'demande_reference': demande.reference
-            },
-            date_creation=timezone.now(),
-            date_maj=timezone.now()
-        )
-    
-        # Mettre à jour le statut de la demande
-        demande.statut = 'attente_paiement'
-        demande.save()
-    
-        return transaction
+        with db_transaction.atomic():
+            # Statut de la demande vérifié sous verrou avant de créer la transaction :
+            # elle a pu changer depuis validate_demande_id
+            try:
+                etats.transition(demande.pk, etats.ATTENTE_PAIEMENT, 'paiement')
+            except etats.TransitionInvalide as e:
+                raise serializers.ValidationError({'demande_id': str(e)})
+
+            # Créer la transaction
+            transaction = PaiementsTransaction.objects.create(
+                reference=reference,
+                demande=demande,
+                type_paiement=type_paiement,
+                montant=montant,
+                commission=commission,
+                statut='initiee',
+                donnees_api={
+                    'initiated_at': timezone.now().isoformat(),
+                    'provider': type_paiement,
+                    'montant': float(montant),
+                    'commission': 0.0,
+                    'demande_reference': demande.reference
+                },
+                date_creation=timezone.now(),
+                date_maj=timezone.now()
+            )
+            return transaction
 
 
 class PaiementUpdateSerializer(serializers.ModelSerializer):
@@ -165,18 +170,20 @@ class PaiementUpdateSerializer(serializers.ModelSerializer):
         new_statut = validated_data.get('statut', instance.statut)
     
         # Si le statut passe à 'validee', mettre à jour la date de validation
-        if new_statut == 'validee' and instance.statut != 'validee':
-            validated_data['date_validation'] = timezone.now()
-        
-            # Mettre à jour le statut de la demande
-            demande = instance.demande
-            demande.statut = 'en_attente_traitement'
-            demande.save()
-    
-        # Mettre à jour la date de modification
-        validated_data['date_maj'] = timezone.now()
-    
-        return super().update(instance, validated_data)
+        with db_transaction.atomic():
+            if new_statut == 'validee' and instance.statut != 'validee':
+                validated_data['date_validation'] = timezone.now()
+
+                # Mettre à jour le statut de la demande (refusé si elle est close)
+                try:
+                    etats.transition(instance.demande_id, etats.EN_ATTENTE_TRAITEMENT, 'admin', paiement=True)
+                except etats.TransitionInvalide as e:
+                    raise serializers.ValidationError({'statut': str(e)})
+
+            # Mettre à jour la date de modification
+            validated_data['date_maj'] = timezone.now()
+
+            return super().update(instance, validated_data)
 
 
 class WebhookSerializer(serializers.Serializer):
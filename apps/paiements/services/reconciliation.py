@@ -0,0 +1,230 @@
+# apps/paiements/services/reconciliation.py
+"""
+Réconciliation des paiements restés en `initiee` / `en_attente`.
+
+Les transactions bloquées au-delà d'un seuil sont re-vérifiées auprès du
+fournisseur dans un pool de threads borné et limité en débit ; seuls les
+appels HTTP sont faits dans les threads, les transitions sont appliquées
+ensuite, une à une, sous verrou de ligne.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from apps.demandes import etats
+from apps.demandes.attribution import attribuer_apres_paiement
+from apps.demandes.models import DemandesDemande
+
+from ..models import PaiementsTransaction
+from . import get_payment_service
+
+logger = logging.getLogger(__name__)
+
+STATUTS_EN_COURS = ('initiee', 'en_attente')
+
+# Statuts renvoyés par les services (historiques) -> statuts du modèle
+STATUTS_LOCAUX = {
+    'reussi': 'validee',
+    'validee': 'validee',
+    'echec': 'echouee',
+    'echouee': 'echouee',
+    'en_attente': 'en_attente',
+}
+
+
+def extraire_id_fournisseur(transaction):
+    """Identifiant de la transaction chez le fournisseur, d'après `donnees_api`."""
+    api_data = transaction.donnees_api or {}
+    imbrique = api_data.get('data') if isinstance(api_data.get('data'), dict) else {}
+    return (
+        api_data.get('transaction_id')
+        or api_data.get('id')                  # payment intent Yengapay
+        or api_data.get('transactionId')
+        or imbrique.get('transaction_id')
+        or imbrique.get('transactionId')
+    )
+
+
+def _notifier_validation(transaction_id):
+    from apps.communications.services import SMSService
+
+    tx = PaiementsTransaction.objects.select_related('demande__utilisateur').get(pk=transaction_id)
+    utilisateur = tx.demande.utilisateur
+    if utilisateur and utilisateur.telephone:
+        try:
+            SMSService.send_payment_confirmation_sms(
+                phone_number=utilisateur.telephone,
+                transaction_reference=tx.reference,
+                amount=str(tx.montant),
+                user_name=utilisateur.nom,
+            )
+        except Exception as e:
+            # Ne pas faire échouer la transition si l'envoi SMS échoue
+            logger.error(f"Erreur envoi SMS confirmation paiement {tx.reference}: {e}")
+
+
+def appliquer_statut(transaction_id, statut, source, api_data=None):
+    """
+    Applique un statut fournisseur à une transaction, de façon idempotente.
+
+    Retourne (transaction, ancien_statut, modifie). Une transaction validée
+    ne change plus ; une transaction échouée peut encore être validée (le
+    fournisseur a finalement encaissé).
+    """
+    statut = STATUTS_LOCAUX.get(statut, statut)
+    with db_transaction.atomic():
+        # Demande puis transaction : même ordre de verrouillage que l'initiation
+        demande = DemandesDemande.objects.select_for_update(of=('self',)).get(paiementstransaction__pk=transaction_id)
+        tx = PaiementsTransaction.objects.select_for_update().get(pk=transaction_id)
+        ancien = tx.statut
+
+        donnees = tx.donnees_api or {}
+        if api_data is not None:
+            donnees[source] = {'received_at': timezone.now().isoformat(), 'data': api_data}
+        tx.donnees_api = donnees
+
+        modifie = ancien != statut and ancien != 'validee' and (
+            ancien in STATUTS_EN_COURS or statut == 'validee'
+        )
+        if not modifie:
+            tx.save(update_fields=['donnees_api', 'date_maj'])
+            return tx, ancien, False
+
+        tx.statut = statut
+        if statut in ('validee', 'echouee'):
+            tx.date_validation = timezone.now()
+        tx.save()
+
+        if statut == 'validee':
+            db_transaction.on_commit(lambda: _notifier_validation(tx.pk))
+            try:
+                etats.appliquer(demande, etats.EN_ATTENTE_TRAITEMENT, source, paiement=True)
+            except etats.TransitionInvalide as e:
+                # Paiement encaissé sur une demande close : à traiter à la main
+                logger.error(f"Paiement {tx.reference} validé : {e}")
+            else:
+                db_transaction.on_commit(lambda: attribuer_apres_paiement(tx.demande_id))
+
+    logger.info(f"Paiement {tx.reference}: {ancien} -> {statut} ({source})")
+    return tx, ancien, True
+
+
+class _LimiteurDebit:
+    """Limiteur simple partagé entre threads : au plus `par_seconde` appels/s."""
+
+    def __init__(self, par_seconde):
+        self.intervalle = 1.0 / par_seconde if par_seconde else 0
+        self.prochain = time.monotonic()
+        self.lock = threading.Lock()
+
+    def attendre(self):
+        if not self.intervalle:
+            return
+        with self.lock:
+            maintenant = time.monotonic()
+            attente = self.prochain - maintenant
+            self.prochain = max(self.prochain, maintenant) + self.intervalle
+        if attente > 0:
+            time.sleep(attente)
+
+
+class ReconciliationService:
+    """Re-vérification périodique des paiements en attente."""
+
+    RAPPORT_KEY = 'paiements:reconciliation:dernier_rapport'
+
+    @staticmethod
+    def _config():
+        config = {
+            'SEUIL_SECONDES': 120,
+            'AGE_MAX_HEURES': 72,
+            'LOT': 200,
+            'WORKERS': 4,
+            'RATE_LIMIT': 5,
+        }
+        config.update(getattr(settings, 'PAIEMENTS_RECONCILIATION', {}))
+        return config
+
+    @classmethod
+    def transactions_bloquees(cls):
+        config = cls._config()
+        maintenant = timezone.now()
+        return (
+            PaiementsTransaction.objects
+            .filter(
+                statut__in=STATUTS_EN_COURS,
+                date_maj__lte=maintenant - timedelta(seconds=config['SEUIL_SECONDES']),
+                date_creation__gte=maintenant - timedelta(hours=config['AGE_MAX_HEURES']),
+            )
+            .order_by('date_maj')[:config['LOT']]
+        )
+
+    @staticmethod
+    def _verifier(tx, id_fournisseur, limiteur):
+        limiteur.attendre()
+        try:
+            return get_payment_service(tx).verify_payment(id_fournisseur)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    @classmethod
+    def executer(cls):
+        """Réconcilie un lot de transactions et retourne le rapport."""
+        config = cls._config()
+        debut = time.monotonic()
+        rapport = {
+            'examinees': 0, 'validees': 0, 'echouees': 0, 'inchangees': 0,
+            'sans_identifiant': [], 'erreurs': {},
+        }
+
+        a_verifier = []
+        for tx in cls.transactions_bloquees():
+            rapport['examinees'] += 1
+            id_fournisseur = extraire_id_fournisseur(tx)
+            if id_fournisseur:
+                a_verifier.append((tx, id_fournisseur))
+            else:
+                rapport['sans_identifiant'].append(tx.reference)
+
+        limiteur = _LimiteurDebit(config['RATE_LIMIT'])
+        with ThreadPoolExecutor(max_workers=config['WORKERS'], thread_name_prefix='reconciliation') as pool:
+            resultats = list(pool.map(lambda item: cls._verifier(*item, limiteur), a_verifier))
+
+        for (tx, _), resultat in zip(a_verifier, resultats):
+            if not resultat.get('success'):
+                rapport['erreurs'][tx.reference] = resultat.get('error')
+                continue
+            try:
+                _, _, modifie = appliquer_statut(
+                    tx.pk, resultat['status'], 'reconciliation', resultat.get('api_data', {})
+                )
+            except Exception as e:
+                rapport['erreurs'][tx.reference] = str(e)
+                continue
+            statut = STATUTS_LOCAUX.get(resultat['status'], resultat['status'])
+            if modifie and statut == 'validee':
+                rapport['validees'] += 1
+            elif modifie and statut == 'echouee':
+                rapport['echouees'] += 1
+            else:
+                rapport['inchangees'] += 1
+
+        # appliquer_statut met à jour date_maj ; on fait de même pour les
+        # transactions non vérifiées afin qu'elles ne bloquent pas la tête
+        # du lot suivant.
+        PaiementsTransaction.objects.filter(
+            reference__in=rapport['sans_identifiant'] + list(rapport['erreurs'])
+        ).update(date_maj=timezone.now())
+
+        rapport['duree'] = round(time.monotonic() - debut, 3)
+        rapport['date'] = timezone.now().isoformat()
+        cache.set(cls.RAPPORT_KEY, rapport, timeout=None)
+        logger.info(f"Réconciliation des paiements: {rapport}")
+        return rapport
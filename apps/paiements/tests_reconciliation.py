@@ -0,0 +1,127 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from apps.demandes.models import DemandesDemande
+from apps.documents.models import DocumentsDocument
+from apps.paiements.models import PaiementsTransaction
+from apps.paiements.serializers import PaiementUpdateSerializer
+from apps.paiements.services.reconciliation import (
+    ReconciliationService, appliquer_statut, extraire_id_fournisseur
+)
+from apps.utilisateurs.models import User
+
+
+@override_settings(PAIEMENTS_RECONCILIATION={'SEUIL_SECONDES': 60, 'WORKERS': 2, 'RATE_LIMIT': 0})
+class ReconciliationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='password123',
+            nom='Test', prenom='User', telephone='22675757575'
+        )
+        self.doc = DocumentsDocument.objects.create(
+            reference='DOC-TEST-001', nom='Test Document', description='Test',
+            prix=5000, delai_heures=120
+        )
+
+    def _transaction(self, reference, statut='en_attente', donnees_api=None, age=300):
+        demande = DemandesDemande.objects.create(
+            utilisateur=self.user, statut='attente_paiement', montant_total=5000,
+            reference=f'DEM-{reference}', document=self.doc
+        )
+        tx = PaiementsTransaction.objects.create(
+            demande=demande, type_paiement='yengapay', montant=5000, reference=reference,
+            statut=statut, donnees_api={'id': f'intent-{reference}'} if donnees_api is None else donnees_api
+        )
+        PaiementsTransaction.objects.filter(pk=tx.pk).update(
+            date_maj=timezone.now() - timedelta(seconds=age)
+        )
+        return tx
+
+    def test_extraire_id_fournisseur_yengapay(self):
+        tx = self._transaction('TX-1')
+        self.assertEqual(extraire_id_fournisseur(tx), 'intent-TX-1')
+
+    @patch('apps.paiements.services.yengapay.YengapayService.verify_payment')
+    def test_reconciliation_applique_les_statuts(self, mock_verify):
+        statuts = {'intent-TX-OK': 'reussi', 'intent-TX-KO': 'echec', 'intent-TX-ATT': 'en_attente'}
+        mock_verify.side_effect = lambda id_: {'success': True, 'status': statuts[id_], 'api_data': {}}
+        ok = self._transaction('TX-OK')
+        ko = self._transaction('TX-KO', statut='initiee')
+        self._transaction('TX-ATT')
+        self._transaction('TX-RECENT', age=0)
+        self._transaction('TX-SANS-ID', donnees_api={})
+
+        rapport = ReconciliationService.executer()
+
+        self.assertEqual(rapport['examinees'], 4)
+        self.assertEqual(rapport['validees'], 1)
+        self.assertEqual(rapport['echouees'], 1)
+        self.assertEqual(rapport['inchangees'], 1)
+        self.assertEqual(rapport['sans_identifiant'], ['TX-SANS-ID'])
+        self.assertEqual(mock_verify.call_count, 3)
+
+        ok.refresh_from_db()
+        ko.refresh_from_db()
+        self.assertEqual(ok.statut, 'validee')
+        self.assertEqual(ok.demande.statut, 'en_attente_traitement')
+        self.assertEqual(ko.statut, 'echouee')
+
+        # Les transactions traitées ne sont pas re-vérifiées au passage suivant
+        mock_verify.reset_mock()
+        self.assertEqual(ReconciliationService.executer()['examinees'], 0)
+        mock_verify.assert_not_called()
+
+    @patch('apps.paiements.services.yengapay.YengapayService.verify_payment')
+    def test_erreur_fournisseur_rapportee(self, mock_verify):
+        mock_verify.return_value = {'success': False, 'error': 'timeout'}
+        tx = self._transaction('TX-ERR')
+
+        rapport = ReconciliationService.executer()
+
+        self.assertEqual(rapport['erreurs'], {'TX-ERR': 'timeout'})
+        tx.refresh_from_db()
+        self.assertEqual(tx.statut, 'en_attente')
+
+    def test_appliquer_statut_idempotent(self):
+        tx = self._transaction('TX-IDEM')
+
+        _, ancien, modifie = appliquer_statut(tx.pk, 'validee', 'webhook_yengapay', {})
+        self.assertEqual(ancien, 'en_attente')
+        self.assertTrue(modifie)
+
+        _, _, modifie = appliquer_statut(tx.pk, 'validee', 'webhook_yengapay', {})
+        self.assertFalse(modifie)
+
+        # Une transaction validée ne redevient pas échouée
+        tx, _, modifie = appliquer_statut(tx.pk, 'echouee', 'reconciliation', {})
+        self.assertFalse(modifie)
+        self.assertEqual(tx.statut, 'validee')
+
+    def test_paiement_valide_sur_demande_annulee(self):
+        webhook = self._transaction('TX-WH')
+        admin = self._transaction('TX-ADM')
+        DemandesDemande.objects.filter(pk__in=[webhook.demande_id, admin.demande_id]).update(statut='annule')
+
+        # Webhook historique : acquitté, la demande reste annulée
+        with self.assertLogs('apps.paiements.views', 'ERROR'):
+            response = self.client.post(
+                reverse('paiements:paiement-webhook'), {'reference': 'TX-WH', 'statut': 'SUCCESS'},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        webhook.refresh_from_db()
+        self.assertEqual(webhook.statut, 'validee')
+        self.assertEqual(webhook.demande.statut, 'annule')
+
+        # API d'administration : refus, rien n'est enregistré
+        serializer = PaiementUpdateSerializer(admin, data={'statut': 'validee'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        admin.refresh_from_db()
+        self.assertEqual(admin.statut, 'en_attente')
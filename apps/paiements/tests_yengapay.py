@@ -110,3 +110,113 @@ class YengapayIntegrationTest(TestCase):
         self.assertEqual(self.transaction.statut, 'validee')
         self.demande.refresh_from_db()
         self.assertEqual(self.demande.statut, 'en_attente_traitement')
+
+
+class InitierPaiementIdempotenceTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from apps.documents.models import DocumentsDocument
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser', email='test@example.com', password='password123',
+            nom='Test', prenom='User', telephone='22675757575'
+        )
+        doc = DocumentsDocument.objects.create(
+            reference='DOC-TEST-001', nom='Test Document', description='Test Description',
+            prix=5000, delai_heures=120
+        )
+        self.demande = DemandesDemande.objects.create(
+            utilisateur=self.user, statut='attente_paiement', montant_total=5000,
+            reference='DEM-12345', document=doc
+        )
+        self.url = reverse('paiements:initier-paiement')
+
+    def _initier(self, **headers):
+        return self.client.post(
+            self.url, data=json.dumps({'demande_id': self.demande.id}),
+            content_type='application/json', **headers
+        )
+
+    @patch.object(YengapayService, 'initiate_payment')
+    def test_cle_idempotence_rejoue_la_premiere_reponse(self, mock_initiate):
+        mock_initiate.return_value = {
+            'success': True, 'payment_url': 'https://checkout/1', 'transaction_id': 'intent-1', 'api_data': {'id': 'intent-1'}
+        }
+
+        premiere = self._initier(HTTP_IDEMPOTENCY_KEY='cle-1')
+        seconde = self._initier(HTTP_IDEMPOTENCY_KEY='cle-1')
+
+        self.assertEqual(premiere.status_code, 200)
+        self.assertEqual(seconde.status_code, 200)
+        self.assertEqual(seconde['Idempotent-Replayed'], 'true')
+        self.assertEqual(seconde.json(), premiere.json())
+        self.assertEqual(mock_initiate.call_count, 1)
+        self.assertEqual(PaiementsTransaction.objects.filter(demande=self.demande).count(), 1)
+
+    @patch.object(YengapayService, 'initiate_payment')
+    def test_nouvelle_tentative_reutilise_l_url_en_cache(self, mock_initiate):
+        mock_initiate.return_value = {
+            'success': True, 'payment_url': 'https://checkout/1', 'transaction_id': 'intent-1', 'api_data': {'id': 'intent-1'}
+        }
+
+        premiere = self._initier()
+        seconde = self._initier()
+
+        self.assertEqual(seconde.status_code, 200)
+        self.assertEqual(seconde.json()['payment_url'], 'https://checkout/1')
+        self.assertEqual(seconde.json()['transaction']['id'], premiere.json()['transaction']['id'])
+        self.assertEqual(mock_initiate.call_count, 1)
+
+    @patch.object(YengapayService, 'initiate_payment')
+    def test_echec_puis_nouvelle_tentative_reutilise_la_transaction(self, mock_initiate):
+        mock_initiate.return_value = {'success': False, 'error': 'indisponible', 'api_data': {}}
+        premiere = self._initier()
+        self.assertEqual(premiere.status_code, 400)
+        tx = PaiementsTransaction.objects.get(demande=self.demande)
+        self.assertEqual(tx.statut, 'echouee')
+
+        mock_initiate.return_value = {
+            'success': True, 'payment_url': 'https://checkout/2', 'transaction_id': 'intent-2', 'api_data': {'id': 'intent-2'}
+        }
+        seconde = self._initier()
+
+        self.assertEqual(seconde.status_code, 200)
+        tx_apres = PaiementsTransaction.objects.get(demande=self.demande)
+        self.assertEqual(tx_apres.pk, tx.pk)
+        self.assertEqual(tx_apres.statut, 'initiee')
+        self.assertNotEqual(tx_apres.reference, tx.reference)
+
+    @patch.object(YengapayService, 'initiate_payment')
+    def test_cle_propre_a_l_appelant(self, mock_initiate):
+        mock_initiate.return_value = {
+            'success': True, 'payment_url': 'https://checkout/1', 'transaction_id': 'intent-1', 'api_data': {'id': 'intent-1'}
+        }
+        self._initier(HTTP_IDEMPOTENCY_KEY='cle-3', REMOTE_ADDR='10.0.0.1')
+        autre = self._initier(HTTP_IDEMPOTENCY_KEY='cle-3', REMOTE_ADDR='10.0.0.2')
+        self.assertNotIn('Idempotent-Replayed', autre)
+
+
+    def test_empreinte_d_un_corps_liste(self):
+        from rest_framework.parsers import JSONParser
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from apps.core.idempotence import empreinte_requete
+
+        def empreinte(corps):
+            requete = APIRequestFactory().post(self.url, corps, format='json')
+            return empreinte_requete(Request(requete, parsers=[JSONParser()]))
+
+        self.assertEqual(empreinte([1, 2]), empreinte([1, 2]))
+        self.assertNotEqual(empreinte([1, 2]), empreinte([2, 1]))
+
+    def test_meme_cle_avec_un_autre_corps_refusee(self):
+        with patch.object(YengapayService, 'initiate_payment', return_value={
+            'success': False, 'error': 'indisponible', 'api_data': {}
+        }):
+            self._initier(HTTP_IDEMPOTENCY_KEY='cle-2')
+
+        response = self.client.post(
+            self.url, data=json.dumps({'demande_id': self.demande.id, 'type_paiement': 'autre'}),
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY='cle-2'
+        )
+        self.assertEqual(response.status_code, 422)
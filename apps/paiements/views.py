@@ -13,11 +13,14 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 import io
+import logging
 from .models import PaiementsTransaction
-from .serializers import PaiementSerializer, PaiementCreateSerializer
+from .serializers import PaiementSerializer, PaiementCreateSerializer, WebhookSerializer
 from apps.demandes.models import DemandesDemande
 from apps.communications.services import SMSService
 
+logger = logging.getLogger(__name__)
+
 
 class PaiementViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = PaiementsTransaction.objects.all().order_by('-date_creation')
@@ -69,10 +72,15 @@ class PaiementWebhookAPIView(APIView):
                 tx.date_validation = timezone.now()
                 tx.save()
 
-                # Propager sur la demande
-                demande = tx.demande
-                demande.statut = 'en_attente_traitement'
-                demande.save()
+                # Propager sur la demande (machine à états, sous verrou)
+                from apps.demandes import etats
+                try:
+                    demande = etats.transition(tx.demande_id, etats.EN_ATTENTE_TRAITEMENT, 'webhook', paiement=True)
+                except etats.TransitionInvalide as e:
+                    # Paiement encaissé sur une demande close : acquitté (sinon le
+                    # fournisseur rejoue la notification), à traiter à la main
+                    logger.error(f"Paiement {tx.reference} validé : {e}")
+                    return Response({'detail': 'ok'})
 
                 # Envoyer un SMS de confirmation de paiement
                 try:
@@ -90,8 +98,6 @@ class PaiementWebhookAPIView(APIView):
                         )
                 except Exception as e:
                     # Ne pas échouer le webhook si l'envoi SMS échoue
-                    import logging
-                    logger = logging.getLogger(__name__)
                     logger.error(f"Erreur envoi SMS confirmation paiement {tx.reference}: {e}")
             else:
                 tx.save()
@@ -104,12 +110,17 @@ from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from django.db import transaction as db_transaction
+from django.core.cache import cache
+from django.conf import settings as conf_settings
 import json
 
 from notaires_bf import settings
 
 # Import des services
 from .services import get_payment_service
+from .services.reconciliation import appliquer_statut, extraire_id_fournisseur
+from apps.core.idempotence import executer_idempotent
 from .models import PaiementsTransaction
 from .serializers import (
     PaiementSerializer, 
@@ -121,15 +132,44 @@ from .serializers import (
 )
 
 class InitierPaiementView(APIView):
-    """Vue pour initier un paiement avec l'API de l'opérateur"""
+    """
+    Vue pour initier un paiement avec l'API de l'opérateur.
+
+    - En-tête `Idempotency-Key` : la première réponse est rejouée pour les
+      doublons (double clic, nouvelle tentative du client).
+    - La demande est verrouillée (select_for_update) le temps de créer ou de
+      réutiliser sa transaction ; l'appel à l'opérateur se fait ensuite,
+      hors transaction.
+    - L'URL de paiement obtenue est mise en cache par transaction : une
+      nouvelle tentative ne rappelle pas l'opérateur.
+    """
     permission_classes = [permissions.AllowAny]
-    
+
+    CHECKOUT_KEY = 'paiements:checkout:{}'
+    INITIATION_KEY = 'paiements:initiation:{}'
+
+    @staticmethod
+    def _config():
+        config = {'CHECKOUT_TIMEOUT': 1800, 'INITIATION_TIMEOUT': 60}
+        config.update(getattr(conf_settings, 'PAIEMENTS_INITIATION', {}))
+        return config
+
     def post(self, request):
+        return executer_idempotent(request, 'initier-paiement', lambda: self._initier(request))
+
+    def _reponse_succes(self, transaction, checkout):
+        return Response({
+            'status': 'success',
+            'message': 'Paiement initié avec succès',
+            'transaction': PaiementSerializer(transaction).data,
+            'payment_url': checkout['payment_url'],
+            'transaction_id': checkout.get('transaction_id'),
+            'next_step': 'Redirigez l\'utilisateur vers payment_url pour effectuer le paiement'
+        })
+
+    def _initier(self, request):
         from apps.demandes.models import DemandesDemande
         
-        print(f"DEBUG PAYMENT INIT: Data received: {request.data}")
-        print(f"DEBUG PAYMENT INIT: Query params: {request.query_params}")
-        
         # Support snake_case (standard) and camelCase (JS frontend)
         # Also check query params as fallback
         def get_param(key_snake, key_camel):
@@ -153,117 +193,111 @@ class InitierPaiementView(APIView):
                 {'error': 'demande_id est requis'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        config = self._config()
         
-        try:
-            # Récupérer la demande
-            # On autorise tout le monde à payer une demande en attente de paiement
-            # C'est une opération "write-only" (initiation) sécuritaire
+        # Création / réutilisation de la transaction sous verrou de la demande
+        with db_transaction.atomic():
             try:
-                demande = DemandesDemande.objects.get(id=demande_id)
-                print(f"DEBUG PAYMENT INIT: Demande {demande_id} found. Status: {demande.statut}")
-                
-                if demande.statut not in ['attente_paiement', 'attente_formulaire']:
-                    print(f"DEBUG PAYMENT INIT: Invalid status {demande.statut} for demande {demande_id}")
-                    return Response(
-                        {'error': f'La demande n\'est pas en attente de paiement (Statut actuel: {demande.statut})'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            except DemandesDemande.DoesNotExist:
-                print(f"DEBUG PAYMENT INIT: Demande {demande_id} does not exist in DB")
+                demande = DemandesDemande.objects.select_for_update().get(id=demande_id)
+            except (DemandesDemande.DoesNotExist, ValueError):
                 return Response(
                     {'error': f'Demande {demande_id} introuvable'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            
-            # Vérifier si une transaction existe déjà
-            if hasattr(demande, 'paiementstransaction'):
-                existing_tx = demande.paiementstransaction
-                if existing_tx.statut in ['echouee', 'initiee', 'brouillon']:
-                    # On supprime l'ancienne transaction pour en recréer une
-                    print(f"DEBUG PAYMENT INIT: Deleting old transaction {existing_tx.reference} with status {existing_tx.statut}")
-                    existing_tx.delete()
-                elif existing_tx.statut == 'validee':
-                    return Response(
-                        {'error': 'Cette demande a déjà été payée'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                else:
-                    # En attente, etc.
-                    return Response(
-                        {'error': f'Une transaction est déjà en cours (Statut: {existing_tx.statut})'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            # Créer la transaction sans commission ajoutée (commission mise à 0)
-            transaction = PaiementsTransaction.objects.create(
-                demande=demande,
-                type_paiement=type_paiement,
-                montant=demande.montant_total,
-                commission=0,
-                statut='initiee',
-                donnees_api={},
-                date_creation=timezone.now(),
-                date_maj=timezone.now()
-            )
-            
-            # Générer une référence si non fournie
-            if not transaction.reference:
-                transaction.reference = f"TXN-{int(timezone.now().timestamp())}-{demande.id}"
-                transaction.save()
-            
-            # Obtenir le service de paiement et initier le paiement
-            try:
-                payment_service = get_payment_service(transaction)
-                payment_result = payment_service.initiate_payment()
-                
-                if not payment_result['success']:
-                    # Si l'initiation échoue, marquer la transaction comme échec
-                    error_msg = payment_result.get('error')
-                    print(f"DEBUG PAYMENT ERROR: {error_msg}")
-                    transaction.statut = 'echec'
-                    transaction.donnees_api = payment_result.get('api_data', {})
-                    transaction.save()
-                    
-                    return Response({
-                        'status': 'error',
-                        'message': f"Échec de l'initiation du paiement: {error_msg}",
-                        'transaction': PaiementSerializer(transaction).data
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Sauvegarder les données de l'API
-                transaction.donnees_api = payment_result.get('api_data', {})
-                transaction.save()
-                
-                # Retourner l'URL de paiement
-                return Response({
-                    'status': 'success',
-                    'message': 'Paiement initié avec succès',
-                    'transaction': PaiementSerializer(transaction).data,
-                    'payment_url': payment_result['payment_url'],
-                    'transaction_id': payment_result.get('transaction_id'),
-                    'next_step': 'Redirigez l\'utilisateur vers payment_url pour effectuer le paiement'
-                })
-                
-            except Exception as e:
-                transaction.statut = 'echec'
-                transaction.donnees_api = {'error': str(e)}
+
+            # On autorise tout le monde à payer une demande en attente de paiement
+            if demande.statut not in ['attente_paiement', 'attente_formulaire']:
+                return Response(
+                    {'error': f'La demande n\'est pas en attente de paiement (Statut actuel: {demande.statut})'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            transaction = PaiementsTransaction.objects.filter(demande=demande).first()
+            if transaction and transaction.statut == 'validee':
+                return Response(
+                    {'error': 'Cette demande a déjà été payée'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if transaction and transaction.statut not in ['initiee', 'echouee']:
+                return Response(
+                    {'error': f'Une transaction est déjà en cours (Statut: {transaction.statut})'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if transaction and transaction.statut == 'initiee':
+                checkout = cache.get(self.CHECKOUT_KEY.format(transaction.pk))
+                if checkout:
+                    return self._reponse_succes(transaction, checkout)
+
+            if transaction and not cache.add(
+                self.INITIATION_KEY.format(transaction.pk), 1, config['INITIATION_TIMEOUT']
+            ):
+                return Response(
+                    {'error': 'Une initiation de paiement est déjà en cours pour cette demande'},
+                    status=status.HTTP_409_CONFLICT,
+                    headers={'Retry-After': '2'}
+                )
+
+            # Nouvelle référence à chaque session opérateur (sans commission ajoutée)
+            reference = f"TXN-{int(timezone.now().timestamp() * 1000)}-{demande.id}"
+            if transaction is None:
+                transaction = PaiementsTransaction.objects.create(
+                    reference=reference,
+                    demande=demande,
+                    type_paiement=type_paiement,
+                    montant=demande.montant_total,
+                    commission=0,
+                    statut='initiee',
+                    donnees_api={}
+                )
+                cache.add(self.INITIATION_KEY.format(transaction.pk), 1, config['INITIATION_TIMEOUT'])
+            else:
+                # Session expirée ou échouée : on réutilise la ligne (lien one-to-one)
+                transaction.reference = reference
+                transaction.type_paiement = type_paiement
+                transaction.montant = demande.montant_total
+                transaction.commission = 0
+                transaction.statut = 'initiee'
+                transaction.donnees_api = {}
+                transaction.date_validation = None
                 transaction.save()
-                
-                return Response({
-                    'status': 'error',
-                    'message': f'Erreur lors de l\'initiation du paiement: {str(e)}'
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        except DemandesDemande.DoesNotExist:
-            return Response(
-                {'error': 'Demande non trouvée ou non éligible au paiement'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+
+        # Appel à l'opérateur hors transaction ; les autres tentatives reçoivent un 409
+        try:
+            payment_service = get_payment_service(transaction)
+            payment_result = payment_service.initiate_payment()
         except Exception as e:
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+            transaction.statut = 'echouee'
+            transaction.donnees_api = {'error': str(e)}
+            transaction.save(update_fields=['statut', 'donnees_api', 'date_maj'])
+            return Response({
+                'status': 'error',
+                'message': f'Erreur lors de l\'initiation du paiement: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        finally:
+            cache.delete(self.INITIATION_KEY.format(transaction.pk))
+
+        transaction.donnees_api = payment_result.get('api_data', {})
+        if not payment_result['success']:
+            error_msg = payment_result.get('error')
+            transaction.statut = 'echouee'
+            transaction.save(update_fields=['statut', 'donnees_api', 'date_maj'])
+            return Response({
+                'status': 'error',
+                'message': f"Échec de l'initiation du paiement: {error_msg}",
+                'transaction': PaiementSerializer(transaction).data
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        checkout = {
+            'payment_url': payment_result['payment_url'],
+            'transaction_id': payment_result.get('transaction_id'),
+        }
+        transaction.donnees_api['transaction_id'] = checkout['transaction_id']
+        transaction.save(update_fields=['donnees_api', 'date_maj'])
+        cache.set(self.CHECKOUT_KEY.format(transaction.pk), checkout, config['CHECKOUT_TIMEOUT'])
+
+        return self._reponse_succes(transaction, checkout)
 
 
 class WebhookView(APIView):
@@ -347,29 +381,12 @@ class WebhookView(APIView):
                 provider_status = data.get('status') or data.get('paymentStatus') or data.get('transactionStatus')
                 new_status = status_mapping[provider].get(provider_status, 'en_attente')
             
-            # Mettre à jour la transaction
-            old_status = transaction.statut
-            transaction.statut = new_status
-            
-            # Si le statut passe à 'validee', mettre à jour la date de validation
-            if new_status == 'validee' and old_status != 'validee':
-                transaction.date_validation = timezone.now()
-                
-                # Mettre à jour le statut de la demande
-                demande = transaction.demande
-                demande.statut = 'en_attente_traitement'
-                demande.save()
-            
-            # Sauvegarder les données du webhook
-            webhook_data = transaction.donnees_api or {}
-            webhook_data[f'webhook_{provider}'] = {
-                'received_at': timezone.now().isoformat(),
-                'data': data,
-                'signature': signature
-            }
-            transaction.donnees_api = webhook_data
-            
-            transaction.save()
+            # Mettre à jour la transaction (idempotent : les doublons de webhook sont sans effet)
+            transaction, old_status, _ = appliquer_statut(
+                transaction.pk, new_status, f'webhook_{provider}',
+                {'data': data, 'signature': signature}
+            )
+            new_status = transaction.statut
             
             # Log pour le débogage
             print(f"Webhook {provider}: Transaction {transaction.reference} mise à jour de {old_status} à {new_status}")
@@ -412,14 +429,8 @@ class VerifierPaiementView(APIView):
             # Obtenir le service de paiement
             payment_service = get_payment_service(transaction)
             
-            # Trouver l'ID de transaction dans les données API
-            transaction_id = None
-            api_data = transaction.donnees_api or {}
-            
-            if transaction.type_paiement == 'orange_money':
-                transaction_id = api_data.get('transaction_id') or api_data.get('data', {}).get('transaction_id')
-            elif transaction.type_paiement == 'moov_money':
-                transaction_id = api_data.get('transactionId') or api_data.get('data', {}).get('transactionId')
+            # Trouver l'ID de transaction chez le fournisseur (Yengapay ou anciens opérateurs)
+            transaction_id = extraire_id_fournisseur(transaction)
             
             if not transaction_id:
                 return Response({
@@ -430,50 +441,14 @@ class VerifierPaiementView(APIView):
             verification_result = payment_service.verify_payment(transaction_id)
             
             if verification_result['success']:
-                old_status = transaction.statut
-                new_status = verification_result['status']
-                
-                # Mettre à jour le statut si différent
-                if new_status != old_status:
-                    transaction.statut = new_status
-                    
-                    if new_status == 'reussi' and old_status != 'reussi':
-                        transaction.date_validation = timezone.now()
-
-                        # Mettre à jour le statut de la demande
-                        demande = transaction.demande
-                        demande.statut = 'en_attente_traitement'
-                        demande.save()
-
-                        # Envoyer un SMS de confirmation de paiement
-                        try:
-                            # Récupérer le numéro de téléphone du demandeur
-                            user_phone = None
-                            if hasattr(demande, 'demandeur') and demande.demandeur:
-                                user_phone = getattr(demande.demandeur, 'telephone', None)
-
-                            if user_phone:
-                                SMSService.send_payment_confirmation_sms(
-                                    phone_number=user_phone,
-                                    transaction_reference=transaction.reference,
-                                    amount=str(transaction.montant),
-                                    user_name=getattr(demande.demandeur, 'nom', None)
-                                )
-                        except Exception as e:
-                            # Ne pas échouer la vérification si l'envoi SMS échoue
-                            import logging
-                            logger = logging.getLogger(__name__)
-                            logger.error(f"Erreur envoi SMS confirmation paiement {transaction.reference}: {e}")
-                    
-                    # Mettre à jour les données API
-                    verification_data = transaction.donnees_api or {}
-                    verification_data['verification'] = {
-                        'verified_at': timezone.now().isoformat(),
-                        'result': verification_result.get('api_data', {})
-                    }
-                    transaction.donnees_api = verification_data
-                    
-                    transaction.save()
+                # Transition idempotente (verrou de ligne, SMS de confirmation après commit)
+                transaction, _, _ = appliquer_statut(
+                    transaction.pk,
+                    verification_result['status'],
+                    'verification',
+                    verification_result.get('api_data', {})
+                )
+                new_status = transaction.statut
                 
                 return Response({
                     'status': 'success',
@@ -547,6 +522,7 @@ class ExportRapportView(APIView):
     Accessible uniquement aux administrateurs
     """
     permission_classes = [permissions.IsAdminUser]
+    lecture_replica = True
 
     def get(self, request):
         format_type = request.query_params.get('format', 'pdf')  # pdf ou excel
@@ -1,13 +1,15 @@
 from rest_framework import serializers
+from apps.core.images import ImageDerivesField
 from .models import PartenairesPartenaire
 
 
 class PartenaireSerializer(serializers.ModelSerializer):
     logo_url = serializers.SerializerMethodField()
+    logo_variantes = ImageDerivesField(source='logo')
 
     class Meta:
         model = PartenairesPartenaire
-        fields = ['id', 'nom', 'type_partenaire', 'logo', 'logo_url', 'url', 'description', 'ordre', 'actif', 'created_at', 'updated_at']
+        fields = ['id', 'nom', 'type_partenaire', 'logo', 'logo_url', 'logo_variantes', 'url', 'description', 'ordre', 'actif', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
     def get_logo_url(self, obj):
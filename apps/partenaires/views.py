@@ -2,11 +2,12 @@ from rest_framework import viewsets, permissions, filters
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 
+from apps.core.cache import PublicResponseCacheMixin
 from .models import PartenairesPartenaire
 from .serializers import PartenaireSerializer
 
 
-class PartenaireViewSet(viewsets.ModelViewSet):
+class PartenaireViewSet(PublicResponseCacheMixin, viewsets.ModelViewSet):
     """API for partenaires.
 
     - list/retrieve: public
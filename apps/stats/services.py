@@ -25,25 +25,31 @@ class StatsService:
             date = timezone.now().date()
         
         try:
-            stats, created = StatsVisite.objects.get_or_create(
-                date=date,
-                defaults={
-                    'visites': 1,
-                    'pages_vues': pages_vues,
-                    'visites_authentifiees': 1 if authentifie else 0,
-                }
-            )
-            
-            if not created:
-                stats.visites = models.F('visites') + 1
-                stats.pages_vues = models.F('pages_vues') + pages_vues
-                if authentifie:
-                    stats.visites_authentifiees = models.F('visites_authentifiees') + 1
-                stats.save(update_fields=[
-                    'visites', 'pages_vues', 'visites_authentifiees', 'updated_at'
-                ])
-            
-            return stats
+            # UPDATE direct : StatsVisite.save() compare les compteurs à des
+            # entiers et ne peut recevoir d'expressions F()
+            increments = {
+                'visites': models.F('visites') + 1,
+                'pages_vues': models.F('pages_vues') + pages_vues,
+                'updated_at': timezone.now(),
+            }
+            if authentifie:
+                increments['visites_authentifiees'] = models.F('visites_authentifiees') + 1
+            if not StatsVisite.objects.filter(date=date).update(**increments):
+                stats, created = StatsVisite.objects.get_or_create(
+                    date=date,
+                    defaults={
+                        'visites': 1,
+                        'pages_vues': pages_vues,
+                        'visites_authentifiees': 1 if authentifie else 0,
+                        'heure': timezone.localtime().hour,
+                    }
+                )
+                if created:
+                    return stats
+                # Ligne créée entre-temps par une requête concurrente
+                StatsVisite.objects.filter(date=date).update(**increments)
+
+            return StatsVisite.objects.get(date=date)
         except Exception as e:
             logger.error(f"Erreur lors de l'incrément des stats: {e}")
             return None
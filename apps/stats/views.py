@@ -298,6 +298,7 @@ class PeriodeActiveViewSet(viewsets.ModelViewSet):
 class DashboardView(generics.GenericAPIView):
     """Vue pour le tableau de bord des statistiques."""
     permission_classes = [IsAuthenticated, CanViewStats]
+    lecture_replica = True
     serializer_class = DashboardSerializer
     
     def get(self, request):
@@ -375,6 +376,7 @@ class DashboardView(generics.GenericAPIView):
 class TendancesView(generics.GenericAPIView):
     """Analyse des tendances temporelles."""
     permission_classes = [IsAuthenticated, CanViewStats]
+    lecture_replica = True
     
     def get(self, request):
         jours = int(request.query_params.get('jours', 30))
@@ -464,6 +466,12 @@ class GenererRapportView(generics.GenericAPIView):
 class ExportStatsView(generics.GenericAPIView):
     """Export des données statistiques."""
     permission_classes = [IsAuthenticated, CanViewStats]
+    lecture_replica = True
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format=csv|excel est lu par la vue : DRF y verrait un format de
+        # rendu inconnu et répondrait 404
+        return super().perform_content_negotiation(request, force=True)
     
     def get(self, request):
         format_export = request.query_params.get('format', 'json')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.metriques import instantane
+
+
+class Command(BaseCommand):
+    help = (
+        'Enregistre dans SystemMetric un instantané des métriques de requêtes par vue '
+        '(à lancer via cron avec le même PROMETHEUS_MULTIPROC_DIR que gunicorn)'
+    )
+
+    def handle(self, *args, **options):
+        nombre = instantane()
+        self.stdout.write(self.style.SUCCESS(f"{nombre} métrique(s) enregistrée(s)"))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from apps.system.partitions import maintenir
+
+
+class Command(BaseCommand):
+    help = (
+        'Crée les partitions mensuelles à venir des journaux (audit, système) et '
+        'retire celles dont la rétention est dépassée (à lancer via cron, quotidiennement)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mois-avance', type=int, default=None,
+            help='Nombre de mois à venir pour lesquels créer les partitions'
+        )
+        parser.add_argument(
+            '--detacher-seulement', action='store_true', default=None,
+            help='Détacher les partitions expirées sans les supprimer (archivage)'
+        )
+
+    def handle(self, *args, **options):
+        rapport = maintenir(
+            mois_avance=options['mois_avance'],
+            detacher_seulement=options['detacher_seulement'],
+        )
+        for table, resultat in rapport.items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{table}: {len(resultat['creees'])} partition(s) créée(s), "
+                f"{len(resultat['retirees'])} retirée(s), "
+                f"{resultat['lignes_supprimees']} ligne(s) supprimée(s)"
+            ))
+            for nom in resultat['creees']:
+                self.stdout.write(f'  + {nom}')
+            for nom in resultat['retirees']:
+                self.stdout.write(f'  - {nom}')
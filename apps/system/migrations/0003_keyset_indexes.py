@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('system', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='systemlog',
+            name='system_log_timesta_2209e3_idx',
+        ),
+        migrations.AddIndex(
+            model_name='systemlog',
+            index=models.Index(fields=['timestamp', 'id'], name='system_log_timesta_8db82f_idx'),
+        ),
+    ]
@@ -322,6 +322,8 @@ class SystemLog(models.Model):
         ('security', _('Sécurité')),
     ]
 
+    # Sous PostgreSQL, table partitionnée : l'unicité est (uuid, timestamp)
+    # en base (apps/system/partitions.py)
     uuid = models.UUIDField(
         default=uuid.uuid4,
         editable=False,
@@ -409,7 +411,7 @@ class SystemLog(models.Model):
         verbose_name_plural = _("Journaux système")
         ordering = ['-timestamp']
         indexes = [
-            models.Index(fields=['timestamp']),
+            models.Index(fields=['timestamp', 'id']),
             models.Index(fields=['level']),
             models.Index(fields=['source']),
             models.Index(fields=['uuid']),
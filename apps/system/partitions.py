@@ -0,0 +1,334 @@
+# apps/system/partitions.py
+"""
+Partitionnement mensuel (PostgreSQL, RANGE sur l'horodatage) des journaux
+en ajout seul : audit de sécurité, tentatives de connexion, usage des
+jetons, journal et métriques système.
+
+Chaque table est un parent partitionné `<table>` avec une partition par mois
+(`<table>_pAAAAMM`) et une partition par défaut (`<table>_defaut`) qui ne sert
+que de filet de sécurité si les partitions à venir n'ont pas été créées. La
+clé primaire devient (id, horodatage) : les modèles Django ne changent pas,
+et un filtre sur l'horodatage ne lit que les partitions concernées (partition
+pruning du planificateur).
+
+La clé de partitionnement doit figurer dans toute contrainte d'unicité :
+UNIQUE(uuid) de `system_log` devient UNIQUE(uuid, timestamp). La base ne
+garantit donc plus qu'un uuid est unique d'un mois à l'autre ; il reste
+tiré par uuid4 côté application, et une recherche par uuid lit toutes les
+partitions (filtrer aussi sur l'horodatage quand il est connu).
+
+Le parent partitionné n'a pas de statistiques propres (reltuples = -1) :
+l'estimation des totaux (apps/core/pagination.py) additionne celles des
+partitions.
+
+La rétention ne supprime plus ligne à ligne : une partition expirée est
+détachée puis supprimée, ce qui ne touche que le catalogue.
+
+Conversion (migrations audit/0004 et system/0004, non atomiques) : chaque
+table bascule dans sa propre transaction courte. Le verrou ACCESS EXCLUSIVE
+n'est tenu que le temps du renommage et de la création du parent et de ses
+partitions vides (catalogue seulement, quelques millisecondes, mais il
+attend la fin des requêtes en cours sur la table). Les lignes existantes
+restent dans `<table>_avant_partition` et sont déplacées ensuite par lots de
+LOG_PARTITIONS['LOT_COPIE'] lignes, une transaction par lot : les écritures
+reprennent aussitôt dans la table partitionnée, mais jusqu'à la fin de la
+copie l'historique pas encore déplacé n'apparaît pas dans les listes. Une
+copie interrompue reprend à la migration suivante ou au prochain
+`manage.py partitions_journaux`.
+
+Hors PostgreSQL (SQLite en développement), les tables restent classiques et
+la rétention se fait par DELETE.
+"""
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection as connexion_defaut, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Table -> colonne de partitionnement
+TABLES_PARTITIONNEES = {
+    'audit_securitylog': 'timestamp',
+    'audit_loginattempt': 'timestamp',
+    'audit_tokenusage': 'used_at',
+    'system_log': 'timestamp',
+    'system_metric': 'collected_at',
+}
+
+SUFFIXE_PARTITION = re.compile(r'_p(?P<annee>\d{4})(?P<mois>\d{2})$')
+
+
+def _config():
+    system_config = getattr(settings, 'SYSTEM_CONFIG', {})
+    config = {
+        'MOIS_AVANCE': 3,
+        'DETACHER_SEULEMENT': False,
+        'LOT_COPIE': 10000,
+        'RETENTION_JOURS': {
+            'audit_securitylog': 365,
+            'audit_loginattempt': 365,
+            'audit_tokenusage': 365,
+            'system_log': system_config.get('LOG_RETENTION_DAYS', 90),
+            'system_metric': system_config.get('METRIC_RETENTION_DAYS', 30),
+        },
+    }
+    surcharge = getattr(settings, 'LOG_PARTITIONS', {})
+    config['RETENTION_JOURS'].update(surcharge.get('RETENTION_JOURS', {}))
+    config.update({k: v for k, v in surcharge.items() if k != 'RETENTION_JOURS'})
+    return config
+
+
+def debut_mois(instant):
+    return datetime(instant.year, instant.month, 1, tzinfo=dt_timezone.utc)
+
+
+def mois_suivant(debut):
+    return (debut + timedelta(days=32)).replace(day=1)
+
+
+def nom_partition(table, debut):
+    return f'{table}_p{debut:%Y%m}'
+
+
+def borne_superieure(nom):
+    """Fin (exclue) de la partition mensuelle `nom`, None si ce n'en est pas une."""
+    correspondance = SUFFIXE_PARTITION.search(nom)
+    if not correspondance:
+        return None
+    debut = datetime(int(correspondance['annee']), int(correspondance['mois']), 1, tzinfo=dt_timezone.utc)
+    return mois_suivant(debut)
+
+
+def est_partitionnee(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(connection, table):
+    """Noms des partitions de `table`."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+            [table],
+        )
+        return [ligne[0] for ligne in cursor.fetchall()]
+
+
+def _creer_partition(cursor, qn, table, colonne, debut):
+    """
+    Crée la partition du mois `debut`. Les lignes déjà tombées dans la
+    partition par défaut pour ce mois y sont déplacées avant l'attachement.
+    """
+    nom, fin = nom_partition(table, debut), mois_suivant(debut)
+    cursor.execute(
+        f"CREATE TABLE {qn(nom)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    cursor.execute(
+        f"WITH deplacees AS (DELETE FROM {qn(table + '_defaut')} "
+        f"WHERE {qn(colonne)} >= %s AND {qn(colonne)} < %s RETURNING *) "
+        f"INSERT INTO {qn(nom)} SELECT * FROM deplacees",
+        [debut, fin],
+    )
+    cursor.execute(
+        f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(nom)} FOR VALUES FROM (%s) TO (%s)",
+        [debut, fin],
+    )
+
+
+def _table_existe(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [table])
+        return cursor.fetchone()[0]
+
+
+def convertir_en_partitions(connection, table, colonne, lot=None):
+    """
+    Transforme une table classique en table partitionnée par mois, en
+    conservant colonnes, index, clés étrangères et séquence d'id. Sans effet
+    hors PostgreSQL ou si la table est déjà partitionnée (hormis la reprise
+    d'une copie interrompue).
+
+    La bascule (renommage, parent et partitions vides, index, contraintes)
+    est une courte transaction qui ne touche que le catalogue ; les lignes
+    existantes sont ensuite déplacées par lots (`copier_lignes`), chacun
+    dans sa propre transaction. À appeler hors transaction (migration
+    `atomic = False`), sans quoi tout redevient une seule transaction.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+    if est_partitionnee(connection, table):
+        copier_lignes(connection, table, lot)
+        return False
+
+    qn = connection.ops.quote_name
+    ancienne = f'{table}_avant_partition'
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        # Index hors contraintes, à recréer tels quels sur le parent
+        cursor.execute(
+            "SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i WHERE i.indrelid = %s::regclass "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)",
+            [table],
+        )
+        index = [ligne[0] for ligne in cursor.fetchall()]
+        # Clés étrangères et contraintes d'unicité
+        cursor.execute(
+            "SELECT k.conname, k.contype, pg_get_constraintdef(k.oid), "
+            "ARRAY(SELECT a.attname FROM pg_attribute a "
+            "      WHERE a.attrelid = k.conrelid AND a.attnum = ANY(k.conkey)) "
+            "FROM pg_constraint k WHERE k.conrelid = %s::regclass AND k.contype IN ('f', 'u')",
+            [table],
+        )
+        contraintes = cursor.fetchall()
+
+        # Verrou exclusif le temps de la bascule seulement ; min() et max()
+        # sont lus sur les index (horodatage, id) et clé primaire
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(ancienne)}")
+        cursor.execute(f"SELECT date_trunc('month', min({qn(colonne)})), max(id) FROM {qn(ancienne)}")
+        plus_ancien, dernier_id = cursor.fetchone()
+        plus_ancien = plus_ancien or timezone.now()
+
+        # Contraintes (clé primaire comprise) et index suivent la table
+        # renommée : leurs noms sont libérés pour le parent
+        cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass", [ancienne])
+        for (nom,) in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE {qn(ancienne)} RENAME CONSTRAINT {qn(nom)} TO {qn(nom + '_ap')}")
+        cursor.execute(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = %s::regclass "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)",
+            [ancienne],
+        )
+        for (nom,) in cursor.fetchall():
+            cursor.execute(f"ALTER INDEX {qn(nom)} RENAME TO {qn(nom + '_ap')}")
+
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} (LIKE {qn(ancienne)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({qn(colonne)})"
+        )
+        cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(f"CREATE TABLE {qn(table + '_defaut')} PARTITION OF {qn(table)} DEFAULT")
+
+        debut, fin = debut_mois(plus_ancien), debut_mois(timezone.now())
+        for _ in range(_config()['MOIS_AVANCE']):
+            fin = mois_suivant(fin)
+        while debut <= fin:
+            _creer_partition(cursor, qn, table, colonne, debut)
+            debut = mois_suivant(debut)
+
+        # La clé de partitionnement doit figurer dans toute contrainte d'unicité
+        cursor.execute(f"ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, {qn(colonne)})")
+        sequence = f'{table}_id_seq'
+        cursor.execute(f"ALTER SEQUENCE IF EXISTS {qn(sequence)} RENAME TO {qn(sequence + '_ap')}")
+        cursor.execute(f"CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}.id")
+        cursor.execute("SELECT setval(%s, %s, false)", [sequence, (dernier_id or 0) + 1])
+        cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)", [sequence])
+
+        for definition in index:
+            cursor.execute(definition)
+        for nom, type_contrainte, definition, colonnes in contraintes:
+            if type_contrainte == 'u' and colonne not in colonnes:
+                definition = 'UNIQUE ({})'.format(', '.join(qn(c) for c in [*colonnes, colonne]))
+            cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(nom)} {definition}")
+
+    logger.info(f"Table {table} partitionnée par mois sur {colonne}, copie des lignes existantes")
+    copier_lignes(connection, table, lot)
+    return True
+
+
+def copier_lignes(connection, table, lot=None):
+    """
+    Déplace par lots de `lot` lignes (LOG_PARTITIONS['LOT_COPIE']) le
+    contenu de `<table>_avant_partition` vers la table partitionnée, puis
+    supprime l'ancienne table. Chaque lot est une transaction : une copie
+    interrompue reprend où elle s'était arrêtée (nouvel appel, ou
+    `maintenir()`). Retourne le nombre de lignes déplacées.
+    """
+    ancienne = f'{table}_avant_partition'
+    if connection.vendor != 'postgresql' or not _table_existe(connection, ancienne):
+        return 0
+    qn = connection.ops.quote_name
+    lot = lot or _config()['LOT_COPIE']
+    total = 0
+    while True:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH lot AS (DELETE FROM {qn(ancienne)} WHERE id IN "
+                f"(SELECT id FROM {qn(ancienne)} ORDER BY id LIMIT %s) RETURNING *) "
+                f"INSERT INTO {qn(table)} SELECT * FROM lot",
+                [lot],
+            )
+            deplacees = cursor.rowcount
+        total += deplacees
+        if deplacees < lot:
+            break
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {qn(ancienne)}")
+    logger.info(f"Table {table} : {total} ligne(s) copiée(s) dans les partitions")
+    return total
+
+
+def _modele(table):
+    for modele in apps.get_models():
+        if modele._meta.db_table == table:
+            return modele
+    raise LookupError(table)
+
+
+def maintenir(connection=None, maintenant=None, mois_avance=None, detacher_seulement=None):
+    """
+    Crée les partitions des mois à venir et retire celles dont toutes les
+    lignes ont dépassé la rétention. Retourne un rapport par table.
+    """
+    connection = connection or connexion_defaut
+    config = _config()
+    maintenant = maintenant or timezone.now()
+    mois_avance = config['MOIS_AVANCE'] if mois_avance is None else mois_avance
+    detacher_seulement = config['DETACHER_SEULEMENT'] if detacher_seulement is None else detacher_seulement
+    qn = connection.ops.quote_name
+    rapport = {}
+
+    for table, colonne in TABLES_PARTITIONNEES.items():
+        limite = maintenant - timedelta(days=config['RETENTION_JOURS'][table])
+        resultat = rapport[table] = {'creees': [], 'retirees': [], 'lignes_supprimees': 0}
+
+        if connection.vendor != 'postgresql' or not est_partitionnee(connection, table):
+            modele = _modele(table)
+            resultat['lignes_supprimees'], _ = modele.objects.filter(**{f'{colonne}__lt': limite}).delete()
+            continue
+
+        copier_lignes(connection, table)
+        existantes = set(partitions(connection, table))
+        debut = debut_mois(maintenant)
+        for _ in range(mois_avance + 1):
+            if nom_partition(table, debut) not in existantes:
+                with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                    _creer_partition(cursor, qn, table, colonne, debut)
+                resultat['creees'].append(nom_partition(table, debut))
+            debut = mois_suivant(debut)
+
+        for nom in sorted(existantes):
+            fin = borne_superieure(nom)
+            if fin is None or fin > limite:
+                continue
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(nom)}")
+                if not detacher_seulement:
+                    cursor.execute(f"DROP TABLE {qn(nom)}")
+            resultat['retirees'].append(nom)
+
+        # La partition par défaut ne devrait contenir que des égarés
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {qn(table + '_defaut')} WHERE {qn(colonne)} < %s", [limite]
+            )
+            resultat['lignes_supprimees'] = cursor.rowcount
+
+    return rapport
@@ -0,0 +1,256 @@
+# apps/system/profilage.py
+"""
+Profilage à la demande de requêtes de production.
+
+Un administrateur obtient un jeton signé (POST /api/system/profilage/jeton/)
+et le présente sur la requête à examiner, en en-tête `X-Profilage` ou en
+paramètre `?profilage=`. `ProfilageMiddleware` (notaires_bf/middleware.py)
+profile alors la requête si le quota le permet (PROFILAGE['MAX_PAR_MINUTE']
+profils par minute, tous workers confondus via le cache, et une proportion
+PROFILAGE['RATIO'] des requêtes porteuses du jeton) :
+
+    - un thread échantillonne la pile du thread de la requête toutes les
+      PROFILAGE['INTERVALLE_MS'] millisecondes (`sys._current_frames`),
+      sans trace ni hook par appel : le coût ne dépend pas du code profilé ;
+    - chaque requête SQL est journalisée avec sa durée et son origine (les
+      derniers appels du code du projet), via `connection.execute_wrapper`.
+
+Le profil est écrit au format « folded » (une pile `a;b;c N` par ligne,
+lisible par flamegraph.pl, speedscope ou inferno) et le journal SQL en
+JSON, dans le stockage ; un `SystemLog` les référence dans `details` et
+se télécharge par lien signé (SystemLogViewSet.pieces). L'en-tête
+`X-Profilage-Journal` de la réponse donne l'UUID du journal.
+
+Sans jeton, le middleware ne fait qu'un test d'en-tête et de chaîne de
+requête ; PROFILAGE['ACTIF'] faux le retire de la chaîne (MiddlewareNotUsed).
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+
+ENTETE = 'HTTP_X_PROFILAGE'
+PARAMETRE = 'profilage'
+SIGNING_SALT = 'system.profilage'
+CLE_QUOTA = 'system:profilage:quota:{}'
+PIECES = {
+    'profil': ('profil.folded', 'text/plain'),
+    'requetes': ('requetes.json', 'application/json'),
+}
+
+_RACINE = str(settings.BASE_DIR)
+_ICI = os.path.abspath(__file__)
+
+
+def _config():
+    config = {
+        'ACTIF': True, 'RATIO': 1.0, 'MAX_PAR_MINUTE': 6, 'INTERVALLE_MS': 5, 'DUREE_JETON': 3600,
+        'DUREE_LIEN_PIECES': 60,
+    }
+    config.update(getattr(settings, 'PROFILAGE', {}))
+    return config
+
+
+def actif():
+    return _config()['ACTIF']
+
+
+# =====================================================
+# DÉCLENCHEMENT
+# =====================================================
+
+def creer_jeton(utilisateur):
+    return signing.dumps({'u': utilisateur.pk}, salt=SIGNING_SALT)
+
+
+def demande(request):
+    """Jeton présenté par la requête, ou None (aucun accès base ni cache)."""
+    jeton = request.META.get(ENTETE)
+    if jeton:
+        return jeton
+    if f'{PARAMETRE}=' in request.META.get('QUERY_STRING', ''):
+        return request.GET.get(PARAMETRE) or None
+    return None
+
+
+def autoriser(jeton):
+    """Vrai si le jeton désigne un administrateur actif et que le quota le permet."""
+    from apps.utilisateurs.models import UtilisateursUser
+
+    config = _config()
+    try:
+        donnees = signing.loads(jeton, salt=SIGNING_SALT, max_age=config['DUREE_JETON'])
+    except signing.BadSignature:
+        return False
+    if random.random() >= config['RATIO']:
+        return False
+    if not UtilisateursUser.objects.filter(pk=donnees.get('u'), is_staff=True, is_active=True).exists():
+        return False
+
+    cle = CLE_QUOTA.format(int(time.time() // 60))
+    cache.add(cle, 0, 120)
+    try:
+        return cache.incr(cle) <= config['MAX_PAR_MINUTE']
+    except ValueError:
+        return False
+
+
+# =====================================================
+# ÉCHANTILLONNAGE DES PILES
+# =====================================================
+
+def _nom_fichier(chemin):
+    if chemin.startswith(_RACINE):
+        return os.path.relpath(chemin, _RACINE)
+    marque = f'{os.sep}site-packages{os.sep}'
+    return chemin.split(marque, 1)[1] if marque in chemin else os.path.basename(chemin)
+
+
+def _libelle(code):
+    return f'{_nom_fichier(code.co_filename)}:{code.co_name}'
+
+
+class Echantillonneur:
+    """Relève périodiquement la pile d'un thread, dans un thread à part."""
+
+    def __init__(self, thread_id, intervalle):
+        self.thread_id = thread_id
+        self.intervalle = intervalle
+        self.piles = Counter()
+        self._arret = threading.Event()
+        self._thread = threading.Thread(target=self._boucle, name='profilage', daemon=True)
+
+    def _boucle(self):
+        while not self._arret.wait(self.intervalle):
+            frame = sys._current_frames().get(self.thread_id)
+            pile = []
+            while frame is not None:
+                pile.append(_libelle(frame.f_code))
+                frame = frame.f_back
+            if pile:
+                self.piles[';'.join(reversed(pile))] += 1
+
+    def demarrer(self):
+        self._thread.start()
+
+    def arreter(self):
+        self._arret.set()
+        self._thread.join()
+
+    def folded(self):
+        """Profil au format « folded » (flamegraph.pl, speedscope)."""
+        return ''.join(f'{pile} {nombre}\n' for pile, nombre in self.piles.most_common())
+
+
+# =====================================================
+# JOURNAL SQL
+# =====================================================
+
+def _origine(profondeur=3):
+    """Derniers appels du code du projet ayant mené à la requête SQL."""
+    appels = [
+        f'{os.path.relpath(cadre.filename, _RACINE)}:{cadre.lineno} {cadre.name}'
+        for cadre in traceback.extract_stack()
+        if cadre.filename.startswith(_RACINE)
+        and os.path.abspath(cadre.filename) != _ICI
+        and f'{os.sep}site-packages{os.sep}' not in cadre.filename
+    ]
+    return appels[-profondeur:]
+
+
+class JournalSQL:
+    def __init__(self):
+        self.requetes = []
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.requetes.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'duree_ms': round((time.perf_counter() - debut) * 1000, 3),
+                'origine': _origine(),
+            })
+
+
+# =====================================================
+# PROFILAGE D'UNE REQUÊTE
+# =====================================================
+
+def profiler(request, get_response):
+    """Exécute la requête sous profilage et enregistre le résultat."""
+    from contextlib import ExitStack
+
+    echantillonneur = Echantillonneur(threading.get_ident(), _config()['INTERVALLE_MS'] / 1000)
+    journal = JournalSQL()
+    debut = time.perf_counter()
+    with ExitStack() as pile:
+        for alias in connections:
+            pile.enter_context(connections[alias].execute_wrapper(journal))
+        echantillonneur.demarrer()
+        try:
+            response = get_response(request)
+        finally:
+            echantillonneur.arreter()
+    duree_ms = (time.perf_counter() - debut) * 1000
+
+    journal_systeme = enregistrer(request, response, echantillonneur, journal, duree_ms)
+    response['X-Profilage-Journal'] = str(journal_systeme.uuid)
+    return response
+
+
+def enregistrer(request, response, echantillonneur, journal, duree_ms):
+    from apps.system.models import SystemLog
+
+    identifiant = uuid.uuid4()
+    dossier = timezone.now().strftime('profilage/%Y/%m/%d')
+    fichiers = {
+        'profil': default_storage.save(
+            f'{dossier}/{identifiant}.folded', ContentFile(echantillonneur.folded().encode())),
+        'requetes': default_storage.save(
+            f'{dossier}/{identifiant}.json',
+            ContentFile(json.dumps(journal.requetes, ensure_ascii=False, indent=1).encode())),
+    }
+    correspondance = getattr(request, 'resolver_match', None)
+    vue = correspondance.view_name if correspondance else ''
+    sql_ms = sum(r['duree_ms'] for r in journal.requetes)
+    return SystemLog.objects.create(
+        uuid=identifiant,
+        level='info',
+        source='api',
+        module='profilage',
+        action=(vue or request.path)[:100],
+        message=(
+            f"Profil {request.method} {request.path} : {duree_ms:.0f} ms, "
+            f"{len(journal.requetes)} requête(s) SQL ({sql_ms:.0f} ms)"
+        ),
+        details={
+            'methode': request.method,
+            'chemin': request.get_full_path(),
+            'vue': vue,
+            'statut': response.status_code,
+            'echantillons': sum(echantillonneur.piles.values()),
+            'intervalle_ms': echantillonneur.intervalle * 1000,
+            'sql_requetes': len(journal.requetes),
+            'sql_duree_ms': round(sql_ms, 3),
+            'fichiers': fichiers,
+        },
+        duration=duree_ms,
+        ip_address=request.META.get('REMOTE_ADDR') or None,
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+    )
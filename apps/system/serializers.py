@@ -54,23 +54,16 @@ class SystemConfigSerializer(serializers.ModelSerializer):
 # SYSTEM LOG
 # -----------------------------
 class SystemLogSerializer(serializers.ModelSerializer):
-    user_display = serializers.SerializerMethodField()
 
     class Meta:
         model = SystemLog
         fields = [
             'id', 'uuid', 'timestamp', 'level', 'source', 'module',
-            'action', 'message', 'details', 'user', 'user_display',
-            'ip_address', 'user_agent', 'duration', 'is_resolved',
-            'resolved_at', 'resolved_by', 'traceback'
+            'action', 'message', 'details', 'ip_address', 'user_agent',
+            'duration', 'is_resolved', 'resolved_at', 'traceback'
         ]
         read_only_fields = ['id', 'uuid', 'timestamp']
 
-    def get_user_display(self, obj):
-        if obj.user:
-            return obj.user.get_full_name() or obj.user.username
-        return None
-
     def validate_details(self, value):
         if isinstance(value, str):
             try:
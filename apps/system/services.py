@@ -179,6 +179,13 @@ class MonitoringService:
         SystemMetric.objects.bulk_create(metrics)
         return len(metrics)
     
+    @staticmethod
+    def collect_request_metrics():
+        """Instantané des métriques de requêtes par vue (apps/core/metriques.py)."""
+        from apps.core.metriques import instantane
+
+        return instantane()
+
     @staticmethod
     def check_service_health(service_name, check_function, **kwargs):
         """Vérifie la santé d'un service."""
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.audit.models import SecurityLog
+from apps.core.pagination import estimer_total
+from .models import SystemLog, SystemMetric
+from .partitions import (
+    borne_superieure, convertir_en_partitions, copier_lignes, debut_mois, est_partitionnee, maintenir,
+    mois_suivant, nom_partition, partitions,
+)
+
+
+class PartitionsJournauxTestCase(TestCase):
+    """Partitions mensuelles des journaux (repli DELETE hors PostgreSQL)"""
+
+    def test_bornes_mensuelles(self):
+        debut = debut_mois(datetime(2026, 12, 17, 9, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(debut, datetime(2026, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(mois_suivant(debut), datetime(2027, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(nom_partition('system_log', debut), 'system_log_p202612')
+        self.assertEqual(borne_superieure('system_log_p202612'), datetime(2027, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertIsNone(borne_superieure('system_log_defaut'))
+
+    def test_conversion_ignoree_hors_postgresql(self):
+        if connection.vendor == 'postgresql':
+            self.skipTest('Repli SQLite uniquement')
+        self.assertFalse(convertir_en_partitions(connection, 'system_log', 'timestamp'))
+
+    def test_estimation_sur_table_partitionnee(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('PostgreSQL requis')
+        self.assertTrue(est_partitionnee(connection, 'system_log'))
+        SystemLog.objects.bulk_create([SystemLog(action='a', message=str(i)) for i in range(30)])
+        with connection.cursor() as cursor:
+            for nom in partitions(connection, 'system_log'):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(nom)}')
+            cursor.execute(
+                "SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = 'system_log'::regclass AND contype = 'u'"
+            )
+            contraintes = [ligne[0] for ligne in cursor.fetchall()]
+
+        # Parent sans statistiques : somme des partitions
+        with override_settings(LOG_PAGINATION={'SEUIL_COMPTE_EXACT': 0}):
+            self.assertEqual(estimer_total(SystemLog.objects.all()), (30, True))
+        self.assertTrue(any('uuid' in c and 'timestamp' in c for c in contraintes), contraintes)
+
+    def test_reprise_de_copie_par_lots(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('PostgreSQL requis')
+        # Conversion interrompue : des lignes restent dans l'ancienne table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE system_metric_avant_partition (LIKE system_metric INCLUDING DEFAULTS)"
+            )
+            cursor.execute(
+                "INSERT INTO system_metric_avant_partition (id, metric_type, name, value, unit, tags, hostname, collected_at) "
+                "SELECT g, 'cpu', 'cpu', g, '%%', '{}', 'h', now() FROM generate_series(1000001, 1000025) g"
+            )
+        self.assertEqual(copier_lignes(connection, 'system_metric', lot=10), 25)
+        self.assertEqual(SystemMetric.objects.filter(pk__gt=1000000).count(), 25)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('system_metric_avant_partition')")
+            self.assertIsNone(cursor.fetchone()[0])
+        self.assertEqual(copier_lignes(connection, 'system_metric'), 0)
+
+    @override_settings(LOG_PARTITIONS={'RETENTION_JOURS': {'system_log': 30, 'audit_securitylog': 30}})
+    def test_retention(self):
+        ancien = SystemLog.objects.create(action='a', message='ancien', timestamp=timezone.now() - timedelta(days=45))
+        recent = SystemLog.objects.create(action='a', message='récent')
+        SystemMetric.objects.create(metric_type='cpu', name='cpu', value=1.0)
+        log = SecurityLog.objects.create(action='login_success')
+        SecurityLog.objects.filter(pk=log.pk).update(timestamp=timezone.now() - timedelta(days=45))
+
+        rapport = maintenir()
+
+        self.assertFalse(SystemLog.objects.filter(pk=ancien.pk).exists())
+        self.assertTrue(SystemLog.objects.filter(pk=recent.pk).exists())
+        self.assertFalse(SecurityLog.objects.exists())
+        self.assertEqual(SystemMetric.objects.count(), 1)
+        self.assertEqual(rapport['system_log']['lignes_supprimees'], 1)
+
+    def test_commande(self):
+        sortie = StringIO()
+        call_command('partitions_journaux', stdout=sortie)
+        self.assertIn('system_metric', sortie.getvalue())
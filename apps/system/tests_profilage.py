@@ -0,0 +1,130 @@
+# tests_profilage.py - Tests du profilage à la demande des requêtes
+import json
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from . import profilage
+from apps.core import telechargements
+from .models import SystemLog
+from apps.utilisateurs.models import UtilisateursUser
+
+VUE = 'partenaire-list'
+
+
+@override_settings(
+    PROFILAGE={'ACTIF': True, 'RATIO': 1.0, 'MAX_PAR_MINUTE': 5, 'INTERVALLE_MS': 1, 'DUREE_JETON': 600},
+    DIRECT_UPLOADS={'BACKEND': 'local', 'EXPIRES': 900},
+)
+class ProfilageTestCase(TestCase):
+    """Jeton d'administrateur, quota, profil « folded » et journal SQL"""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.admin = UtilisateursUser.objects.create_user(
+            username='admin', email='admin@notaires.bf', nom='Admin', prenom='Test',
+            password='pass', is_staff=True,
+        )
+        self.jeton = profilage.creer_jeton(self.admin)
+        self.client = APIClient()
+
+    def _profiler(self, **kwargs):
+        return self.client.get(reverse(VUE), HTTP_X_PROFILAGE=self.jeton, **kwargs)
+
+    def test_jeton_reserve_aux_administrateurs(self):
+        utilisateur = UtilisateursUser.objects.create_user(
+            username='u', email='u@example.com', nom='U', prenom='U', password='pass',
+        )
+        self.client.force_authenticate(user=utilisateur)
+        self.assertEqual(self.client.post(reverse('system-profilage-jeton')).status_code, 403)
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(reverse('system-profilage-jeton'))
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(profilage.autoriser(response.data['jeton']))
+
+        # Jeton d'un non-administrateur ou falsifié : pas de profil
+        self.assertFalse(profilage.autoriser(profilage.creer_jeton(utilisateur)))
+        self.assertFalse(profilage.autoriser(self.jeton + 'x'))
+
+    def test_requete_sans_jeton_non_profilee(self):
+        response = self.client.get(reverse(VUE))
+        self.assertNotIn('X-Profilage-Journal', response)
+        self.assertFalse(SystemLog.objects.filter(module='profilage').exists())
+
+    def test_requete_profilee(self):
+        response = self._profiler()
+        self.assertEqual(response.status_code, 200)
+        journal = SystemLog.objects.get(uuid=response['X-Profilage-Journal'])
+        self.assertEqual((journal.module, journal.action), ('profilage', VUE))
+        self.assertEqual(journal.details['statut'], 200)
+
+        requetes = json.loads(default_storage.open(journal.details['fichiers']['requetes']).read())
+        self.assertEqual(len(requetes), journal.details['sql_requetes'])
+        self.assertGreater(len(requetes), 0)
+        self.assertTrue(all({'sql', 'duree_ms', 'origine'} <= set(r) for r in requetes))
+        self.assertTrue(any(r['origine'] for r in requetes))
+
+        profil = default_storage.open(journal.details['fichiers']['profil']).read().decode()
+        for ligne in profil.splitlines():
+            pile, nombre = ligne.rsplit(' ', 1)
+            self.assertTrue(pile and int(nombre) > 0)
+
+    def test_parametre_de_requete(self):
+        response = self.client.get(reverse(VUE), {'profilage': self.jeton})
+        self.assertIn('X-Profilage-Journal', response)
+
+    def test_quota_et_ratio(self):
+        with override_settings(PROFILAGE={'MAX_PAR_MINUTE': 2, 'INTERVALLE_MS': 1}):
+            profils = [('X-Profilage-Journal' in self._profiler()) for _ in range(3)]
+        self.assertEqual(profils, [True, True, False])
+
+        cache.clear()
+        with override_settings(PROFILAGE={'RATIO': 0.0}):
+            self.assertNotIn('X-Profilage-Journal', self._profiler())
+
+    def test_echantillonneur(self):
+        echantillonneur = profilage.Echantillonneur(threading.get_ident(), 0.001)
+        echantillonneur.demarrer()
+        fin = time.perf_counter() + 0.05
+        while time.perf_counter() < fin:
+            sum(range(1000))
+        echantillonneur.arreter()
+        self.assertGreater(sum(echantillonneur.piles.values()), 0)
+        self.assertIn('apps/system/tests_profilage.py:test_echantillonneur', echantillonneur.folded())
+
+    def test_telechargement_des_pieces(self):
+        journal = SystemLog.objects.get(uuid=self._profiler()['X-Profilage-Journal'])
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('system-log-pieces', kwargs={'pk': journal.pk, 'piece': 'requetes'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        telechargement = self.client.get(response['Location'])
+        self.assertEqual(telechargement.status_code, 200)
+        self.assertIsInstance(json.loads(b''.join(telechargement.streaming_content)), list)
+
+        # Lien réservé aux administrateurs, et de courte durée
+        anonyme = APIClient()
+        self.assertIn(anonyme.get(response['Location']).status_code, (401, 403))
+        anonyme.force_authenticate(user=UtilisateursUser.objects.create_user(
+            username='agent', email='agent@notaires.bf', nom='A', prenom='A', password='pass',
+        ))
+        self.assertEqual(anonyme.get(response['Location']).status_code, 403)
+        with mock.patch.object(telechargements.time, 'time', return_value=time.time() + 120):
+            self.assertEqual(self.client.get(response['Location']).status_code, 410)
+
+        url = reverse('system-log-pieces', kwargs={'pk': journal.pk, 'piece': 'inconnue'})
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -12,6 +12,7 @@ router = DefaultRouter()
 
 # ✅ SEULEMENT la ViewSet qui existe
 router.register(r'emails-professionnels', views.SystemEmailprofessionnelViewSet, basename='email-professionnel')
+router.register(r'logs', views.SystemLogViewSet, basename='system-log')
 
 # ========================================
 # URL PATTERNS (SANS "api/" ici car déjà dans notaires_bf/urls.py)
@@ -20,12 +21,16 @@ router.register(r'emails-professionnels', views.SystemEmailprofessionnelViewSet,
 urlpatterns = [
     # Routes du router
     path('', include(router.urls)),
+
+    # Profilage à la demande (apps/system/profilage.py)
+    path('profilage/jeton/', views.JetonProfilageView.as_view(), name='system-profilage-jeton'),
     
     # Endpoints supplémentaires
     path('info/', lambda r: JsonResponse({
         'service': 'System API',
         'endpoints': {
             'emails': 'emails-professionnels/',
+            'logs': 'logs/',
             'health': 'health/',
             'info': 'info/'
         }
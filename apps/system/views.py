@@ -3,8 +3,12 @@ from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.http import HttpResponseRedirect
 from django_filters.rest_framework import DjangoFilterBackend
+from apps.core import telechargements
+from . import profilage
 from apps.system.serializers import SystemStatsSerializer
+from apps.core.pagination import KeysetPagination
 from .models import (
     SystemConfig, SystemLog, MaintenanceWindow, SystemMetric,
     APIKey, ScheduledTask, SystemHealth, SystemNotification,
@@ -45,6 +49,56 @@ class SystemEmailprofessionnelViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+
+class SystemLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """Consultation du journal système (admin), paginée par curseur"""
+    queryset = SystemLog.objects.all()
+    serializer_class = SystemLogSerializer
+    permission_classes = [permissions.IsAdminUser]
+    pagination_class = KeysetPagination
+    keyset_field = 'timestamp'
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_fields = ['level', 'source', 'module', 'is_resolved']
+    search_fields = ['action', 'message']
+
+    @action(detail=True, methods=['get'], url_path=r'pieces/(?P<piece>[a-z]+)')
+    def pieces(self, request, pk=None, piece=None):
+        """
+        Pièce jointe d'un journal (profil, requetes pour un profilage) :
+        redirige vers un lien de téléchargement signé de courte durée
+        (PROFILAGE['DUREE_LIEN_PIECES']), servi aux seuls administrateurs.
+        GET /api/system/logs/<id>/pieces/<piece>/
+        """
+        journal = self.get_object()
+        cle = journal.details.get('fichiers', {}).get(piece) if isinstance(journal.details, dict) else None
+        if not cle or piece not in profilage.PIECES:
+            return Response({'error': 'Pièce introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        nom, content_type = profilage.PIECES[piece]
+        return HttpResponseRedirect(telechargements.creer_lien(
+            cle, f'{journal.uuid}-{nom}', content_type, request,
+            duree=profilage._config()['DUREE_LIEN_PIECES'], staff=True,
+        ))
+
+
+class JetonProfilageView(APIView):
+    """
+    Jeton de profilage à présenter en en-tête X-Profilage ou en paramètre
+    ?profilage= sur les requêtes à profiler (apps/system/profilage.py).
+    POST /api/system/profilage/jeton/
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        if not profilage.actif():
+            return Response({'error': 'Profilage désactivé'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'jeton': profilage.creer_jeton(request.user),
+            'expire_dans': profilage._config()['DUREE_JETON'],
+            'entete': 'X-Profilage',
+            'parametre': profilage.PARAMETRE,
+        }, status=status.HTTP_201_CREATED)
+
+
 # Les autres vues peuvent être ajoutées ici si nécessaire
 # Pour l'instant, on se concentre sur SystemEmailprofessionnel
 
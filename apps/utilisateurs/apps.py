@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class UtilisateursConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.utilisateurs'
+
+    def ready(self):
+        from . import authentication
+        authentication.connecter_signaux()
@@ -0,0 +1,241 @@
+# apps/utilisateurs/authentication.py
+"""
+Authentification JWT sans requête par appel.
+
+Le jeton d'accès embarque les claims utiles au front et aux permissions
+(is_staff, is_superuser, rôles, vérifications) ainsi que la version de jeton
+de l'utilisateur (`tv`). Côté serveur, un profil de l'utilisateur (champs
+hors mot de passe, rôles, permissions Django) est gardé dans le cache pour
+une courte durée : une requête authentifiée ne coûte donc aucune requête
+SQL tant que le profil est en cache.
+
+Le profil est invalidé à l'enregistrement de l'utilisateur et aux
+changements de rôles, de groupes ou de permissions, en avançant une
+génération par utilisateur (tout de suite et au commit) : un profil est
+rangé sous la génération lue avant son chargement en base, si bien qu'un
+profil lu pendant une révocation ou avant son commit n'est jamais resservi.
+La révocation
+(déconnexion, changement de mot de passe) incrémente `User.token_version` :
+tous les jetons portant une version antérieure sont refusés.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+PROFIL_KEY = 'auth:profil:{}'
+GENERATION_KEY = 'auth:profil:generation:{}'
+CLAIM_VERSION = 'tv'
+
+
+def _config():
+    config = {'CACHE_TIMEOUT': 300}
+    config.update(getattr(settings, 'JWT_CLAIMS', {}))
+    return config
+
+
+def construire_profil(user):
+    """Instantané sérialisable de l'utilisateur, sans le mot de passe."""
+    from apps.core.models import AuthUserrole
+
+    champs = {
+        f.attname: getattr(user, f.attname)
+        for f in user._meta.concrete_fields
+        if f.attname != 'password'
+    }
+    roles = dict(
+        AuthUserrole.objects.filter(user_id=user.pk).values_list('role__nom', 'role__permissions')
+    )
+    return {
+        'champs': champs,
+        'roles': roles,
+        'permissions_utilisateur': sorted(user.get_user_permissions()) if user.is_active else [],
+        'permissions_groupes': sorted(user.get_group_permissions()) if user.is_active else [],
+    }
+
+
+def _generation(user_id, lue):
+    """Génération du profil, initialisée au besoin (départ horodaté, comme apps/core/cache.py)."""
+    if lue is None:
+        cle = GENERATION_KEY.format(user_id)
+        cache.add(cle, time.time_ns() // 1000, timeout=None)
+        lue = cache.get(cle)
+    return lue
+
+
+def charger_profil(user_id):
+    """Profil depuis le cache, chargé en base au besoin. None si l'utilisateur n'existe pas."""
+    cle, cle_generation = PROFIL_KEY.format(user_id), GENERATION_KEY.format(user_id)
+    lus = cache.get_many([cle, cle_generation])
+    generation = _generation(user_id, lus.get(cle_generation))
+    entree = lus.get(cle)
+    if entree is not None and entree[0] == generation:
+        return entree[1]
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user is None:
+        return None
+    profil = construire_profil(user)
+    cache.set(cle, (generation, profil), _config()['CACHE_TIMEOUT'])
+    return profil
+
+
+def _avancer_generations(user_ids):
+    for user_id in user_ids:
+        cle = GENERATION_KEY.format(user_id)
+        try:
+            cache.incr(cle)
+        except ValueError:
+            cache.set(cle, time.time_ns() // 1000, timeout=None)
+
+
+def invalider_profil(*user_ids):
+    """Profils en cache périmés tout de suite, et de nouveau au commit de la modification."""
+    if not user_ids:
+        return
+    _avancer_generations(user_ids)
+    transaction.on_commit(lambda: _avancer_generations(user_ids))
+
+
+def utilisateur_depuis_profil(profil):
+    """
+    Reconstruit une vraie instance `User` (utilisable dans l'ORM) sans requête.
+    Le mot de passe est différé : il n'est chargé que s'il est lu, et un
+    `save()` ne réécrit que les champs chargés.
+    """
+    User = get_user_model()
+    champs = profil['champs']
+    user = User.from_db(router.db_for_read(User), list(champs), list(champs.values()))
+    user.roles = profil['roles']
+    # Caches du ModelBackend : has_perm() ne fait plus de requête
+    user._user_perm_cache = set(profil['permissions_utilisateur'])
+    user._group_perm_cache = set(profil['permissions_groupes'])
+    user._perm_cache = user._user_perm_cache | user._group_perm_cache
+    return user
+
+
+def verifier_profil(profil, version):
+    """Lève TokenError si le compte est inactif ou si le jeton a été révoqué."""
+    if profil is None:
+        raise TokenError("Utilisateur introuvable")
+    if api_settings.CHECK_USER_IS_ACTIVE and not profil['champs']['is_active']:
+        raise TokenError("Utilisateur inactif")
+    if (version or 0) != profil['champs']['token_version']:
+        raise TokenError("Token révoqué")
+
+
+def appliquer_claims(token, profil):
+    champs = profil['champs']
+    token['is_staff'] = champs['is_staff']
+    token['is_superuser'] = champs['is_superuser']
+    token['email_verifie'] = champs['email_verifie']
+    token['telephone_verifie'] = champs['telephone_verifie']
+    token['roles'] = sorted(profil['roles'])
+    token[CLAIM_VERSION] = champs['token_version']
+
+
+def revoquer_tokens(user):
+    """Invalide tous les jetons émis pour l'utilisateur (toutes sessions)."""
+    get_user_model().objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user.token_version = (user.token_version or 0) + 1
+    invalider_profil(user.pk)
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token portant les claims de l'utilisateur. Le jeton d'accès
+    dérivé reprend des claims à jour, et n'est émis que si le refresh
+    n'a pas été révoqué.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        invalider_profil(user.pk)
+        appliquer_claims(token, charger_profil(user.pk))
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        profil = charger_profil(self[api_settings.USER_ID_CLAIM])
+        verifier_profil(profil, self.get(CLAIM_VERSION))
+        appliquer_claims(access, profil)
+        return access
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication dont l'utilisateur est reconstruit depuis le profil en cache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Le token ne contient aucune identification d'utilisateur")
+
+        profil = charger_profil(user_id)
+        try:
+            verifier_profil(profil, validated_token.get(CLAIM_VERSION))
+        except TokenError as e:
+            raise AuthenticationFailed(str(e), code='token_not_valid')
+        return utilisateur_depuis_profil(profil)
+
+
+def _utilisateur_modifie(sender, instance, **kwargs):
+    invalider_profil(instance.pk)
+
+
+def _role_utilisateur_modifie(sender, instance, **kwargs):
+    invalider_profil(instance.user_id)
+
+
+def _role_modifie(sender, instance, **kwargs):
+    from apps.core.models import AuthUserrole
+    invalider_profil(*AuthUserrole.objects.filter(role=instance).values_list('user_id', flat=True))
+
+
+def _relations_modifiees(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    User = get_user_model()
+    if isinstance(instance, User):
+        invalider_profil(instance.pk)
+    elif model is User and pk_set:
+        invalider_profil(*pk_set)
+    elif isinstance(instance, Group):
+        invalider_profil(*instance.user_set.values_list('pk', flat=True))
+
+
+def connecter_signaux():
+    """Appelé depuis UtilisateursConfig.ready()."""
+    from apps.core.models import AuthRole, AuthUserrole
+
+    User = get_user_model()
+    post_save.connect(_utilisateur_modifie, sender=User, dispatch_uid='jwt_claims_user_save')
+    post_delete.connect(_utilisateur_modifie, sender=User, dispatch_uid='jwt_claims_user_delete')
+    post_save.connect(_role_utilisateur_modifie, sender=AuthUserrole, dispatch_uid='jwt_claims_userrole_save')
+    post_delete.connect(_role_utilisateur_modifie, sender=AuthUserrole, dispatch_uid='jwt_claims_userrole_delete')
+    post_save.connect(_role_modifie, sender=AuthRole, dispatch_uid='jwt_claims_role_save')
+    m2m_changed.connect(_relations_modifiees, sender=User.groups.through, dispatch_uid='jwt_claims_groups')
+    m2m_changed.connect(
+        _relations_modifiees, sender=User.user_permissions.through, dispatch_uid='jwt_claims_user_permissions'
+    )
+    m2m_changed.connect(_relations_modifiees, sender=Group.permissions.through, dispatch_uid='jwt_claims_group_permissions')
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utilisateurs', '0002_add_used_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Version des tokens'),
+        ),
+    ]
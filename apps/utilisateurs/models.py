@@ -10,6 +10,7 @@ class User(AbstractUser):
     telephone = models.CharField(max_length=20, verbose_name="Téléphone")
     email_verifie = models.BooleanField(default=False, verbose_name="Email vérifié")
     telephone_verifie = models.BooleanField(default=False, verbose_name="Téléphone vérifié")
+    token_version = models.PositiveIntegerField(default=0, verbose_name="Version des tokens")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
 
     class Meta:
@@ -249,3 +249,117 @@ class UserPermissionTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+
+
+class ClaimsJWTAuthenticationTestCase(APITestCase):
+    """Tests de l'authentification JWT à claims et profil en cache"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='claims',
+            email='claims@example.com',
+            nom='Claims',
+            prenom='User',
+            password='testpass123'
+        )
+
+    def _authentifier(self, token):
+        from rest_framework.test import APIRequestFactory
+        from .authentication import ClaimsJWTAuthentication
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return ClaimsJWTAuthentication().authenticate(request)
+
+    def test_token_contient_les_claims(self):
+        from .authentication import ClaimsRefreshToken
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        self.assertFalse(access['is_staff'])
+        self.assertFalse(access['email_verifie'])
+        self.assertEqual(access['roles'], [])
+        self.assertEqual(access['tv'], 0)
+
+    def test_authentification_sans_requete_avec_profil_en_cache(self):
+        from .authentication import ClaimsRefreshToken
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        self._authentifier(access)
+
+        with self.assertNumQueries(0):
+            user, _ = self._authentifier(access)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertFalse(user.has_perm('utilisateurs.view_user'))
+
+    def test_enregistrement_invalide_le_profil(self):
+        from .authentication import ClaimsRefreshToken
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        self._authentifier(access)
+
+        self.user.is_staff = True
+        self.user.save()
+
+        user, _ = self._authentifier(access)
+        self.assertTrue(user.is_staff)
+
+    def test_changement_de_role_invalide_le_profil(self):
+        from django.utils import timezone
+        from apps.core.models import AuthRole, AuthUserrole
+        from .authentication import ClaimsRefreshToken
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        self._authentifier(access)
+
+        role = AuthRole.objects.create(
+            nom='verificateur', permissions={'demandes': ['view']},
+            created_at=timezone.now(), updated_at=timezone.now()
+        )
+        AuthUserrole.objects.create(user=self.user, role=role, created_at=timezone.now())
+
+        user, _ = self._authentifier(access)
+        self.assertEqual(user.roles, {'verificateur': {'demandes': ['view']}})
+
+    def test_deconnexion_revoque_les_tokens(self):
+        from .authentication import ClaimsRefreshToken
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, status.HTTP_205_RESET_CONTENT)
+
+        response = self.client.get(reverse('user-me'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials()
+        response = self.client.post(reverse('token_refresh'), {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_pendant_le_chargement_du_profil(self):
+        from unittest import mock
+        from . import authentication
+
+        construire = authentication.construire_profil
+
+        def construire_puis_revoquer(user):
+            # Profil lu en base, puis révocation avant sa mise en cache
+            profil = construire(user)
+            authentication.revoquer_tokens(User.objects.get(pk=user.pk))
+            return profil
+
+        with mock.patch.object(authentication, 'construire_profil', side_effect=construire_puis_revoquer):
+            self.assertEqual(authentication.charger_profil(self.user.pk)['champs']['token_version'], 0)
+        self.assertEqual(authentication.charger_profil(self.user.pk)['champs']['token_version'], 1)
+
+        # Génération évincée du cache : le profil rangé n'est pas resservi
+        from django.core.cache import cache
+        cache.delete(authentication.GENERATION_KEY.format(self.user.pk))
+        with mock.patch.object(authentication, 'construire_profil', wraps=construire) as rechargement:
+            authentication.charger_profil(self.user.pk)
+        rechargement.assert_called_once()
+
+    def test_refresh_met_a_jour_les_claims(self):
+        from .authentication import ClaimsRefreshToken
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        self.user.email_verifie = True
+        self.user.save()
+
+        response = self.client.post(reverse('token_refresh'), {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(AccessToken(response.data['access'])['email_verifie'])
@@ -3,7 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import Throttled
 from rest_framework.permissions import IsAdminUser,IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import ClaimsRefreshToken, revoquer_tokens
 from django.contrib.auth import get_user_model, authenticate
 from django.utils import timezone
 from django.conf import settings
@@ -164,7 +164,7 @@ class LoginView(generics.GenericAPIView):
             )
 
         # 6️⃣ Succès → génération JWT
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
 
         # Nettoyage rate limit
         LoginRateLimiter.clear_attempts(ip_address)
@@ -216,7 +216,7 @@ class VerifyTokenView(generics.CreateAPIView):
                 user.save()
                 
                 # Générer des tokens JWT
-                refresh = RefreshToken.for_user(user)
+                refresh = ClaimsRefreshToken.for_user(user)
                 result.update({
                     'refresh': str(refresh),
                     'access': str(refresh.access_token),
@@ -268,27 +268,29 @@ class PasswordChangeView(generics.UpdateAPIView):
                 'error': 'Ancien mot de passe incorrect'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Changer le mot de passe
+        # Changer le mot de passe et révoquer les autres sessions
         request.user.set_password(serializer.validated_data['new_password'])
         request.user.save()
+        revoquer_tokens(request.user)
+        refresh = ClaimsRefreshToken.for_user(request.user)
         
         return Response({
-            'message': 'Mot de passe changé avec succès'
+            'message': 'Mot de passe changé avec succès',
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
         }, status=status.HTTP_200_OK)
 
 
 class LogoutView(generics.GenericAPIView):
-    """Déconnexion en blacklistant le refresh token"""
+    """
+    Déconnexion : incrémente la version des tokens de l'utilisateur, ce qui
+    révoque immédiatement ses tokens d'accès et de rafraîchissement.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        try:
-            refresh_token = request.data.get("refresh")
-            token = RefreshToken(refresh_token)
-            token.blacklist()  # nécessite l'app token_blacklist activée
-            return Response({"message": "Déconnecté avec succès"}, status=status.HTTP_205_RESET_CONTENT)
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        revoquer_tokens(request.user)
+        return Response({"message": "Déconnecté avec succès"}, status=status.HTTP_205_RESET_CONTENT)
 
 
 """
@@ -392,7 +394,6 @@ class AdminManagementViewSet(viewsets.ModelViewSet):
     def verify_admin_otp(self, request, pk=None):
         """Vérifier l'OTP et activer un compte admin nouvellement créé"""
         from django.conf import settings
-        from rest_framework_simplejwt.tokens import RefreshToken
         from .serializers import VerifyTokenSerializer
 
         user = self.get_object()
@@ -437,7 +438,7 @@ class AdminManagementViewSet(viewsets.ModelViewSet):
             if result.get('verified', False):
                 user.is_active = True
                 user.save()
-                refresh = RefreshToken.for_user(user)
+                refresh = ClaimsRefreshToken.for_user(user)
                 access = str(refresh.access_token)
 
             # Journaliser l'activation
@@ -2,7 +2,10 @@
 
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import VenteSticker, DemandeVente, Paiement, AvisClient, CodePromo, ReferenceSticker, VenteStickerNotaire
+from .models import (
+    VenteSticker, DemandeVente, Paiement, AvisClient, CodePromo, ReferenceSticker, VenteStickerNotaire,
+    MouvementStock,
+)
 
 
 # ========================================
@@ -101,10 +104,22 @@ class PaiementAdmin(admin.ModelAdmin):
 # ========================================
 # 7. STICKERS NOTAIRES
 # ========================================
+class MouvementStockInline(admin.TabularInline):
+    model = MouvementStock
+    fields = ('created_at', 'motif', 'quantite', 'vente_reference', 'case', 'nombre')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    ordering = ('-created_at',)
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(ReferenceSticker)
 class ReferenceStickerAdmin(admin.ModelAdmin):
     list_display = ('nom', 'prix_unitaire', 'total_stock', 'created_at')
     search_fields = ('nom',)
+    inlines = [MouvementStockInline]
 
 @admin.register(VenteStickerNotaire)
 class VenteStickerNotaireAdmin(admin.ModelAdmin):
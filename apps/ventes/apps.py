@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class VentesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ventes'
+
+    def ready(self):
+        from . import stock
+        stock.connecter_signaux()
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from apps.ventes import stock
+
+
+class Command(BaseCommand):
+    help = (
+        'Compacte le registre de stock des stickers et le réconcilie avec '
+        'ReferenceSticker.total_stock et les ventes (à lancer via cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sans-compaction', action='store_true', help='Ne pas compacter le registre')
+        parser.add_argument('--corriger', action='store_true', help='Enregistrer les mouvements manquants')
+
+    def handle(self, *args, **options):
+        if not options['sans_compaction']:
+            rapport = stock.compacter()
+            self.stdout.write(self.style.SUCCESS(
+                f"{rapport['regroupes']} mouvement(s) regroupé(s) en {rapport['lignes']} ligne(s), "
+                f"cases rééquilibrées pour {rapport['cases']} sticker(s)"
+            ))
+
+        rapport = stock.reconcilier(corriger=options['corriger'])
+        style = self.style.WARNING if rapport['ecarts'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{rapport['examines']} sticker(s) examiné(s) : {len(rapport['ecarts'])} écart(s)"
+            + (' corrigé(s)' if rapport['corriges'] and rapport['ecarts'] else '')
+        ))
+        for ecart in rapport['ecarts']:
+            self.stdout.write(self.style.WARNING(
+                f"  {ecart['nom']} [{ecart['controle']}] attendu {ecart['attendu']}, constaté {ecart['constate']}"
+            ))
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:43
+
+import bisect
+import re
+
+from django.db import migrations, models
+
+# Copie figée de la lecture des plages (apps/ventes/series.py à cette migration)
+SERIE = re.compile(r'^([A-Z]*)[-\s]?(\d+)$')
+
+EXCLUSION = (
+    "ALTER TABLE ventes_ventestickernotaire ADD CONSTRAINT vente_notaire_serie_excl "
+    "EXCLUDE USING gist (serie_prefixe WITH =, int8range(serie_debut, serie_fin, '[]') WITH &&) "
+    "WHERE (serie_debut IS NOT NULL)"
+)
+
+
+def lire_plage(debut, fin):
+    """Plage texte -> (prefixe, debut, fin), ou None si illisible."""
+    lus = [SERIE.match(str(valeur or '').strip().upper()) for valeur in (debut, fin)]
+    if not all(lus) or lus[0].group(1) != lus[1].group(1):
+        return None
+    n_debut, n_fin = int(lus[0].group(2)), int(lus[1].group(2))
+    return (lus[0].group(1), n_debut, n_fin) if n_debut <= n_fin else None
+
+
+def lire_plages_existantes(apps, schema_editor):
+    """
+    Renseigne les séries des ventes existantes, les plus anciennes d'abord.
+    Une plage illisible ou qui chevauche une vente antérieure reste non
+    indexée (à corriger à la main) pour que la contrainte puisse être posée.
+    """
+    VenteStickerNotaire = apps.get_model('ventes', 'VenteStickerNotaire')
+    # Plages indexées par préfixe : débuts triés et fins correspondantes
+    debuts, fins, lues = {}, {}, []
+    for vente in VenteStickerNotaire.objects.order_by('date_vente', 'id').iterator():
+        plage = lire_plage(vente.plage_debut, vente.plage_fin)
+        if plage is None:
+            continue
+        prefixe, debut, fin = plage
+        debuts_prefixe, fins_prefixe = debuts.setdefault(prefixe, []), fins.setdefault(prefixe, [])
+        position = bisect.bisect_right(debuts_prefixe, fin)
+        if position and fins_prefixe[position - 1] >= debut:
+            continue
+        debuts_prefixe.insert(position, debut)
+        fins_prefixe.insert(position, fin)
+        vente.serie_prefixe, vente.serie_debut, vente.serie_fin = prefixe, debut, fin
+        lues.append(vente)
+    VenteStickerNotaire.objects.bulk_update(lues, ['serie_prefixe', 'serie_debut', 'serie_fin'], batch_size=500)
+
+
+def creer_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(EXCLUSION)
+
+
+def supprimer_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE ventes_ventestickernotaire DROP CONSTRAINT IF EXISTS vente_notaire_serie_excl'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notaires', '0009_initialiser_charges'),
+        ('ventes', '0023_ventestickernotaire_date_recu_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ventestickernotaire',
+            name='serie_debut',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ventestickernotaire',
+            name='serie_fin',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ventestickernotaire',
+            name='serie_prefixe',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='ventestickernotaire',
+            index=models.Index(fields=['serie_prefixe', 'serie_debut'], name='vente_notaire_serie_idx'),
+        ),
+        migrations.RunPython(lire_plages_existantes, migrations.RunPython.noop),
+        migrations.RunPython(creer_exclusion, supprimer_exclusion),
+    ]
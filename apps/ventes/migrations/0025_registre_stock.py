@@ -0,0 +1,82 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Sum
+
+CASES = 8
+
+
+def ouvrir_registre(apps, schema_editor):
+    """
+    Ouvre le registre de chaque sticker : une entrée de `total_stock`, une
+    sortie du total déjà vendu, et le solde réparti dans les cases.
+    """
+    ReferenceSticker = apps.get_model('ventes', 'ReferenceSticker')
+    VenteStickerNotaire = apps.get_model('ventes', 'VenteStickerNotaire')
+    MouvementStock = apps.get_model('ventes', 'MouvementStock')
+    CaseStock = apps.get_model('ventes', 'CaseStock')
+
+    vendus = dict(
+        VenteStickerNotaire.objects.values('type_sticker_id').annotate(total=Sum('quantite'))
+        .values_list('type_sticker_id', 'total')
+    )
+    mouvements, cases = [], []
+    for reference in ReferenceSticker.objects.all():
+        vendu = vendus.get(reference.pk) or 0
+        mouvements.append(MouvementStock(type_sticker=reference, quantite=reference.total_stock, motif='entree'))
+        if vendu:
+            mouvements.append(MouvementStock(type_sticker=reference, quantite=-vendu, motif='vente'))
+        part, reste = divmod(max(reference.total_stock - vendu, 0), CASES)
+        cases.extend(
+            CaseStock(type_sticker=reference, numero=n, disponible=part + (1 if n < reste else 0))
+            for n in range(CASES)
+        )
+    MouvementStock.objects.bulk_create(mouvements, batch_size=500)
+    CaseStock.objects.bulk_create(cases, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventes', '0024_series_stickers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveSmallIntegerField()),
+                ('disponible', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('type_sticker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cases_stock', to='ventes.referencesticker')),
+            ],
+            options={
+                'verbose_name': 'Case de stock',
+                'verbose_name_plural': 'Cases de stock',
+                'constraints': [models.UniqueConstraint(fields=('type_sticker', 'numero'), name='case_stock_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MouvementStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.IntegerField(verbose_name='Quantité (signée)')),
+                ('motif', models.CharField(choices=[('entree', 'Entrée en stock'), ('vente', 'Vente'), ('annulation', 'Annulation de vente'), ('ajustement', 'Ajustement')], max_length=20)),
+                ('vente_reference', models.CharField(blank=True, default='', max_length=30)),
+                ('case', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('nombre', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('type_sticker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mouvements', to='ventes.referencesticker')),
+            ],
+            options={
+                'verbose_name': 'Mouvement de stock',
+                'verbose_name_plural': 'Mouvements de stock',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['type_sticker', 'created_at'], name='mouvement_stock_sticker_idx')],
+            },
+        ),
+        migrations.RunPython(ouvrir_registre, migrations.RunPython.noop),
+    ]
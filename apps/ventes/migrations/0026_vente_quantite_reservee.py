@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def reprendre_reservations(apps, schema_editor):
+    """Les ventes existantes sont sorties du registre à son ouverture (0025)."""
+    VenteStickerNotaire = apps.get_model('ventes', 'VenteStickerNotaire')
+    VenteStickerNotaire.objects.update(quantite_reservee=F('quantite'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventes', '0025_registre_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ventestickernotaire',
+            name='quantite_reservee',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(reprendre_reservations, migrations.RunPython.noop),
+    ]
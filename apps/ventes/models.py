@@ -64,6 +64,16 @@ class ReferenceSticker(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from .stock import disponible
+
+        # Une baisse du stock total ne peut retirer que du stock encore disponible
+        if self.pk:
+            ancien = ReferenceSticker.objects.filter(pk=self.pk).values_list('total_stock', flat=True).first() or 0
+            if ancien - self.total_stock > disponible(self.pk):
+                raise ValidationError({'total_stock': f"Seuls {disponible(self.pk)} sticker(s) sont encore disponibles"})
+
     class Meta:
         verbose_name = "Référence Sticker"
         verbose_name_plural = "Références Stickers"
@@ -92,6 +102,12 @@ class VenteStickerNotaire(models.Model):
     quantite = models.PositiveIntegerField(verbose_name="Quantité")
     plage_debut = models.CharField(max_length=100, verbose_name="Plage de début (Ex: A1010101)")
     plage_fin = models.CharField(max_length=100, verbose_name="Plage de fin (Ex: A2000002)")
+    # Plage lue depuis plage_debut / plage_fin (apps/ventes/series.py)
+    serie_prefixe = models.CharField(max_length=20, blank=True, default='', editable=False)
+    serie_debut = models.BigIntegerField(null=True, blank=True, editable=False)
+    serie_fin = models.BigIntegerField(null=True, blank=True, editable=False)
+    # Quantité sortie du registre de stock pour cette vente (apps/ventes/stock.py)
+    quantite_reservee = models.PositiveIntegerField(default=0, editable=False)
     
     montant_total = models.DecimalField(
         max_digits=12, 
@@ -156,9 +172,56 @@ class VenteStickerNotaire(models.Model):
             
         return f"{nouveau_seq:03d}-{annee}/ONBF"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._plage_chargee = (instance.__dict__.get('plage_debut'), instance.__dict__.get('plage_fin'))
+        return instance
+
+    def plage_modifiee(self, debut=None, fin=None):
+        """
+        Plage nouvelle ou différente de celle chargée, donc à lire et vérifier.
+        Une plage inchangée ne l'est pas : les plages historiques (texte libre,
+        chevauchantes) laissées hors index par la migration 0024 restent
+        modifiables pour le reste (paiement...).
+        """
+        plage = (self.plage_debut if debut is None else debut, self.plage_fin if fin is None else fin)
+        return self.pk is None or getattr(self, '_plage_chargee', None) != plage
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from .series import PlageIndisponible, SerieInvalide, lire_plage, verifier_disponible
+        from .stock import disponible
+
+        if self.plage_modifiee():
+            try:
+                verifier_disponible(*lire_plage(self.plage_debut, self.plage_fin), exclure_pk=self.pk)
+            except (SerieInvalide, PlageIndisponible) as e:
+                raise ValidationError({'plage_debut': str(e)})
+
+        if self.type_sticker_id and self.quantite:
+            avant = VenteStickerNotaire.objects.filter(pk=self.pk, type_sticker_id=self.type_sticker_id).first()
+            besoin = self.quantite - (avant.quantite_reservee if avant else 0)
+            if besoin > disponible(self.type_sticker_id):
+                raise ValidationError({'quantite': f"Stock insuffisant : {disponible(self.type_sticker_id)} disponible(s)"})
+
+    def _lire_serie(self):
+        from .series import SerieInvalide, lire_plage
+
+        try:
+            self.serie_prefixe, self.serie_debut, self.serie_fin = lire_plage(self.plage_debut, self.plage_fin)
+        except SerieInvalide:
+            # Plage historique en texte libre : non indexée
+            self.serie_prefixe, self.serie_debut, self.serie_fin = '', None, None
+
     def save(self, *args, **kwargs):
         if not self.reference:
             self.reference = self._generer_reference()
+
+        if self.plage_modifiee():
+            self._lire_serie()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'serie_prefixe', 'serie_debut', 'serie_fin'}
             
         # Générer le numéro de reçu si pas encore défini
         if not self.numero_recu:
@@ -170,18 +233,106 @@ class VenteStickerNotaire(models.Model):
             self.montant_total = self.type_sticker.prix_unitaire * self.quantite
         
         self.reste_a_payer = self.montant_total - self.montant_paye
-        
-        super().save(*args, **kwargs)
+
+        champs = kwargs.get('update_fields')
+        if champs is not None and not {'quantite', 'type_sticker', 'type_sticker_id'} & set(champs):
+            super().save(*args, **kwargs)
+            self._plage_chargee = (self.plage_debut, self.plage_fin)
+            return
+
+        # Toute vente enregistrée sort sa quantité du stock, dans la même
+        # transaction ; la suppression la remet (voir stock.py)
+        from . import stock
+
+        with transaction.atomic():
+            avant = None
+            if self.pk is not None:
+                avant = (
+                    VenteStickerNotaire.objects.select_for_update().filter(pk=self.pk)
+                    .values_list('type_sticker_id', 'quantite_reservee').first()
+                )
+            super().save(*args, **kwargs)
+            stock.synchroniser_vente(self, avant)
+        self._plage_chargee = (self.plage_debut, self.plage_fin)
 
     class Meta:
         verbose_name = "Vente Sticker Notaire"
         verbose_name_plural = "Ventes Stickers Notaires"
         ordering = ['-date_vente']
+        indexes = [
+            # Vente contenant un numéro : plus grand début <= numéro (series.vente_pour)
+            models.Index(fields=['serie_prefixe', 'serie_debut'], name='vente_notaire_serie_idx'),
+        ]
 
     def __str__(self):
         return f"{self.reference} - {self.numero_recu or 'Sans reçu'} - {self.notaire.nom_complet}"
 
 
+# =====================================================
+# 3 bis. REGISTRE DE STOCK DES STICKERS (apps/ventes/stock.py)
+# =====================================================
+
+class MouvementStock(models.Model):
+    """Ligne du registre : entrée (+) ou sortie (-) de stock, jamais modifiée."""
+    MOTIF_CHOICES = [
+        ('entree', 'Entrée en stock'),
+        ('vente', 'Vente'),
+        ('annulation', 'Annulation de vente'),
+        ('ajustement', 'Ajustement'),
+    ]
+
+    type_sticker = models.ForeignKey(
+        ReferenceSticker,
+        on_delete=models.CASCADE,
+        related_name='mouvements'
+    )
+    quantite = models.IntegerField(verbose_name="Quantité (signée)")
+    motif = models.CharField(max_length=20, choices=MOTIF_CHOICES)
+    vente_reference = models.CharField(max_length=30, blank=True, default='')
+    case = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Nombre de mouvements regroupés par la compaction
+    nombre = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Mouvement de stock"
+        verbose_name_plural = "Mouvements de stock"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['type_sticker', 'created_at'], name='mouvement_stock_sticker_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Un mouvement de stock ne se modifie pas : enregistrer un ajustement")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.type_sticker_id} {self.motif} {self.quantite:+d}"
+
+
+class CaseStock(models.Model):
+    """Part pré-allouée du stock disponible d'un sticker, verrouillée seule par une vente."""
+    type_sticker = models.ForeignKey(
+        ReferenceSticker,
+        on_delete=models.CASCADE,
+        related_name='cases_stock'
+    )
+    numero = models.PositiveSmallIntegerField()
+    disponible = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Case de stock"
+        verbose_name_plural = "Cases de stock"
+        constraints = [
+            models.UniqueConstraint(fields=['type_sticker', 'numero'], name='case_stock_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.type_sticker_id}#{self.numero} : {self.disponible}"
+
+
 # =====================================================
 # 4. DEMANDE (quatrième car Paiement y fait référence)
 # =====================================================
@@ -2,12 +2,15 @@
 from rest_framework import serializers
 from django.core.validators import EmailValidator, RegexValidator
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from datetime import timedelta
 import re
 import uuid
 
 from .models import VenteSticker, Demande, Paiement, AvisClient, CodePromo, ReferenceSticker, VenteStickerNotaire
+from .series import PlageIndisponible, SerieInvalide, lire_plage, verifier_disponible
+from . import stock
 
 
 
@@ -549,7 +552,54 @@ class ReferenceStickerSerializer(serializers.ModelSerializer):
         fields = ['id', 'nom', 'description', 'image', 'prix_unitaire', 'total_stock', 'created_at']
         read_only_fields = ['created_at']
 
-class VenteStickerNotaireSerializer(serializers.ModelSerializer):
+    def validate_total_stock(self, value):
+        # Une baisse du stock total ne peut retirer que du stock encore disponible
+        if self.instance is not None and value < self.instance.total_stock:
+            disponible = stock.disponible(self.instance.pk)
+            if self.instance.total_stock - value > disponible:
+                raise serializers.ValidationError(f"Seuls {disponible} sticker(s) sont encore disponibles")
+        return value
+
+class PlageSerieMixin:
+    """
+    Plage de numéros lisible et libre (aucun chevauchement, voir series.py),
+    quantité sortie du stock dans la même transaction (voir stock.py)
+    """
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        debut = attrs.get('plage_debut', getattr(self.instance, 'plage_debut', None))
+        fin = attrs.get('plage_fin', getattr(self.instance, 'plage_fin', None))
+        if self.instance is not None and not self.instance.plage_modifiee(debut, fin):
+            # Plage inchangée (éventuellement historique, hors index) : rien à revérifier
+            return attrs
+        try:
+            verifier_disponible(*lire_plage(debut, fin), exclure_pk=getattr(self.instance, 'pk', None))
+        except (SerieInvalide, PlageIndisponible) as e:
+            raise serializers.ValidationError({'plage_debut': str(e)})
+        return attrs
+
+    def _enregistrer(self, enregistrer, *args):
+        # Vente concurrente sur la même plage : la contrainte d'exclusion tranche.
+        # Le stock est réservé par VenteStickerNotaire.save()
+        try:
+            with transaction.atomic():
+                return enregistrer(*args)
+        except stock.StockInsuffisant as e:
+            raise serializers.ValidationError({'quantite': str(e)})
+        except IntegrityError as e:
+            if 'vente_notaire_serie_excl' in str(e):
+                raise serializers.ValidationError({'plage_debut': 'Plage déjà attribuée'})
+            raise
+
+    def create(self, validated_data):
+        return self._enregistrer(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._enregistrer(super().update, instance, validated_data)
+
+
+class VenteStickerNotaireSerializer(PlageSerieMixin, serializers.ModelSerializer):
     """
     Serializer pour les ventes de stickers aux notaires
     """
@@ -566,6 +616,35 @@ class VenteStickerNotaireSerializer(serializers.ModelSerializer):
             'date_vente', 'created_at'
         ]
 
+
+class VerificationStickerSerializer(serializers.Serializer):
+    """Résultat public de la vérification d'un numéro de sticker"""
+    serie = serializers.CharField()
+    valide = serializers.SerializerMethodField()
+    erreur = serializers.CharField(allow_null=True)
+    vente = serializers.SerializerMethodField()
+
+    def get_valide(self, obj):
+        return obj['vente'] is not None
+
+    def get_vente(self, obj):
+        vente = obj['vente']
+        if vente is None:
+            return None
+        return {
+            'reference': vente.reference,
+            'numero_recu': vente.numero_recu,
+            'date_recu': vente.date_recu,
+            'date_vente': vente.date_vente,
+            'type_sticker': vente.type_sticker.nom,
+            'plage': f"{vente.plage_debut}-{vente.plage_fin}",
+            'notaire': {
+                'id': vente.notaire.id,
+                'nom': f"{vente.notaire.nom} {vente.notaire.prenom}",
+                'matricule': vente.notaire.matricule,
+            },
+        }
+
 class RecuStickerSerializer(serializers.ModelSerializer):
     """
     Serializer pour le reçu de vente de stickers
@@ -629,7 +708,7 @@ class RecuStickerSerializer(serializers.ModelSerializer):
         except ImportError:
             return f"{int(obj.montant_total)} francs CFA"
 
-class RecuStickerCreateSerializer(serializers.ModelSerializer):
+class RecuStickerCreateSerializer(PlageSerieMixin, serializers.ModelSerializer):
     """
     Serializer pour la création d'une vente de sticker via l'API de reçus
     """
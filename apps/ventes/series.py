@@ -0,0 +1,153 @@
+# apps/ventes/series.py
+"""
+Numéros de série des stickers vendus aux notaires.
+
+Une plage `A1010101`-`A2000002` est lue en (préfixe 'A', 1010101, 2000002)
+et stockée dans `VenteStickerNotaire` (serie_prefixe, serie_debut,
+serie_fin). Deux plages d'un même préfixe ne peuvent pas se chevaucher :
+
+    - PostgreSQL : contrainte d'exclusion GiST sur
+      (serie_prefixe WITH =, int8range(serie_debut, serie_fin, '[]') WITH &&),
+      créée par la migration 0024 ;
+    - partout : vérification applicative (`verifier_disponible`) avant
+      l'enregistrement, seule garantie sous SQLite.
+
+Les plages ne se chevauchant pas, la vente qui contient un numéro est celle
+de plus grand début <= numéro (index (serie_prefixe, serie_debut)) : une
+recherche est un parcours d'index descendant arrêté à la première ligne,
+en O(log n). La vérification par lot fait cette recherche pour chaque
+numéro distinct, sauf s'il tombe dans une plage déjà trouvée
+(`IndexPlages`) : au plus une requête bornée par numéro, quel que soit
+l'écart entre les numéros demandés.
+"""
+import bisect
+import re
+
+from django.conf import settings
+
+SERIE = re.compile(r'^([A-Z]*)[-\s]?(\d+)$')
+
+
+class SerieInvalide(ValueError):
+    pass
+
+
+class PlageIndisponible(ValueError):
+    pass
+
+
+def _config():
+    config = {'MAX_SERIES': 500}
+    config.update(getattr(settings, 'VENTES_VERIFICATION', {}))
+    return config
+
+
+def lire_numero(serie):
+    """'a1010150' -> ('A', 1010150) ; lève SerieInvalide."""
+    correspondance = SERIE.match(str(serie or '').strip().upper())
+    if not correspondance:
+        raise SerieInvalide(f"Numéro de série invalide : {serie!r}")
+    return correspondance.group(1), int(correspondance.group(2))
+
+
+def lire_plage(debut, fin):
+    """Plage texte -> (prefixe, debut, fin) ; lève SerieInvalide."""
+    prefixe, n_debut = lire_numero(debut)
+    prefixe_fin, n_fin = lire_numero(fin)
+    if prefixe != prefixe_fin:
+        raise SerieInvalide(f"Préfixes différents : {prefixe!r} et {prefixe_fin!r}")
+    if n_debut > n_fin:
+        raise SerieInvalide("Le début de plage est supérieur à la fin")
+    return prefixe, n_debut, n_fin
+
+
+class IndexPlages:
+    """
+    Intervalles disjoints triés par début, par préfixe ; `trouver` et
+    `chevauche` procèdent par dichotomie.
+    """
+
+    def __init__(self, plages=()):
+        self._debuts, self._plages = {}, {}
+        for prefixe, debut, fin, valeur in sorted(plages, key=lambda p: (p[0], p[1])):
+            self._debuts.setdefault(prefixe, []).append(debut)
+            self._plages.setdefault(prefixe, []).append((debut, fin, valeur))
+
+    def trouver(self, prefixe, numero):
+        """Valeur de la plage contenant le numéro, ou None."""
+        position = bisect.bisect_right(self._debuts.get(prefixe, []), numero) - 1
+        if position < 0:
+            return None
+        debut, fin, valeur = self._plages[prefixe][position]
+        return valeur if numero <= fin else None
+
+    def chevauche(self, prefixe, debut, fin):
+        """Valeur d'une plage chevauchant [debut, fin], ou None."""
+        debuts = self._debuts.get(prefixe, [])
+        position = bisect.bisect_right(debuts, fin) - 1
+        if position < 0:
+            return None
+        autre_debut, autre_fin, valeur = self._plages[prefixe][position]
+        return valeur if autre_fin >= debut else None
+
+    def ajouter(self, prefixe, debut, fin, valeur):
+        debuts = self._debuts.setdefault(prefixe, [])
+        position = bisect.bisect_left(debuts, debut)
+        debuts.insert(position, debut)
+        self._plages.setdefault(prefixe, []).insert(position, (debut, fin, valeur))
+
+
+def _ventes():
+    from .models import VenteStickerNotaire
+    return VenteStickerNotaire.objects.select_related('notaire', 'type_sticker')
+
+
+def vente_pour(prefixe, numero):
+    """Vente contenant le numéro, ou None (une requête indexée)."""
+    vente = (
+        _ventes()
+        .filter(serie_prefixe=prefixe, serie_debut__lte=numero)
+        .order_by('-serie_debut')
+        .first()
+    )
+    return vente if vente is not None and vente.serie_fin >= numero else None
+
+
+def verifier_disponible(prefixe, debut, fin, exclure_pk=None):
+    """Lève PlageIndisponible si [debut, fin] chevauche une vente existante."""
+    from .models import VenteStickerNotaire
+
+    autre = (
+        VenteStickerNotaire.objects
+        .filter(serie_prefixe=prefixe, serie_debut__lte=fin, serie_fin__gte=debut)
+        .exclude(pk=exclure_pk)
+        .only('reference')
+        .first()
+    )
+    if autre is not None:
+        raise PlageIndisponible(f"Plage déjà attribuée (vente {autre.reference})")
+
+
+def verifier_series(series):
+    """
+    Vérification par lot : [(serie, vente ou None, erreur ou None)].
+    Au plus une requête `vente_pour` par numéro distinct ; les numéros
+    d'une plage déjà trouvée n'en coûtent pas.
+    """
+    lus = []
+    for serie in series:
+        try:
+            lus.append((serie, lire_numero(serie), None))
+        except SerieInvalide as e:
+            lus.append((serie, None, str(e)))
+
+    index, trouvees = IndexPlages(), {}
+    for cle in sorted({cle for _, cle, _ in lus if cle}):
+        vente = index.trouver(*cle)
+        if vente is None:
+            vente = vente_pour(*cle)
+            if vente is not None:
+                index.ajouter(cle[0], vente.serie_debut, vente.serie_fin, vente)
+        trouvees[cle] = vente
+
+    return [(serie, trouvees.get(cle), erreur) for serie, cle, erreur in lus]
@@ -8,10 +8,10 @@ from datetime import timedelta
 import uuid
 from django.conf import settings
 
-from .models import (
-    VenteSticker, VentesSticker, Demande, 
-    Paiement, User
-)
+from apps.documents.models import DocumentsDocument
+from apps.notaires.models import NotairesNotaire
+
+from .models import VenteSticker, Demande, Paiement
 from .serializers import DemandeCreateSerializer
 
 
@@ -25,50 +25,41 @@ class VenteStickerService:
         Créer une vente de sticker liée à un notaire
         """
         # Validation des champs requis
-        required_fields = ['sticker_id', 'notaire_id', 'quantite', 'client_nom', 'client_email']
+        required_fields = ['sticker_id', 'notaire_id', 'quantite', 'client_email']
         for field in required_fields:
             if not data.get(field):
                 raise ValidationError({field: 'Ce champ est requis'})
         
+        try:
+            quantite = int(data['quantite'])
+        except (TypeError, ValueError):
+            quantite = 0
+        if quantite < 1:
+            raise ValidationError({'quantite': 'Un entier positif est attendu'})
+
         # Normalisation email
-        if 'client_email' in data:
-            data['client_email'] = data['client_email'].lower().strip()
-        
-        # Vérification du stock (avec verrouillage)
-        sticker = VentesSticker.objects.select_for_update().get(
-            id=data['sticker_id'],
-            actif=True
-        )
+        client_email = str(data['client_email']).lower().strip()
         
-        if sticker.quantite < data['quantite']:
-            raise ValidationError({
-                'quantite': f'Stock insuffisant. Disponible: {sticker.quantite}'
-            })
+        # Sticker vendu : document du catalogue (VenteSticker.sticker), sans stock propre
+        sticker = get_object_or_404(DocumentsDocument, id=data['sticker_id'], actif=True)
+        notaire = get_object_or_404(NotairesNotaire, id=data['notaire_id'], actif=True)
         
         # Prix figé à la date de vente (historique)
-        prix_unitaire = sticker.prix_ttc
+        prix_unitaire = sticker.prix
         
         # Création de la vente
         vente = VenteSticker.objects.create(
             sticker=sticker,
-            notaire_id=data['notaire_id'],
-            quantite=data['quantite'],
+            code=uuid.uuid4().hex[:12].upper(),
+            notaire=notaire,
+            quantite=quantite,
             prix_unitaire=prix_unitaire,
-            montant_total=prix_unitaire * data['quantite'],
-            client_nom=data['client_nom'],
-            client_email=data['client_email'],
-            client_contact=data.get('client_contact', ''),
-            token_acces=uuid.uuid4() if data.get('avec_suivi') else None
+            montant_total=prix_unitaire * quantite,
+            client_email=client_email,
         )
         
-        # Décrémentation atomique du stock
-        sticker.quantite = F('quantite') - data['quantite']
-        sticker.save(update_fields=['quantite'])
-        sticker.refresh_from_db()
-        
         return {
             'vente': vente,
-            'stock_restant': sticker.quantite,
             'prix_unitaire_fige': prix_unitaire
         }
 
@@ -131,25 +122,20 @@ class DemandeService:
         if demande.statut != 'en_traitement':
             raise ValidationError("La demande doit être en traitement")
         
-        notaire = get_object_or_404(User, id=notaire_id, role='notaire')
+        notaire = get_object_or_404(NotairesNotaire, id=notaire_id, actif=True)
         
         # Vérifier la disponibilité du notaire
         demandes_actives = Demande.objects.filter(
             notaire=notaire,
-            statut__in=['en_traitement', 'en_attente_notaire']
-        ).count()
+            statut='en_traitement'
+        ).exclude(pk=demande.pk).count()
         
         if demandes_actives >= 5:  # Limite de 5 demandes actives
             raise ValidationError("Ce notaire a atteint sa limite de demandes actives")
         
         # Attribution
         demande.notaire = notaire
-        demande.statut = 'en_attente_notaire'
-        demande.save()
-        
-        # Mise à jour disponibilité notaire
-        notaire.is_available = False
-        notaire.save(update_fields=['is_available'])
+        demande.save(update_fields=['notaire', 'updated_at'])
         
         # Envoyer notification au notaire
         from .services import NotificationService
@@ -252,7 +238,7 @@ class StatistiquesService:
             created_at__range=[date_debut, date_fin]
         ).aggregate(
             total_demandes=Count('id'),
-            demandes_terminees=Count('id', filter=Q(statut='termine')),
+            demandes_terminees=Count('id', filter=Q(statut='terminee')),
             total_montant=Sum('montant_total')
         )
         
@@ -302,12 +288,11 @@ class NotificationService:
         # Exemple d'envoi d'email
         subject = "Nouvelle demande de document"
         message = f"""
-        Bonjour {notaire.get_full_name()},
+        Bonjour {notaire.prenom} {notaire.nom},
         
         Une nouvelle demande vous a été attribuée :
         - Référence : {demande.reference}
-        - Document : {demande.document.nom}
-        - Client : {demande.client_nom}
+        - Client : {demande.client_email}
         - Montant : {demande.montant_total} FCFA
         
         Connectez-vous à votre espace pour traiter cette demande.
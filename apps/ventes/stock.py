@@ -0,0 +1,351 @@
+# apps/ventes/stock.py
+"""
+Registre de stock des stickers vendus aux notaires.
+
+Chaque entrée ou sortie est une ligne de `MouvementStock` (quantité signée),
+jamais modifiée : le solde d'un sticker est la somme de ses mouvements,
+mis en cache (VENTES_STOCK['TTL_SOLDE']) et oublié par chaque mouvement
+(réservation, libération, entrée, correction) et chaque compaction.
+
+`VenteStickerNotaire.save()` sort la quantité vendue du stock et la note
+dans `quantite_reservee` ; la suppression de la vente (signal post_delete)
+remet cette quantité-là. Une vente créée sans passer par save()
+(bulk_create, import brut) ne réserve rien et ne rend rien : `reconcilier()`
+la signale.
+
+Le stock disponible est réparti dans VENTES_STOCK['CASES'] cases
+(`CaseStock`). Une vente verrouille une seule case tirée au hasard parmi
+celles qui couvrent la quantité (SELECT ... FOR UPDATE SKIP LOCKED) : deux
+ventes simultanées du même sticker ne s'attendent pas, au lieu de se
+sérialiser sur une seule ligne. Si aucune case ne suffit, toutes les cases
+sont verrouillées dans l'ordre et la quantité est prélevée sur plusieurs.
+
+`ReferenceSticker.total_stock` reste le stock total reçu : ses variations
+sont enregistrées comme entrées (signal post_save), une vente ne le touche
+pas. La commande `stock_stickers` lance périodiquement :
+
+    - `compacter()` : regroupe les mouvements plus anciens que
+      VENTES_STOCK['RETENTION_JOURS'] en une ligne par sticker et par motif,
+      sous verrou du sticker (deux compactions simultanées ne regroupent
+      pas deux fois les mêmes lignes), et rééquilibre les cases ;
+    - `reconcilier()` : contrôle entrées == total_stock, cases == solde du
+      registre et ventes du registre == quantités de VenteStickerNotaire.
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import CaseStock, MouvementStock, ReferenceSticker, VenteStickerNotaire
+
+CLE_SOLDE = 'ventes:stock:solde:{}'
+MOTIFS_VENTE = ('vente', 'annulation')
+
+
+class StockInsuffisant(ValueError):
+    pass
+
+
+def _config():
+    config = {'CASES': 8, 'RETENTION_JOURS': 90, 'TTL_SOLDE': 300}
+    config.update(getattr(settings, 'VENTES_STOCK', {}))
+    return config
+
+
+def repartir(total, nombre):
+    """Répartit `total` en `nombre` parts entières aussi égales que possible."""
+    part, reste = divmod(max(total, 0), nombre)
+    return [part + (1 if i < reste else 0) for i in range(nombre)]
+
+
+# =====================================================
+# REGISTRE
+# =====================================================
+
+def _mouvement(type_sticker_id, quantite, motif, vente_reference='', case=None):
+    MouvementStock.objects.create(
+        type_sticker_id=type_sticker_id, quantite=quantite, motif=motif,
+        vente_reference=vente_reference, case=case,
+    )
+    _oublier_solde(type_sticker_id)
+
+
+def _oublier_solde(type_sticker_id):
+    # Oublié tout de suite et au commit : un solde relu entre-temps par une
+    # autre transaction (mouvement encore invisible) ne survit pas
+    cle = CLE_SOLDE.format(type_sticker_id)
+    cache.delete(cle)
+    transaction.on_commit(lambda: cache.delete(cle))
+
+
+def solde(type_sticker_id):
+    """Solde du registre (somme des mouvements), mis en cache."""
+    cle = CLE_SOLDE.format(type_sticker_id)
+    valeur = cache.get(cle)
+    if valeur is None:
+        valeur = MouvementStock.objects.filter(type_sticker_id=type_sticker_id).aggregate(
+            total=Sum('quantite'))['total'] or 0
+        cache.set(cle, valeur, _config()['TTL_SOLDE'])
+    return valeur
+
+
+def disponible(type_sticker_id):
+    """Stock réellement disponible dans les cases (non mis en cache)."""
+    return CaseStock.objects.filter(type_sticker_id=type_sticker_id).aggregate(
+        total=Sum('disponible'))['total'] or 0
+
+
+# =====================================================
+# CASES
+# =====================================================
+
+def _verrouiller_cases(type_sticker_id):
+    """Toutes les cases du sticker, créées au besoin, verrouillées dans l'ordre."""
+    CaseStock.objects.bulk_create(
+        [CaseStock(type_sticker_id=type_sticker_id, numero=n) for n in range(_config()['CASES'])],
+        ignore_conflicts=True,
+    )
+    return list(CaseStock.objects.select_for_update().filter(type_sticker_id=type_sticker_id).order_by('numero'))
+
+
+def _prelever(type_sticker_id, quantite):
+    """Retire `quantite` des cases ; retourne [(numero, quantite prélevée)]."""
+    candidates = list(
+        CaseStock.objects.filter(type_sticker_id=type_sticker_id, disponible__gte=quantite)
+        .values_list('pk', flat=True)
+    )
+    random.shuffle(candidates)
+    for pk in candidates:
+        case = (
+            CaseStock.objects.select_for_update(skip_locked=True)
+            .filter(pk=pk, disponible__gte=quantite)
+            .first()
+        )
+        if case is not None:
+            CaseStock.objects.filter(pk=pk).update(disponible=F('disponible') - quantite)
+            return [(case.numero, quantite)]
+
+    # Aucune case ne suffit seule (ou toutes sont prises) : prélèvement réparti
+    cases = _verrouiller_cases(type_sticker_id)
+    total = sum(case.disponible for case in cases)
+    if total < quantite:
+        raise StockInsuffisant(f"Stock insuffisant : {total} disponible(s), {quantite} demandé(s)")
+    prelevements, reste = [], quantite
+    for case in sorted(cases, key=lambda c: -c.disponible):
+        part = min(case.disponible, reste)
+        if part:
+            CaseStock.objects.filter(pk=case.pk).update(disponible=F('disponible') - part)
+            prelevements.append((case.numero, part))
+            reste -= part
+        if not reste:
+            break
+    return prelevements
+
+
+def _remettre(type_sticker_id, quantite):
+    """Remet `quantite` dans une case tirée au hasard ; retourne son numéro."""
+    numero = random.randrange(_config()['CASES'])
+    mis_a_jour = CaseStock.objects.filter(type_sticker_id=type_sticker_id, numero=numero).update(
+        disponible=F('disponible') + quantite)
+    if not mis_a_jour:
+        case = _verrouiller_cases(type_sticker_id)[numero]
+        CaseStock.objects.filter(pk=case.pk).update(disponible=F('disponible') + quantite)
+    return numero
+
+
+def _repartir_cases(cases, total):
+    for case, part in zip(cases, repartir(total, len(cases))):
+        if case.disponible != part:
+            case.disponible = part
+            case.save(update_fields=['disponible', 'updated_at'])
+
+
+# =====================================================
+# OPÉRATIONS
+# =====================================================
+
+@transaction.atomic
+def approvisionner(type_sticker_id, quantite, motif='entree'):
+    """Entrée (quantite > 0) ou retrait (quantite < 0) de stock hors vente."""
+    if quantite > 0:
+        cases = _verrouiller_cases(type_sticker_id)
+        for case, part in zip(cases, repartir(quantite, len(cases))):
+            if part:
+                CaseStock.objects.filter(pk=case.pk).update(disponible=F('disponible') + part)
+        _mouvement(type_sticker_id, quantite, motif)
+    elif quantite < 0:
+        for numero, part in _prelever(type_sticker_id, -quantite):
+            _mouvement(type_sticker_id, -part, motif, case=numero)
+
+
+def aligner_entrees(reference):
+    """Enregistre l'écart entre `total_stock` et les entrées du registre."""
+    entrees = MouvementStock.objects.filter(type_sticker=reference, motif='entree').aggregate(
+        total=Sum('quantite'))['total'] or 0
+    approvisionner(reference.pk, reference.total_stock - entrees)
+
+
+@transaction.atomic
+def reserver(type_sticker_id, quantite, vente_reference=''):
+    """Sort `quantite` du stock pour une vente ; lève StockInsuffisant."""
+    for numero, part in _prelever(type_sticker_id, quantite):
+        _mouvement(type_sticker_id, -part, 'vente', vente_reference, case=numero)
+
+
+@transaction.atomic
+def liberer(type_sticker_id, quantite, vente_reference=''):
+    """Remet en stock la quantité d'une vente annulée ou réduite."""
+    numero = _remettre(type_sticker_id, quantite)
+    _mouvement(type_sticker_id, quantite, 'annulation', vente_reference, case=numero)
+
+
+def synchroniser_vente(vente, avant=None):
+    """
+    Répercute une vente créée ou modifiée sur le stock (appelé par
+    VenteStickerNotaire.save). `avant` est le couple (type_sticker_id,
+    quantite_reservee) enregistré, None pour une création.
+    """
+    if avant is not None and avant[0] == vente.type_sticker_id:
+        ecart = vente.quantite - avant[1]
+        if ecart > 0:
+            reserver(vente.type_sticker_id, ecart, vente.reference)
+        elif ecart < 0:
+            liberer(vente.type_sticker_id, -ecart, vente.reference)
+    else:
+        if avant is not None and avant[1]:
+            liberer(avant[0], avant[1], vente.reference)
+        if vente.quantite:
+            reserver(vente.type_sticker_id, vente.quantite, vente.reference)
+    if (avant[1] if avant else 0) != vente.quantite:
+        VenteStickerNotaire.objects.filter(pk=vente.pk).update(quantite_reservee=vente.quantite)
+    vente.quantite_reservee = vente.quantite
+
+
+# =====================================================
+# TÂCHES PÉRIODIQUES
+# =====================================================
+
+def compacter(avant=None):
+    """
+    Regroupe les mouvements antérieurs à `avant` (par défaut il y a
+    RETENTION_JOURS jours) en une ligne par sticker et par motif, puis
+    rééquilibre les cases sur le solde courant.
+    """
+    config = _config()
+    limite = avant or timezone.now() - timedelta(days=config['RETENTION_JOURS'])
+    rapport = {'regroupes': 0, 'lignes': 0, 'cases': 0}
+
+    anciens = MouvementStock.objects.filter(created_at__lt=limite)
+    groupes = (
+        anciens.values('type_sticker_id', 'motif')
+        .annotate(total=Sum('quantite'), lignes=Count('id'), nombre_total=Sum('nombre'), dernier=Max('created_at'))
+        .filter(lignes__gt=1)
+    )
+    for type_sticker_id, motif in list(groupes.values_list('type_sticker_id', 'motif')):
+        with transaction.atomic():
+            # Verrou du sticker (les ventes ne le prennent pas), puis groupe
+            # relu : une compaction concurrente a pu le regrouper entre-temps
+            list(ReferenceSticker.objects.select_for_update().filter(pk=type_sticker_id).values_list('pk'))
+            lignes = anciens.filter(type_sticker_id=type_sticker_id, motif=motif)
+            groupe = lignes.aggregate(
+                total=Sum('quantite'), lignes=Count('id'), nombre_total=Sum('nombre'), dernier=Max('created_at'),
+            )
+            if groupe['lignes'] < 2:
+                continue
+            supprimes, _ = lignes.delete()
+            MouvementStock.objects.create(
+                type_sticker_id=type_sticker_id, motif=motif, quantite=groupe['total'],
+                nombre=groupe['nombre_total'], created_at=groupe['dernier'],
+            )
+            _oublier_solde(type_sticker_id)
+        rapport['regroupes'] += supprimes
+        rapport['lignes'] += 1
+
+    for type_sticker_id in ReferenceSticker.objects.values_list('pk', flat=True):
+        with transaction.atomic():
+            cases = _verrouiller_cases(type_sticker_id)
+            _repartir_cases(cases, sum(case.disponible for case in cases))
+        rapport['cases'] += 1
+    return rapport
+
+
+def _par_sticker(queryset, **agregats):
+    return {ligne.pop('type_sticker_id'): ligne for ligne in queryset.values('type_sticker_id').annotate(**agregats)}
+
+
+def reconcilier(corriger=False):
+    """
+    Compare registre, cases, `total_stock` et ventes par sticker (quatre
+    requêtes). Avec `corriger`, enregistre les mouvements manquants puis
+    recale les cases sur le solde du registre.
+    """
+    mouvements = _par_sticker(
+        MouvementStock.objects.all(),
+        solde=Sum('quantite'),
+        entrees=Sum('quantite', filter=Q(motif='entree')),
+        ventes=Sum('quantite', filter=Q(motif__in=MOTIFS_VENTE)),
+    )
+    cases = _par_sticker(CaseStock.objects.all(), disponible=Sum('disponible'))
+    ventes = _par_sticker(VenteStickerNotaire.objects.all(), quantite=Sum('quantite'))
+
+    ecarts, examines = [], 0
+    for reference in ReferenceSticker.objects.only('pk', 'nom', 'total_stock'):
+        examines += 1
+        registre = mouvements.get(reference.pk, {})
+        solde_registre = registre.get('solde') or 0
+        controles = [
+            ('entrees', reference.total_stock, registre.get('entrees') or 0),
+            ('ventes', (ventes.get(reference.pk) or {}).get('quantite') or 0, -(registre.get('ventes') or 0)),
+            ('cases', solde_registre, (cases.get(reference.pk) or {}).get('disponible') or 0),
+        ]
+        ecarts_sticker = [
+            {'type_sticker': reference.pk, 'nom': reference.nom, 'controle': controle,
+             'attendu': attendu, 'constate': constate}
+            for controle, attendu, constate in controles if attendu != constate
+        ]
+        ecarts.extend(ecarts_sticker)
+        if corriger and ecarts_sticker:
+            _corriger(reference, {e['controle']: e for e in ecarts_sticker})
+
+    return {'examines': examines, 'ecarts': ecarts, 'corriges': corriger}
+
+
+@transaction.atomic
+def _corriger(reference, ecarts):
+    cases = _verrouiller_cases(reference.pk)
+    if 'entrees' in ecarts:
+        ecart = ecarts['entrees']
+        _mouvement(reference.pk, ecart['attendu'] - ecart['constate'], 'entree')
+    if 'ventes' in ecarts:
+        ecart = ecarts['ventes']
+        _mouvement(reference.pk, ecart['constate'] - ecart['attendu'], 'vente')
+        # Ventes désormais couvertes par le registre : leur suppression rendra le stock
+        VenteStickerNotaire.objects.filter(type_sticker=reference).update(quantite_reservee=F('quantite'))
+    total = MouvementStock.objects.filter(type_sticker=reference).aggregate(total=Sum('quantite'))['total'] or 0
+    _repartir_cases(cases, total)
+
+
+# =====================================================
+# SIGNAUX
+# =====================================================
+
+def _reference_enregistree(sender, instance, raw=False, **kwargs):
+    if not raw:
+        aligner_entrees(instance)
+
+
+def _vente_supprimee(sender, instance, **kwargs):
+    # Ce que la vente a réservé, pas sa quantité : une vente hors registre ne rend rien
+    if instance.quantite_reservee:
+        liberer(instance.type_sticker_id, instance.quantite_reservee, instance.reference)
+
+
+def connecter_signaux():
+    """Appelé depuis VentesConfig.ready()."""
+    post_save.connect(_reference_enregistree, sender=ReferenceSticker, dispatch_uid='stock_reference_save')
+    post_delete.connect(_vente_supprimee, sender=VenteStickerNotaire, dispatch_uid='stock_vente_delete')
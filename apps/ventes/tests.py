@@ -0,0 +1,351 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.throttling import ScopedRateThrottle
+
+from apps.documents.models import DocumentsDocument
+from apps.notaires.models import NotairesNotaire
+from apps.utilisateurs.models import UtilisateursUser
+from . import stock
+from .models import CaseStock, MouvementStock, ReferenceSticker, VenteSticker, VenteStickerNotaire
+from .series import IndexPlages, SerieInvalide, lire_numero, lire_plage, vente_pour, verifier_series
+
+
+class SeriesStickersTestCase(TestCase):
+    """Plages de numéros des stickers vendus aux notaires"""
+
+    def setUp(self):
+        self.notaire = NotairesNotaire.objects.create(
+            matricule='N-SERIE', nom='Ouedraogo', prenom='Awa', email='awa@notaires.bf',
+            telephone='+22670000000', adresse='Ouagadougou',
+        )
+        self.sticker = ReferenceSticker.objects.create(nom='Sticker A', prix_unitaire=500, total_stock=1000)
+        self.vente = self._vente('A1010101', 'A1010200')
+        self.autre = self._vente('B0001', 'B0100')
+
+    def _vente(self, debut, fin):
+        return VenteStickerNotaire.objects.create(
+            notaire=self.notaire, type_sticker=self.sticker, quantite=10, plage_debut=debut, plage_fin=fin,
+        )
+
+    def test_lecture_des_plages(self):
+        self.assertEqual(lire_numero(' a1010150 '), ('A', 1010150))
+        self.assertEqual(lire_plage('A1010101', 'A2000002'), ('A', 1010101, 2000002))
+        self.assertEqual(
+            (self.vente.serie_prefixe, self.vente.serie_debut, self.vente.serie_fin), ('A', 1010101, 1010200)
+        )
+        for debut, fin in [('A10', 'B20'), ('A20', 'A10'), ('??', 'A1')]:
+            with self.assertRaises(SerieInvalide):
+                lire_plage(debut, fin)
+
+    def test_plage_historique_illisible_non_indexee(self):
+        vente = self._vente('premier carnet', 'dernier carnet')
+        self.assertIsNone(vente.serie_debut)
+
+    def test_vente_pour_un_numero(self):
+        self.assertEqual(vente_pour('A', 1010150), self.vente)
+        self.assertEqual(vente_pour('A', 1010200), self.vente)
+        self.assertIsNone(vente_pour('A', 1010201))
+        self.assertIsNone(vente_pour('C', 1010150))
+
+    def test_index_plages(self):
+        index = IndexPlages([('A', 10, 20, 'x'), ('A', 30, 40, 'y')])
+        self.assertEqual(index.trouver('A', 35), 'y')
+        self.assertIsNone(index.trouver('A', 25))
+        self.assertEqual(index.chevauche('A', 15, 32), 'y')
+        self.assertIsNone(index.chevauche('A', 21, 29))
+        index.ajouter('A', 21, 29, 'z')
+        self.assertEqual(index.trouver('A', 22), 'z')
+
+    def test_chevauchement_refuse(self):
+        admin = UtilisateursUser.objects.create_user(
+            username='admin', email='admin@notaires.bf', nom='Admin', prenom='Test',
+            password='pass', is_staff=True,
+        )
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        donnees = {
+            'notaire': self.notaire.pk, 'type_sticker': self.sticker.pk, 'quantite': 10,
+            'plage_debut': 'A1010190', 'plage_fin': 'A1010300',
+        }
+        response = client.post(reverse('vente-sticker-notaire-list'), donnees, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('plage_debut', response.data)
+
+        donnees.update(plage_debut='A1010201', plage_fin='A1010300')
+        response = client.post(reverse('vente-sticker-notaire-list'), donnees, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        vente = VenteStickerNotaire(
+            notaire=self.notaire, type_sticker=self.sticker, quantite=1, plage_debut='B50', plage_fin='B60',
+        )
+        with self.assertRaises(ValidationError):
+            vente.clean()
+
+    def test_plage_historique_modifiable(self):
+        # Lignes laissées hors index par la migration 0024 : texte libre, chevauchement
+        VenteStickerNotaire.objects.bulk_create([
+            VenteStickerNotaire(
+                reference=reference, notaire=self.notaire, type_sticker=self.sticker, quantite=1,
+                plage_debut=debut, plage_fin=fin, montant_total=500, reste_a_payer=500,
+            )
+            for reference, debut, fin in [('VNT-LIBRE', 'lot ancien', 'carnet 3'), ('VNT-CHEV', 'A1010150', 'A1010160')]
+        ])
+        admin = UtilisateursUser.objects.create_user(
+            username='admin', email='admin@notaires.bf', nom='Admin', prenom='Test',
+            password='pass', is_staff=True,
+        )
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        for reference in ('VNT-LIBRE', 'VNT-CHEV'):
+            url = reverse('vente-sticker-notaire-detail', args=[reference])
+            response = client.patch(url, {'montant_paye': 500}, format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+            vente = VenteStickerNotaire.objects.get(reference=reference)
+            self.assertEqual((vente.reste_a_payer, vente.serie_debut), (0, None))
+            vente.full_clean()
+
+            # Nouvelle plage : vérifiée
+            response = client.patch(url, {'plage_debut': 'A1010199', 'plage_fin': 'A1010199'}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_verification_publique(self):
+        client = APIClient()
+        response = client.get(reverse('verification-sticker'), {'serie': 'a1010150'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['valide'])
+        self.assertEqual(response.data['vente']['reference'], self.vente.reference)
+        self.assertEqual(response.data['vente']['numero_recu'], self.vente.numero_recu)
+        self.assertEqual(response.data['vente']['notaire']['matricule'], 'N-SERIE')
+
+        response = client.get(reverse('verification-sticker'), {'serie': 'A999'})
+        self.assertFalse(response.data['valide'])
+
+    def test_verification_par_lot(self):
+        response = APIClient().post(
+            reverse('verification-sticker'),
+            {'series': ['A1010101', 'B0050', 'A5', 'pas-un-numero']},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(response.data['valides'], 2)
+        references = [r['vente']['reference'] if r['vente'] else None for r in response.data['resultats']]
+        self.assertEqual(references, [self.vente.reference, self.autre.reference, None, None])
+        self.assertIsNotNone(response.data['resultats'][3]['erreur'])
+
+    def test_verification_par_lot_bornee(self):
+        # Numéros très éloignés : aucune vente intermédiaire chargée
+        self._vente('A5000001', 'A5000100')
+        with self.assertNumQueries(3):
+            resultats = verifier_series(['A1010101', 'A1010150', 'A9999999', 'A5000050', 'A1010101'])
+        self.assertEqual(
+            [vente.pk if vente else None for _, vente, _ in resultats],
+            [self.vente.pk, self.vente.pk, None, VenteStickerNotaire.objects.get(plage_debut='A5000001').pk,
+             self.vente.pk],
+        )
+
+    def test_verification_par_lot_limitee(self):
+        cache.clear()
+        client, url = APIClient(), reverse('verification-sticker')
+        with mock.patch.dict(ScopedRateThrottle.THROTTLE_RATES, {'verification_stickers': '2/min'}):
+            for _ in range(2):
+                self.assertEqual(client.post(url, {'series': ['A1010101']}, format='json').status_code, 200)
+            self.assertEqual(client.post(url, {'series': ['A1010101']}, format='json').status_code, 429)
+            self.assertEqual(client.get(url, {'serie': 'A1010101'}).status_code, 200)
+
+
+@override_settings(VENTES_STOCK={'CASES': 4})
+class StockStickersTestCase(TestCase):
+    """Registre de stock, cases pré-allouées, compaction et réconciliation"""
+
+    def setUp(self):
+        cache.clear()
+        self.notaire = NotairesNotaire.objects.create(
+            matricule='N-STOCK', nom='Kabore', prenom='Issa', email='issa@notaires.bf',
+            telephone='+22670000001', adresse='Bobo-Dioulasso',
+        )
+        self.sticker = ReferenceSticker.objects.create(nom='Sticker B', prix_unitaire=500, total_stock=100)
+        admin = UtilisateursUser.objects.create_user(
+            username='admin', email='admin@notaires.bf', nom='Admin', prenom='Test',
+            password='pass', is_staff=True,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=admin)
+
+    def _vendre(self, quantite, debut, fin):
+        return self.client.post(reverse('vente-sticker-notaire-list'), {
+            'notaire': self.notaire.pk, 'type_sticker': self.sticker.pk, 'quantite': quantite,
+            'plage_debut': debut, 'plage_fin': fin,
+        }, format='json')
+
+    def test_ouverture_en_cases(self):
+        self.assertEqual(stock.solde(self.sticker.pk), 100)
+        self.assertEqual(
+            sorted(CaseStock.objects.filter(type_sticker=self.sticker).values_list('disponible', flat=True)),
+            [25, 25, 25, 25],
+        )
+        self.sticker.total_stock = 140
+        self.sticker.save()
+        self.assertEqual(stock.disponible(self.sticker.pk), 140)
+        self.assertEqual(stock.solde(self.sticker.pk), 140)
+
+    def test_vente_preleve_une_case(self):
+        response = self._vendre(10, 'C1', 'C10')
+        self.assertEqual(response.status_code, 201)
+        sortie = MouvementStock.objects.get(motif='vente')
+        self.assertEqual((sortie.quantite, sortie.vente_reference), (-10, response.data['reference']))
+        self.assertEqual(CaseStock.objects.get(type_sticker=self.sticker, numero=sortie.case).disponible, 15)
+        self.assertEqual(stock.solde(self.sticker.pk), 90)
+
+    def test_solde_en_cache_oublie_par_les_mouvements(self):
+        self.assertEqual(stock.solde(self.sticker.pk), 100)
+        with self.assertNumQueries(0):
+            self.assertEqual(stock.solde(self.sticker.pk), 100)
+        self._vendre(10, 'C1', 'C10')
+        self.assertEqual(stock.solde(self.sticker.pk), 90)
+        self._vendre(5, 'C11', 'C15')
+        self.assertEqual(stock.solde(self.sticker.pk), 85)
+        stock.compacter(avant=timezone.now() + timedelta(seconds=1))
+        with self.assertNumQueries(1):
+            self.assertEqual(stock.solde(self.sticker.pk), 85)
+
+    def test_vente_repartie_puis_insuffisante(self):
+        self.assertEqual(self._vendre(60, 'C1', 'C60').status_code, 201)
+        self.assertEqual(MouvementStock.objects.filter(motif='vente').count(), 3)
+        self.assertEqual(stock.disponible(self.sticker.pk), 40)
+
+        response = self._vendre(41, 'C61', 'C101')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quantite', response.data)
+        self.assertFalse(VenteStickerNotaire.objects.filter(plage_debut='C61').exists())
+        self.assertEqual(stock.disponible(self.sticker.pk), 40)
+
+    def test_modification_et_suppression_de_vente(self):
+        reference = self._vendre(10, 'C1', 'C10').data['reference']
+        vente = VenteStickerNotaire.objects.get(reference=reference)
+        response = self.client.patch(
+            reverse('vente-sticker-notaire-detail', args=[reference]), {'quantite': 4}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stock.disponible(self.sticker.pk), 96)
+        vente.refresh_from_db()
+        vente.delete()
+        self.assertEqual(stock.disponible(self.sticker.pk), 100)
+        self.assertEqual(stock.solde(self.sticker.pk), 100)
+
+    def test_compaction(self):
+        for i in range(3):
+            self._vendre(5, f'C{i * 10 + 1}', f'C{i * 10 + 5}')
+        rapport = stock.compacter(avant=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(rapport['regroupes'], 3)
+        self.assertEqual(
+            list(MouvementStock.objects.filter(motif='vente').values_list('quantite', 'nombre')), [(-15, 3)]
+        )
+        self.assertEqual(stock.solde(self.sticker.pk), 85)
+        self.assertEqual(
+            sorted(CaseStock.objects.filter(type_sticker=self.sticker).values_list('disponible', flat=True)),
+            [21, 21, 21, 22],
+        )
+        self.assertEqual(stock.reconcilier()['ecarts'], [])
+
+    def test_reconciliation(self):
+        # Vente enregistrée hors registre (sans save) et stock total modifié en base
+        VenteStickerNotaire.objects.bulk_create([VenteStickerNotaire(
+            reference='VNT-HORS-REGISTRE', notaire=self.notaire, type_sticker=self.sticker, quantite=7,
+            plage_debut='D1', plage_fin='D7',
+        )])
+        ReferenceSticker.objects.filter(pk=self.sticker.pk).update(total_stock=110)
+        rapport = stock.reconcilier()
+        self.assertEqual(
+            sorted((e['controle'], e['attendu'], e['constate']) for e in rapport['ecarts']),
+            [('entrees', 110, 100), ('ventes', 7, 0)],
+        )
+        call_command('stock_stickers', '--corriger', stdout=open('/dev/null', 'w'))
+        self.assertEqual(stock.reconcilier()['ecarts'], [])
+        self.assertEqual(stock.disponible(self.sticker.pk), 103)
+
+        # Vente reprise par la correction : sa suppression rend le stock
+        VenteStickerNotaire.objects.get(reference='VNT-HORS-REGISTRE').delete()
+        self.assertEqual(stock.disponible(self.sticker.pk), 110)
+        self.assertEqual(stock.reconcilier()['ecarts'], [])
+
+    def test_reservation_au_niveau_du_modele(self):
+        vente = VenteStickerNotaire.objects.create(
+            notaire=self.notaire, type_sticker=self.sticker, quantite=6, plage_debut='E1', plage_fin='E6',
+        )
+        self.assertEqual((vente.quantite_reservee, stock.disponible(self.sticker.pk)), (6, 94))
+
+        autre = ReferenceSticker.objects.create(nom='Sticker C', prix_unitaire=500, total_stock=20)
+        vente.type_sticker, vente.quantite = autre, 5
+        vente.save()
+        self.assertEqual((stock.disponible(self.sticker.pk), stock.disponible(autre.pk)), (100, 15))
+
+        # Sans changement de quantité ni de sticker : aucun mouvement
+        mouvements = MouvementStock.objects.count()
+        vente.montant_paye = 100
+        vente.save(update_fields=['montant_paye', 'reste_a_payer'])
+        self.assertEqual(MouvementStock.objects.count(), mouvements)
+
+        vente.delete()
+        self.assertEqual(stock.disponible(autre.pk), 20)
+        self.assertEqual(stock.reconcilier()['ecarts'], [])
+
+    def test_vente_hors_registre_ne_rend_rien(self):
+        VenteStickerNotaire.objects.bulk_create([VenteStickerNotaire(
+            reference='VNT-BRUT', notaire=self.notaire, type_sticker=self.sticker, quantite=9,
+            plage_debut='F1', plage_fin='F9',
+        )])
+        VenteStickerNotaire.objects.get(reference='VNT-BRUT').delete()
+        self.assertEqual(stock.disponible(self.sticker.pk), 100)
+        self.assertEqual(stock.solde(self.sticker.pk), 100)
+
+
+class CreationVenteStickerTestCase(TestCase):
+    """POST /api/ventes/ventes-stickers/creer/"""
+
+    def setUp(self):
+        self.notaire = NotairesNotaire.objects.create(
+            matricule='N-VENTE', nom='Sawadogo', prenom='Issa', email='issa@notaires.bf',
+            telephone='+22670000001', adresse='Bobo-Dioulasso', actif=True,
+        )
+        self.sticker = DocumentsDocument.objects.create(
+            reference='DOC-STK', nom='Sticker officiel', description='Test', prix=500, delai_heures=48, actif=True,
+        )
+        self.url = reverse('creer-vente-sticker')
+        self.donnees = {
+            'sticker_id': self.sticker.pk, 'notaire_id': self.notaire.pk, 'quantite': 3,
+            'client_email': ' Client@Example.com ',
+        }
+
+    def test_creation(self):
+        response = APIClient().post(self.url, self.donnees, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['data']['notaire'], 'Issa Sawadogo')
+        self.assertEqual(response.data['data']['montant'], 1500.0)
+        vente = VenteSticker.objects.get()
+        self.assertEqual((vente.client_email, vente.quantite), ('client@example.com', 3))
+
+    def test_donnees_invalides_sans_vente(self):
+        client = APIClient()
+        for donnees in (
+            {**self.donnees, 'client_email': ''},
+            {**self.donnees, 'quantite': 'trois'},
+            {**self.donnees, 'quantite': 0},
+        ):
+            self.assertEqual(client.post(self.url, donnees, format='json').status_code, 400, donnees)
+        self.assertEqual(client.post(self.url, {**self.donnees, 'notaire_id': 999}, format='json').status_code, 404)
+        self.assertFalse(VenteSticker.objects.exists())
+
+    def test_erreur_de_reponse_annule_la_vente(self):
+        with mock.patch.object(NotairesNotaire, 'prenom', new_callable=mock.PropertyMock, side_effect=AttributeError), \
+                self.assertRaises(AttributeError):
+            APIClient().post(self.url, self.donnees, format='json')
+        self.assertFalse(VenteSticker.objects.exists())
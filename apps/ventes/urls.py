@@ -21,4 +21,5 @@ urlpatterns = [
     path('demandes/creer/', views.DemandeViewSet.as_view({'post': 'creer'}), name='creer-demande'),
     path('paiements/initier/', views.PaiementViewSet.as_view({'post': 'initier'}), name='initier-paiement'),
     path('statistiques/notaires/', views.StatistiquesNotairesAPIView.as_view(), name='statistiques-notaires'),
+    path('stickers-verification/', views.VerificationStickerAPIView.as_view(), name='verification-sticker'),
 ]
\ No newline at end of file
@@ -3,6 +3,8 @@ from rest_framework import viewsets, status, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
+from rest_framework.throttling import ScopedRateThrottle
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
 from django.shortcuts import get_object_or_404
 import uuid
@@ -19,8 +21,9 @@ from .serializers import (
     DemandeCreateSerializer, DemandeSerializer,
     AvisClientCreateSerializer, ReferenceStickerSerializer, 
     VenteStickerNotaireSerializer, RecuStickerSerializer, RecuStickerCreateSerializer,
-    RecuVenteStickerSerializer
+    RecuVenteStickerSerializer, VerificationStickerSerializer
 )
+from . import series
 
 # ========================================
 # 1. API VENTE DE STICKER (LIÉE À NOTAIRE)
@@ -40,23 +43,20 @@ class VenteStickerViewSet(viewsets.ViewSet):
         from .services import VenteStickerService
         
         try:
-            result = VenteStickerService.creer_vente(
-                data=request.data,
-                request=request
-            )
-            
-            return Response({
-                'status': 'success',
-                'data': {
-                    'reference': result['vente'].reference,
-                    'sticker': result['vente'].sticker.nom,
-                    'notaire': result['vente'].notaire.nom_complet,
-                    'montant': float(result['vente'].montant_total)
+            # La réponse est construite dans la transaction : une erreur
+            # n'y laisse pas de vente enregistrée (et dupliquée au renvoi)
+            with transaction.atomic():
+                vente = VenteStickerService.creer_vente(data=request.data, request=request)['vente']
+                donnees = {
+                    'reference': vente.reference,
+                    'sticker': vente.sticker.nom,
+                    'notaire': f"{vente.notaire.prenom} {vente.notaire.nom}",
+                    'montant': float(vente.montant_total)
                 }
-            }, status=201)
-            
-        except ValidationError as e:
-            return Response({'error': str(e)}, status=400)
+        except DjangoValidationError as e:
+            return Response({'error': e.message_dict if hasattr(e, 'error_dict') else e.messages}, status=400)
+        
+        return Response({'status': 'success', 'data': donnees}, status=201)
     
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
     def par_notaire(self, request):
@@ -359,6 +359,7 @@ class StatistiquesNotairesAPIView(APIView):
     Retourne les agrégats globaux attendus par le frontend
     """
     permission_classes = [permissions.IsAuthenticated]
+    lecture_replica = True
 
     def get(self, request):
         from django.db.models import Count, Sum, Q
@@ -480,3 +481,51 @@ class RecuStickerViewSet(viewsets.ModelViewSet):
         recu = self.get_object()
         # Logique de génération PDF ici
         return Response({'status': 'PDF generation not implemented yet'})
+
+
+class VerificationStickerAPIView(APIView):
+    """
+    Vérification publique des numéros de stickers (contrôles sur le terrain).
+
+    GET  ?serie=A1010150             -> vente, reçu et notaire du numéro
+    POST {"series": ["A1010150", ...]} -> un résultat par numéro
+
+    Le POST (jusqu'à MAX_SERIES numéros par appel) est limité par adresse
+    IP au débit REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['verification_stickers'].
+    """
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = 'verification_stickers'
+
+    def get_throttles(self):
+        if self.request.method == 'POST':
+            return [ScopedRateThrottle()]
+        return super().get_throttles()
+
+    def get(self, request):
+        serie = request.query_params.get('serie', '').strip()
+        if not serie:
+            return Response({'error': 'Le paramètre serie est requis'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            vente, erreur = series.vente_pour(*series.lire_numero(serie)), None
+        except series.SerieInvalide as e:
+            vente, erreur = None, str(e)
+        return Response(VerificationStickerSerializer({'serie': serie, 'vente': vente, 'erreur': erreur}).data)
+
+    def post(self, request):
+        liste = request.data.get('series')
+        if not isinstance(liste, list) or not liste:
+            return Response({'error': 'Une liste "series" est requise'}, status=status.HTTP_400_BAD_REQUEST)
+        maximum = series._config()['MAX_SERIES']
+        if len(liste) > maximum:
+            return Response(
+                {'error': f'Au plus {maximum} numéros par vérification'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        resultats = [
+            {'serie': serie, 'vente': vente, 'erreur': erreur}
+            for serie, vente, erreur in series.verifier_series(liste)
+        ]
+        return Response({
+            'total': len(resultats),
+            'valides': sum(1 for r in resultats if r['vente'] is not None),
+            'resultats': VerificationStickerSerializer(resultats, many=True).data,
+        })
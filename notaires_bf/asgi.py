@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'notaires_bf.settings')
+# Processus servant des requêtes : statement_timeout appliqué (DB_CONNEXIONS)
+os.environ['NOTAIRES_BF_WEB'] = '1'
 
 application = get_asgi_application()
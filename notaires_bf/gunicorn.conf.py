@@ -0,0 +1,44 @@
+# notaires_bf/gunicorn.conf.py
+"""
+Configuration gunicorn : gunicorn -c notaires_bf/gunicorn.conf.py notaires_bf.wsgi:application
+
+Les métriques Prometheus (apps/core/metriques.py) sont agrégées entre
+workers dans PROMETHEUS_MULTIPROC_DIR : le dossier est vidé au démarrage
+du maître et les fichiers d'un worker arrêté sont marqués morts.
+
+Connexions à la base (DB_CONNEXIONS, apps/core/connexions.py) : en mode
+'pool', servir avec GUNICORN_THREADS > 1 (workers gthread) pour que les
+threads d'un worker partagent le pool ; un worker sync n'emprunte jamais
+plus d'une connexion, le mode 'persistantes' lui suffit.
+"""
+import os
+import shutil
+
+# Avant tout import de prometheus_client, qui choisit alors son stockage
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/notaires_bf_metriques')
+
+from prometheus_client import multiprocess  # noqa: E402
+
+bind = os.getenv('GUNICORN_BIND', 'unix:/run/gunicorn.sock')
+workers = int(os.getenv('GUNICORN_WORKERS', '3'))
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+accesslog = '-'
+
+
+def on_starting(server):
+    # Vider sans supprimer le dossier (RuntimeDirectory systemd)
+    dossier = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    os.makedirs(dossier, exist_ok=True)
+    for nom in os.listdir(dossier):
+        chemin = os.path.join(dossier, nom)
+        shutil.rmtree(chemin) if os.path.isdir(chemin) else os.remove(chemin)
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    # Rendre les connexions (et fermer le pool) avant l'arrêt du worker
+    from apps.core import connexions
+    connexions.fermer()
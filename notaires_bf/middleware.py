@@ -1,14 +1,19 @@
+import contextlib
 import logging
 import json
 import traceback
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.http import JsonResponse, HttpResponseServerError
 from django.urls import resolve, Resolver404
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.exceptions import APIException
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
-from rest_framework_simplejwt.tokens import RefreshToken
+from apps.core import budget, connexions, metriques, replicas
+from apps.system import profilage
+from apps.utilisateurs.authentication import ClaimsRefreshToken
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +60,7 @@ class JWTTokenRefreshMiddleware:
 
             if refresh_token:
                 # Valider et utiliser le refresh token
-                refresh = RefreshToken(refresh_token)
+                refresh = ClaimsRefreshToken(refresh_token)
                 new_access_token = str(refresh.access_token)
 
                 # Créer une nouvelle réponse avec le nouveau token
@@ -73,6 +78,142 @@ class JWTTokenRefreshMiddleware:
         return None
 
 
+class QueryCountHeaderMiddleware:
+    """
+    Ajoute l'en-tête `X-Query-Count` (requêtes SQL exécutées pendant la
+    requête). Activé seulement si EXPOSE_QUERY_COUNT est vrai, pour les
+    tests de charge (voir apps/core/simulation/charge.py).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'EXPOSE_QUERY_COUNT', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        compteur = [0]
+
+        def compter(execute, sql, params, many, context):
+            compteur[0] += 1
+            return execute(sql, params, many, context)
+
+        with contextlib.ExitStack() as pile:
+            for alias in connections:
+                pile.enter_context(connections[alias].execute_wrapper(compter))
+            response = self.get_response(request)
+        response['X-Query-Count'] = str(compteur[0])
+        return response
+
+
+class BudgetRequetesMiddleware:
+    """
+    Contrôle le budget de requêtes SQL déclaré par la vue résolue
+    (apps/core/budget.py) : dépassement journalisé, ou levé en mode strict.
+    Le suivi des requêtes n'est installé qu'une fois la vue résolue, et
+    seulement si elle déclare un budget. Désactivé si
+    BUDGET_REQUETES['ACTIF'] est faux.
+    """
+
+    def __init__(self, get_response):
+        if not budget.actif():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with contextlib.ExitStack() as pile:
+            request._budget_pile = pile
+            response = self.get_response(request)
+        suivi = getattr(request, '_budget_suivi', None)
+        if suivi is not None:
+            budget.verifier(request, suivi, request._budget_requetes)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        maximum = budget.budget_de_vue(view_func, request.method)
+        pile = getattr(request, '_budget_pile', None)
+        if maximum is None or pile is None:
+            return
+        request._budget_requetes = maximum
+        request._budget_suivi = suivi = budget.Suivi()
+        for alias in connections:
+            pile.enter_context(connections[alias].execute_wrapper(suivi))
+
+
+class ReplicaLectureMiddleware:
+    """
+    Route les lectures des vues déclarées `lecture_replica` vers la
+    réplique et retient les écritures de l'utilisateur pour qu'il relise
+    le primaire (apps/core/replicas.py). Retiré de la chaîne sans réplique
+    configurée ou si REPLICAS['ACTIF'] est faux.
+    """
+
+    def __init__(self, get_response):
+        if not replicas.actif():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        etat, jeton = replicas.demarrer(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.terminer(jeton)
+        replicas.retenir_ecriture(request, etat)
+        if etat.replica and response.streaming:
+            response.streaming_content = replicas.prolonger(response.streaming_content, etat)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas.declarer(view_func, request.method)
+
+
+class InstrumentationMiddleware:
+    """
+    Mesure chaque requête (durée, SQL, cache, appels sortants, taille de
+    réponse) par vue et méthode, exposé sur /metrics (apps/core/metriques.py),
+    puis l'état des pools de connexions (apps/core/connexions.py).
+    Désactivé si METRIQUES['ACTIF'] est faux.
+    """
+
+    def __init__(self, get_response):
+        if not metriques.actif():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mesure, jeton = metriques.demarrer()
+        with contextlib.ExitStack() as pile:
+            for alias in connections:
+                pile.enter_context(connections[alias].execute_wrapper(mesure.sql))
+            try:
+                response = self.get_response(request)
+            except BaseException:
+                metriques.annuler(jeton)
+                raise
+        metriques.terminer(jeton, mesure, request, response)
+        connexions.publier()
+        return response
+
+
+class ProfilageMiddleware:
+    """
+    Profile la requête (échantillonnage de pile, journal SQL) quand elle
+    porte un jeton de profilage d'administrateur (apps/system/profilage.py).
+    Retiré de la chaîne si PROFILAGE['ACTIF'] est faux.
+    """
+
+    def __init__(self, get_response):
+        if not profilage.actif():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        jeton = profilage.demande(request)
+        if jeton is None or not profilage.autoriser(jeton):
+            return self.get_response(request)
+        return profilage.profiler(request, self.get_response)
+
+
 class ExceptionMiddleware:
     """
     Middleware amélioré pour gérer les exceptions de manière sécurisée.
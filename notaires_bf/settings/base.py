@@ -1,8 +1,11 @@
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import timedelta
 
+from apps.core import connexions
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 # BASE_DIR est la racine du projet (où se trouve manage.py et .env)
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -71,6 +74,10 @@ INSTALLED_APPS = [
     'apps.evenements',
 ]
 MIDDLEWARE = [
+    'notaires_bf.middleware.InstrumentationMiddleware',
+    'notaires_bf.middleware.QueryCountHeaderMiddleware',
+    'notaires_bf.middleware.BudgetRequetesMiddleware',
+    'notaires_bf.middleware.ReplicaLectureMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -80,6 +87,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'notaires_bf.middleware.JWTTokenRefreshMiddleware',
+    'notaires_bf.middleware.ProfilageMiddleware',
 ]
 ROOT_URLCONF = 'notaires_bf.urls'
 TEMPLATES = [
@@ -101,6 +109,24 @@ WSGI_APPLICATION = 'notaires_bf.wsgi.application'
 # Database
 # On utilise PostgreSQL si les variables d'environnement sont définies.
 DB_NAME = os.getenv('DB_NAME')
+# Connexions PostgreSQL (apps/core/connexions.py) : 'persistantes' pour des
+# workers gunicorn sync, 'pool' (psycopg 3) pour des workers gthread, 'requete'
+DB_CONNEXIONS = {
+    'MODE': os.getenv('DB_CONNEXIONS', 'persistantes'),
+    # Durée de vie d'une connexion persistante (secondes)
+    'DUREE_MAX': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+    'POOL_MIN': int(os.getenv('DB_POOL_MIN', '2')),
+    'POOL_MAX': int(os.getenv('DB_POOL_MAX', '10')),
+    # Attente maximale d'une connexion libre du pool (secondes)
+    'POOL_ATTENTE': float(os.getenv('DB_POOL_ATTENTE', '10')),
+    'DELAI_CONNEXION': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+    # statement_timeout PostgreSQL (millisecondes, 0 : aucun), posé sur les seules
+    # connexions des processus web (wsgi.py, asgi.py) : migrations et commandes
+    # manage.py ne sont pas bornées
+    'DUREE_REQUETE_MAX_MS': (
+        int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000')) if os.getenv('NOTAIRES_BF_WEB') else 0
+    ),
+}
 if DB_NAME:
     DATABASES = {
         'default': {
@@ -112,6 +138,15 @@ if DB_NAME:
             'PORT': os.getenv('DB_PORT', '5432'),
         }
     }
+    DATABASES['default'].update(connexions.reglages(DB_CONNEXIONS))
+    # Réplique en lecture (apps/core/replicas.py) : même base, autre serveur
+    if os.getenv('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('DB_REPLICA_HOST'),
+            'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
 else:
     if not DEBUG:
         from django.core.exceptions import ImproperlyConfigured
@@ -123,6 +158,45 @@ else:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    # Réplique simulée par une copie de db.sqlite3, pour essayer le routage
+    if os.getenv('DB_REPLICA_SQLITE'):
+        DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_REPLICA_SQLITE'),
+            'TEST': {'MIRROR': 'default'},
+        }
+DATABASE_ROUTERS = ['apps.core.replicas.RouteurReplica']
+# Cache partagé entre workers et redémarrages (niveau L2 de apps/core/cache_niveaux.py) :
+# Redis si REDIS_URL est défini. Sans Redis, cache fichier dans CACHE_DOSSIER,
+# commun aux workers d'un même serveur et conservé au redémarrage : compteurs,
+# limites de débit et invalidations restent partagés (les incréments n'y sont
+# pas atomiques, Redis reste conseillé en production). Pas de cache en base :
+# chaque lecture deviendrait une requête SQL, routée et comptée comme les
+# autres (budgets, réplique). Un cache propre au processus (locmem) est
+# signalé par `manage.py check --deploy`.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': os.getenv('CACHE_PREFIXE', 'notaires_bf'),
+        }
+    }
+elif sys.argv[1:2] == ['test']:
+    # Tests : cache propre au lancement, sans l'état (limites de débit,
+    # absences...) laissé dans CACHE_DOSSIER par le serveur ou un lancement précédent
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DOSSIER', str(BASE_DIR / 'var' / 'cache')),
+            'KEY_PREFIX': os.getenv('CACHE_PREFIXE', 'notaires_bf'),
+            # Au-delà, Django évince un tiers des entrées au hasard (versions, compteurs compris)
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTREES', '100000'))},
+        }
+    }
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -141,7 +215,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.utilisateurs.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
@@ -155,6 +229,13 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # Débits des vues qui déclarent un throttle_scope
+    'DEFAULT_THROTTLE_RATES': {
+        # Vérification par lot des numéros de stickers (apps/ventes/views.py)
+        'verification_stickers': os.getenv('VENTES_VERIFICATION_DEBIT', '30/min'),
+        # URLs d'upload direct et réception locale, anonymes (apps/core/uploads.py)
+        'uploads': os.getenv('UPLOADS_DEBIT', '60/hour'),
+    },
 }
 
 
@@ -170,6 +251,13 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    'TOKEN_OBTAIN_SERIALIZER': 'apps.utilisateurs.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'apps.utilisateurs.authentication.ClaimsTokenRefreshSerializer',
+}
+
+# Profils utilisateurs mis en cache pour l'authentification JWT (secondes)
+JWT_CLAIMS = {
+    'CACHE_TIMEOUT': int(os.getenv('JWT_CLAIMS_CACHE_TIMEOUT', '300')),
 }
 
 
@@ -240,7 +328,10 @@ CORS_ALLOW_HEADERS = [
     "x-requested-with",
     "x-api-key",
     "cache-control",
+    "if-none-match",
+    "idempotency-key",
 ]
+CORS_EXPOSE_HEADERS = ["etag", "idempotent-replayed", "retry-after"]
 
 
 # Configurations de sécurité pour la production
@@ -378,6 +469,52 @@ else:
     # STATICFILES_DIRS = [BASE_DIR / 'static']  # Supprimé car le dossier n'existe pas
     STATIC_ROOT = BASE_DIR / 'static'
 
+# Cache des réponses publiques (ETag / 304), voir apps/core/cache.py
+RESPONSE_CACHE = {
+    'ENABLED': os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true',
+    'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', '300')),
+    # Modèles supplémentaires dont les sauvegardes invalident le cache
+    'MODELS': [],
+}
+
+# Compteur de vues des actualités (apps/actualites/services.py)
+ACTUALITES_VUES = {
+    'DEDUP_SECONDS': int(os.getenv('ACTUALITES_VUES_DEDUP_SECONDS', '1800')),
+    # Identifiant inexistant mémorisé (secondes) ; report : flush_vues_actualites en cron
+    'ABSENT_TIMEOUT': int(os.getenv('ACTUALITES_VUES_ABSENT_TIMEOUT', '300')),
+}
+
+# Uploads directs vers le stockage (apps/core/uploads.py)
+# BACKEND : 's3' ou 'local' ; par défaut déduit de STORAGES['default'].
+DIRECT_UPLOADS = {
+    'BACKEND': os.getenv('DIRECT_UPLOADS_BACKEND') or None,
+    'EXPIRES': int(os.getenv('DIRECT_UPLOADS_EXPIRES', '900')),
+}
+
+# Dérivés d'images : miniatures et WebP/AVIF (apps/core/images.py)
+IMAGE_DERIVATIVES = {
+    'LARGEURS': [160, 400, 800],
+    'FORMATS': ['webp', 'avif'],
+    'QUALITE': int(os.getenv('IMAGE_DERIVATIVES_QUALITE', '80')),
+    'WORKERS': int(os.getenv('IMAGE_DERIVATIVES_WORKERS', '2')),
+}
+
+# Liens de téléchargement signés (apps/core/telechargements.py)
+# DUREE : validité maximale d'un lien (celui envoyé par email) ; DUREE_REDIRECTION : URL S3 pré-signée.
+TELECHARGEMENTS = {
+    'DUREE': int(os.getenv('TELECHARGEMENTS_DUREE', str(24 * 3600))),
+    'DUREE_REDIRECTION': int(os.getenv('TELECHARGEMENTS_DUREE_REDIRECTION', '300')),
+    'CACHE_MAX_AGE': int(os.getenv('TELECHARGEMENTS_CACHE_MAX_AGE', '3600')),
+}
+
+# Clés d'idempotence des endpoints d'écriture (apps/core/idempotence.py)
+IDEMPOTENCY = {
+    'TIMEOUT': int(os.getenv('IDEMPOTENCY_TIMEOUT', str(24 * 3600))),
+}
+
+# En-tête X-Query-Count sur chaque réponse (tests de charge uniquement)
+EXPOSE_QUERY_COUNT = os.getenv('EXPOSE_QUERY_COUNT', 'False').lower() == 'true'
+
 # Configuration pour les images d'actualités
 ACTUALITES_IMAGE_DIR = 'actualites/'
 MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
@@ -392,6 +529,128 @@ YENGAPAY_PROJECT_ID = os.getenv('YENGAPAY_PROJECT_ID', '77423')
 YENGAPAY_WEBHOOK_SECRET = os.getenv('YENGAPAY_WEBHOOK_SECRET', 'e6282d55-a72d-421e-a844-99caa8a3b091')
 YENGAPAY_API_URL = os.getenv('YENGAPAY_API_URL', 'https://api.yengapay.com/api/v1')
 
+# Réconciliation des paiements en attente (apps/paiements/services/reconciliation.py)
+PAIEMENTS_RECONCILIATION = {
+    'SEUIL_SECONDES': int(os.getenv('PAIEMENTS_RECONCILIATION_SEUIL', '120')),
+    'AGE_MAX_HEURES': int(os.getenv('PAIEMENTS_RECONCILIATION_AGE_MAX_HEURES', '72')),
+    'WORKERS': int(os.getenv('PAIEMENTS_RECONCILIATION_WORKERS', '4')),
+    'RATE_LIMIT': float(os.getenv('PAIEMENTS_RECONCILIATION_RATE_LIMIT', '5')),
+}
+
+# Initiation des paiements : durée de validité d'une URL de paiement mise en cache
+PAIEMENTS_INITIATION = {
+    'CHECKOUT_TIMEOUT': int(os.getenv('PAIEMENTS_CHECKOUT_TIMEOUT', '1800')),
+}
+
+# Attribution des demandes aux notaires selon leur charge (apps/demandes/attribution.py)
+DEMANDES_ATTRIBUTION = {
+    'CAPACITE': int(os.getenv('DEMANDES_ATTRIBUTION_CAPACITE', '5')),
+    'AUTOMATIQUE': os.getenv('DEMANDES_ATTRIBUTION_AUTOMATIQUE', 'False') == 'True',
+}
+
+# Envoi des liens vers les documents générés (apps/demandes/livraison.py)
+DEMANDES_LIVRAISON = {
+    'WORKERS': int(os.getenv('DEMANDES_LIVRAISON_WORKERS', '2')),
+}
+
+# Suivi des demandes sans compte : durée de mémorisation d'une recherche
+# sans résultat (apps/demandes/suivi.py)
+DEMANDES_SUIVI = {
+    'TTL_ABSENT': int(os.getenv('DEMANDES_SUIVI_TTL_ABSENT', '60')),
+}
+
+# Vérification publique des numéros de stickers (apps/ventes/series.py)
+VENTES_VERIFICATION = {
+    'MAX_SERIES': int(os.getenv('VENTES_VERIFICATION_MAX_SERIES', '500')),
+}
+
+# Métriques Prometheus des requêtes, exposées sur /metrics (apps/core/metriques.py).
+# Sous gunicorn, définir PROMETHEUS_MULTIPROC_DIR (voir notaires_bf/gunicorn.conf.py)
+METRIQUES = {
+    'ACTIF': os.getenv('METRIQUES_ACTIF', 'True').lower() == 'true',
+    # Jeton du collecteur Prometheus (Authorization: Bearer <jeton>)
+    'JETON': os.getenv('METRIQUES_JETON', ''),
+}
+
+# Profilage à la demande des requêtes par un administrateur (apps/system/profilage.py)
+PROFILAGE = {
+    'ACTIF': os.getenv('PROFILAGE_ACTIF', 'True').lower() == 'true',
+    # Proportion des requêtes porteuses d'un jeton effectivement profilées
+    'RATIO': float(os.getenv('PROFILAGE_RATIO', '1.0')),
+    'MAX_PAR_MINUTE': int(os.getenv('PROFILAGE_MAX_PAR_MINUTE', '6')),
+    'INTERVALLE_MS': float(os.getenv('PROFILAGE_INTERVALLE_MS', '5')),
+    # Validité d'un jeton de profilage (secondes)
+    'DUREE_JETON': int(os.getenv('PROFILAGE_DUREE_JETON', '3600')),
+    # Validité du lien de téléchargement d'une pièce (profil, requêtes), réservé aux administrateurs
+    'DUREE_LIEN_PIECES': int(os.getenv('PROFILAGE_DUREE_LIEN_PIECES', '60')),
+}
+
+# Budget de requêtes SQL déclaré par les vues (apps/core/budget.py)
+BUDGET_REQUETES = {
+    'ACTIF': os.getenv('BUDGET_REQUETES_ACTIF', 'True').lower() == 'true',
+    # Lever BudgetRequetesDepasse au lieu de journaliser (tests, développement)
+    'STRICT': os.getenv('BUDGET_REQUETES_STRICT', 'False').lower() == 'true',
+    # Empreintes SQL répétées rapportées par dépassement
+    'EMPREINTES': int(os.getenv('BUDGET_REQUETES_EMPREINTES', '5')),
+}
+
+# Lectures des vues de reporting sur la réplique DATABASES['replica'] (apps/core/replicas.py)
+REPLICAS = {
+    'ACTIF': os.getenv('REPLICAS_ACTIF', 'True').lower() == 'true',
+    'ALIAS': os.getenv('REPLICAS_ALIAS', 'replica'),
+    # Après une écriture, les lectures de l'utilisateur restent sur le primaire (secondes)
+    'COLLANT': int(os.getenv('REPLICAS_COLLANT', '5')),
+    # Retard de réplication au-delà duquel la réplique est écartée (secondes)
+    'RETARD_MAX': float(os.getenv('REPLICAS_RETARD_MAX', '10')),
+    # Intervalle entre deux vérifications de la réplique par processus (secondes)
+    'VERIFICATION': float(os.getenv('REPLICAS_VERIFICATION', '15')),
+    # Applications toujours lues sur le primaire (authentification, révocation, cache)
+    'APPS_PRIMAIRE': ('auth', 'utilisateurs', 'core', 'sessions', 'contenttypes', 'admin', 'django_cache'),
+}
+
+# Cache à deux niveaux des services : LRU par processus devant CACHES (apps/core/cache_niveaux.py)
+CACHE_NIVEAUX = {
+    'ACTIF': os.getenv('CACHE_NIVEAUX_ACTIF', 'True').lower() == 'true',
+    'ALIAS': 'default',
+    'L1_TAILLE': int(os.getenv('CACHE_NIVEAUX_L1_TAILLE', '1000')),
+    # Durée de vie maximale en L1 : retard de visibilité d'une invalidation entre workers (secondes)
+    'L1_TTL': float(os.getenv('CACHE_NIVEAUX_L1_TTL', '5')),
+    # Valeur périmée servie pendant son recalcul (secondes au-delà du ttl)
+    'GRACE': int(os.getenv('CACHE_NIVEAUX_GRACE', '60')),
+    'VERROU': int(os.getenv('CACHE_NIVEAUX_VERROU', '30')),
+    'ATTENTE': float(os.getenv('CACHE_NIVEAUX_ATTENTE', '5')),
+    # Rafraîchissement anticipé : > 1 recalcule plus tôt, 0 le désactive
+    'BETA': float(os.getenv('CACHE_NIVEAUX_BETA', '1.0')),
+}
+
+# Banc de mesure des chemins chauds (apps/core/benchmarks, commande benchmarks)
+BENCHMARKS = {
+    'ITERATIONS': int(os.getenv('BENCHMARKS_ITERATIONS', '30')),
+    'ECHAUFFEMENT': int(os.getenv('BENCHMARKS_ECHAUFFEMENT', '3')),
+    # Écart toléré par rapport à la référence avant de signaler une régression
+    'SEUIL': float(os.getenv('BENCHMARKS_SEUIL', '0.2')),
+    'DOSSIER': os.getenv('BENCHMARKS_DOSSIER', str(BASE_DIR / 'benchmarks')),
+}
+
+# Attribution des slugs uniques (apps/core/slugs.py)
+SLUGS = {
+    'TENTATIVES': int(os.getenv('SLUGS_TENTATIVES', '5')),
+}
+
+# Registre de stock des stickers notaires (apps/ventes/stock.py)
+VENTES_STOCK = {
+    'CASES': int(os.getenv('VENTES_STOCK_CASES', '8')),
+    'RETENTION_JOURS': int(os.getenv('VENTES_STOCK_RETENTION_JOURS', '90')),
+    'TTL_SOLDE': int(os.getenv('VENTES_STOCK_TTL_SOLDE', '300')),
+}
+
+# Pagination par curseur des journaux d'audit et système (apps/core/pagination.py)
+LOG_PAGINATION = {
+    'PAGE_SIZE': int(os.getenv('LOG_PAGINATION_PAGE_SIZE', '50')),
+    'MAX_PAGE_SIZE': int(os.getenv('LOG_PAGINATION_MAX_PAGE_SIZE', '500')),
+    'SEUIL_COMPTE_EXACT': int(os.getenv('LOG_PAGINATION_SEUIL_COMPTE_EXACT', '10000')),
+}
+
 # URL de base de votre application
 BASE_URL = os.getenv('BASE_URL', 'https://notaire-bf-1ns8.onrender.com')
 
@@ -402,6 +661,13 @@ SYSTEM_CONFIG = {
     'METRIC_RETENTION_DAYS': 30,
 }
 
+# Partitions mensuelles des journaux (apps/system/partitions.py, commande partitions_journaux)
+LOG_PARTITIONS = {
+    'MOIS_AVANCE': int(os.getenv('LOG_PARTITIONS_MOIS_AVANCE', '3')),
+    'DETACHER_SEULEMENT': os.getenv('LOG_PARTITIONS_DETACHER_SEULEMENT', 'False') == 'True',
+    'LOT_COPIE': int(os.getenv('LOG_PARTITIONS_LOT_COPIE', '10000')),
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -22,6 +22,7 @@ from django.conf.urls.static import static
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework import permissions
+from apps.core.views import MetriquesView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -43,6 +44,8 @@ schema_view = get_schema_view(
 urlpatterns = [
     #admin
     path('admin/', admin.site.urls),
+    #Métriques Prometheus (apps/core/metriques.py)
+    path('metrics', MetriquesView.as_view(), name='metriques'),
     #Api 
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
@@ -36,7 +36,9 @@ After=network.target
 User=$USER
 Group=www-data
 WorkingDirectory=$PROJECT_DIR
-ExecStart=$PROJECT_DIR/venv/bin/gunicorn --access-logfile - --workers 3 --bind unix:/run/gunicorn.sock notaires_bf.wsgi:application
+RuntimeDirectory=gunicorn-metriques
+Environment=PROMETHEUS_MULTIPROC_DIR=/run/gunicorn-metriques
+ExecStart=$PROJECT_DIR/venv/bin/gunicorn -c notaires_bf/gunicorn.conf.py notaires_bf.wsgi:application
 
 [Install]
 WantedBy=multi-user.target